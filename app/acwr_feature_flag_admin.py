@@ -84,8 +84,8 @@ def toggle_acwr_feature_flag():
         if feature_name != 'enhanced_acwr_calculation':
             return jsonify({'error': 'Invalid feature name'}), 400
         
-        # Note: In a real implementation, this would update a database or configuration file
-        # For now, we'll just log the action and return success
+        from utils.feature_flags import set_feature_flag
+        set_feature_flag(feature_name, bool(enabled), admin_user_id=current_user.id)
         logger.info(f"Admin {current_user.id} toggled {feature_name} to {enabled}")
         
         return jsonify({
@@ -2,16 +2,29 @@
 """
 ACWR Feature Flag Monitoring and Logging
 Handles comprehensive monitoring and logging for ACWR feature flags
+
+Access checks run on hot paths (per date in update_moving_averages, per user in
+crons), so they are sampled and batched: every check is counted, only
+ACCESS_SAMPLE_RATE of them are kept as events, and the counts are written to
+the application log as one summary line per ACCESS_FLUSH_SECONDS.
+Toggles and errors are always recorded.
 """
 
 import logging
 import json
+import os
+import random
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from dataclasses import dataclass, asdict
 
 logger = logging.getLogger(__name__)
 
+ACCESS_SAMPLE_RATE = float(os.environ.get('FEATURE_ACCESS_SAMPLE_RATE', '0.01'))
+ACCESS_FLUSH_SECONDS = 60
+
 @dataclass
 class FeatureFlagEvent:
     """Data class for feature flag events"""
@@ -26,35 +39,56 @@ class FeatureFlagEvent:
 class ACWRFeatureFlagMonitor:
     """Monitor and log ACWR feature flag activities"""
     
-    def __init__(self):
+    def __init__(self, sample_rate: float = ACCESS_SAMPLE_RATE, flush_seconds: float = ACCESS_FLUSH_SECONDS):
         self.logger = logger
         self.events: List[FeatureFlagEvent] = []
         self.max_events = 1000  # Keep last 1000 events in memory
+        self.sample_rate = sample_rate
+        self.flush_seconds = flush_seconds
+        self.access_totals: Dict[str, Dict[str, int]] = {}  # since process start
+        self._pending_access: Dict[tuple, int] = {}  # (feature_name, granted) -> count since last flush
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
     
     def log_feature_access(self, feature_name: str, user_id: int, granted: bool, details: Dict = None):
-        """Log feature flag access attempts"""
+        """Count a feature flag access check; keep a sampled event and flush counts periodically"""
         try:
-            event = FeatureFlagEvent(
-                timestamp=datetime.now(),
-                event_type='access_granted' if granted else 'access_denied',
-                feature_name=feature_name,
-                user_id=user_id,
-                admin_user_id=None,
-                details=details or {},
-                success=granted
-            )
+            outcome = 'granted' if granted else 'denied'
+            with self._lock:
+                totals = self.access_totals.setdefault(feature_name, {'granted': 0, 'denied': 0})
+                totals[outcome] += 1
+                key = (feature_name, granted)
+                self._pending_access[key] = self._pending_access.get(key, 0) + 1
+                flush_due = time.monotonic() - self._last_flush >= self.flush_seconds
             
-            self._add_event(event)
+            if random.random() < self.sample_rate:
+                self._add_event(FeatureFlagEvent(
+                    timestamp=datetime.now(),
+                    event_type=f'access_{outcome}',
+                    feature_name=feature_name,
+                    user_id=user_id,
+                    admin_user_id=None,
+                    details=dict(details or {}, sample_rate=self.sample_rate),
+                    success=granted
+                ))
             
-            # Log to application logger
-            if granted:
-                self.logger.info(f"🎉 ACWR feature access granted to user {user_id} for {feature_name}")
-            else:
-                self.logger.info(f"⏳ ACWR feature access denied to user {user_id} for {feature_name}")
+            if flush_due:
+                self.flush_access_log()
                 
         except Exception as e:
             self.logger.error(f"Error logging feature access: {str(e)}")
     
+    def flush_access_log(self):
+        """Write the access counts since the last flush as one log line"""
+        with self._lock:
+            pending, self._pending_access = self._pending_access, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        summary = ', '.join(f"{name} {'granted' if granted else 'denied'}={count}"
+                            for (name, granted), count in sorted(pending.items()))
+        self.logger.info(f"ACWR feature access checks since last flush: {summary}")
+    
     def log_feature_toggle(self, feature_name: str, admin_user_id: int, enabled: bool, details: Dict = None):
         """Log feature flag toggle events"""
         try:
@@ -99,11 +133,12 @@ class ACWRFeatureFlagMonitor:
     
     def _add_event(self, event: FeatureFlagEvent):
         """Add event to memory store"""
-        self.events.append(event)
-        
-        # Keep only the most recent events
-        if len(self.events) > self.max_events:
-            self.events = self.events[-self.max_events:]
+        with self._lock:
+            self.events.append(event)
+            
+            # Keep only the most recent events
+            if len(self.events) > self.max_events:
+                self.events = self.events[-self.max_events:]
     
     def get_recent_events(self, hours_back: int = 24) -> List[Dict]:
         """Get recent events within specified time window"""
@@ -137,7 +172,9 @@ class ACWRFeatureFlagMonitor:
                     'flags_toggled': 0,
                     'errors': 0,
                     'unique_users': 0,
-                    'success_rate': 0.0
+                    'success_rate': 0.0,
+                    'access_sample_rate': self.sample_rate,
+                    'access_totals': {name: dict(counts) for name, counts in self.access_totals.items()}
                 }
             
             # Calculate statistics
@@ -168,7 +205,9 @@ class ACWRFeatureFlagMonitor:
                 'flags_toggled': flags_toggled,
                 'errors': errors,
                 'unique_users': unique_users,
-                'success_rate': round(success_rate, 2)
+                'success_rate': round(success_rate, 2),
+                'access_sample_rate': self.sample_rate,
+                'access_totals': {name: dict(counts) for name, counts in self.access_totals.items()}
             }
             
         except Exception as e:
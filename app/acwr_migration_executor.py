@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+ACWR Migration Executor
+Recomputes enhanced ACWR for whole users at a time: each user's daily series is loaded
+once, every activity date is evaluated with the range engine, and results are written
+with multi-row upserts. Users fan out across a process pool.
+
+Progress is durable. Each chunk of upserted rows commits together with the user's
+checkpoint (last_completed_date), so a paused, crashed or redeployed run resumes where
+it stopped. The same transaction snapshots what each row held before the migration first
+touched it (acwr_migration_prior_values), so a rollback deletes only the rows the
+migration created and restores the ones it overwrote.
+"""
+
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from psycopg2.extras import execute_values
+
+import acwr_sweep_engine
+import db_utils
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+CHECKPOINT_CHUNK_DAYS = 90
+
+# Checkpoint statuses a run picks up; 'running' covers a process that died mid-user
+RESUMABLE_STATUSES = ('pending', 'running', 'failed')
+
+UPSERT_SQL = """
+    INSERT INTO acwr_enhanced_calculations
+    (user_id, activity_id, configuration_id, acwr_ratio, acute_load, chronic_load,
+     calculation_method, migration_id, created_at, updated_at)
+    VALUES %s
+    ON CONFLICT (user_id, activity_id, configuration_id) DO UPDATE SET
+        acwr_ratio = EXCLUDED.acwr_ratio,
+        acute_load = EXCLUDED.acute_load,
+        chronic_load = EXCLUDED.chronic_load,
+        calculation_method = EXCLUDED.calculation_method,
+        migration_id = EXCLUDED.migration_id,
+        updated_at = NOW()
+"""
+UPSERT_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())"
+
+# The first write of a migration to a row keeps the row's previous values (or that it
+# did not exist); later writes by the same migration leave that snapshot alone
+SNAPSHOT_SQL = """
+    INSERT INTO acwr_migration_prior_values
+    (migration_id, user_id, activity_id, configuration_id, existed, acwr_ratio,
+     acute_load, chronic_load, calculation_method, prior_migration_id, prior_updated_at)
+    SELECT v.migration_id, v.user_id, v.activity_id, v.configuration_id, e.user_id IS NOT NULL,
+           e.acwr_ratio, e.acute_load, e.chronic_load, e.calculation_method, e.migration_id,
+           e.updated_at
+    FROM (VALUES %s) AS v (migration_id, user_id, activity_id, configuration_id)
+    LEFT JOIN acwr_enhanced_calculations e
+      ON e.user_id = v.user_id
+     AND e.activity_id = v.activity_id
+     AND e.configuration_id = v.configuration_id
+    ON CONFLICT (migration_id, user_id, activity_id, configuration_id) DO NOTHING
+"""
+
+# Rollback only touches rows still stamped with the migration (not since overwritten)
+_ROLLBACK_MATCH = """
+      AND e.user_id = p.user_id
+      AND e.activity_id = p.activity_id
+      AND e.configuration_id = p.configuration_id
+      AND e.migration_id = p.migration_id
+      AND p.migration_id = %(migration_id)s
+      AND (%(user_id)s IS NULL OR p.user_id = %(user_id)s)
+"""
+
+
+def _checkpoint_status(migration_id: str, user_id: int) -> Optional[Dict]:
+    rows = db_utils.execute_query(
+        """
+        SELECT status, last_completed_date, processed_activities, rows_written
+        FROM acwr_migration_checkpoints
+        WHERE migration_id = %s AND user_id = %s
+        """,
+        (migration_id, user_id),
+        fetch=True
+    )
+    return dict(rows[0]) if rows else None
+
+
+def _set_checkpoint_status(migration_id: str, user_id: int, status: str,
+                           error_message: Optional[str] = None) -> None:
+    db_utils.execute_query(
+        """
+        UPDATE acwr_migration_checkpoints
+        SET status = %s,
+            error_message = %s,
+            started_at = COALESCE(started_at, NOW()),
+            updated_at = NOW()
+        WHERE migration_id = %s AND user_id = %s
+        """,
+        (status, error_message, migration_id, user_id)
+    )
+
+
+def write_calculations(cursor, migration_id: str, rows: List[tuple]) -> None:
+    """
+    Snapshot, then upsert, acwr_enhanced_calculations rows in the caller's transaction.
+
+    rows are UPSERT_TEMPLATE tuples: (user_id, activity_id, configuration_id, acwr_ratio,
+    acute_load, chronic_load, calculation_method, migration_id).
+    """
+    execute_values(cursor, SNAPSHOT_SQL, [(migration_id,) + tuple(row[:3]) for row in rows],
+                   page_size=1000)
+    execute_values(cursor, UPSERT_SQL, rows, template=UPSERT_TEMPLATE, page_size=1000)
+
+
+def _complete_checkpoint(migration_id: str, user_id: int) -> bool:
+    """Mark a running checkpoint completed; False if it is no longer running (e.g. paused)"""
+    with db_utils.get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE acwr_migration_checkpoints
+                SET status = 'completed', error_message = NULL, updated_at = NOW()
+                WHERE migration_id = %s AND user_id = %s AND status = 'running'
+                """,
+                (migration_id, user_id)
+            )
+            completed = cursor.rowcount
+        conn.commit()
+    return completed > 0
+
+
+def _chunk_by_days(activities: List[Dict], chunk_days: int) -> List[List[Dict]]:
+    """Split date-ordered activities into chunks that never split a date"""
+    chunks = []
+    current = []
+    chunk_start = None
+    for activity in activities:
+        day = activity['_date']
+        if chunk_start is None or (day - chunk_start).days >= chunk_days:
+            if current:
+                chunks.append(current)
+            current = []
+            chunk_start = day
+        current.append(activity)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def migrate_user(migration_id: str, user_id: int, configuration: Dict,
+                 chunk_days: int = CHECKPOINT_CHUNK_DAYS,
+                 progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Migrate one user from their durable checkpoint to their latest activity.
+
+    Args:
+        migration_id: Migration the checkpoint belongs to
+        user_id: User to migrate
+        configuration: ACWR configuration (id, chronic_period_days, decay_rate)
+        chunk_days: Activity days committed per checkpoint
+        progress_callback: Called with a summary dict after each committed chunk
+
+    Returns:
+        Summary dict with status, processed_activities, rows_written and timings
+    """
+    start = time.time()
+    summary = {
+        'migration_id': migration_id,
+        'user_id': user_id,
+        'status': 'running',
+        'processed_activities': 0,
+        'rows_written': 0,
+        'chunks': 0,
+        'error': None
+    }
+
+    try:
+        checkpoint = _checkpoint_status(migration_id, user_id)
+        if checkpoint is None:
+            raise ValueError(f"No checkpoint for user {user_id} in migration {migration_id}")
+        if checkpoint['status'] not in RESUMABLE_STATUSES:
+            summary['status'] = checkpoint['status']
+            return summary
+
+        _set_checkpoint_status(migration_id, user_id, 'running')
+
+        resume_after = checkpoint.get('last_completed_date')
+        if resume_after is not None:
+            resume_after = acwr_sweep_engine.parse_date(resume_after)
+            activities = db_utils.execute_query(
+                """
+                SELECT activity_id, date FROM activities
+                WHERE user_id = %s AND date > %s
+                ORDER BY date, activity_id
+                """,
+                (user_id, resume_after.strftime('%Y-%m-%d')),
+                fetch=True
+            ) or []
+        else:
+            activities = db_utils.execute_query(
+                """
+                SELECT activity_id, date FROM activities
+                WHERE user_id = %s
+                ORDER BY date, activity_id
+                """,
+                (user_id,),
+                fetch=True
+            ) or []
+
+        if activities:
+            for activity in activities:
+                activity['_date'] = acwr_sweep_engine.parse_date(activity['date'])
+
+            chronic_period = int(configuration['chronic_period_days'])
+            decay_rate = float(configuration['decay_rate'])
+            first_date = activities[0]['_date']
+            last_date = activities[-1]['_date']
+
+            # One series load and one range evaluation for the user's whole history
+            horizon = max(chronic_period, acwr_sweep_engine.ACUTE_PERIOD_DAYS)
+            series = acwr_sweep_engine.load_daily_series(
+                user_id, first_date - timedelta(days=horizon - 1), last_date
+            )
+            values = acwr_sweep_engine.evaluate_range(
+                series, first_date, last_date, chronic_period, decay_rate
+            )
+
+            for chunk in _chunk_by_days(activities, chunk_days):
+                # Pause is a checkpoint status so it reaches workers in other processes
+                current = _checkpoint_status(migration_id, user_id)
+                if current and current['status'] == 'paused':
+                    summary['status'] = 'paused'
+                    break
+
+                rows = []
+                for activity in chunk:
+                    day = values.day((activity['_date'] - first_date).days)
+                    rows.append((
+                        user_id,
+                        activity['activity_id'],
+                        configuration['id'],
+                        day['enhanced_acute_chronic_ratio'],
+                        day['acute_load_avg'],
+                        day['enhanced_chronic_load'],
+                        'enhanced',
+                        migration_id
+                    ))
+
+                with db_utils.get_db_connection() as conn:
+                    with conn.cursor() as cursor:
+                        write_calculations(cursor, migration_id, rows)
+                        cursor.execute(
+                            """
+                            UPDATE acwr_migration_checkpoints
+                            SET processed_activities = processed_activities + %s,
+                                rows_written = rows_written + %s,
+                                last_completed_date = %s,
+                                updated_at = NOW()
+                            WHERE migration_id = %s AND user_id = %s
+                            """,
+                            (len(chunk), len(rows), chunk[-1]['_date'], migration_id, user_id)
+                        )
+                    conn.commit()
+
+                summary['processed_activities'] += len(chunk)
+                summary['rows_written'] += len(rows)
+                summary['chunks'] += 1
+                if progress_callback:
+                    progress_callback({
+                        'chunk': summary['chunks'],
+                        'activities_processed': len(chunk),
+                        'rows_written': len(rows),
+                        'last_completed_date': chunk[-1]['_date'].isoformat(),
+                        'processing_time': time.time() - start
+                    })
+
+        if summary['status'] == 'running':
+            if _complete_checkpoint(migration_id, user_id):
+                summary['status'] = 'completed'
+            else:
+                # Paused after the last chunk: the checkpoint's status wins over completion
+                current = _checkpoint_status(migration_id, user_id)
+                summary['status'] = current['status'] if current else 'paused'
+
+    except Exception as e:
+        logger.error(f"Migration {migration_id} failed for user {user_id}: {str(e)}")
+        summary['status'] = 'failed'
+        summary['error'] = str(e)
+        try:
+            _set_checkpoint_status(migration_id, user_id, 'failed', str(e))
+        except Exception as checkpoint_error:
+            logger.error(f"Could not record failure checkpoint: {str(checkpoint_error)}")
+
+    summary['processing_time'] = time.time() - start
+    return summary
+
+
+def _migrate_user_worker(migration_id: str, user_id: int, configuration: Dict,
+                         chunk_days: int) -> Dict:
+    """Process-pool entry point (must be module-level to pickle)"""
+    return migrate_user(migration_id, user_id, configuration, chunk_days)
+
+
+class ACWRMigrationExecutor:
+    """Runs checkpointed, per-user ACWR migrations across a process pool"""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS,
+                 chunk_days: int = CHECKPOINT_CHUNK_DAYS):
+        self.max_workers = max_workers
+        self.chunk_days = chunk_days
+        self.logger = logging.getLogger(__name__)
+
+    def create_checkpoints(self, migration_id: str, user_ids: List[int],
+                           configuration_id: int) -> int:
+        """
+        Register users with a migration. Existing checkpoints are left alone, so
+        calling this again for a migration that already ran is how it resumes.
+
+        Returns:
+            Number of new checkpoints
+        """
+        if not user_ids:
+            return 0
+        with db_utils.get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO acwr_migration_checkpoints
+                    (migration_id, user_id, configuration_id, total_activities)
+                    SELECT %s, user_id, %s, COUNT(*)
+                    FROM activities
+                    WHERE user_id = ANY(%s)
+                    GROUP BY user_id
+                    ON CONFLICT (migration_id, user_id) DO NOTHING
+                    """,
+                    (migration_id, configuration_id, list(user_ids))
+                )
+                created = cursor.rowcount
+            conn.commit()
+        return created
+
+    def get_resumable_users(self, migration_id: str) -> List[int]:
+        rows = db_utils.execute_query(
+            """
+            SELECT user_id FROM acwr_migration_checkpoints
+            WHERE migration_id = %s AND status = ANY(%s)
+            ORDER BY total_activities DESC
+            """,
+            (migration_id, list(RESUMABLE_STATUSES)),
+            fetch=True
+        ) or []
+        return [row['user_id'] for row in rows]
+
+    def run(self, migration_id: str, user_ids: List[int], configuration: Dict) -> List[Dict]:
+        """
+        Migrate users, largest first, skipping anything already completed or paused.
+
+        Args:
+            migration_id: Migration identifier (checkpoint key)
+            user_ids: Users to migrate
+            configuration: ACWR configuration dict
+
+        Returns:
+            Per-user summary dicts
+        """
+        self.create_checkpoints(migration_id, user_ids, configuration['id'])
+        pending = self.get_resumable_users(migration_id)
+        if not pending:
+            return []
+
+        # Plain values only: the configuration row may carry types other processes can't use
+        configuration = {
+            'id': configuration['id'],
+            'chronic_period_days': int(configuration['chronic_period_days']),
+            'decay_rate': float(configuration['decay_rate'])
+        }
+
+        self.logger.info(f"Migration {migration_id}: {len(pending)} users to process "
+                         f"with {min(self.max_workers, len(pending))} workers")
+
+        if self.max_workers <= 1 or len(pending) == 1:
+            return [migrate_user(migration_id, user_id, configuration, self.chunk_days)
+                    for user_id in pending]
+
+        results = []
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(pending))) as pool:
+            futures = {
+                pool.submit(_migrate_user_worker, migration_id, user_id,
+                            configuration, self.chunk_days): user_id
+                for user_id in pending
+            }
+            for future in as_completed(futures):
+                user_id = futures[future]
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    self.logger.error(f"Worker for user {user_id} crashed: {str(e)}")
+                    results.append({'migration_id': migration_id, 'user_id': user_id,
+                                    'status': 'failed', 'error': str(e)})
+        return results
+
+    def pause(self, migration_id: str, user_id: Optional[int] = None) -> bool:
+        """Pause a migration (or one user); workers stop after their current chunk"""
+        return self._transition(migration_id, user_id, ('pending', 'running'), 'paused')
+
+    def resume(self, migration_id: str, user_id: Optional[int] = None) -> bool:
+        """Mark paused users pending again; the next run() continues from their checkpoints"""
+        return self._transition(migration_id, user_id, ('paused',), 'pending')
+
+    def _transition(self, migration_id: str, user_id: Optional[int],
+                    from_statuses: tuple, to_status: str) -> bool:
+        with db_utils.get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE acwr_migration_checkpoints
+                    SET status = %s, updated_at = NOW()
+                    WHERE migration_id = %s
+                      AND (%s IS NULL OR user_id = %s)
+                      AND status = ANY(%s)
+                    """,
+                    (to_status, migration_id, user_id, user_id, list(from_statuses))
+                )
+                changed = cursor.rowcount
+            conn.commit()
+        return changed > 0
+
+    def get_progress(self, migration_id: str) -> Dict:
+        """Aggregate durable progress for a migration"""
+        rows = db_utils.execute_query(
+            """
+            SELECT status,
+                   COUNT(*) AS users,
+                   COALESCE(SUM(total_activities), 0) AS total_activities,
+                   COALESCE(SUM(processed_activities), 0) AS processed_activities,
+                   COALESCE(SUM(rows_written), 0) AS rows_written
+            FROM acwr_migration_checkpoints
+            WHERE migration_id = %s
+            GROUP BY status
+            """,
+            (migration_id,),
+            fetch=True
+        ) or []
+
+        by_status = {row['status']: int(row['users']) for row in rows}
+        total = sum(int(row['total_activities']) for row in rows)
+        processed = sum(int(row['processed_activities']) for row in rows)
+        return {
+            'migration_id': migration_id,
+            'users_by_status': by_status,
+            'total_users': sum(by_status.values()),
+            'total_activities': total,
+            'processed_activities': processed,
+            'rows_written': sum(int(row['rows_written']) for row in rows),
+            'percent_complete': round(processed / total * 100, 1) if total else 0.0
+        }
+
+    def rollback(self, migration_id: str, user_id: Optional[int] = None) -> int:
+        """
+        Undo a migration's writes (for one user or all) and mark their checkpoints
+        rolled_back: rows it created are deleted, rows it overwrote get their prior
+        values back. Re-running means starting a new migration.
+
+        Returns:
+            Number of acwr_enhanced_calculations rows deleted or restored
+        """
+        params = {'migration_id': migration_id, 'user_id': user_id}
+        with db_utils.get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    DELETE FROM acwr_enhanced_calculations e
+                    USING acwr_migration_prior_values p
+                    WHERE NOT p.existed
+                    """ + _ROLLBACK_MATCH,
+                    params
+                )
+                deleted = cursor.rowcount
+                cursor.execute(
+                    """
+                    UPDATE acwr_enhanced_calculations e
+                    SET acwr_ratio = p.acwr_ratio,
+                        acute_load = p.acute_load,
+                        chronic_load = p.chronic_load,
+                        calculation_method = p.calculation_method,
+                        migration_id = p.prior_migration_id,
+                        updated_at = p.prior_updated_at
+                    FROM acwr_migration_prior_values p
+                    WHERE p.existed
+                    """ + _ROLLBACK_MATCH,
+                    params
+                )
+                restored = cursor.rowcount
+                cursor.execute(
+                    """
+                    DELETE FROM acwr_migration_prior_values
+                    WHERE migration_id = %(migration_id)s
+                      AND (%(user_id)s IS NULL OR user_id = %(user_id)s)
+                    """,
+                    params
+                )
+                cursor.execute(
+                    """
+                    UPDATE acwr_migration_checkpoints
+                    SET status = 'rolled_back',
+                        processed_activities = 0,
+                        rows_written = 0,
+                        last_completed_date = NULL,
+                        updated_at = NOW()
+                    WHERE migration_id = %(migration_id)s
+                      AND (%(user_id)s IS NULL OR user_id = %(user_id)s)
+                    """,
+                    params
+                )
+            conn.commit()
+
+        self.logger.info(f"Rolled back migration {migration_id}"
+                         f"{'' if user_id is None else f' for user {user_id}'}: "
+                         f"{deleted} rows deleted, {restored} restored")
+        return deleted + restored
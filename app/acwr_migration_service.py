@@ -9,7 +9,7 @@ import logging
 import time
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional, Any, Generator
+from typing import Dict, List, Tuple, Optional, Any
 from dataclasses import dataclass, asdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
@@ -22,6 +22,10 @@ from exponential_decay_engine import ExponentialDecayEngine
 from acwr_migration_progress_tracker import (
     ACWRMigrationProgressTracker, ProgressEvent, ProgressEventType
 )
+from acwr_migration_executor import (
+    ACWRMigrationExecutor, migrate_user, write_calculations
+)
+import acwr_sweep_engine
 import db_utils
 
 logger = logging.getLogger(__name__)
@@ -88,6 +92,9 @@ class ACWRMigrationService:
         # Real-time progress tracker
         self.progress_tracker = ACWRMigrationProgressTracker()
         
+        # Checkpointed executor (durable progress, process pool across users)
+        self.executor = ACWRMigrationExecutor(max_workers=self.max_workers)
+        
         # Performance tracking
         self.performance_metrics = {
             'total_migrations': 0,
@@ -191,64 +198,47 @@ class ACWRMigrationService:
             
             self.logger.info(f"Starting migration {migration_id} for user {progress.user_id}")
             
-            # Get user activities in batches
-            activity_batches = self._get_user_activities_batched(
-                progress.user_id, self.batch_size
-            )
+            configuration = self.config_service.get_configuration_by_id(configuration_id)
+            if not configuration:
+                raise ValueError(f"Configuration {configuration_id} not found")
+            
+            # Durable checkpoint: a re-run of this migration_id continues where it stopped
+            self.executor.create_checkpoints(migration_id, [progress.user_id], configuration_id)
             
-            # Process batches
             batch_results = []
-            for batch_id, activities in enumerate(activity_batches, 1):
-                if progress.status == 'paused':
-                    self.logger.info(f"Migration {migration_id} paused at batch {batch_id}")
-                    break
-                
-                progress.current_batch = batch_id
-                progress.last_update = datetime.now()
-                
-                # Publish batch started event
-                self._publish_progress_event(
-                    ProgressEventType.BATCH_STARTED,
-                    migration_id,
-                    progress.user_id,
-                    {
-                        'batch_id': batch_id,
-                        'total_batches': progress.total_batches,
-                        'activities_in_batch': len(activities)
-                    },
-                    f"Starting batch {batch_id}/{progress.total_batches}"
-                )
-                
-                # Process batch
-                batch_result = self._process_activity_batch(
-                    batch_id, progress.user_id, activities, configuration_id
+            
+            def on_chunk_committed(chunk: Dict[str, Any]):
+                batch_result = BatchResult(
+                    batch_id=chunk['chunk'],
+                    user_id=progress.user_id,
+                    activities_processed=chunk['activities_processed'],
+                    successful_calculations=chunk['rows_written'],
+                    failed_calculations=chunk['activities_processed'] - chunk['rows_written'],
+                    processing_time=chunk['processing_time'],
+                    errors=[]
                 )
                 batch_results.append(batch_result)
                 
-                # Update progress
+                progress.current_batch = batch_result.batch_id
                 progress.processed_activities += batch_result.activities_processed
                 progress.successful_calculations += batch_result.successful_calculations
                 progress.failed_calculations += batch_result.failed_calculations
                 progress.last_update = datetime.now()
                 
-                # Publish batch completed event
                 self._publish_progress_event(
                     ProgressEventType.BATCH_COMPLETED,
                     migration_id,
                     progress.user_id,
                     {
-                        'batch_id': batch_id,
-                        'total_batches': progress.total_batches,
+                        'batch_id': batch_result.batch_id,
                         'activities_processed': batch_result.activities_processed,
                         'successful_calculations': batch_result.successful_calculations,
                         'failed_calculations': batch_result.failed_calculations,
+                        'last_completed_date': chunk['last_completed_date'],
                         'processing_time': batch_result.processing_time
                     },
-                    f"Batch {batch_id}/{progress.total_batches} completed"
+                    f"Checkpoint {batch_result.batch_id} committed through {chunk['last_completed_date']}"
                 )
-                
-                # Publish progress update
-                elapsed_time = (datetime.now() - start_time).total_seconds()
                 self._publish_progress_event(
                     ProgressEventType.PROGRESS_UPDATE,
                     migration_id,
@@ -256,19 +246,55 @@ class ACWRMigrationService:
                     {
                         'status': progress.status,
                         'current_batch': progress.current_batch,
-                        'total_batches': progress.total_batches,
                         'processed_activities': progress.processed_activities,
                         'total_activities': progress.total_activities,
                         'successful_calculations': progress.successful_calculations,
                         'failed_calculations': progress.failed_calculations,
-                        'elapsed_time': elapsed_time
+                        'elapsed_time': (datetime.now() - start_time).total_seconds()
                     },
                     f"Progress: {progress.processed_activities}/{progress.total_activities} activities"
                 )
-                
-                # Log progress
-                self.logger.info(f"Migration {migration_id} batch {batch_id}/{progress.total_batches} "
-                               f"completed: {batch_result.activities_processed} activities processed")
+            
+            # One series load, one range evaluation and chunked upserts for the user
+            summary = migrate_user(
+                migration_id, progress.user_id, configuration,
+                chunk_days=self.executor.chunk_days,
+                progress_callback=on_chunk_committed
+            )
+            
+            if summary['status'] == 'failed':
+                raise Exception(summary['error'])
+            
+            def paused_result() -> MigrationResult:
+                progress.last_update = datetime.now()
+                self.logger.info(f"Migration {migration_id} paused after "
+                               f"{progress.processed_activities} activities")
+                return MigrationResult(
+                    user_id=progress.user_id,
+                    migration_id=migration_id,
+                    start_time=start_time,
+                    end_time=datetime.now(),
+                    total_activities=progress.total_activities,
+                    successful_calculations=progress.successful_calculations,
+                    failed_calculations=progress.failed_calculations,
+                    configuration_id=configuration_id,
+                    performance_metrics={'status': 'paused',
+                                         'batch_results': [asdict(br) for br in batch_results]},
+                    error_log=[]
+                )
+            
+            if summary['status'] == 'paused':
+                progress.status = 'paused'
+                return paused_result()
+            
+            # A pause requested after the last chunk must not be overwritten by
+            # 'completed'; pause_migration() sets the status under the same lock
+            with self.migration_lock:
+                paused = progress.status == 'paused'
+                if not paused:
+                    progress.status = 'completed'
+            if paused:
+                return paused_result()
             
             # Complete migration
             end_time = datetime.now()
@@ -293,9 +319,8 @@ class ACWRMigrationService:
                 error_log=[error for br in batch_results for error in br.errors]
             )
             
-            # Update status
+            # Record the outcome
             if progress.failed_calculations == 0:
-                progress.status = 'completed'
                 self.performance_metrics['successful_migrations'] += 1
                 
                 # Publish migration completed event
@@ -313,7 +338,7 @@ class ACWRMigrationService:
                     f"Migration completed successfully: {progress.successful_calculations}/{progress.total_activities} calculations"
                 )
             else:
-                progress.status = 'completed'  # Completed with some failures
+                # Completed with some failures
                 self.performance_metrics['successful_migrations'] += 1
                 
                 # Publish migration completed with warnings event
@@ -385,81 +410,62 @@ class ACWRMigrationService:
             )
     
     def _process_activity_batch(self, batch_id: int, user_id: int, 
-                               activities: List[Dict], configuration_id: int) -> BatchResult:
-        """Process a batch of activities"""
+                               activities: List[Dict], configuration_id: int,
+                               migration_id: str) -> BatchResult:
+        """Process a batch of activities with one range evaluation and one bulk upsert"""
         start_time = time.time()
-        successful = 0
-        failed = 0
-        errors = []
         
         try:
-            # Get configuration
             configuration = self.config_service.get_configuration_by_id(configuration_id)
             if not configuration:
                 raise ValueError(f"Configuration {configuration_id} not found")
             
-            # Process each activity
-            for activity in activities:
-                try:
-                    # Calculate enhanced ACWR for this activity
-                    # Convert date to string format if it's a datetime object
-                    activity_date = activity['date']
-                    if hasattr(activity_date, 'strftime'):
-                        activity_date = activity_date.strftime('%Y-%m-%d')
-                    elif isinstance(activity_date, str):
-                        # Already a string, use as-is
-                        pass
-                    else:
-                        # Convert to string
-                        activity_date = str(activity_date)
-                    
-                    result = self.calc_service.calculate_acwr_for_user(
-                        user_id=user_id,
-                        activity_date=activity_date
-                    )
-                    
-                    if result and result.get('success') and result.get('enhanced_acute_chronic_ratio') is not None:
-                        # Store enhanced calculation
-                        self._store_enhanced_calculation(
-                            user_id, activity['activity_id'], result, configuration_id
-                        )
-                        successful += 1
-                    else:
-                        failed += 1
-                        errors.append(f"Activity {activity['activity_id']}: No result returned")
-                        
-                except Exception as e:
-                    failed += 1
-                    error_msg = f"Activity {activity['activity_id']}: {str(e)}"
-                    errors.append(error_msg)
-                    self.logger.warning(error_msg)
-            
-            processing_time = time.time() - start_time
+            if not activities:
+                return BatchResult(batch_id, user_id, 0, 0, 0, 0.0, [])
+            
+            dates = [acwr_sweep_engine.parse_date(activity['date']) for activity in activities]
+            first_date = min(dates)
+            values = acwr_sweep_engine.evaluate_user_range(
+                user_id, first_date, max(dates),
+                int(configuration['chronic_period_days']), float(configuration['decay_rate'])
+            )
+            
+            rows = []
+            for activity, activity_date in zip(activities, dates):
+                day = values.day((activity_date - first_date).days)
+                rows.append((
+                    user_id, activity['activity_id'], configuration_id,
+                    day['enhanced_acute_chronic_ratio'], day['acute_load_avg'],
+                    day['enhanced_chronic_load'], 'enhanced', migration_id
+                ))
+            
+            with db_utils.get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    write_calculations(cursor, migration_id, rows)
+                conn.commit()
             
             return BatchResult(
                 batch_id=batch_id,
                 user_id=user_id,
                 activities_processed=len(activities),
-                successful_calculations=successful,
-                failed_calculations=failed,
-                processing_time=processing_time,
-                errors=errors
+                successful_calculations=len(rows),
+                failed_calculations=len(activities) - len(rows),
+                processing_time=time.time() - start_time,
+                errors=[]
             )
             
         except Exception as e:
-            processing_time = time.time() - start_time
             error_msg = f"Batch {batch_id} failed: {str(e)}"
-            errors.append(error_msg)
             self.logger.error(error_msg)
             
             return BatchResult(
                 batch_id=batch_id,
                 user_id=user_id,
                 activities_processed=len(activities),
-                successful_calculations=successful,
-                failed_calculations=failed,
-                processing_time=processing_time,
-                errors=errors
+                successful_calculations=0,
+                failed_calculations=len(activities),
+                processing_time=time.time() - start_time,
+                errors=[error_msg]
             )
     
     def start_migration(self, migration_id: str) -> bool:
@@ -508,13 +514,17 @@ class ACWRMigrationService:
             return False
         
         progress = self.active_migrations[migration_id]
-        if progress.status == 'running':
+        with self.migration_lock:
+            # execute_migration() checks this under the lock before marking completion
+            if progress.status != 'running':
+                return False
             progress.status = 'paused'
             progress.last_update = datetime.now()
-            self.logger.info(f"Migration {migration_id} paused")
-            return True
         
-        return False
+        # The executor checks the durable checkpoint between chunks
+        self.executor.pause(migration_id)
+        self.logger.info(f"Migration {migration_id} paused")
+        return True
     
     def resume_migration(self, migration_id: str) -> bool:
         """Resume a paused migration"""
@@ -523,8 +533,17 @@ class ACWRMigrationService:
         
         progress = self.active_migrations[migration_id]
         if progress.status == 'paused':
+            self.executor.resume(migration_id)
             progress.status = 'running'
             progress.last_update = datetime.now()
+            
+            # Continue from the last committed checkpoint in the background
+            threading.Thread(
+                target=self.execute_migration,
+                args=(migration_id, progress.configuration_id),
+                daemon=True
+            ).start()
+            
             self.logger.info(f"Migration {migration_id} resumed")
             return True
         
@@ -544,6 +563,47 @@ class ACWRMigrationService:
         
         return False
     
+    def execute_bulk_migration(self, configuration_id: int,
+                               user_ids: Optional[List[int]] = None,
+                               migration_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Migrate many users in parallel with durable per-user checkpoints.
+        
+        Args:
+            configuration_id: ACWR configuration to calculate with
+            user_ids: Users to migrate (default: every user with activities)
+            migration_id: Existing migration to resume (default: start a new one)
+            
+        Returns:
+            Dictionary with migration_id, per-user summaries and durable progress
+        """
+        configuration = self.config_service.get_configuration_by_id(configuration_id)
+        if not configuration:
+            raise ValueError(f"Configuration {configuration_id} not found")
+        
+        if user_ids is None:
+            rows = db_utils.execute_query(
+                "SELECT DISTINCT user_id FROM activities", fetch=True
+            ) or []
+            user_ids = [row['user_id'] for row in rows]
+        
+        migration_id = migration_id or f"migration_bulk_{configuration_id}_{int(time.time())}"
+        summaries = self.executor.run(migration_id, user_ids, configuration)
+        
+        for summary in summaries:
+            self.performance_metrics['total_migrations'] += 1
+            self.performance_metrics['total_activities_processed'] += summary.get('processed_activities', 0)
+            if summary.get('status') == 'failed':
+                self.performance_metrics['failed_migrations'] += 1
+            elif summary.get('status') == 'completed':
+                self.performance_metrics['successful_migrations'] += 1
+        
+        return {
+            'migration_id': migration_id,
+            'users': summaries,
+            'progress': self.executor.get_progress(migration_id)
+        }
+    
     def get_migration_history(self, user_id: Optional[int] = None) -> List[MigrationResult]:
         """Get migration history"""
         try:
@@ -600,46 +660,6 @@ class ACWRMigrationService:
             self.logger.error(f"Error getting activity count for user {user_id}: {str(e)}")
             return 0
     
-    def _get_user_activities_batched(self, user_id: int, batch_size: int) -> Generator[List[Dict], None, None]:
-        """Get user activities in batches"""
-        try:
-            offset = 0
-            while True:
-                query = """
-                    SELECT activity_id, date, trimp
-                    FROM activities 
-                    WHERE user_id = %s 
-                    ORDER BY date ASC
-                    LIMIT %s OFFSET %s
-                """
-                batch = db_utils.execute_query(query, (user_id, batch_size, offset), fetch=True)
-                
-                if not batch:
-                    break
-                
-                yield batch
-                offset += batch_size
-                        
-        except Exception as e:
-            self.logger.error(f"Error getting activities for user {user_id}: {str(e)}")
-            yield []
-    
-    def _store_enhanced_calculation(self, user_id: int, activity_id: int, 
-                                   result: Dict, configuration_id: int):
-        """Store enhanced ACWR calculation"""
-        try:
-            # Use the configuration service to store the calculation
-            # This ensures we use the correct table structure
-            config_service = ACWRConfigurationService()
-            success = config_service.store_enhanced_calculation(result)
-            
-            if not success:
-                raise Exception("Failed to store enhanced calculation")
-                    
-        except Exception as e:
-            self.logger.error(f"Error storing enhanced calculation: {str(e)}")
-            raise
-    
     def _store_migration_result(self, result: MigrationResult):
         """Store migration result in database"""
         try:
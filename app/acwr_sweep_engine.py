@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+ACWR Parameter Sweep Engine
+Evaluates exponential-decay ACWR for many (chronic period, decay rate) combinations,
+or for every day of a date range, from a single load of the user's daily series.
+
+The per-combination path (ACWRConfigurationService.calculate_enhanced_acwr) issues two
+queries and walks every activity once per combination. Here the daily series is read
+once, the decay weights for the whole grid are built as a (rates x days) matrix, and
+the chronic sums for every combination come out of one matrix product. Results match
+calculate_enhanced_acwr exactly, including per-activity weighting on days with more
+than one activity and the same rounding.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import db_utils
+
+logger = logging.getLogger(__name__)
+
+ACUTE_PERIOD_DAYS = 7
+SWEEP_CACHE_TTL_SECONDS = 600
+SWEEP_CACHE_MAX_ENTRIES = 256
+
+# (user_id, start, end) -> (version, DailyLoadSeries, cached_at)
+_series_cache: "OrderedDict[Tuple, Tuple[Tuple, DailyLoadSeries, float]]" = OrderedDict()
+# (user_id, start, end, version, kind, params) -> (result, cached_at)
+_result_cache: "OrderedDict[Tuple, Tuple[object, float]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+@dataclass
+class DailyLoadSeries:
+    """Per-day activity totals for one user; index 0 is start_date"""
+    user_id: int
+    start_date: date
+    end_date: date
+    load: np.ndarray
+    trimp: np.ndarray
+    counts: np.ndarray
+    version: Tuple = field(default_factory=tuple)
+
+    def index_of(self, day: date) -> int:
+        return (day - self.start_date).days
+
+    def window(self, reference_date: date, days: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return (load, trimp, counts) for the `days` days ending at reference_date,
+        most recent first (element k is k days before reference_date). Days outside
+        the loaded series are zero.
+        """
+        load = np.zeros(days)
+        trimp = np.zeros(days)
+        counts = np.zeros(days)
+        end_idx = self.index_of(reference_date)
+        for k in range(days):
+            idx = end_idx - k
+            if 0 <= idx < len(self.load):
+                load[k] = self.load[idx]
+                trimp[k] = self.trimp[idx]
+                counts[k] = self.counts[idx]
+        return load, trimp, counts
+
+
+@dataclass
+class SweepResult:
+    """ACWR for every (decay rate, chronic period) cell at one reference date"""
+    reference_date: date
+    chronic_periods: List[int]
+    decay_rates: List[float]
+    acute_load_avg: float
+    acute_trimp_avg: float
+    chronic_load: np.ndarray        # shape (len(decay_rates), len(chronic_periods))
+    chronic_trimp: np.ndarray
+    external_acwr: np.ndarray
+    internal_acwr: np.ndarray
+    normalized_divergence: np.ndarray
+
+    def cell(self, chronic_period: int, decay_rate: float) -> Dict:
+        """Return one combination in calculate_enhanced_acwr's result shape"""
+        r = self.decay_rates.index(decay_rate)
+        p = self.chronic_periods.index(chronic_period)
+        return {
+            'success': True,
+            'activity_date': self.reference_date.strftime('%Y-%m-%d'),
+            'chronic_period_days': chronic_period,
+            'decay_rate': decay_rate,
+            'acute_load_avg': round(self.acute_load_avg, 2),
+            'acute_trimp_avg': round(self.acute_trimp_avg, 2),
+            'enhanced_chronic_load': round(float(self.chronic_load[r, p]), 2),
+            'enhanced_chronic_trimp': round(float(self.chronic_trimp[r, p]), 2),
+            'enhanced_acute_chronic_ratio': round(float(self.external_acwr[r, p]), 2),
+            'enhanced_trimp_acute_chronic_ratio': round(float(self.internal_acwr[r, p]), 2),
+            'enhanced_normalized_divergence': round(float(self.normalized_divergence[r, p]), 2),
+            'calculation_method': 'exponential_decay_sweep',
+            'data_quality': 'unknown'
+        }
+
+
+@dataclass
+class RangeResult:
+    """ACWR for one (chronic period, decay rate) on every day of a date range"""
+    dates: List[date]
+    chronic_period_days: int
+    decay_rate: float
+    acute_load_avg: np.ndarray
+    acute_trimp_avg: np.ndarray
+    chronic_load: np.ndarray
+    chronic_trimp: np.ndarray
+    external_acwr: np.ndarray
+    internal_acwr: np.ndarray
+    normalized_divergence: np.ndarray
+    activity_counts: np.ndarray
+
+    def day(self, i: int) -> Dict:
+        """Return day i in calculate_enhanced_acwr's result shape"""
+        return {
+            'success': True,
+            'activity_date': self.dates[i].strftime('%Y-%m-%d'),
+            'chronic_period_days': self.chronic_period_days,
+            'decay_rate': self.decay_rate,
+            'acute_load_avg': round(float(self.acute_load_avg[i]), 2),
+            'acute_trimp_avg': round(float(self.acute_trimp_avg[i]), 2),
+            'enhanced_chronic_load': round(float(self.chronic_load[i]), 2),
+            'enhanced_chronic_trimp': round(float(self.chronic_trimp[i]), 2),
+            'enhanced_acute_chronic_ratio': round(float(self.external_acwr[i]), 2),
+            'enhanced_trimp_acute_chronic_ratio': round(float(self.internal_acwr[i]), 2),
+            'enhanced_normalized_divergence': round(float(self.normalized_divergence[i]), 2),
+            'calculation_method': 'exponential_decay_sweep',
+            'data_quality': 'unknown'
+        }
+
+
+def parse_date(value) -> date:
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _validate_parameters(chronic_periods: Sequence[int], decay_rates: Sequence[float]) -> None:
+    for period in chronic_periods:
+        if period < ACUTE_PERIOD_DAYS:
+            raise ValueError(f"chronic_period_days must be >= {ACUTE_PERIOD_DAYS}, got {period}")
+    for rate in decay_rates:
+        if rate <= 0 or rate > 1.0:
+            raise ValueError(f"decay_rate must be between 0 and 1, got {rate}")
+
+
+def _divergence(external: np.ndarray, internal: np.ndarray) -> np.ndarray:
+    """Elementwise UnifiedMetricsService._calculate_normalized_divergence"""
+    from unified_metrics_service import UnifiedMetricsService
+    divergence = np.zeros(external.shape)
+    for idx in np.ndindex(external.shape):
+        divergence[idx] = UnifiedMetricsService._calculate_normalized_divergence(
+            float(external[idx]), float(internal[idx])
+        ) or 0.0
+    return divergence
+
+
+def _ratios(acute_load, acute_trimp, chronic_load, chronic_trimp):
+    external = np.divide(acute_load, chronic_load,
+                         out=np.zeros(np.shape(chronic_load)), where=chronic_load > 0)
+    internal = np.divide(acute_trimp, chronic_trimp,
+                         out=np.zeros(np.shape(chronic_trimp)), where=chronic_trimp > 0)
+    return external, internal
+
+
+def _weighted_average(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Chronic average rounded to 3dp like calculate_weighted_averages; 0 with no activities"""
+    avg = np.divide(numerator, denominator, out=np.zeros(numerator.shape), where=denominator > 0)
+    return np.round(avg, 3)
+
+
+def evaluate_grid(series: DailyLoadSeries, reference_date: date,
+                  chronic_periods: Sequence[int], decay_rates: Sequence[float]) -> SweepResult:
+    """
+    Evaluate every (decay rate, chronic period) combination at reference_date.
+
+    Args:
+        series: Daily series covering at least max(chronic_periods) days to reference_date
+        reference_date: Date the ACWR is evaluated for
+        chronic_periods: Chronic window lengths in days
+        decay_rates: Exponential decay rates
+
+    Returns:
+        SweepResult with (len(decay_rates), len(chronic_periods)) matrices
+    """
+    chronic_periods = [int(p) for p in chronic_periods]
+    decay_rates = [float(r) for r in decay_rates]
+    _validate_parameters(chronic_periods, decay_rates)
+
+    horizon = max(chronic_periods + [ACUTE_PERIOD_DAYS])
+    load, trimp, counts = series.window(reference_date, horizon)
+    days_ago = np.arange(horizon)
+
+    weights = np.exp(-np.outer(decay_rates, days_ago))                          # (R, K)
+    in_window = (days_ago[None, :] < np.array(chronic_periods)[:, None]).astype(float)  # (P, K)
+
+    # Each activity on a day carries that day's weight, so the denominator
+    # counts activities, not days - same as weighting activity rows one by one.
+    chronic_load = _weighted_average((weights * load) @ in_window.T, (weights * counts) @ in_window.T)
+    chronic_trimp = _weighted_average((weights * trimp) @ in_window.T, (weights * counts) @ in_window.T)
+
+    acute_load = float(load[:ACUTE_PERIOD_DAYS].sum()) / ACUTE_PERIOD_DAYS
+    acute_trimp = float(trimp[:ACUTE_PERIOD_DAYS].sum()) / ACUTE_PERIOD_DAYS
+
+    external, internal = _ratios(acute_load, acute_trimp, chronic_load, chronic_trimp)
+
+    return SweepResult(
+        reference_date=reference_date,
+        chronic_periods=chronic_periods,
+        decay_rates=decay_rates,
+        acute_load_avg=acute_load,
+        acute_trimp_avg=acute_trimp,
+        chronic_load=chronic_load,
+        chronic_trimp=chronic_trimp,
+        external_acwr=external,
+        internal_acwr=internal,
+        normalized_divergence=_divergence(external, internal)
+    )
+
+
+def evaluate_range(series: DailyLoadSeries, start_date: date, end_date: date,
+                   chronic_period_days: int, decay_rate: float) -> RangeResult:
+    """
+    Evaluate one configuration for every day from start_date to end_date.
+
+    The chronic sums are a causal convolution of the daily series with the truncated
+    kernel exp(-decay_rate * k), k < chronic_period_days, so the whole range costs one
+    pass instead of one query pair per day.
+
+    Args:
+        series: Daily series starting at least chronic_period_days - 1 days before start_date
+        start_date: First date to evaluate
+        end_date: Last date to evaluate (inclusive)
+        chronic_period_days: Chronic window length in days
+        decay_rate: Exponential decay rate
+
+    Returns:
+        RangeResult with one entry per day
+    """
+    _validate_parameters([chronic_period_days], [decay_rate])
+    horizon = max(chronic_period_days, ACUTE_PERIOD_DAYS)
+
+    # Re-base onto a zero-padded array that starts `horizon - 1` days before start_date
+    n_days = (end_date - start_date).days + 1
+    if n_days <= 0:
+        empty = np.zeros(0)
+        return RangeResult([], chronic_period_days, decay_rate, empty, empty, empty, empty,
+                           empty, empty, empty, empty)
+    span = n_days + horizon - 1
+    load = np.zeros(span)
+    trimp = np.zeros(span)
+    counts = np.zeros(span)
+    offset = series.index_of(start_date) - (horizon - 1)
+    for i in range(span):
+        idx = offset + i
+        if 0 <= idx < len(series.load):
+            load[i] = series.load[idx]
+            trimp[i] = series.trimp[idx]
+            counts[i] = series.counts[idx]
+
+    kernel = np.exp(-decay_rate * np.arange(chronic_period_days))
+    acute_kernel = np.ones(ACUTE_PERIOD_DAYS)
+
+    def causal(values, k):
+        return np.convolve(values, k)[horizon - 1:span]
+
+    chronic_load = _weighted_average(causal(load, kernel), causal(counts, kernel))
+    chronic_trimp = _weighted_average(causal(trimp, kernel), causal(counts, kernel))
+    acute_load = causal(load, acute_kernel) / ACUTE_PERIOD_DAYS
+    acute_trimp = causal(trimp, acute_kernel) / ACUTE_PERIOD_DAYS
+
+    external, internal = _ratios(acute_load, acute_trimp, chronic_load, chronic_trimp)
+
+    return RangeResult(
+        dates=[start_date + timedelta(days=i) for i in range(n_days)],
+        chronic_period_days=chronic_period_days,
+        decay_rate=decay_rate,
+        acute_load_avg=acute_load,
+        acute_trimp_avg=acute_trimp,
+        chronic_load=chronic_load,
+        chronic_trimp=chronic_trimp,
+        external_acwr=external,
+        internal_acwr=internal,
+        normalized_divergence=_divergence(external, internal),
+        activity_counts=counts[horizon - 1:span]
+    )
+
+
+def get_data_version(user_id: int, start_date: date, end_date: date) -> Tuple:
+    """
+    Cheap fingerprint of a user's activities in a window. Any insert, delete or
+    load/TRIMP change in the window changes it, so cached results keyed by it
+    never outlive the data they were computed from.
+    """
+    rows = db_utils.execute_query(
+        """
+        SELECT COUNT(*) AS activity_count,
+               MAX(date) AS last_date,
+               COALESCE(SUM(total_load_miles), 0) AS load_sum,
+               COALESCE(SUM(trimp), 0) AS trimp_sum
+        FROM activities
+        WHERE user_id = %s AND date BETWEEN %s AND %s
+        """,
+        (user_id, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')),
+        fetch=True
+    )
+    row = rows[0] if rows else {}
+    return (
+        int(row.get('activity_count') or 0),
+        str(row.get('last_date')),
+        round(float(row.get('load_sum') or 0), 4),
+        round(float(row.get('trimp_sum') or 0), 4)
+    )
+
+
+def load_daily_series(user_id: int, start_date: date, end_date: date,
+                      version: Optional[Tuple] = None) -> DailyLoadSeries:
+    """Load per-day load/TRIMP sums and activity counts in one grouped query"""
+    rows = db_utils.execute_query(
+        """
+        SELECT date,
+               COUNT(*) AS activity_count,
+               COALESCE(SUM(total_load_miles), 0) AS total_load_miles,
+               COALESCE(SUM(trimp), 0) AS trimp
+        FROM activities
+        WHERE user_id = %s AND date BETWEEN %s AND %s
+        GROUP BY date
+        ORDER BY date
+        """,
+        (user_id, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')),
+        fetch=True
+    ) or []
+
+    n_days = (end_date - start_date).days + 1
+    load = np.zeros(n_days)
+    trimp = np.zeros(n_days)
+    counts = np.zeros(n_days)
+    for row in rows:
+        idx = (parse_date(row['date']) - start_date).days
+        if 0 <= idx < n_days:
+            load[idx] = float(row['total_load_miles'] or 0)
+            trimp[idx] = float(row['trimp'] or 0)
+            counts[idx] = int(row['activity_count'] or 0)
+
+    return DailyLoadSeries(user_id, start_date, end_date, load, trimp, counts, version or ())
+
+
+def get_daily_series(user_id: int, start_date: date, end_date: date) -> DailyLoadSeries:
+    """Return the daily series, reusing the cached copy while the data version is unchanged"""
+    key = (user_id, start_date, end_date)
+    version = get_data_version(user_id, start_date, end_date)
+    now = time.time()
+
+    with _cache_lock:
+        cached = _series_cache.get(key)
+        if cached and cached[0] == version and now - cached[2] < SWEEP_CACHE_TTL_SECONDS:
+            _series_cache.move_to_end(key)
+            return cached[1]
+
+    series = load_daily_series(user_id, start_date, end_date, version)
+    with _cache_lock:
+        _series_cache[key] = (version, series, now)
+        _series_cache.move_to_end(key)
+        while len(_series_cache) > SWEEP_CACHE_MAX_ENTRIES:
+            _series_cache.popitem(last=False)
+    return series
+
+
+def _cached(key: Tuple, compute):
+    now = time.time()
+    with _cache_lock:
+        cached = _result_cache.get(key)
+        if cached and now - cached[1] < SWEEP_CACHE_TTL_SECONDS:
+            _result_cache.move_to_end(key)
+            return cached[0]
+
+    result = compute()
+    with _cache_lock:
+        _result_cache[key] = (result, now)
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > SWEEP_CACHE_MAX_ENTRIES:
+            _result_cache.popitem(last=False)
+    return result
+
+
+def sweep_user(user_id: int, reference_date: date,
+               chronic_periods: Sequence[int], decay_rates: Sequence[float]) -> SweepResult:
+    """
+    Evaluate a parameter grid for one user at reference_date.
+
+    Reads the daily series once (or not at all when the cached copy is still
+    current) and memoizes the grid per data version.
+    """
+    reference_date = parse_date(reference_date)
+    horizon = max(list(chronic_periods) + [ACUTE_PERIOD_DAYS])
+    start_date = reference_date - timedelta(days=horizon - 1)
+    series = get_daily_series(user_id, start_date, reference_date)
+    key = (user_id, start_date, reference_date, series.version, 'grid',
+           tuple(int(p) for p in chronic_periods), tuple(float(r) for r in decay_rates))
+    return _cached(key, lambda: evaluate_grid(series, reference_date, chronic_periods, decay_rates))
+
+
+def evaluate_user_range(user_id: int, start_date: date, end_date: date,
+                        chronic_period_days: int, decay_rate: float) -> RangeResult:
+    """Evaluate one configuration for every day of a range with a single series load"""
+    start_date = parse_date(start_date)
+    end_date = parse_date(end_date)
+    horizon = max(chronic_period_days, ACUTE_PERIOD_DAYS)
+    series_start = start_date - timedelta(days=horizon - 1)
+    series = get_daily_series(user_id, series_start, end_date)
+    key = (user_id, series_start, end_date, series.version, 'range',
+           int(chronic_period_days), float(decay_rate))
+    return _cached(key, lambda: evaluate_range(series, start_date, end_date,
+                                               chronic_period_days, decay_rate))
+
+
+def clear_user_cache(user_id: int) -> None:
+    """Drop cached series and sweeps for a user (call when their activities change)"""
+    with _cache_lock:
+        for cache in (_series_cache, _result_cache):
+            for key in [k for k in cache if k[0] == user_id]:
+                del cache[key]
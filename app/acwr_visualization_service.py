@@ -12,6 +12,7 @@ from typing import Dict, List, Tuple, Optional, Any
 from dataclasses import dataclass
 from acwr_configuration_service import ACWRConfigurationService
 from acwr_calculation_service import ACWRCalculationService
+import acwr_sweep_engine
 import db_utils
 
 logger = logging.getLogger(__name__)
@@ -88,42 +89,43 @@ class ACWRVisualizationService:
     
     def calculate_chronic_load_surface(self, 
                                      user_id: int,
-                                     parameter_combinations: List[ParameterCombination]) -> List[VisualizationDataPoint]:
+                                     parameter_combinations: List[ParameterCombination],
+                                     reference_date: Optional[str] = None) -> List[VisualizationDataPoint]:
         """Calculate chronic load values for 3D surface plot"""
         try:
-            data_points = []
+            if not parameter_combinations:
+                return []
+            
+            if reference_date is None:
+                reference_date = datetime.now().date().strftime('%Y-%m-%d')
             
-            for i, combination in enumerate(parameter_combinations):
-                try:
-                    # Calculate chronic load for this parameter combination
-                    acwr_result = self.calc_service.calculate_acwr_for_user(
-                        user_id=user_id,
-                        activity_date=datetime.now().date().strftime('%Y-%m-%d')
-                    )
-                    
-                    chronic_load = acwr_result.get('chronic_load', 0)
-                    
-                    data_point = VisualizationDataPoint(
-                        x=combination.chronic_period_days,
-                        y=combination.decay_rate,
-                        z=chronic_load,
-                        value=chronic_load,
-                        label=f"Chronic: {combination.chronic_period_days}d, Decay: {combination.decay_rate}",
-                        metadata={
-                            'chronic_period_days': combination.chronic_period_days,
-                            'decay_rate': combination.decay_rate,
-                            'acute_load': acwr_result.get('acute_load', 0),
-                            'acwr_ratio': acwr_result.get('acwr_ratio', 0),
-                            'risk_level': acwr_result.get('risk_level', 'Unknown'),
-                            'data_quality': acwr_result.get('data_quality', 'Unknown')
-                        }
-                    )
-                    
-                    data_points.append(data_point)
-                    
-                except Exception as e:
-                    self.logger.warning(f"Error calculating chronic load for combination {i}: {str(e)}")
-                    continue
+            # One series load and one matrix evaluation for the whole grid
+            chronic_periods = sorted({c.chronic_period_days for c in parameter_combinations})
+            decay_rates = sorted({c.decay_rate for c in parameter_combinations})
+            sweep = acwr_sweep_engine.sweep_user(user_id, reference_date, chronic_periods, decay_rates)
+            
+            data_points = []
+            for combination in parameter_combinations:
+                cell = sweep.cell(combination.chronic_period_days, combination.decay_rate)
+                chronic_load = cell['enhanced_chronic_load']
+                acwr_ratio = cell['enhanced_acute_chronic_ratio']
+                
+                data_points.append(VisualizationDataPoint(
+                    x=combination.chronic_period_days,
+                    y=combination.decay_rate,
+                    z=chronic_load,
+                    value=chronic_load,
+                    label=f"Chronic: {combination.chronic_period_days}d, Decay: {combination.decay_rate}",
+                    metadata={
+                        'chronic_period_days': combination.chronic_period_days,
+                        'decay_rate': combination.decay_rate,
+                        'acute_load': cell['acute_load_avg'],
+                        'acwr_ratio': acwr_ratio,
+                        'internal_acwr': cell['enhanced_trimp_acute_chronic_ratio'],
+                        'risk_level': self._get_risk_zone(acwr_ratio),
+                        'data_quality': cell['data_quality']
+                    }
+                ))
             
             self.logger.info(f"Generated {len(data_points)} chronic load data points")
             return data_points
@@ -148,22 +150,11 @@ class ACWRVisualizationService:
             decay_rates = sorted(list(set([dp.y for dp in data_points])))
             
             # Create matrix for heatmap
-            matrix = []
-            for decay_rate in decay_rates:
-                row = []
-                for chronic_period in chronic_periods:
-                    # Find matching data point
-                    matching_point = next(
-                        (dp for dp in data_points if dp.x == chronic_period and dp.y == decay_rate),
-                        None
-                    )
-                    
-                    if matching_point:
-                        row.append(matching_point.value)
-                    else:
-                        row.append(0)  # Default value for missing data
-                
-                matrix.append(row)
+            values = {(dp.x, dp.y): dp.value for dp in data_points}
+            matrix = [
+                [values.get((chronic_period, decay_rate), 0) for chronic_period in chronic_periods]
+                for decay_rate in decay_rates
+            ]
             
             # Generate color mapping
             all_values = [dp.value for dp in data_points if dp.value > 0]
@@ -213,59 +204,36 @@ class ACWRVisualizationService:
                 self.logger.error(f"Configuration {configuration_id} not found")
                 return []
             
-            # Get user's activities for the time period
             end_date = datetime.now().date()
             start_date = end_date - timedelta(days=days_back)
             
-            # Query activities
-            query = """
-                SELECT start_date, trimp_score, duration_seconds
-                FROM activities
-                WHERE user_id = %s AND start_date >= %s AND start_date <= %s
-                ORDER BY start_date
-            """
-            
-            activities = db_utils.execute_query(
-                query, 
-                (user_id, start_date, end_date), 
-                fetch=True
+            # Every day of the range from one series load
+            series = acwr_sweep_engine.evaluate_user_range(
+                user_id, start_date, end_date,
+                config['chronic_period_days'], config['decay_rate']
             )
             
-            if not activities:
+            if not series.activity_counts.any():
                 self.logger.warning(f"No activities found for user {user_id} in the specified period")
                 return []
             
-            # Calculate ACWR for each day
             time_series_points = []
-            current_date = start_date
-            
-            while current_date <= end_date:
-                try:
-                    # Calculate ACWR for this date
-                    acwr_result = self.calc_service.calculate_acwr_for_user(
-                        user_id=user_id,
-                        activity_date=current_date.strftime('%Y-%m-%d')
-                    )
-                    
-                    time_series_point = TimeSeriesPoint(
-                        date=current_date,
-                        value=acwr_result.get('acwr_ratio', 0),
-                        metadata={
-                            'acute_load': acwr_result.get('acute_load', 0),
-                            'chronic_load': acwr_result.get('chronic_load', 0),
-                            'risk_level': acwr_result.get('risk_level', 'Unknown'),
-                            'data_quality': acwr_result.get('data_quality', 'Unknown'),
-                            'configuration_id': configuration_id,
-                            'configuration_name': config['name']
-                        }
-                    )
-                    
-                    time_series_points.append(time_series_point)
-                    
-                except Exception as e:
-                    self.logger.warning(f"Error calculating ACWR for date {current_date}: {str(e)}")
-                
-                current_date += timedelta(days=1)
+            for i, current_date in enumerate(series.dates):
+                day = series.day(i)
+                acwr_ratio = day['enhanced_acute_chronic_ratio']
+                time_series_points.append(TimeSeriesPoint(
+                    date=current_date,
+                    value=acwr_ratio,
+                    metadata={
+                        'acute_load': day['acute_load_avg'],
+                        'chronic_load': day['enhanced_chronic_load'],
+                        'internal_acwr': day['enhanced_trimp_acute_chronic_ratio'],
+                        'risk_level': self._get_risk_zone(acwr_ratio),
+                        'data_quality': day['data_quality'],
+                        'configuration_id': configuration_id,
+                        'configuration_name': config['name']
+                    }
+                ))
             
             self.logger.info(f"Generated {len(time_series_points)} time series points")
             return time_series_points
@@ -374,62 +342,40 @@ class ACWRVisualizationService:
                             decay_rate=decay_rate
                         ))
             
-            # Calculate results for each combination
+            # Evaluate the whole grid from one series load
             sensitivity_results = []
             base_result = None
             
+            if parameter_combinations:
+                sweep = acwr_sweep_engine.sweep_user(
+                    user_id, analysis_date,
+                    sorted({c.chronic_period_days for c in parameter_combinations}),
+                    sorted({c.decay_rate for c in parameter_combinations})
+                )
+            
             for combination in parameter_combinations:
-                try:
-                    # Create a temporary configuration for this parameter combination
-                    temp_config = {
-                        'chronic_period_days': combination.chronic_period_days,
-                        'decay_rate': combination.decay_rate
-                    }
-                    
-                    # Calculate ACWR with the specific parameters
-                    acwr_result = self.config_service.calculate_enhanced_acwr(
-                        user_id=user_id,
-                        activity_date=analysis_date,
-                        configuration=temp_config
-                    )
-                    
-                    result = {
-                        'chronic_period_days': combination.chronic_period_days,
-                        'decay_rate': combination.decay_rate,
-                        'external_acwr': acwr_result.get('enhanced_acute_chronic_ratio', 0),  # External ACWR (based on distance/load)
-                        'internal_acwr': acwr_result.get('enhanced_trimp_acute_chronic_ratio', 0),  # Internal ACWR (based on TRIMP)
-                        'external_work': acwr_result.get('acute_load_avg', 0),  # External Work (7-day avg load)
-                        'internal_load': acwr_result.get('acute_trimp_avg', 0),  # Internal Load (7-day avg TRIMP)
-                        'normalized_divergence': acwr_result.get('enhanced_normalized_divergence', 0),  # Normalized divergence
-                        'chronic_load': acwr_result.get('enhanced_chronic_load', 0),
-                        'risk_level': 'Unknown',  # This would need to be calculated based on ACWR values
-                        'data_quality': acwr_result.get('data_quality', 'Unknown')
-                    }
-                    
-                    sensitivity_results.append(result)
-                    
-                    # Store base result for comparison
-                    if (combination.chronic_period_days == base_chronic_period and 
-                        combination.decay_rate == base_decay_rate):
-                        base_result = result
-                        
-                except Exception as e:
-                    self.logger.warning(f"Error in sensitivity analysis for combination {combination.chronic_period_days}d/{combination.decay_rate}: {str(e)}")
-                    # Add a default result to avoid breaking the analysis
-                    result = {
-                        'chronic_period_days': combination.chronic_period_days,
-                        'decay_rate': combination.decay_rate,
-                        'external_acwr': 0,
-                        'internal_acwr': 0,
-                        'external_work': 0,
-                        'internal_load': 0,
-                        'normalized_divergence': 0,
-                        'chronic_load': 0,
-                        'risk_level': 'Error',
-                        'data_quality': 'Error'
-                    }
-                    sensitivity_results.append(result)
-                    continue
+                acwr_result = sweep.cell(combination.chronic_period_days, combination.decay_rate)
+                external_acwr = acwr_result['enhanced_acute_chronic_ratio']
+                
+                result = {
+                    'chronic_period_days': combination.chronic_period_days,
+                    'decay_rate': combination.decay_rate,
+                    'external_acwr': external_acwr,  # External ACWR (based on distance/load)
+                    'internal_acwr': acwr_result['enhanced_trimp_acute_chronic_ratio'],  # Internal ACWR (based on TRIMP)
+                    'external_work': acwr_result['acute_load_avg'],  # External Work (7-day avg load)
+                    'internal_load': acwr_result['acute_trimp_avg'],  # Internal Load (7-day avg TRIMP)
+                    'normalized_divergence': acwr_result['enhanced_normalized_divergence'],  # Normalized divergence
+                    'chronic_load': acwr_result['enhanced_chronic_load'],
+                    'risk_level': self._get_risk_zone(external_acwr),
+                    'data_quality': acwr_result['data_quality']
+                }
+                
+                sensitivity_results.append(result)
+                
+                # Store base result for comparison
+                if (combination.chronic_period_days == base_chronic_period and 
+                    combination.decay_rate == base_decay_rate):
+                    base_result = result
             
             # Calculate sensitivity metrics
             if base_result and sensitivity_results:
@@ -560,7 +506,7 @@ class ACWRVisualizationService:
     def _calculate_sensitivity_metrics(self, base_result: Dict, sensitivity_results: List[Dict]) -> Dict[str, Any]:
         """Calculate sensitivity metrics for parameter variations"""
         try:
-            base_acwr = base_result.get('acwr_ratio', 0)
+            base_acwr = base_result.get('external_acwr', 0)
             base_chronic = base_result.get('chronic_load', 0)
             
             # Calculate variations
@@ -570,7 +516,7 @@ class ACWRVisualizationService:
             for result in sensitivity_results:
                 if result['chronic_period_days'] != base_result['chronic_period_days'] or \
                    result['decay_rate'] != base_result['decay_rate']:
-                    acwr_variations.append(abs(result['acwr_ratio'] - base_acwr))
+                    acwr_variations.append(abs(result['external_acwr'] - base_acwr))
                     chronic_variations.append(abs(result['chronic_load'] - base_chronic))
             
             # Calculate sensitivity metrics
@@ -5,17 +5,136 @@ This module provides comprehensive analytics tracking for integration points,
 user interactions, and conversion funnel analysis.
 """
 
+import atexit
 import logging
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
 
+from psycopg2.extras import execute_values
+
 from db_utils import get_db_connection, execute_query
 
 logger = logging.getLogger(__name__)
 
+# Ingestion pipeline limits - events beyond the queue capacity are dropped
+# (and counted) rather than blocking the request that produced them
+INGEST_QUEUE_MAXSIZE = 10000
+INGEST_BATCH_SIZE = 500
+INGEST_FLUSH_INTERVAL_SECONDS = 2.0
+
+# In-memory session summaries (LRU, evicted by size and idle time)
+SESSION_CACHE_MAX_SESSIONS = 5000
+SESSION_CACHE_TTL_SECONDS = 1800
+
+# Daily aggregate rollup used by the CTR / funnel / tutorial reports.
+# Windows are whole calendar days ending today.
+ROLLUP_PERIOD_DAYS = {'1d': 1, '7d': 7, '30d': 30, '90d': 90}
+ROLLUP_MAX_STALENESS_SECONDS = 900
+
+# One row per (day, event_type, integration_point, tutorial_id). Also run by
+# scripts/migrations/add_analytics_daily_rollup_2026-10-18.py.
+DAILY_ROLLUP_DDL = """
+    CREATE TABLE IF NOT EXISTS analytics_daily_rollup (
+        day DATE NOT NULL,
+        event_type VARCHAR(100) NOT NULL,
+        integration_point VARCHAR(100) NOT NULL DEFAULT '',
+        tutorial_id VARCHAR(100) NOT NULL DEFAULT '',
+        event_count INTEGER NOT NULL DEFAULT 0,
+        user_ids INTEGER[] NOT NULL DEFAULT '{}',
+        session_ids TEXT[] NOT NULL DEFAULT '{}',
+        gap_seconds_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        gap_count INTEGER NOT NULL DEFAULT 0,
+        step_position_sum BIGINT NOT NULL DEFAULT 0,
+        first_occurrence TIMESTAMP,
+        last_occurrence TIMESTAMP,
+        refreshed_at TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (day, event_type, integration_point, tutorial_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_analytics_daily_rollup_event_type_day
+    ON analytics_daily_rollup (event_type, day);
+"""
+
+# Re-aggregates analytics_events into analytics_daily_rollup for every day on or
+# after %(start_day)s. Distinct users/sessions are kept as exact sorted arrays so
+# any multi-day window can be de-duplicated with unnest + COUNT(DISTINCT). The
+# one-day lookback lets the first event of start_day see its predecessor for the
+# inter-event gap; step_position is the event's ordinal within the user's day.
+ROLLUP_REFRESH_SQL = """
+    INSERT INTO analytics_daily_rollup (
+        day, event_type, integration_point, tutorial_id, event_count,
+        user_ids, session_ids, gap_seconds_sum, gap_count, step_position_sum,
+        first_occurrence, last_occurrence, refreshed_at
+    )
+    WITH ordered AS (
+        SELECT 
+            timestamp::date as day,
+            event_type,
+            COALESCE(integration_point, '') as integration_point,
+            COALESCE(event_data->>'tutorial_id', '') as tutorial_id,
+            user_id,
+            session_id,
+            timestamp,
+            EXTRACT(EPOCH FROM (timestamp - LAG(timestamp) OVER (PARTITION BY user_id ORDER BY timestamp))) as gap_seconds,
+            ROW_NUMBER() OVER (PARTITION BY user_id, timestamp::date ORDER BY timestamp) as step_position
+        FROM analytics_events
+        WHERE timestamp >= %(start_day)s::date - INTERVAL '1 day'
+    )
+    SELECT 
+        day, event_type, integration_point, tutorial_id,
+        COUNT(*),
+        COALESCE(ARRAY_AGG(DISTINCT user_id) FILTER (WHERE user_id IS NOT NULL), '{}'),
+        ARRAY_AGG(DISTINCT session_id),
+        COALESCE(SUM(gap_seconds) FILTER (WHERE user_id IS NOT NULL), 0),
+        COUNT(gap_seconds) FILTER (WHERE user_id IS NOT NULL),
+        SUM(step_position),
+        MIN(timestamp),
+        MAX(timestamp),
+        NOW()
+    FROM ordered
+    WHERE day >= %(start_day)s
+    GROUP BY day, event_type, integration_point, tutorial_id
+"""
+
+# Multi-row insert statements per target table, used with execute_values.
+# Rows are tuples in column order; timestamps are captured at enqueue time
+# so a delayed flush does not skew them.
+INGEST_TABLES: Dict[str, str] = {
+    'analytics_events': """
+        INSERT INTO analytics_events (
+            event_id, user_id, session_id, event_type, integration_point,
+            source_page, target_page, event_data, timestamp, user_agent, ip_address, referrer
+        ) VALUES %s
+        ON CONFLICT (event_id) DO NOTHING
+    """,
+    'rum_metrics': """
+        INSERT INTO rum_metrics (
+            page, user_id, ttfb, fcp, lcp, dns_time, connection_time,
+            request_time, response_time, dom_interactive_time, dom_complete_time,
+            load_complete, resource_count, total_resource_size,
+            user_agent, viewport_width, viewport_height, connection_type,
+            timestamp
+        ) VALUES %s
+    """,
+    'component_performance': """
+        INSERT INTO component_performance (
+            page, user_id, fetch_time_ms, process_time_ms, render_time_ms,
+            total_time_ms, data_points, error, timestamp
+        ) VALUES %s
+    """,
+    'api_timing_client': """
+        INSERT INTO api_timing_client (
+            api_name, user_id, duration_ms, success, error, timestamp
+        ) VALUES %s
+    """,
+}
+
 
 class EventType(Enum):
     """Analytics event types"""
@@ -77,34 +196,287 @@ class ClickThroughRate:
     date_range: Dict[str, str]
 
 
+class AnalyticsIngestionQueue:
+    """
+    Bounded, batched writer for analytics rows.
+
+    Request handlers call submit() which never touches the database; a
+    background thread drains the queue and writes each table's rows with a
+    single multi-row INSERT. When the queue is full new rows are dropped
+    and counted so traffic spikes cannot block requests or exhaust memory.
+    """
+
+    def __init__(self, maxsize: int = INGEST_QUEUE_MAXSIZE,
+                 batch_size: int = INGEST_BATCH_SIZE,
+                 flush_interval: float = INGEST_FLUSH_INTERVAL_SECONDS):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'enqueued': 0,
+            'dropped': 0,
+            'written': 0,
+            'failed_rows': 0,
+            'failed_batches': 0,
+            'high_watermark': 0,
+            'last_batch_size': 0,
+            'last_flush_ms': None,
+            'last_flush_at': None
+        }
+
+    def submit(self, table: str, row: tuple) -> bool:
+        """
+        Queue a row for insertion without blocking
+
+        Returns:
+            True if accepted, False if dropped (unknown table or queue full)
+        """
+        if table not in INGEST_TABLES:
+            logger.error(f"Analytics ingestion: unknown table '{table}'")
+            return False
+
+        self._ensure_worker()
+
+        try:
+            self._queue.put_nowait((table, row))
+        except queue.Full:
+            with self._metrics_lock:
+                self._metrics['dropped'] += 1
+                dropped = self._metrics['dropped']
+            # Log on powers of two so a sustained overload doesn't flood the logs
+            if dropped & (dropped - 1) == 0:
+                logger.warning(f"Analytics ingestion queue full ({self.maxsize}); {dropped} rows dropped so far")
+            return False
+
+        depth = self._queue.qsize()
+        with self._metrics_lock:
+            self._metrics['enqueued'] += 1
+            if depth > self._metrics['high_watermark']:
+                self._metrics['high_watermark'] = depth
+        return True
+
+    def flush(self) -> int:
+        """Synchronously drain everything currently queued. Returns rows written."""
+        written = 0
+        while True:
+            batch = self._drain(self.batch_size, timeout=0)
+            if not batch:
+                return written
+            written += self._write_batch(batch)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Backpressure and throughput counters for monitoring"""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics['queue_depth'] = self._queue.qsize()
+        metrics['queue_capacity'] = self.maxsize
+        metrics['queue_utilization_pct'] = round(metrics['queue_depth'] / self.maxsize * 100, 2) if self.maxsize else 0
+        metrics['worker_alive'] = bool(self._worker and self._worker.is_alive())
+        return metrics
+
+    def _ensure_worker(self) -> None:
+        """Start the drain thread on first use (nothing runs at import time)"""
+        if self._worker and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(
+                target=self._run, name='analytics-ingestion', daemon=True
+            )
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._drain(self.batch_size, timeout=self.flush_interval)
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    logger.error(f"Analytics ingestion worker error: {str(e)}")
+
+    def _drain(self, max_items: int, timeout: float) -> List[Tuple[str, tuple]]:
+        """Collect up to max_items, waiting at most `timeout` seconds for the first row"""
+        batch = []
+        try:
+            if timeout > 0:
+                batch.append(self._queue.get(timeout=timeout))
+            else:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < max_items:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                # Give a trickle of events a brief chance to join the batch
+                if time.monotonic() >= deadline or timeout <= 0:
+                    break
+                time.sleep(0.05)
+        return batch
+
+    def _write_batch(self, batch: List[Tuple[str, tuple]]) -> int:
+        """Write a drained batch, one multi-row INSERT per table, each committed on its own"""
+        rows_by_table: Dict[str, List[tuple]] = {}
+        for table, row in batch:
+            rows_by_table.setdefault(table, []).append(row)
+
+        start = time.perf_counter()
+        written = 0
+        try:
+            with self._write_lock, get_db_connection() as conn:
+                cursor = conn.cursor()
+                for table, rows in rows_by_table.items():
+                    written += self._write_table(conn, cursor, table, rows)
+        except Exception as e:
+            logger.error(f"Error writing analytics batch of {len(batch)} rows: {str(e)}")
+
+        failed = len(batch) - written
+        with self._metrics_lock:
+            self._metrics['written'] += written
+            if failed:
+                self._metrics['failed_batches'] += 1
+                self._metrics['failed_rows'] += failed
+            if written:
+                self._metrics['last_batch_size'] = len(batch)
+                self._metrics['last_flush_ms'] = round((time.perf_counter() - start) * 1000, 2)
+                self._metrics['last_flush_at'] = datetime.now().isoformat()
+        return written
+
+    def _write_table(self, conn, cursor, table: str, rows: List[tuple]) -> int:
+        """Insert one table's rows; if the batch is rejected, retry row by row so only bad rows are lost"""
+        try:
+            execute_values(cursor, INGEST_TABLES[table], rows, page_size=self.batch_size)
+            conn.commit()
+            return len(rows)
+        except Exception as e:
+            conn.rollback()
+            if len(rows) == 1:
+                logger.error(f"Dropping analytics row for {table}: {str(e)}")
+                return 0
+            logger.warning(f"Analytics insert of {len(rows)} rows into {table} failed, retrying per row: {str(e)}")
+
+        written = 0
+        for row in rows:
+            try:
+                execute_values(cursor, INGEST_TABLES[table], [row])
+                conn.commit()
+                written += 1
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Dropping analytics row for {table}: {str(e)}")
+        return written
+
+
+class SessionSummaryCache:
+    """
+    LRU of per-session summaries bounded by entry count and idle TTL.
+
+    Only aggregate counters are kept per session - never the event objects
+    themselves - so memory stays flat regardless of traffic.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_CACHE_MAX_SESSIONS,
+                 ttl_seconds: int = SESSION_CACHE_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def record(self, event: AnalyticsEvent) -> None:
+        session_key = f"{event.user_id}_{event.session_id}"
+        with self._lock:
+            session = self._sessions.pop(session_key, None)
+            if session is None:
+                session = {
+                    'user_id': event.user_id,
+                    'session_id': event.session_id,
+                    'start_time': event.timestamp,
+                    'event_count': 0,
+                    'integration_points_clicked': set(),
+                    'pages_visited': set()
+                }
+            session['event_count'] += 1
+            session['last_activity'] = event.timestamp
+            if event.integration_point:
+                session['integration_points_clicked'].add(event.integration_point.value)
+            session['pages_visited'].add(event.source_page)
+
+            # Most recently active sessions live at the end
+            self._sessions[session_key] = session
+            self._evict(now=event.timestamp)
+
+    def get(self, session_key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._sessions.get(session_key)
+
+    def _evict(self, now: datetime) -> None:
+        """Drop idle sessions from the LRU end, then enforce the size cap"""
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest['last_activity'] <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, session_key: str) -> bool:
+        with self._lock:
+            return session_key in self._sessions
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+# Global ingestion queue shared by event tracking and the RUM endpoints
+ingestion_queue = AnalyticsIngestionQueue()
+atexit.register(ingestion_queue.flush)
+
+# Monotonic time of this process's last rollup refresh (0 = never)
+_last_rollup_refresh = 0.0
+_rollup_refresh_lock = threading.Lock()
+
+
 class AnalyticsTracker:
     """Comprehensive analytics tracking system"""
     
-    def __init__(self):
-        self.session_events = {}
-        self.user_sessions = {}
+    def __init__(self, ingestion: Optional[AnalyticsIngestionQueue] = None):
+        self.ingestion = ingestion or ingestion_queue
+        self.user_sessions = SessionSummaryCache()
     
     def track_event(self, event: AnalyticsEvent) -> bool:
         """
         Track an analytics event
         
+        The event is queued for a batched insert; this call never waits on
+        the database.
+        
         Args:
             event: AnalyticsEvent object
             
         Returns:
-            True if successfully tracked, False otherwise
+            True if accepted for storage, False if dropped or failed
         """
         try:
-            # Store in database
-            self._store_event(event)
+            accepted = self.ingestion.submit('analytics_events', self._event_row(event))
             
             # Update session tracking
             self._update_session_tracking(event)
             
-            # Log for monitoring
-            logger.info(f"Analytics event tracked: {event.event_type.value} - {event.integration_point.value if event.integration_point else 'N/A'}")
+            logger.debug(f"Analytics event queued: {event.event_type.value} - {event.integration_point.value if event.integration_point else 'N/A'}")
             
-            return True
+            return accepted
             
         except Exception as e:
             logger.error(f"Error tracking analytics event: {str(e)}")
@@ -115,6 +487,9 @@ class AnalyticsTracker:
         """
         Get click-through rate metrics for integration points
         
+        Answered in a single query against analytics_daily_rollup; conversions
+        are counted in the same pass rather than per integration point.
+        
         Args:
             time_period: Time period for analysis ('1d', '7d', '30d', '90d')
             integration_points: Specific integration points to analyze (None for all)
@@ -123,80 +498,72 @@ class AnalyticsTracker:
             List of ClickThroughRate objects
         """
         try:
-            # Calculate date range
-            end_date = datetime.now()
-            if time_period == '1d':
-                start_date = end_date - timedelta(days=1)
-            elif time_period == '7d':
-                start_date = end_date - timedelta(days=7)
-            elif time_period == '30d':
-                start_date = end_date - timedelta(days=30)
-            elif time_period == '90d':
-                start_date = end_date - timedelta(days=90)
-            else:
-                start_date = end_date - timedelta(days=7)
-            
-            # Build query
-            query = """
-                SELECT 
-                    integration_point,
-                    COUNT(*) as total_events,
-                    COUNT(DISTINCT user_id) as unique_users,
-                    COUNT(CASE WHEN event_type = 'integration_point_click' THEN 1 END) as total_clicks,
-                    COUNT(CASE WHEN event_type = 'page_view' THEN 1 END) as total_impressions
-                FROM analytics_events 
-                WHERE timestamp >= %s AND timestamp <= %s
-                AND event_type IN ('integration_point_click', 'page_view', 'getting_started_access')
-            """
-            
-            params = [start_date, end_date]
+            start_day, end_day = self._get_day_range(time_period)
+            self._ensure_rollup_fresh()
             
+            params = [start_day, end_day]
+            point_filter = ""
             if integration_points:
-                placeholders = ','.join(['%s'] * len(integration_points))
-                query += f" AND integration_point IN ({placeholders})"
-                params.extend(integration_points)
+                point_filter = " AND integration_point = ANY(%s)"
+                params.append(list(integration_points))
             
-            query += " GROUP BY integration_point ORDER BY total_clicks DESC"
+            query = f"""
+                WITH scoped AS (
+                    SELECT * FROM analytics_daily_rollup
+                    WHERE day BETWEEN %s AND %s
+                    AND event_type IN ('integration_point_click', 'page_view', 'getting_started_access')
+                    {point_filter}
+                ),
+                counts AS (
+                    SELECT 
+                        integration_point,
+                        SUM(event_count) as total_events,
+                        COALESCE(SUM(event_count) FILTER (WHERE event_type = 'integration_point_click'), 0) as total_clicks,
+                        COALESCE(SUM(event_count) FILTER (WHERE event_type = 'page_view'), 0) as total_impressions
+                    FROM scoped
+                    GROUP BY integration_point
+                ),
+                users AS (
+                    SELECT 
+                        s.integration_point,
+                        COUNT(DISTINCT u.user_id) as unique_users,
+                        COUNT(DISTINCT u.user_id) FILTER (WHERE s.event_type = 'getting_started_access') as conversions
+                    FROM scoped s
+                    CROSS JOIN LATERAL unnest(s.user_ids) AS u(user_id)
+                    GROUP BY s.integration_point
+                )
+                SELECT 
+                    c.integration_point, c.total_events, c.total_clicks, c.total_impressions,
+                    COALESCE(u.unique_users, 0) as unique_users,
+                    COALESCE(u.conversions, 0) as conversions
+                FROM counts c
+                LEFT JOIN users u ON u.integration_point = c.integration_point
+                ORDER BY c.total_clicks DESC
+            """
             
-            # Execute query
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(query, params)
-                results = cursor.fetchall()
+            results = self._fetch_rollup(query, params)
             
-            # Process results
             ctr_metrics = []
             for row in results:
-                integration_point, total_events, unique_users, total_clicks, total_impressions = row
-                
-                # Calculate CTR
-                ctr = (total_clicks / total_impressions * 100) if total_impressions > 0 else 0
+                total_impressions = row['total_impressions']
+                unique_users = row['unique_users']
                 
-                # Calculate conversion rate (clicks that led to getting started access)
-                conversion_query = """
-                    SELECT COUNT(DISTINCT user_id) as conversions
-                    FROM analytics_events 
-                    WHERE integration_point = %s 
-                    AND event_type = 'getting_started_access'
-                    AND timestamp >= %s AND timestamp <= %s
-                """
+                ctr = (row['total_clicks'] / total_impressions * 100) if total_impressions > 0 else 0
                 
-                cursor.execute(conversion_query, [integration_point, start_date, end_date])
-                conversion_result = cursor.fetchone()
-                conversions = conversion_result[0] if conversion_result else 0
-                conversion_rate = (conversions / unique_users * 100) if unique_users > 0 else 0
+                # Conversion rate: users who reached getting started from this point
+                conversion_rate = (row['conversions'] / unique_users * 100) if unique_users > 0 else 0
                 
                 ctr_metrics.append(ClickThroughRate(
-                    integration_point=integration_point,
+                    integration_point=row['integration_point'] or None,
                     total_impressions=total_impressions,
-                    total_clicks=total_clicks,
+                    total_clicks=row['total_clicks'],
                     click_through_rate=round(ctr, 2),
                     unique_users=unique_users,
                     conversion_rate=round(conversion_rate, 2),
                     time_period=time_period,
                     date_range={
-                        'start': start_date.strftime('%Y-%m-%d'),
-                        'end': end_date.strftime('%Y-%m-%d')
+                        'start': start_day.strftime('%Y-%m-%d'),
+                        'end': end_day.strftime('%Y-%m-%d')
                     }
                 ))
             
@@ -218,16 +585,7 @@ class AnalyticsTracker:
             Dictionary with funnel metrics
         """
         try:
-            # Calculate date range
-            end_date = datetime.now()
-            if time_period == '1d':
-                start_date = end_date - timedelta(days=1)
-            elif time_period == '7d':
-                start_date = end_date - timedelta(days=7)
-            elif time_period == '30d':
-                start_date = end_date - timedelta(days=30)
-            else:
-                start_date = end_date - timedelta(days=7)
+            start_day, end_day = self._get_day_range(time_period)
             
             # Define funnel steps based on type
             if funnel_type == 'onboarding':
@@ -262,41 +620,15 @@ class AnalyticsTracker:
                     ('tutorial_complete', 'Tutorial Completions')
                 ]
             
-            # Get funnel data with more detailed analysis
-            funnel_query = """
-                SELECT 
-                    event_type,
-                    COUNT(DISTINCT user_id) as unique_users,
-                    COUNT(*) as total_events,
-                    COUNT(DISTINCT session_id) as unique_sessions,
-                    AVG(EXTRACT(EPOCH FROM (timestamp - LAG(timestamp) OVER (PARTITION BY user_id ORDER BY timestamp)))) as avg_time_between_events
-                FROM analytics_events 
-                WHERE timestamp >= %s AND timestamp <= %s
-                AND event_type IN ({})
-                GROUP BY event_type
-                ORDER BY 
-                    CASE event_type
-                        {}
-                    END
-            """.format(
-                ','.join(['%s'] * len(funnel_steps)),
-                ' '.join([f"WHEN '{step[0]}' THEN {i+1}" for i, step in enumerate(funnel_steps)])
-            )
-            
-            event_types = [step[0] for step in funnel_steps]
-            
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(funnel_query, [start_date, end_date] + event_types)
-                results = cursor.fetchall()
+            results = self._get_step_rollup(start_day, end_day, [step[0] for step in funnel_steps])
             
             # Process funnel data
             funnel_data = {
                 'funnel_type': funnel_type,
                 'time_period': time_period,
                 'date_range': {
-                    'start': start_date.strftime('%Y-%m-%d'),
-                    'end': end_date.strftime('%Y-%m-%d')
+                    'start': start_day.strftime('%Y-%m-%d'),
+                    'end': end_day.strftime('%Y-%m-%d')
                 },
                 'steps': [],
                 'overall_metrics': {
@@ -312,29 +644,32 @@ class AnalyticsTracker:
             total_events = 0
             total_sessions = 0
             
-            for event_type, unique_users, total_events_count, unique_sessions, avg_time_between in results:
+            for row in results:
+                event_type = row['event_type']
+                unique_users = row['unique_users']
                 step_name = next((step[1] for step in funnel_steps if step[0] == event_type), event_type.replace('_', ' ').title())
+                avg_time_between = (row['gap_seconds_sum'] / row['gap_count']) if row['gap_count'] else None
                 
                 step = {
                     'step_name': step_name,
                     'event_type': event_type,
                     'unique_users': unique_users,
-                    'total_events': total_events_count,
-                    'unique_sessions': unique_sessions,
+                    'total_events': row['total_events'],
+                    'unique_sessions': row['unique_sessions'],
                     'conversion_rate': None,
                     'drop_off_rate': None,
                     'avg_time_between_events': round(avg_time_between, 2) if avg_time_between else None
                 }
                 
-                if previous_count is not None:
+                if previous_count:
                     step['conversion_rate'] = round((unique_users / previous_count * 100), 2)
                     step['drop_off_rate'] = round(((previous_count - unique_users) / previous_count * 100), 2)
                 
                 funnel_data['steps'].append(step)
                 previous_count = unique_users
                 total_users = max(total_users, unique_users)
-                total_events += total_events_count
-                total_sessions = max(total_sessions, unique_sessions)
+                total_events += row['total_events']
+                total_sessions = max(total_sessions, row['unique_sessions'])
             
             # Calculate overall metrics
             if funnel_data['steps']:
@@ -364,64 +699,19 @@ class AnalyticsTracker:
             Dictionary with detailed funnel metrics
         """
         try:
-            # Calculate date range
-            end_date = datetime.now()
-            if time_period == '7d':
-                start_date = end_date - timedelta(days=7)
-            elif time_period == '30d':
-                start_date = end_date - timedelta(days=30)
-            else:
-                start_date = end_date - timedelta(days=7)
+            start_day, end_day = self._get_day_range(time_period)
             
-            # Get detailed funnel analysis
-            detailed_query = """
-                WITH user_journeys AS (
-                    SELECT 
-                        user_id,
-                        session_id,
-                        event_type,
-                        timestamp,
-                        source_page,
-                        integration_point,
-                        ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY timestamp) as step_number
-                    FROM analytics_events 
-                    WHERE timestamp >= %s AND timestamp <= %s
-                    AND event_type IN ('page_view', 'integration_point_click', 'getting_started_access', 'tutorial_start', 'tutorial_complete')
-                ),
-                funnel_analysis AS (
-                    SELECT 
-                        event_type,
-                        COUNT(DISTINCT user_id) as unique_users,
-                        COUNT(DISTINCT session_id) as unique_sessions,
-                        COUNT(*) as total_events,
-                        AVG(step_number) as avg_step_position,
-                        MIN(timestamp) as first_occurrence,
-                        MAX(timestamp) as last_occurrence
-                    FROM user_journeys
-                    GROUP BY event_type
-                )
-                SELECT * FROM funnel_analysis
-                ORDER BY 
-                    CASE event_type
-                        WHEN 'page_view' THEN 1
-                        WHEN 'integration_point_click' THEN 2
-                        WHEN 'getting_started_access' THEN 3
-                        WHEN 'tutorial_start' THEN 4
-                        WHEN 'tutorial_complete' THEN 5
-                    END
-            """
-            
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(detailed_query, [start_date, end_date])
-                results = cursor.fetchall()
+            results = self._get_step_rollup(start_day, end_day, [
+                'page_view', 'integration_point_click', 'getting_started_access',
+                'tutorial_start', 'tutorial_complete'
+            ])
             
             # Process detailed funnel data
             detailed_funnel = {
                 'time_period': time_period,
                 'date_range': {
-                    'start': start_date.strftime('%Y-%m-%d'),
-                    'end': end_date.strftime('%Y-%m-%d')
+                    'start': start_day.strftime('%Y-%m-%d'),
+                    'end': end_day.strftime('%Y-%m-%d')
                 },
                 'funnel_steps': [],
                 'cohort_analysis': {},
@@ -429,15 +719,20 @@ class AnalyticsTracker:
             }
             
             previous_users = None
-            for result in results:
-                event_type, unique_users, unique_sessions, total_events, avg_step_position, first_occurrence, last_occurrence = result
+            for row in results:
+                event_type = row['event_type']
+                unique_users = row['unique_users']
+                first_occurrence = row['first_occurrence']
+                last_occurrence = row['last_occurrence']
+                # Step position is the event's ordinal within the user's day
+                avg_step_position = (row['step_position_sum'] / row['total_events']) if row['total_events'] else 0
                 
                 step = {
                     'event_type': event_type,
                     'step_name': event_type.replace('_', ' ').title(),
                     'unique_users': unique_users,
-                    'unique_sessions': unique_sessions,
-                    'total_events': total_events,
+                    'unique_sessions': row['unique_sessions'],
+                    'total_events': row['total_events'],
                     'avg_step_position': round(avg_step_position, 2),
                     'first_occurrence': first_occurrence.isoformat() if first_occurrence else None,
                     'last_occurrence': last_occurrence.isoformat() if last_occurrence else None,
@@ -446,7 +741,7 @@ class AnalyticsTracker:
                     'drop_off_rate': None
                 }
                 
-                if previous_users is not None:
+                if previous_users:
                     step['conversion_rate'] = round((unique_users / previous_users * 100), 2)
                     step['drop_off_count'] = previous_users - unique_users
                     step['drop_off_rate'] = round(((previous_users - unique_users) / previous_users * 100), 2)
@@ -471,59 +766,63 @@ class AnalyticsTracker:
             Dictionary with tutorial metrics
         """
         try:
-            # Calculate date range
-            end_date = datetime.now()
-            if time_period == '7d':
-                start_date = end_date - timedelta(days=7)
-            elif time_period == '30d':
-                start_date = end_date - timedelta(days=30)
-            else:
-                start_date = end_date - timedelta(days=7)
+            start_day, end_day = self._get_day_range(time_period)
+            self._ensure_rollup_fresh()
             
-            # Get tutorial metrics
             tutorial_query = """
-                SELECT 
-                    JSON_EXTRACT(event_data, '$.tutorial_id') as tutorial_id,
-                    COUNT(CASE WHEN event_type = 'tutorial_start' THEN 1 END) as starts,
-                    COUNT(CASE WHEN event_type = 'tutorial_complete' THEN 1 END) as completions,
-                    COUNT(CASE WHEN event_type = 'tutorial_skip' THEN 1 END) as skips,
-                    COUNT(DISTINCT user_id) as unique_users
-                FROM analytics_events 
-                WHERE timestamp >= %s AND timestamp <= %s
-                AND event_type IN ('tutorial_start', 'tutorial_complete', 'tutorial_skip')
-                GROUP BY tutorial_id
-                ORDER BY starts DESC
+                WITH scoped AS (
+                    SELECT * FROM analytics_daily_rollup
+                    WHERE day BETWEEN %s AND %s
+                    AND event_type IN ('tutorial_start', 'tutorial_complete', 'tutorial_skip')
+                    AND tutorial_id <> ''
+                ),
+                counts AS (
+                    SELECT 
+                        tutorial_id,
+                        COALESCE(SUM(event_count) FILTER (WHERE event_type = 'tutorial_start'), 0) as starts,
+                        COALESCE(SUM(event_count) FILTER (WHERE event_type = 'tutorial_complete'), 0) as completions,
+                        COALESCE(SUM(event_count) FILTER (WHERE event_type = 'tutorial_skip'), 0) as skips
+                    FROM scoped
+                    GROUP BY tutorial_id
+                ),
+                users AS (
+                    SELECT s.tutorial_id, COUNT(DISTINCT u.user_id) as unique_users
+                    FROM scoped s
+                    CROSS JOIN LATERAL unnest(s.user_ids) AS u(user_id)
+                    GROUP BY s.tutorial_id
+                )
+                SELECT c.*, COALESCE(u.unique_users, 0) as unique_users
+                FROM counts c
+                LEFT JOIN users u ON u.tutorial_id = c.tutorial_id
+                ORDER BY c.starts DESC
             """
             
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(tutorial_query, [start_date, end_date])
-                results = cursor.fetchall()
+            results = self._fetch_rollup(tutorial_query, [start_day, end_day])
             
             # Process tutorial data
             tutorial_analytics = {
                 'time_period': time_period,
                 'date_range': {
-                    'start': start_date.strftime('%Y-%m-%d'),
-                    'end': end_date.strftime('%Y-%m-%d')
+                    'start': start_day.strftime('%Y-%m-%d'),
+                    'end': end_day.strftime('%Y-%m-%d')
                 },
                 'tutorials': []
             }
             
-            for tutorial_id, starts, completions, skips, unique_users in results:
-                if tutorial_id:  # Skip null tutorial_ids
-                    completion_rate = (completions / starts * 100) if starts > 0 else 0
-                    skip_rate = (skips / starts * 100) if starts > 0 else 0
-                    
-                    tutorial_analytics['tutorials'].append({
-                        'tutorial_id': tutorial_id.strip('"'),  # Remove quotes from JSON
-                        'starts': starts,
-                        'completions': completions,
-                        'skips': skips,
-                        'unique_users': unique_users,
-                        'completion_rate': round(completion_rate, 2),
-                        'skip_rate': round(skip_rate, 2)
-                    })
+            for row in results:
+                starts = row['starts']
+                completion_rate = (row['completions'] / starts * 100) if starts > 0 else 0
+                skip_rate = (row['skips'] / starts * 100) if starts > 0 else 0
+                
+                tutorial_analytics['tutorials'].append({
+                    'tutorial_id': row['tutorial_id'],
+                    'starts': starts,
+                    'completions': row['completions'],
+                    'skips': row['skips'],
+                    'unique_users': row['unique_users'],
+                    'completion_rate': round(completion_rate, 2),
+                    'skip_rate': round(skip_rate, 2)
+                })
             
             return tutorial_analytics
             
@@ -531,63 +830,148 @@ class AnalyticsTracker:
             logger.error(f"Error getting tutorial analytics: {str(e)}")
             return {}
     
-    def _store_event(self, event: AnalyticsEvent) -> None:
-        """Store analytics event in database"""
-        try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Insert event
+    def refresh_daily_rollup(self, since_day: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Incrementally rebuild analytics_daily_rollup from analytics_events
+        
+        Days from `since_day` (default: the latest rolled-up day, which may have
+        been partial, or the first event day on an empty table) are deleted and
+        re-aggregated in one transaction, so the job is idempotent.
+        
+        Returns:
+            Dictionary with the refreshed start day and rows written
+        """
+        global _last_rollup_refresh
+        
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            if since_day is None:
                 cursor.execute("""
-                    INSERT INTO analytics_events (
-                        event_id, user_id, session_id, event_type, integration_point,
-                        source_page, target_page, event_data, timestamp, user_agent, ip_address, referrer
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    event.event_id,
-                    event.user_id,
-                    event.session_id,
-                    event.event_type.value,
-                    event.integration_point.value if event.integration_point else None,
-                    event.source_page,
-                    event.target_page,
-                    json.dumps(event.event_data),
-                    event.timestamp,
-                    event.user_agent,
-                    event.ip_address,
-                    event.referrer
-                ))
-                
-                conn.commit()
-                
-        except Exception as e:
-            logger.error(f"Error storing analytics event: {str(e)}")
-            raise
+                    SELECT COALESCE(
+                        (SELECT MAX(day) FROM analytics_daily_rollup),
+                        (SELECT MIN(timestamp)::date FROM analytics_events)
+                    ) as start_day
+                """)
+                row = cursor.fetchone()
+                since_day = row['start_day'] if row else None
+            
+            if since_day is None:
+                _last_rollup_refresh = time.monotonic()
+                return {'start_day': None, 'rows': 0}
+            
+            cursor.execute("DELETE FROM analytics_daily_rollup WHERE day >= %s", (since_day,))
+            cursor.execute(ROLLUP_REFRESH_SQL, {'start_day': since_day})
+            rows = cursor.rowcount
+            conn.commit()
+        
+        _last_rollup_refresh = time.monotonic()
+        logger.info(f"Analytics daily rollup refreshed from {since_day}: {rows} rows")
+        return {'start_day': since_day.isoformat(), 'rows': rows}
+    
+    def _ensure_rollup_fresh(self) -> None:
+        """Fold in recent events if this process hasn't refreshed the rollup lately"""
+        if time.monotonic() - _last_rollup_refresh < ROLLUP_MAX_STALENESS_SECONDS:
+            return
+        with _rollup_refresh_lock:
+            if time.monotonic() - _last_rollup_refresh < ROLLUP_MAX_STALENESS_SECONDS:
+                return
+            try:
+                self.refresh_daily_rollup()
+            except Exception as e:
+                # Serve slightly stale aggregates rather than failing the report
+                logger.error(f"Error refreshing analytics daily rollup: {str(e)}")
+    
+    def _get_step_rollup(self, start_day: date, end_day: date, event_types: List[str]) -> List[Dict[str, Any]]:
+        """Per-event-type totals and distinct users/sessions, ordered as given"""
+        self._ensure_rollup_fresh()
+        
+        query = """
+            WITH scoped AS (
+                SELECT * FROM analytics_daily_rollup
+                WHERE day BETWEEN %(start_day)s AND %(end_day)s
+                AND event_type = ANY(%(event_types)s)
+            ),
+            counts AS (
+                SELECT 
+                    event_type,
+                    SUM(event_count) as total_events,
+                    SUM(gap_seconds_sum) as gap_seconds_sum,
+                    SUM(gap_count) as gap_count,
+                    SUM(step_position_sum)::float8 as step_position_sum,
+                    MIN(first_occurrence) as first_occurrence,
+                    MAX(last_occurrence) as last_occurrence
+                FROM scoped
+                GROUP BY event_type
+            ),
+            users AS (
+                SELECT s.event_type, COUNT(DISTINCT u.user_id) as unique_users
+                FROM scoped s
+                CROSS JOIN LATERAL unnest(s.user_ids) AS u(user_id)
+                GROUP BY s.event_type
+            ),
+            sessions AS (
+                SELECT s.event_type, COUNT(DISTINCT x.session_id) as unique_sessions
+                FROM scoped s
+                CROSS JOIN LATERAL unnest(s.session_ids) AS x(session_id)
+                GROUP BY s.event_type
+            )
+            SELECT 
+                c.*,
+                COALESCE(u.unique_users, 0) as unique_users,
+                COALESCE(x.unique_sessions, 0) as unique_sessions
+            FROM counts c
+            LEFT JOIN users u ON u.event_type = c.event_type
+            LEFT JOIN sessions x ON x.event_type = c.event_type
+            ORDER BY array_position(%(event_types)s::text[], c.event_type::text)
+        """
+        
+        return self._fetch_rollup(query, {
+            'start_day': start_day,
+            'end_day': end_day,
+            'event_types': list(event_types)
+        })
+    
+    def _fetch_rollup(self, query: str, params) -> List[Dict[str, Any]]:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    
+    def _get_day_range(self, time_period: str) -> Tuple[date, date]:
+        """Calendar-day window ending today ('7d' = the last 7 days including today)"""
+        days = ROLLUP_PERIOD_DAYS.get(time_period, 7)
+        end_day = datetime.now().date()
+        return end_day - timedelta(days=days - 1), end_day
+    
+    def get_ingestion_metrics(self) -> Dict[str, Any]:
+        """Queue depth, drop counts and flush timings for the ingestion pipeline"""
+        metrics = self.ingestion.get_metrics()
+        metrics['tracked_sessions'] = len(self.user_sessions)
+        metrics['evicted_sessions'] = self.user_sessions.evictions
+        return metrics
+    
+    def _event_row(self, event: AnalyticsEvent) -> tuple:
+        """Row tuple for analytics_events in INGEST_TABLES column order"""
+        return (
+            event.event_id,
+            event.user_id,
+            event.session_id,
+            event.event_type.value,
+            event.integration_point.value if event.integration_point else None,
+            event.source_page,
+            event.target_page,
+            json.dumps(event.event_data),
+            event.timestamp,
+            event.user_agent,
+            event.ip_address,
+            event.referrer
+        )
     
     def _update_session_tracking(self, event: AnalyticsEvent) -> None:
         """Update session tracking for user journey analysis"""
         try:
-            session_key = f"{event.user_id}_{event.session_id}"
-            
-            if session_key not in self.user_sessions:
-                self.user_sessions[session_key] = {
-                    'user_id': event.user_id,
-                    'session_id': event.session_id,
-                    'start_time': event.timestamp,
-                    'events': [],
-                    'integration_points_clicked': set(),
-                    'pages_visited': set()
-                }
-            
-            session = self.user_sessions[session_key]
-            session['events'].append(event)
-            session['last_activity'] = event.timestamp
-            
-            if event.integration_point:
-                session['integration_points_clicked'].add(event.integration_point.value)
-            
-            session['pages_visited'].add(event.source_page)
-            
+            self.user_sessions.record(event)
         except Exception as e:
             logger.error(f"Error updating session tracking: {str(e)}")
     
@@ -617,6 +1001,9 @@ class AnalyticsTracker:
                     )
                 """)
                 
+                # Create analytics_daily_rollup table (see ROLLUP_REFRESH_SQL)
+                cursor.execute(DAILY_ROLLUP_DDL)
+                
                 # Create tutorial_sessions table
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS tutorial_sessions (
@@ -787,6 +1174,41 @@ def track_analytics_event(event_type: EventType, event_data: Dict[str, Any],
         return False
 
 
+def enqueue_rum_metrics(data: Dict[str, Any], user_id: Optional[int] = None) -> bool:
+    """Queue a frontend RUM (page timing / Core Web Vitals) sample"""
+    return ingestion_queue.submit('rum_metrics', (
+        data.get('page', 'unknown'), user_id,
+        data.get('ttfb'), data.get('fcp'), data.get('lcp'),
+        data.get('dns_time'), data.get('connection_time'),
+        data.get('request_time'), data.get('response_time'),
+        data.get('dom_interactive_time'), data.get('dom_complete_time'),
+        data.get('load_complete'), data.get('resource_count'),
+        data.get('total_resource_size'), data.get('user_agent'),
+        data.get('viewport_width'), data.get('viewport_height'),
+        data.get('connection_type'), data.get('timestamp')
+    ))
+
+
+def enqueue_component_performance(data: Dict[str, Any], user_id: Optional[int] = None) -> bool:
+    """Queue a React component fetch/process/render timing sample"""
+    return ingestion_queue.submit('component_performance', (
+        data.get('page', 'unknown'), user_id,
+        data.get('fetch_time_ms'), data.get('process_time_ms'),
+        data.get('render_time_ms'), data.get('total_time_ms'),
+        data.get('data_points'), data.get('error'),
+        datetime.now()
+    ))
+
+
+def enqueue_api_timing(data: Dict[str, Any], user_id: Optional[int] = None) -> bool:
+    """Queue a client-side API call timing sample"""
+    return ingestion_queue.submit('api_timing_client', (
+        data.get('api_name', 'unknown'), user_id, data.get('duration_ms'),
+        data.get('success'), data.get('error'),
+        datetime.now()
+    ))
+
+
 if __name__ == "__main__":
     print("=" * 50)
     print("Analytics Tracker Module")
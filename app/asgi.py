@@ -0,0 +1,26 @@
+# asgi.py
+
+"""
+ASGI entry point: the Flask app behind the asyncio chat gateway.
+
+    gunicorn --workers 1 --worker-class uvicorn.workers.UvicornWorker --timeout 0 asgi:app
+
+POST /api/chat streams on the event loop (chat/streaming_gateway.py) and static
+files are served from memory by static_assets.StaticAssetMiddleware; every other
+request runs in the Flask app on a pool of WSGI_THREADS threads, the same capacity
+the old `--threads 8` gave it - but no longer shared with open chat streams.
+"""
+
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from strava_app import app as flask_app
+from chat.streaming_gateway import ChatStreamingGateway
+from static_assets import StaticAssetMiddleware
+
+WSGI_THREADS = int(os.environ.get('WSGI_THREADS', '8'))
+
+app = StaticAssetMiddleware(
+    ChatStreamingGateway(flask_app, WSGIMiddleware(flask_app, workers=WSGI_THREADS))
+)
@@ -0,0 +1,383 @@
+# athlete_model_stats.py
+
+"""
+Incremental athlete model: the sufficient statistics behind athlete_models.
+
+update_athlete_model() used to re-read the model and then re-query the athlete's
+history on every autopsy - the last 5 alignment scores, every physical-distress day,
+the last 60 healthy training days, 30 days of journal HRV. The statistics those
+fields are computed from are now kept in athlete_models.model_stats (JSONB), and
+each autopsy folds in one day of facts with a bounded amount of work:
+
+- recent_alignment / recent_reasons: the 5 most recent autopsies' alignment scores
+  and deviation reasons (recent_alignment_trend, early_warning_active)
+- healthy: the divergence of the HEALTHY_WINDOW most recent healthy training
+  activities (typical_divergence_low is their P20)
+- distress_recent + distress_sketch: divergence on physical-distress days; the last
+  DISTRESS_RECENT exactly, older ones in a DivergenceSketch
+  (divergence_injury_threshold is the median of those below typical_divergence_low)
+
+The windows are keyed by date, so a regenerated autopsy replaces its day rather than
+counting it twice. apply_autopsy() is the one fold; update_athlete_model() runs it
+for a single autopsy under a row lock, and rebuild_athlete_models() replays every
+user's history through it in one streamed pass over ai_autopsies.
+
+Journal baselines (HRV 30 days, resting HR 7 days) are taken as of the autopsy date.
+"""
+
+import bisect
+import itertools
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+RECENT_AUTOPSIES = 5
+HEALTHY_WINDOW = 60
+DISTRESS_RECENT = 10
+SKETCH_CAPACITY = 64
+
+MIN_HEALTHY_DAYS = 5
+MIN_DISTRESS_EVENTS = 3
+
+DEFAULT_DIVERGENCE_LOW = -0.05
+DEFAULT_HRV_SUPPRESSION_THRESHOLD = 0.85
+
+# One row per autopsy with everything apply_autopsy() needs from that day.
+# {where} narrows it to one autopsy (update) or some/all users (rebuild).
+AUTOPSY_FACTS_SQL = """
+    SELECT a.user_id, a.date, a.alignment_score, a.deviation_reason,
+           day.divergences, day.healthy_divergences,
+           j.pain_percentage, j.energy_level, j.hrv_value,
+           base.hrv_baseline_30d, base.rhr_baseline_7d
+    FROM ai_autopsies a
+    LEFT JOIN LATERAL (
+        SELECT array_agg(act.normalized_divergence ORDER BY act.activity_id)
+                   FILTER (WHERE act.normalized_divergence IS NOT NULL) AS divergences,
+               array_agg(act.normalized_divergence ORDER BY act.activity_id)
+                   FILTER (WHERE act.normalized_divergence IS NOT NULL
+                             AND act.activity_id > 0 AND act.type != 'rest') AS healthy_divergences
+        FROM activities act
+        WHERE act.user_id = a.user_id AND act.date = a.date
+    ) day ON TRUE
+    LEFT JOIN journal_entries j ON j.user_id = a.user_id AND j.date = a.date
+    LEFT JOIN LATERAL (
+        SELECT AVG(jb.hrv_value) AS hrv_baseline_30d,
+               AVG(jb.resting_hr) FILTER (WHERE jb.date >= a.date - 7) AS rhr_baseline_7d
+        FROM journal_entries jb
+        WHERE jb.user_id = a.user_id AND jb.date BETWEEN a.date - 30 AND a.date
+    ) base ON TRUE
+    WHERE a.alignment_score IS NOT NULL AND {where}
+    ORDER BY a.user_id, a.date
+"""
+
+# Columns apply_autopsy() can produce; rebuild_athlete_models() writes them all,
+# keeping the stored value where a field never calibrated (NULL)
+MODEL_COLUMNS = (
+    'total_autopsies', 'avg_lifetime_alignment', 'recent_alignment_trend', 'last_autopsy_date',
+    'early_warning_active', 'early_warning_message',
+    'divergence_injury_threshold', 'threshold_n', 'typical_divergence_low', 'div_low_n',
+    'hrv_baseline_30d', 'rhr_baseline_7d', 'hrv_suppression_threshold',
+)
+ALWAYS_WRITTEN = ('total_autopsies', 'avg_lifetime_alignment', 'recent_alignment_trend',
+                  'early_warning_active', 'early_warning_message')
+
+
+class DivergenceSketch:
+    """
+    Streaming histogram of divergence values (Ben-Haim & Tom-Tov).
+
+    Keeps at most `capacity` (value, count) centroids sorted by value. Exact until
+    more distinct values than that arrive; after that the two closest centroids are
+    merged into their weighted mean, so memory and update cost stay bounded.
+    """
+
+    def __init__(self, capacity: int = SKETCH_CAPACITY, centroids: Iterable = ()):
+        self.capacity = capacity
+        self.centroids: List[List[float]] = sorted([float(v), float(c)] for v, c in centroids)
+
+    def add(self, value: float, count: float = 1.0) -> None:
+        value = float(value)
+        index = bisect.bisect_left(self.centroids, [value])
+        if index < len(self.centroids) and self.centroids[index][0] == value:
+            self.centroids[index][1] += count
+            return
+        self.centroids.insert(index, [value, float(count)])
+        if len(self.centroids) > self.capacity:
+            gaps = [self.centroids[i + 1][0] - self.centroids[i][0] for i in range(len(self.centroids) - 1)]
+            i = gaps.index(min(gaps))
+            (v1, c1), (v2, c2) = self.centroids[i], self.centroids[i + 1]
+            self.centroids[i:i + 2] = [[(v1 * c1 + v2 * c2) / (c1 + c2), c1 + c2]]
+
+    @property
+    def count(self) -> float:
+        return sum(c for _, c in self.centroids)
+
+    def below(self, limit: float) -> List[Tuple[float, float]]:
+        """(value, count) centroids under limit"""
+        return [(v, c) for v, c in self.centroids if v < limit]
+
+    def to_list(self) -> List[List[float]]:
+        return [[round(v, 6), c] for v, c in self.centroids]
+
+
+@dataclass
+class AthleteModelStats:
+    """What the model fields are computed from; stored as athlete_models.model_stats"""
+    recent_alignment: List[list] = field(default_factory=list)  # [date, score], oldest first
+    recent_reasons: List[list] = field(default_factory=list)    # [date, deviation_reason]
+    healthy: List[list] = field(default_factory=list)           # [date, divergence]
+    distress_recent: List[list] = field(default_factory=list)   # [date, divergence]
+    distress_sketch: DivergenceSketch = field(default_factory=DivergenceSketch)
+    autopsies: int = 0
+
+    @classmethod
+    def from_json(cls, value) -> Optional['AthleteModelStats']:
+        """From the stored column (JSONB dict or text); None when there is none"""
+        if not value:
+            return None
+        data = json.loads(value) if isinstance(value, str) else value
+        return cls(
+            recent_alignment=data.get('recent_alignment', []),
+            recent_reasons=data.get('recent_reasons', []),
+            healthy=data.get('healthy', []),
+            distress_recent=data.get('distress_recent', []),
+            distress_sketch=DivergenceSketch(centroids=data.get('distress_sketch', [])),
+            autopsies=data.get('autopsies', 0),
+        )
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'recent_alignment': self.recent_alignment,
+            'recent_reasons': self.recent_reasons,
+            'healthy': self.healthy,
+            'distress_recent': self.distress_recent,
+            'distress_sketch': self.distress_sketch.to_list(),
+            'autopsies': self.autopsies,
+        })
+
+
+def _replace_day(window: List[list], day: str, values: Iterable, capacity: int) -> List[list]:
+    """
+    Replace the entries for day in a date-ordered window, keeping the newest
+    `capacity` entries. Returns the entries that fell out (oldest first).
+    """
+    window[:] = [entry for entry in window if entry[0] != day]
+    index = bisect.bisect_right([entry[0] for entry in window], day)
+    window[index:index] = [[day, value] for value in values]
+    overflow = max(0, len(window) - capacity)
+    evicted, window[:overflow] = window[:overflow], []
+    return evicted
+
+
+def _day_key(value) -> str:
+    return value.isoformat() if isinstance(value, date) else str(value)[:10]
+
+
+def apply_autopsy(stats: AthleteModelStats, model: Dict, facts: Dict) -> Dict:
+    """
+    Fold one autopsy day into stats and return the athlete_models updates.
+
+    model: the current athlete_models values (before this autopsy).
+    facts: one AUTOPSY_FACTS_SQL row (date, alignment_score, deviation_reason,
+           divergences, healthy_divergences, pain_percentage, energy_level,
+           hrv_value, hrv_baseline_30d, rhr_baseline_7d).
+
+    Fields that have too little data to calibrate are left out of the result, so
+    the stored (or population default) value stands.
+    """
+    day = _day_key(facts['date'])
+    alignment_score = float(facts['alignment_score'])
+    reason = facts.get('deviation_reason')
+    stats.autopsies += 1
+
+    # Weighted moving average: 30% new, 70% historical
+    prev_total = model.get('total_autopsies', 0) or 0
+    prev_avg = model.get('avg_lifetime_alignment', 5.0) or 5.0
+    new_avg = (0.7 * prev_avg) + (0.3 * alignment_score)
+
+    _replace_day(stats.recent_alignment, day, [alignment_score], RECENT_AUTOPSIES)
+    _replace_day(stats.recent_reasons, day, [reason] if reason else [], RECENT_AUTOPSIES)
+
+    healthy = (alignment_score >= 7
+               and not facts.get('pain_percentage')
+               and (facts.get('energy_level') is None or facts['energy_level'] >= 3))
+    _replace_day(stats.healthy, day, (facts.get('healthy_divergences') or []) if healthy else [],
+                 HEALTHY_WINDOW)
+
+    physical = reason == 'physical'
+    if stats.distress_recent and day < stats.distress_recent[0][0] and len(stats.distress_recent) >= DISTRESS_RECENT:
+        # Older than the exact window: straight into the sketch
+        evicted = [[day, value] for value in (facts.get('divergences') or [])] if physical else []
+    else:
+        evicted = _replace_day(stats.distress_recent, day,
+                               (facts.get('divergences') or []) if physical else [], DISTRESS_RECENT)
+    for _, value in evicted:
+        stats.distress_sketch.add(value)
+
+    updates = {
+        'total_autopsies': prev_total + 1,
+        'avg_lifetime_alignment': round(new_avg, 3),
+        'recent_alignment_trend': _alignment_trend(stats),
+        'last_autopsy_date': day,
+    }
+    updates.update(_early_warning(stats))
+
+    # Breakdown threshold: median physical-distress divergence beyond the athlete's
+    # productive window edge, anchored to the div_low in force before this autopsy
+    current_div_low = model.get('typical_divergence_low') or DEFAULT_DIVERGENCE_LOW
+    median_div, n = _median_below(stats, current_div_low)
+    if n >= MIN_DISTRESS_EVENTS:
+        updates['divergence_injury_threshold'] = round(abs(median_div), 3)
+        updates['threshold_n'] = n
+
+    # Productive training window edge: P20 of the recent healthy days
+    if len(stats.healthy) >= MIN_HEALTHY_DAYS:
+        div_values = sorted(value for _, value in stats.healthy)
+        updates['typical_divergence_low'] = round(div_values[max(0, int(len(div_values) * 0.20) - 1)], 3)
+        updates['div_low_n'] = len(div_values)
+
+    updates.update(_wellness_updates(model, facts, alignment_score))
+    return updates
+
+
+def _alignment_trend(stats: AthleteModelStats) -> str:
+    # Endpoint comparison (most recent vs. oldest) of the last 5 scores — strict
+    # monotonicity nearly always produced 'stable'
+    scores = [score for _, score in stats.recent_alignment]
+    if len(scores) < 3:
+        return 'insufficient_data'
+    if scores[-1] > scores[0]:
+        return 'improving'
+    if scores[-1] < scores[0]:
+        return 'declining'
+    return 'stable'
+
+
+def _early_warning(stats: AthleteModelStats) -> Dict:
+    """Sustained physical distress: 2 of the last 5 classified autopsies"""
+    physical_count = sum(1 for _, reason in stats.recent_reasons if reason == 'physical')
+    if physical_count >= 2:
+        return {
+            'early_warning_active': True,
+            'early_warning_message': (
+                f"Physical distress signals on {physical_count} of your last "
+                f"{len(stats.recent_reasons)} workouts. Your coach is monitoring this pattern — "
+                f"consider reducing load until symptoms resolve."
+            ),
+        }
+    return {'early_warning_active': False, 'early_warning_message': None}
+
+
+def _median_below(stats: AthleteModelStats, limit: float) -> Tuple[Optional[float], int]:
+    """Upper median (sorted[n // 2]) of the distress divergences below limit, and n"""
+    points = sorted(stats.distress_sketch.below(limit)
+                    + [(value, 1.0) for _, value in stats.distress_recent if value < limit])
+    n = int(round(sum(c for _, c in points)))
+    if n == 0:
+        return None, 0
+    seen = 0.0
+    for value, count in points:
+        seen += count
+        if seen > n // 2:
+            return value, n
+    return points[-1][0], n
+
+
+def _wellness_updates(model: Dict, facts: Dict, alignment_score: float) -> Dict:
+    """Journal baselines, and the HRV suppression threshold nudged by the outcome"""
+    updates = {}
+    hrv_baseline = facts.get('hrv_baseline_30d')
+    if hrv_baseline:
+        updates['hrv_baseline_30d'] = round(float(hrv_baseline), 1)
+    if facts.get('rhr_baseline_7d'):
+        updates['rhr_baseline_7d'] = int(round(float(facts['rhr_baseline_7d'])))
+
+    # - Tighten (+0.02) when the athlete underperformed (alignment < 5) but HRV looked
+    #   normal — the threshold was too lenient, missing a real suppression signal.
+    # - Loosen (-0.01) when the athlete performed well (alignment >= 7) and HRV was
+    #   above the threshold — it may be too aggressive, causing false positives.
+    # Bounds: [0.75, 0.95]
+    hrv_today = facts.get('hrv_value')
+    if 'hrv_baseline_30d' in updates and hrv_today is not None:
+        current_threshold = float(model.get('hrv_suppression_threshold') or DEFAULT_HRV_SUPPRESSION_THRESHOLD)
+        hrv_ratio = float(hrv_today) / updates['hrv_baseline_30d']
+        if alignment_score < 5 and hrv_ratio >= current_threshold:
+            updates['hrv_suppression_threshold'] = min(round(current_threshold + 0.02, 2), 0.95)
+        elif alignment_score >= 7 and hrv_ratio >= current_threshold:
+            updates['hrv_suppression_threshold'] = max(round(current_threshold - 0.01, 2), 0.75)
+    return updates
+
+
+def fold_history(rows: Iterable[Dict], model: Optional[Dict] = None) -> Tuple[AthleteModelStats, Dict]:
+    """Replay one user's autopsy facts (date order) from an empty model"""
+    stats = AthleteModelStats()
+    model = dict(model or {})
+    for facts in rows:
+        model.update(apply_autopsy(stats, model, facts))
+    return stats, model
+
+
+def load_history(cursor, user_id: int) -> List[Dict]:
+    """Every autopsy fact row for one user, oldest first"""
+    cursor.execute(AUTOPSY_FACTS_SQL.format(where="a.user_id = %s"), (user_id,))
+    return cursor.fetchall()
+
+
+def rebuild_athlete_models(user_ids: Optional[List[int]] = None, batch_size: int = 500) -> Dict:
+    """
+    Recompute the athlete model of every user (or user_ids) from history.
+
+    One server-side cursor streams AUTOPSY_FACTS_SQL ordered by user and date; each
+    user's rows are replayed through apply_autopsy() and the results are written in
+    batches of batch_size users. Returns counts of users and autopsies processed.
+    """
+    from db_utils import get_db_connection, invalidate_athlete_model
+
+    where = "a.user_id = ANY(%(user_ids)s)" if user_ids is not None else "TRUE"
+    users = autopsies = 0
+    with get_db_connection() as conn:
+        pending = []
+        with conn.cursor(name='athlete_model_rebuild') as stream, conn.cursor() as writer:
+            stream.itersize = 5000
+            stream.execute(AUTOPSY_FACTS_SQL.format(where=where), {'user_ids': user_ids})
+            for user_id, rows in itertools.groupby(stream, key=lambda row: row['user_id']):
+                stats, model = fold_history(rows)
+                pending.append((user_id, stats, model))
+                users += 1
+                autopsies += stats.autopsies
+                if len(pending) >= batch_size:
+                    _write_models(writer, pending)
+                    pending = []
+            if pending:
+                _write_models(writer, pending)
+        conn.commit()
+
+    invalidate_athlete_model()
+    logger.info(f"Rebuilt athlete models for {users} users from {autopsies} autopsies")
+    return {'users': users, 'autopsies': autopsies}
+
+
+def _write_models(cursor, models: List[Tuple[int, AthleteModelStats, Dict]]) -> None:
+    columns = ('user_id',) + MODEL_COLUMNS + ('model_stats',)
+    assignments = ', '.join(
+        f"{col} = EXCLUDED.{col}" if col in ALWAYS_WRITTEN
+        else f"{col} = COALESCE(EXCLUDED.{col}, athlete_models.{col})"
+        for col in MODEL_COLUMNS
+    )
+    execute_values(
+        cursor,
+        f"""
+        INSERT INTO athlete_models ({', '.join(columns)}) VALUES %s
+        ON CONFLICT (user_id) DO UPDATE SET {assignments},
+            model_stats = EXCLUDED.model_stats, updated_at = NOW()
+        """,
+        [(user_id,) + tuple(model.get(col) for col in MODEL_COLUMNS) + (stats.to_json(),)
+         for user_id, stats, model in models],
+        page_size=len(models),
+    )
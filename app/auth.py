@@ -4,6 +4,7 @@ import logging
 from flask_login import LoginManager, UserMixin, login_user, logout_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from db_utils import execute_query, get_db_connection
+from user_profile_cache import get_user_profile
 
 login_manager = LoginManager()
 logger = logging.getLogger(__name__)
@@ -23,19 +24,11 @@ class User(UserMixin):
 
     @staticmethod
     def get(user_id):
-        user_data = execute_query(
-            "SELECT id, email, password_hash, resting_hr, max_hr, gender, is_admin, registration_date, email_modal_dismissals FROM user_settings WHERE id = %s",
-            (user_id,),
-            fetch=True
-        )
-
-        if not user_data:
+        # Served from the request/process profile cache - handlers reuse the same row
+        user_dict = get_user_profile(user_id)
+        if not user_dict:
             return None
 
-        # Convert PostgreSQL Row to dictionary for reliable access
-        user_row = user_data[0]
-        user_dict = dict(user_row) if hasattr(user_row, 'keys') else user_row
-
         return User(
             id=user_dict['id'],
             email=user_dict['email'],
@@ -17,6 +17,60 @@ DAILY_OUTPUT_TOKEN_LIMIT = 150000
 DAILY_MESSAGE_LIMIT = 100
 
 
+USAGE_QUERY = """
+    SELECT input_tokens, output_tokens, message_count
+    FROM chat_usage
+    WHERE user_id = %s AND date = %s
+"""
+
+RECORD_USAGE_SQL = """
+    INSERT INTO chat_usage (user_id, date, input_tokens, output_tokens, message_count)
+    VALUES (%s, %s, %s, %s, 1)
+    ON CONFLICT (user_id, date) DO UPDATE
+    SET input_tokens = chat_usage.input_tokens + %s,
+        output_tokens = chat_usage.output_tokens + %s,
+        message_count = chat_usage.message_count + 1,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def _usage_from_row(row) -> dict:
+    """Build the check_usage() result from today's chat_usage row (None = no usage yet)."""
+    if not row:
+        return {
+            'allowed': True,
+            'remaining_messages': DAILY_MESSAGE_LIMIT,
+            'input_tokens_used': 0,
+            'output_tokens_used': 0,
+            'message_count': 0,
+            'limit': DAILY_MESSAGE_LIMIT
+        }
+
+    input_tokens = row['input_tokens'] or 0
+    output_tokens = row['output_tokens'] or 0
+    message_count = row['message_count'] or 0
+
+    # Check all limits
+    message_limit_ok = message_count < DAILY_MESSAGE_LIMIT
+    input_limit_ok = input_tokens < DAILY_INPUT_TOKEN_LIMIT
+    output_limit_ok = output_tokens < DAILY_OUTPUT_TOKEN_LIMIT
+
+    return {
+        'allowed': message_limit_ok and input_limit_ok and output_limit_ok,
+        'remaining_messages': max(0, DAILY_MESSAGE_LIMIT - message_count),
+        'input_tokens_used': input_tokens,
+        'output_tokens_used': output_tokens,
+        'message_count': message_count,
+        'limit': DAILY_MESSAGE_LIMIT
+    }
+
+
+def _asyncpg_placeholders(query: str) -> str:
+    """Rewrite %s placeholders as asyncpg's $1, $2, ..."""
+    parts = query.split('%s')
+    return parts[0] + ''.join(f'${i}{part}' for i, part in enumerate(parts[1:], start=1))
+
+
 def check_usage(user_id: int) -> dict:
     """
     Check if user can send another message.
@@ -43,56 +97,16 @@ def check_usage(user_id: int) -> dict:
 
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT input_tokens, output_tokens, message_count
-                    FROM chat_usage
-                    WHERE user_id = %s AND date = %s
-                """, (user_id, today))
+                cur.execute(USAGE_QUERY, (user_id, today))
 
                 row = cur.fetchone()
 
-                if not row:
-                    # No usage yet today
-                    return {
-                        'allowed': True,
-                        'remaining_messages': DAILY_MESSAGE_LIMIT,
-                        'input_tokens_used': 0,
-                        'output_tokens_used': 0,
-                        'message_count': 0,
-                        'limit': DAILY_MESSAGE_LIMIT
-                    }
-
-                input_tokens = row['input_tokens'] or 0
-                output_tokens = row['output_tokens'] or 0
-                message_count = row['message_count'] or 0
-
-                # Check all limits
-                message_limit_ok = message_count < DAILY_MESSAGE_LIMIT
-                input_limit_ok = input_tokens < DAILY_INPUT_TOKEN_LIMIT
-                output_limit_ok = output_tokens < DAILY_OUTPUT_TOKEN_LIMIT
-
-                allowed = message_limit_ok and input_limit_ok and output_limit_ok
-
-                return {
-                    'allowed': allowed,
-                    'remaining_messages': max(0, DAILY_MESSAGE_LIMIT - message_count),
-                    'input_tokens_used': input_tokens,
-                    'output_tokens_used': output_tokens,
-                    'message_count': message_count,
-                    'limit': DAILY_MESSAGE_LIMIT
-                }
+        return _usage_from_row(row)
 
     except Exception as e:
         logger.error(f"Error checking usage for user {user_id}: {e}")
         # On error, allow the request (fail open)
-        return {
-            'allowed': True,
-            'remaining_messages': DAILY_MESSAGE_LIMIT,
-            'input_tokens_used': 0,
-            'output_tokens_used': 0,
-            'message_count': 0,
-            'limit': DAILY_MESSAGE_LIMIT
-        }
+        return _usage_from_row(None)
 
 
 def record_usage(user_id: int, input_tokens: int, output_tokens: int) -> None:
@@ -111,15 +125,7 @@ def record_usage(user_id: int, input_tokens: int, output_tokens: int) -> None:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
                 # UPSERT: Insert or update on conflict
-                cur.execute("""
-                    INSERT INTO chat_usage (user_id, date, input_tokens, output_tokens, message_count)
-                    VALUES (%s, %s, %s, %s, 1)
-                    ON CONFLICT (user_id, date) DO UPDATE
-                    SET input_tokens = chat_usage.input_tokens + %s,
-                        output_tokens = chat_usage.output_tokens + %s,
-                        message_count = chat_usage.message_count + 1,
-                        updated_at = CURRENT_TIMESTAMP
-                """, (user_id, today, input_tokens, output_tokens, input_tokens, output_tokens))
+                cur.execute(RECORD_USAGE_SQL, (user_id, today, input_tokens, output_tokens, input_tokens, output_tokens))
 
                 conn.commit()
                 logger.info(f"Recorded usage for user {user_id}: +{input_tokens} input, +{output_tokens} output tokens")
@@ -129,6 +135,40 @@ def record_usage(user_id: int, input_tokens: int, output_tokens: int) -> None:
         # Don't raise - usage tracking failures shouldn't break the chat
 
 
+async def check_usage_async(user_id: int, today: str) -> dict:
+    """
+    check_usage() for the asyncio chat gateway: same result, but the query runs on the
+    asyncpg pool so a waiting request costs a coroutine, not a thread.
+
+    `today` is the user's local date as 'YYYY-MM-DD' (chat_usage.date is TEXT), resolved
+    by the caller while authenticating so no blocking timezone lookup runs on the loop.
+    """
+    import async_db_utils
+
+    try:
+        row = await async_db_utils.fetchrow(_asyncpg_placeholders(USAGE_QUERY), user_id, today)
+        return _usage_from_row(row)
+    except Exception as e:
+        logger.error(f"Error checking usage for user {user_id}: {e}")
+        # On error, allow the request (fail open)
+        return _usage_from_row(None)
+
+
+async def record_usage_async(user_id: int, today: str, input_tokens: int, output_tokens: int) -> None:
+    """record_usage() for the asyncio chat gateway (see check_usage_async)."""
+    import async_db_utils
+
+    try:
+        await async_db_utils.execute(
+            _asyncpg_placeholders(RECORD_USAGE_SQL),
+            user_id, today, input_tokens, output_tokens, input_tokens, output_tokens
+        )
+        logger.info(f"Recorded usage for user {user_id}: +{input_tokens} input, +{output_tokens} output tokens")
+    except Exception as e:
+        logger.error(f"Error recording usage for user {user_id}: {e}")
+        # Don't raise - usage tracking failures shouldn't break the chat
+
+
 def get_daily_stats(user_id: int) -> dict:
     """
     Get usage statistics for display to user.
@@ -20,6 +20,36 @@ chat_blueprint = Blueprint('chat', __name__)
 ALLOWED_UNIVERSES = {'autopsy', 'training_plan', 'todays_workout', 'progress', 'general'}
 
 
+def validate_chat_request(payload) -> str:
+    """
+    Validate a /api/chat request body.
+
+    Returns:
+        An error message for a 400 response, or None if the payload is valid.
+        Shared with the asyncio gateway (streaming_gateway.py).
+    """
+    if not payload or not isinstance(payload, dict):
+        return 'Request must be JSON'
+
+    universe = payload.get('universe')
+    message = payload.get('message')
+    conversation = payload.get('conversation', [])
+
+    # Validate universe
+    if not universe or universe not in ALLOWED_UNIVERSES:
+        return f'Invalid universe. Must be one of: {", ".join(ALLOWED_UNIVERSES)}'
+
+    # Validate message
+    if not message or not isinstance(message, str) or not message.strip():
+        return 'Message must be a non-empty string'
+
+    # Validate conversation format
+    if not isinstance(conversation, list):
+        return 'Conversation must be a list'
+
+    return None
+
+
 @chat_blueprint.route('', methods=['POST'])
 @login_required
 def chat():
@@ -40,25 +70,14 @@ def chat():
         Server-Sent Events stream with content-type: text/event-stream
     """
     # Validate request
-    if not request.json:
-        return jsonify({'error': 'Request must be JSON'}), 400
+    error = validate_chat_request(request.json)
+    if error:
+        return jsonify({'error': error}), 400
 
     universe = request.json.get('universe')
     message = request.json.get('message')
     conversation = request.json.get('conversation', [])
 
-    # Validate universe
-    if not universe or universe not in ALLOWED_UNIVERSES:
-        return jsonify({'error': f'Invalid universe. Must be one of: {", ".join(ALLOWED_UNIVERSES)}'}), 400
-
-    # Validate message
-    if not message or not isinstance(message, str) or not message.strip():
-        return jsonify({'error': 'Message must be a non-empty string'}), 400
-
-    # Validate conversation format
-    if not isinstance(conversation, list):
-        return jsonify({'error': 'Conversation must be a list'}), 400
-
     # Get user ID
     user_id = current_user.id
 
@@ -5,15 +5,18 @@ Uses ContextManager for efficient context loading and handles
 rate limiting, API calls, and SSE formatting.
 """
 
-import anthropic
+import asyncio
 import json
 import logging
 import os
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 from .context_manager import ContextManager
 from .prompts import build_system_prompt
-from .rate_limiter import check_usage, record_usage
+from .rate_limiter import check_usage, record_usage, check_usage_async, record_usage_async
+
+# anthropic is imported where it is used: it is the single most expensive import in
+# the app (~1.5s), and strava_app imports this module at startup.
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +26,6 @@ MAX_RESPONSE_TOKENS = 500
 TEMPERATURE = 0.7
 MAX_CONVERSATION_MESSAGES = 10
 
-
 def get_api_key():
     """Get the Anthropic API key from environment variable or config file."""
     api_key = os.environ.get('ANTHROPIC_API_KEY')
@@ -75,21 +77,14 @@ def stream_chat_response(
         })
         return
 
-    # 2. Load context using ContextManager (with caching)
+    # 2-4. Load context (cached), build system prompt and messages
     try:
-        manager = ContextManager(user_id)
-        base_context, universe_context = manager.get_context(universe)
+        system_prompt, messages = prepare_request(user_id, universe, message, conversation_history)
     except Exception as e:
         logger.error(f"Context loading failed for user {user_id}: {e}")
         yield _sse_event('error', {'message': 'Failed to load context. Please try again.'})
         return
 
-    # 3. Build system prompt
-    system_prompt = build_system_prompt(base_context, universe_context, universe)
-
-    # 4. Build messages (trim history, add new message)
-    messages = build_messages(conversation_history, message)
-
     # 5. Stream from Claude API
     total_input = 0
     total_output = 0
@@ -121,6 +116,81 @@ def stream_chat_response(
     })
 
 
+async def stream_chat_response_async(
+    user_id: int,
+    universe: str,
+    message: str,
+    conversation_history: list,
+    today: str
+) -> AsyncGenerator[str, None]:
+    """
+    stream_chat_response() for the asyncio gateway (chat/streaming_gateway.py).
+
+    Same SSE events, but usage checks go through asyncpg and tokens come from
+    AsyncAnthropic, so an open stream is a suspended coroutine rather than a
+    gunicorn thread. Context loading is the cached ContextManager path; a cache
+    miss runs in a worker thread for the duration of the load only.
+
+    Args:
+        today: The user's local date ('YYYY-MM-DD') for usage accounting
+    """
+    usage_check = await check_usage_async(user_id, today)
+    if not usage_check['allowed']:
+        yield _sse_event('error', {
+            'message': 'Daily limit reached. Resets at midnight.',
+            'usage': usage_check
+        })
+        return
+
+    try:
+        system_prompt, messages = await asyncio.to_thread(
+            prepare_request, user_id, universe, message, conversation_history
+        )
+    except Exception as e:
+        logger.error(f"Context loading failed for user {user_id}: {e}")
+        yield _sse_event('error', {'message': 'Failed to load context. Please try again.'})
+        return
+
+    total_input = 0
+    total_output = 0
+
+    try:
+        async for event_type, data in call_claude_streaming_async(system_prompt, messages):
+            if event_type == 'token':
+                yield _sse_event('token', {'content': data})
+            elif event_type == 'done':
+                total_input = data['input_tokens']
+                total_output = data['output_tokens']
+            elif event_type == 'error':
+                yield _sse_event('error', {'message': data})
+                return
+    except Exception as e:
+        logger.error(f"Claude API error for user {user_id}: {e}")
+        yield _sse_event('error', {'message': 'AI service temporarily unavailable.'})
+        return
+
+    await record_usage_async(user_id, today, total_input, total_output)
+
+    yield _sse_event('done', {
+        'usage': {
+            'input_tokens': total_input,
+            'output_tokens': total_output,
+        }
+    })
+
+
+def prepare_request(user_id: int, universe: str, message: str, conversation_history: list) -> tuple:
+    """
+    Load context via ContextManager (cached base context) and build the
+    (system_prompt, messages) pair for the API call.
+    """
+    manager = ContextManager(user_id)
+    base_context, universe_context = manager.get_context(universe)
+    system_prompt = build_system_prompt(base_context, universe_context, universe)
+    messages = build_messages(conversation_history, message)
+    return system_prompt, messages
+
+
 def call_claude_streaming(system_prompt: str, messages: list) -> Generator:
     """
     Call Claude API with streaming.
@@ -128,11 +198,13 @@ def call_claude_streaming(system_prompt: str, messages: list) -> Generator:
     Yields:
         Tuples of (event_type, data)
     """
-    api_key = get_api_key()
-    client = anthropic.Anthropic(api_key=api_key)
+    import anthropic
+    from http_clients import get_anthropic_client, track_call
+
+    client = get_anthropic_client(get_api_key())
 
     try:
-        with client.messages.stream(
+        with track_call('anthropic'), client.messages.stream(
             model=CHAT_MODEL,
             max_tokens=MAX_RESPONSE_TOKENS,
             temperature=TEMPERATURE,
@@ -155,6 +227,48 @@ def call_claude_streaming(system_prompt: str, messages: list) -> Generator:
         yield ('error', 'Unexpected error occurred.')
 
 
+def get_async_client():
+    """Return the process-wide AsyncAnthropic client (shared keep-alive pool, see http_clients)."""
+    from http_clients import get_async_anthropic_client
+    return get_async_anthropic_client(get_api_key())
+
+
+async def call_claude_streaming_async(system_prompt: str, messages: list) -> AsyncGenerator:
+    """
+    Async counterpart of call_claude_streaming().
+
+    Yields:
+        Tuples of (event_type, data)
+    """
+    import anthropic
+    from http_clients import track_call_async
+
+    client = get_async_client()
+
+    try:
+        async with track_call_async('anthropic'), client.messages.stream(
+            model=CHAT_MODEL,
+            max_tokens=MAX_RESPONSE_TOKENS,
+            temperature=TEMPERATURE,
+            system=system_prompt,
+            messages=messages,
+        ) as stream:
+            async for text in stream.text_stream:
+                yield ('token', text)
+
+            response = await stream.get_final_message()
+            yield ('done', {
+                'input_tokens': response.usage.input_tokens,
+                'output_tokens': response.usage.output_tokens,
+            })
+    except anthropic.APIError as e:
+        logger.error(f"Anthropic API error: {e}")
+        yield ('error', 'AI service error. Please try again.')
+    except Exception as e:
+        logger.error(f"Unexpected error in Claude streaming: {e}")
+        yield ('error', 'Unexpected error occurred.')
+
+
 def build_messages(conversation_history: list, new_message: str) -> list:
     """
     Build messages list for API call.
@@ -0,0 +1,217 @@
+"""
+Asyncio streaming gateway for POST /api/chat.
+
+The Flask route holds a gunicorn thread for the whole length of a Claude stream,
+so a handful of open chats starve dashboard and journal requests. This ASGI app
+sits in front of the Flask app (see asgi.py): POST /api/chat is served here as a
+coroutine, everything else is passed to the wrapped WSGI app unchanged.
+
+Authentication and the app's before_request gates still run through Flask - the
+request is replayed in a Flask request context in a worker thread just long enough
+to load current_user and validate the body - so the async path cannot drift from
+the sync one. The outcome is finalized like any dispatched response: after_request
+handlers run and the session and remember cookies are saved, and the stream is sent
+with the resulting headers. Only the stream itself (usage check, LLM tokens, usage
+record) runs on the event loop.
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+
+from flask import request, jsonify
+from flask_login import current_user
+
+from timezone_utils import get_user_current_date
+from .routes import validate_chat_request
+from . import service
+
+logger = logging.getLogger(__name__)
+
+CHAT_PATH = '/api/chat'
+
+SSE_HEADERS = {
+    'Content-Type': 'text/event-stream; charset=utf-8',
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',  # Disable nginx buffering
+}
+
+
+@dataclass
+class ChatRequest:
+    """An authenticated, validated chat request ready to stream"""
+    user_id: int
+    universe: str
+    message: str
+    conversation: list
+    today: str
+    headers: list = field(default_factory=list)  # ASGI headers for the stream's response
+
+
+class ChatStreamingGateway:
+    """
+    ASGI app serving POST /api/chat as an async SSE stream.
+
+    Usage:
+        app = ChatStreamingGateway(flask_app, WSGIMiddleware(flask_app))
+    """
+
+    def __init__(self, flask_app, fallback, path: str = CHAT_PATH):
+        """
+        Args:
+            flask_app: The Flask app (for sessions, login and before_request gates)
+            fallback: ASGI app for every other request (normally the wrapped Flask app)
+            path: Path served by the gateway
+        """
+        self.flask_app = flask_app
+        self.fallback = fallback
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+
+        if scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'].rstrip('/') == self.path:
+            await self._handle_chat(scope, receive, send)
+            return
+
+        await self.fallback(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                import async_db_utils
+                await async_db_utils.close_pool()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _handle_chat(self, scope, receive, send):
+        body = await self._read_body(receive)
+        if body is None:
+            return  # Client went away before sending the request
+
+        outcome = await asyncio.to_thread(self._authorize, scope, body)
+        if not isinstance(outcome, ChatRequest):
+            await self._send_flask_response(send, outcome)
+            return
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': outcome.headers})
+
+        stream_task = asyncio.ensure_future(self._stream(send, outcome))
+        disconnect_task = asyncio.ensure_future(self._wait_for_disconnect(receive))
+        await asyncio.wait({stream_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+
+        for task in (stream_task, disconnect_task):
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        if disconnect_task.done() and not disconnect_task.cancelled():
+            logger.info(f"Chat stream for user {outcome.user_id} cancelled: client disconnected")
+
+    def _authorize(self, scope, body: bytes):
+        """
+        Replay the request through Flask's request cycle, stopping short of the view.
+
+        Runs in a worker thread, and mirrors Flask.full_dispatch_request: the
+        before_request gates, login and body validation take the place of the view,
+        and whatever they produce is finalized (after_request handlers, session and
+        remember cookie saved). Returns a ChatRequest carrying the headers of an
+        empty SSE response finalized that way, or a Flask response to send back
+        as-is (401, email gate 403, validation 400, ...).
+        """
+        headers = [(k.decode('latin-1'), v.decode('latin-1')) for k, v in scope.get('headers', [])]
+        client = scope.get('client') or ('', 0)
+
+        with self.flask_app.test_request_context(
+            path=scope['path'],
+            method='POST',
+            headers=headers,
+            data=body,
+            query_string=scope.get('query_string', b''),
+            environ_base={'REMOTE_ADDR': client[0], 'wsgi.url_scheme': scope.get('scheme', 'http')},
+        ):
+            try:
+                rv = self.flask_app.preprocess_request()
+                if rv is None:
+                    rv = self._validate()
+            except Exception as e:
+                rv = self.flask_app.handle_user_exception(e)
+
+            if not isinstance(rv, ChatRequest):
+                return self.flask_app.finalize_request(rv)
+
+            response = self.flask_app.finalize_request(self.flask_app.response_class(headers=SSE_HEADERS))
+            rv.headers = [(k, v) for k, v in self._asgi_headers(response) if k != b'content-length']
+            return rv
+
+    def _validate(self):
+        """The ChatRequest for the current request context, or the response refusing it"""
+        if not current_user.is_authenticated:
+            return self.flask_app.login_manager.unauthorized()
+
+        payload = request.get_json(silent=True)
+        error = validate_chat_request(payload)
+        if error:
+            return jsonify({'error': error}), 400
+
+        return ChatRequest(
+            user_id=current_user.id,
+            universe=payload['universe'],
+            message=payload['message'],
+            conversation=payload.get('conversation', []),
+            today=str(get_user_current_date(current_user.id)),
+        )
+
+    async def _stream(self, send, chat_request: ChatRequest):
+        try:
+            async for chunk in service.stream_chat_response_async(
+                chat_request.user_id,
+                chat_request.universe,
+                chat_request.message,
+                chat_request.conversation,
+                chat_request.today,
+            ):
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+        except Exception as e:
+            logger.error(f"Error in chat stream: {e}")
+            error_event = f"data: {json.dumps({'type': 'error', 'message': 'Stream error occurred'})}\n\n"
+            await send({'type': 'http.response.body', 'body': error_event.encode('utf-8'), 'more_body': True})
+
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    @staticmethod
+    async def _wait_for_disconnect(receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+    @staticmethod
+    def _asgi_headers(response):
+        return [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in response.headers.items()]
+
+    @classmethod
+    async def _send_flask_response(cls, send, response):
+        headers = cls._asgi_headers(response)
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': response.get_data(), 'more_body': False})
@@ -25,24 +25,14 @@ from concurrent.futures import ThreadPoolExecutor
 from timezone_utils import get_app_current_date, get_current_week_start
 from unified_metrics_service import UnifiedMetricsService
 from db_utils import execute_query, upsert_week_strategic_summary
-from readiness_engine import get_weekly_ans_summary
 from llm_recommendations_module import (
     call_anthropic_api,
     call_claude,
-    load_training_guide,
-    _select_guide_sections,
-    get_athlete_model_context,
     get_user_coaching_spectrum,
     get_coaching_tone_instructions,
     get_user_autopsy_weights,
-    get_user_recommendation_style,
-    get_adjusted_thresholds,
-    apply_athlete_model_to_thresholds,
-    analyze_pattern_flags,
-    get_recent_autopsy_insights,
     MODEL_HAIKU,
 )
-from acwr_configuration_service import ACWRConfigurationService
 from prompt_constants import NORMALIZED_DIVERGENCE_FORMULA, format_divergence_for_prompt
 
 # Setup logging
@@ -141,21 +131,28 @@ def get_race_history(user_id: int, limit: int = 10) -> List[Dict]:
     return history
 
 
-def get_training_schedule(user_id: int) -> Optional[Dict]:
-    """Fetch user's training schedule from user_settings and cross-training disciplines."""
-    query = """
-        SELECT training_schedule_json, include_strength_training, strength_hours_per_week,
-               include_mobility, mobility_hours_per_week, include_cross_training,
-               cross_training_type, cross_training_hours_per_week
-        FROM user_settings
-        WHERE id = %s
+def get_training_schedule(user_id: int, settings: Optional[Dict] = None) -> Optional[Dict]:
+    """Fetch user's training schedule from user_settings and cross-training disciplines.
+
+    settings: Optional pre-fetched user_settings row (e.g. from get_user_profile). If None,
+    the schedule columns are fetched from DB.
     """
-    results = execute_query(query, (user_id,), fetch=True)
+    if settings is None:
+        query = """
+            SELECT training_schedule_json, include_strength_training, strength_hours_per_week,
+                   include_mobility, mobility_hours_per_week, include_cross_training,
+                   cross_training_type, cross_training_hours_per_week
+            FROM user_settings
+            WHERE id = %s
+        """
+        results = execute_query(query, (user_id,), fetch=True)
 
-    if not results or not results[0]:
-        return None
+        if not results or not results[0]:
+            return None
 
-    row = results[0]
+        row = results[0]
+    else:
+        row = settings
     schedule_json = row['training_schedule_json']
 
     # Parse JSON if it's a string
@@ -274,15 +271,18 @@ def calculate_performance_trend(race_history: List[Dict]) -> Dict:
     }
 
 
-def get_current_training_stage(user_id: int) -> Dict:
+def get_current_training_stage(user_id: int, race_goals: Optional[List[Dict]] = None) -> Dict:
     """
     Calculate current training stage based on race goals.
     This calls the existing training stage endpoint logic.
+
+    race_goals: Optional pre-fetched get_race_goals() result. If None, fetches from DB.
     """
     # Import here to avoid circular dependency
     from strava_app import _calculate_training_stage
     
-    race_goals = get_race_goals(user_id)
+    if race_goals is None:
+        race_goals = get_race_goals(user_id)
     
     if not race_goals:
         # Shape parity with the has-race path: same keys, same casing.
@@ -363,15 +363,17 @@ def format_race_goals_for_prompt(race_goals: List[Dict]) -> str:
     return "\n".join(lines)
 
 
-def get_upcoming_race_goals(user_id: int, as_of=None) -> List[Dict]:
+def get_upcoming_race_goals(user_id: int, as_of=None, race_goals: Optional[List[Dict]] = None) -> List[Dict]:
     """Race goals on or after `as_of` (default: app current date), date-ascending.
 
     Single source of truth for "which races are still ahead". Every prompt builder
     that needs the athlete's race calendar should derive from this rather than
     re-implementing the date filter (which previously drifted across call sites).
+    Pass race_goals when the caller already holds the get_race_goals() result.
     """
     today = str(as_of) if as_of is not None else str(get_app_current_date())
-    return [g for g in get_race_goals(user_id) if g.get('race_date', '') >= today]
+    goals = race_goals if race_goals is not None else get_race_goals(user_id)
+    return [g for g in goals if g.get('race_date', '') >= today]
 
 
 def build_upcoming_races_block(user_id: int) -> str:
@@ -829,163 +831,48 @@ def build_weekly_program_prompt(
     """
     logger.info(f"Building weekly program prompt for user {user_id}, week starting {target_week_start}")
 
-    # Fetch all context data
-    current_metrics = UnifiedMetricsService.get_latest_complete_metrics(user_id)
-    activities = UnifiedMetricsService.get_recent_activities_for_analysis(days=28, user_id=user_id)
+    # Fetch all context data: shared reads coalesced, independent blocks run concurrently
+    from weekly_program_context import WeeklyProgramContext
+    context = WeeklyProgramContext(user_id, target_week_start).assemble()
 
-    # Compute long run ceiling from last 30 days of running activities
-    activities_30d = execute_query(
-        """
-        SELECT distance_miles FROM activities
-        WHERE user_id = %s
-          AND date >= CURRENT_DATE - INTERVAL '30 days'
-          AND (sport_type = 'running' OR sport_type IS NULL)
-          AND distance_miles IS NOT NULL AND distance_miles > 0
-        ORDER BY distance_miles DESC
-        LIMIT 1
-        """,
-        (user_id,),
-        fetch=True
-    )
-    max_30d_long_run = float(activities_30d[0]['distance_miles']) if activities_30d else None
-    long_run_ceiling = round(max_30d_long_run * 1.1, 1) if max_30d_long_run else None
-    race_goals = get_race_goals(user_id)
+    current_metrics = context['current_metrics']
+    max_30d_long_run = context['long_run']['max_30d_long_run']
+    long_run_ceiling = context['long_run']['long_run_ceiling']
+    race_goals = context['race_goals']
     # Upcoming-only for the prompt's RACE GOALS display (canonical filter, shared with the
     # daily builders). race_goals (all) is still used below for race-week detection.
-    upcoming_race_goals = get_upcoming_race_goals(user_id)
-    race_history = get_race_history(user_id)
+    upcoming_race_goals = context['upcoming_race_goals']
+    race_history = context['race_history']
     perf_trend = calculate_performance_trend(race_history)
-    training_schedule = get_training_schedule(user_id)
-    training_stage = get_current_training_stage(user_id)
-    journal_obs = get_recent_journal_observations(user_id)
-
-    # Fetch athlete-declared scheduling exceptions for this week
-    try:
-        from db_utils import get_current_week_context
-        _week_ctx = get_current_week_context(user_id)
-        schedule_constraints = (_week_ctx.get('schedule_constraints') or []) if _week_ctx else []
-    except Exception:
-        schedule_constraints = []
-
-    # Get personalization data (from Dashboard LLM system)
-    risk_tolerance = get_user_recommendation_style(user_id)
-    thresholds = get_adjusted_thresholds(risk_tolerance)
-    thresholds = apply_athlete_model_to_thresholds(thresholds, user_id)
-    autopsy_insights = get_recent_autopsy_insights(user_id, days=28)
-    pattern_flags = analyze_pattern_flags(activities, current_metrics, user_id, thresholds)
-
-    # Filter training guide to state-relevant sections
-    assessment_category = _derive_assessment_category(pattern_flags, current_metrics, thresholds)
-    training_guide = _select_guide_sections(load_training_guide(), assessment_category)
-    logger.info(f"Training guide filtered for category: {assessment_category}")
-
-    # Get coaching tone
-    spectrum_value = get_user_coaching_spectrum(user_id)
-    tone_instructions = get_coaching_tone_instructions(spectrum_value)
-
-    # Get athlete model context block (personalized divergence window, alignment history)
-    athlete_model_context = get_athlete_model_context(user_id)
-
-    # Get user's ACWR configuration for accurate load window labels
-    try:
-        acwr_config = ACWRConfigurationService().get_user_configuration(user_id)
-        chronic_days = acwr_config['chronic_period_days'] if acwr_config else 28
-        decay_rate = acwr_config['decay_rate'] if acwr_config else None
-    except Exception:
-        chronic_days = 28
-        decay_rate = None
-
-    # Get athlete profile fields not covered by other fetches
-    athlete_profile_data = execute_query(
-        "SELECT training_experience, age FROM user_settings WHERE id = %s",
-        (user_id,),
-        fetch=True
-    )
-
-    # Get prior week: strategic_summary + synthesis + athlete reflection in one query
-    prior_week_rows = execute_query(
-        """
-        SELECT strategic_summary, weekly_synthesis, deviation_log, week_start_date,
-               week_reflection
-        FROM weekly_programs
-        WHERE user_id = %s
-          AND week_start_date < %s
-          AND strategic_summary IS NOT NULL
-        ORDER BY week_start_date DESC
-        LIMIT 1
-        """,
-        (user_id, str(target_week_start)),
-        fetch=True
-    )
-    prior_week = prior_week_rows[0] if prior_week_rows else None
-
-    # Get last 3 weeks of strategic summaries for training arc context
-    prior_weeks = get_prior_week_summaries(user_id, target_week_start, n=3)
-
-    # Fetch latest AeT assessment for prompt injection. The athlete picks one of two
-    # interchangeable methods (HR drift OR LT1 lactate step); fetch the chosen one.
-    latest_aet = None
-    latest_lactate = None
-    aet_method = 'hr_drift'
-    try:
-        from db_utils import get_latest_aerobic_assessment, get_latest_lactate_step_test
-        method_row = execute_query(
-            "SELECT aet_assessment_method FROM user_settings WHERE id = %s",
-            (user_id,), fetch=True
-        )
-        if method_row and method_row[0].get('aet_assessment_method'):
-            aet_method = method_row[0]['aet_assessment_method']
-        if aet_method == 'lactate_step':
-            latest_lactate = get_latest_lactate_step_test(user_id)
-        else:
-            latest_aet = get_latest_aerobic_assessment(user_id)
-    except Exception as _aet_err:
-        logger.debug(f"Aerobic assessment fetch skipped: {_aet_err}")
-
-    athlete_experience = athlete_profile_data[0]['training_experience'].capitalize() if (athlete_profile_data and athlete_profile_data[0].get('training_experience')) else "Intermediate"
-    athlete_age = athlete_profile_data[0]['age'] if (athlete_profile_data and athlete_profile_data[0].get('age')) else None
-
-    # Compute polarized training compliance for prior week
-    polarized_ratio = None
-    polarized_block = ""
-    try:
-        from llm_recommendations_module import compute_weekly_polarized_ratio, get_user_hr_thresholds
-        polarized_ratio = compute_weekly_polarized_ratio(
-            user_id=user_id,
-            training_stage=training_stage,
-            athlete_age=athlete_age,
-            week_start_date=target_week_start - timedelta(days=7)
-        )
-        hr_thresholds = get_user_hr_thresholds(user_id)
-        if polarized_ratio:
-            pr = polarized_ratio
-            bh_str = f"Black hole days: {', '.join(pr['moderate_dates'])}" if pr['moderate_dates'] else "No black hole sessions."
-            vt_str = f"VT1 = {hr_thresholds['vt1_bpm']} bpm | VT2 = {hr_thresholds['vt2_bpm']} bpm" if hr_thresholds else ""
-            polarized_block = f"""
-**POLARIZED TRAINING COMPLIANCE — PRIOR WEEK (SEILER MODEL):**
-Sessions: {pr['easy_sessions']} Easy | {pr['hard_sessions']} Hard | {pr['moderate_sessions']} Moderate (black hole)
-{bh_str}
-Easy%: {pr['easy_pct']:.0f}% | Target: {pr['target_easy_pct']:.0f}% | Status: {pr['compliance'].replace('_', ' ').title()}
-{vt_str}
-"""
-    except Exception as _pre:
-        logger.debug(f"Polarized ratio computation skipped: {_pre}")
-
-    # Interval protocol + stride placement rules — phase-aware, injected so the LLM prescribes correct structures
-    interval_protocol_block = ""
-    try:
-        from workout_library import get_phase_interval_rules
-        _stage = training_stage.get('stage', 'base')
-        _weeks_to_race = training_stage.get('weeks_until_race')
-        _phase_rules = get_phase_interval_rules(
-            stage=_stage,
-            weeks_to_race=_weeks_to_race,
-            target_date=target_week_start,
-        )
-        interval_protocol_block = "\n" + _phase_rules['prompt_block'] + "\n"
-        logger.info(f"Weekly plan interval rules: {_phase_rules['log_summary']}")
-    except Exception as _ipe:
-        logger.debug(f"Interval protocol injection skipped: {_ipe}")
+    training_schedule = context['training_schedule']
+    training_stage = context['training_stage']
+    journal_obs = context['journal_obs']
+    schedule_constraints = context['schedule_constraints']
+
+    # Personalization data (from Dashboard LLM system)
+    risk_tolerance = context['risk_tolerance']
+    thresholds = context['thresholds']
+    autopsy_insights = context['autopsy_insights']
+    pattern_flags = context['pattern_flags']
+    assessment_category = context['training_guide']['assessment_category']
+    training_guide = context['training_guide']['training_guide']
+    tone_instructions = context['tone_instructions']
+    athlete_model_context = context['athlete_model_context']
+    chronic_days = context['acwr_window']['chronic_days']
+    decay_rate = context['acwr_window']['decay_rate']
+
+    # Prior week (newest row) and last 3 weeks of strategic summaries for the training arc
+    prior_weeks = context['recent_weeks']
+    prior_week = prior_weeks[0] if prior_weeks else None
+
+    athlete_experience = context['athlete']['experience']
+    athlete_age = context['athlete']['age']
+    aet_method = context['athlete']['aet_method']
+    latest_aet = context['aerobic_assessment']['latest_aet']
+    latest_lactate = context['aerobic_assessment']['latest_lactate']
+    polarized_ratio = context['polarized']['ratio']
+    polarized_block = context['polarized']['block']
+    interval_protocol_block = context['interval_protocol']
 
     # Build prompt sections
     week_end = target_week_start + timedelta(days=6)
@@ -1048,7 +935,7 @@ Easy%: {pr['easy_pct']:.0f}% | Target: {pr['target_easy_pct']:.0f}% | Status: {p
     div_overtraining = thresholds.get('divergence_overtraining', -0.15)
 
     # Divergence trajectory from recent activity data
-    div_trend = _divergence_trend_label(activities or [], days=7)
+    div_trend = context['div_trend']
 
     # Format prior week structured targets
     if prior_week:
@@ -1102,33 +989,8 @@ Easy%: {pr['easy_pct']:.0f}% | Target: {pr['target_easy_pct']:.0f}% | Status: {p
 
     decay_str = f" | Decay rate: {decay_rate:.3f}" if decay_rate is not None else ""
 
-    # ANS readiness summary for the prior 7 days
-    ans_summary = get_weekly_ans_summary(user_id)
-    ans_prompt_block = _build_ans_prompt_block(ans_summary)
-
-    # Alignment-failure calibration context — feed answered pattern queries into the plan
-    from db_utils import get_answered_alignment_queries
-    alignment_calibration_block = ""
-    try:
-        answered = get_answered_alignment_queries(user_id, days=30)
-        pattern_answers = [q for q in answered if q.get('response')]
-        if pattern_answers:
-            reason_lines = []
-            for q in pattern_answers[-5:]:
-                reason_lines.append(f"  - {q['activity_date']}: \"{q['response']}\"")
-            alignment_calibration_block = (
-                "\n**PLAN CALIBRATION REQUIRED**\n\n"
-                "The previous weekly plan had low alignment — the athlete reported the following "
-                "reasons for missing sessions:\n"
-                + "\n".join(reason_lines)
-                + "\n\nAdjust the new plan to directly address these failure modes. "
-                "If the athlete reports fatigue/physical reasons, reduce load or add recovery. "
-                "If schedule/external constraints, work within them. "
-                "If the sessions felt wrong (too hard, wrong terrain, wrong type), recalibrate "
-                "the prescription to match the athlete's demonstrated capacity and environment.\n"
-            )
-    except Exception as _ace:
-        logger.debug(f"Alignment calibration context skipped: {_ace}")
+    ans_prompt_block = _build_ans_prompt_block(context['ans_summary'])
+    alignment_calibration_block = context['alignment_calibration']
 
     prompt = f"""You are an expert ultra-trail running coach creating a divergence-optimized weekly training program.
 
@@ -1542,18 +1404,21 @@ def save_weekly_program(
     Returns:
         ID of saved program
     """
+    from weekly_program_cache import compute_input_fingerprint, invalidate_weekly_programs
+
     query = """
         INSERT INTO weekly_programs
         (user_id, week_start_date, program_json, predicted_acwr, predicted_divergence,
-         generated_at, generation_type)
-        VALUES (%s, %s, %s, %s, %s, NOW(), %s)
+         generated_at, generation_type, input_fingerprint)
+        VALUES (%s, %s, %s, %s, %s, NOW(), %s, %s)
         ON CONFLICT (user_id, week_start_date)
         DO UPDATE SET
             program_json = EXCLUDED.program_json,
             predicted_acwr = EXCLUDED.predicted_acwr,
             predicted_divergence = EXCLUDED.predicted_divergence,
             generated_at = NOW(),
-            generation_type = EXCLUDED.generation_type
+            generation_type = EXCLUDED.generation_type,
+            input_fingerprint = EXCLUDED.input_fingerprint
         RETURNING id
     """
 
@@ -1565,11 +1430,20 @@ def save_weekly_program(
     # Convert program to JSON string
     program_json = json.dumps(program_data)
 
+    # Inputs this program was generated from (NULL if they can't be read — never skipped by prewarm)
+    try:
+        input_fingerprint = compute_input_fingerprint(user_id, week_start)
+    except Exception as fp_err:
+        logger.warning(f"Input fingerprint failed for user {user_id}, week {week_start}: {fp_err}")
+        input_fingerprint = None
+
     result = execute_query(
         query,
-        (user_id, week_start, program_json, predicted_acwr, predicted_divergence, generation_type),
+        (user_id, week_start, program_json, predicted_acwr, predicted_divergence, generation_type,
+         input_fingerprint),
         fetch=True
     )
+    invalidate_weekly_programs(user_id)
     
     if result and len(result) > 0:
         # Handle both dict and tuple result formats
@@ -1604,40 +1478,14 @@ def get_cached_weekly_program(
         week_start: Sunday of target week
     
     Returns:
-        Program dictionary or None if not cached/expired
+        Program dictionary (parsed, structured totals applied, with inputs_changed)
+        or None if not cached/expired. Served from weekly_program_cache.
     """
-    query = """
-        SELECT program_json, generated_at
-        FROM weekly_programs
-        WHERE user_id = %s
-        AND week_start_date = %s
-        AND generated_at >= NOW() - INTERVAL '%s days'
-        ORDER BY generated_at DESC
-        LIMIT 1
-    """
-    
-    result = execute_query(query, (user_id, week_start, CACHE_EXPIRY_DAYS), fetch=True)
-    
-    if not result:
+    from weekly_program_cache import get_program
+
+    program = get_program(user_id, week_start)
+    if program is None:
         logger.info(f"No cached program found for user {user_id}, week {week_start}")
-        return None
-    
-    # Handle both dict and tuple result formats
-    row = result[0]
-    if hasattr(row, 'keys'):
-        program_json = row['program_json']
-        generated_at = row['generated_at']
-    else:
-        program_json = row[0]
-        generated_at = row[1]
-    
-    # Parse JSON
-    if isinstance(program_json, str):
-        program = json.loads(program_json)
-    else:
-        program = program_json
-    
-    logger.info(f"Found cached program for user {user_id}, week {week_start}, generated {generated_at}")
     return program
 
 
@@ -1663,26 +1511,18 @@ def get_or_generate_weekly_program(
         # Return the existing active plan rather than keying a cache lookup to
         # today's date (which would miss on every new calendar day).
         if not force_regenerate:
-            from db_utils import get_current_week_context
-            ctx = get_current_week_context(user_id)
-            if ctx and ctx.get('program_json'):
-                plan_start = ctx['week_start_date']
-                if not hasattr(plan_start, 'year'):
-                    plan_start = date.fromisoformat(str(plan_start))
+            from weekly_program_cache import get_active_program
+            active = get_active_program(user_id)
+            if active:
+                plan_start, program = active
                 today = get_app_current_date()
                 if (today - plan_start).days < 7:
-                    try:
-                        raw = ctx['program_json']
-                        program = json.loads(raw) if isinstance(raw, str) else raw
-                        program['from_cache'] = True
-                        _apply_structured_totals(program)
-                        logger.info(
-                            f"Returning existing plan for user {user_id}, "
-                            f"week {plan_start} (day {(today - plan_start).days + 1} of 7)"
-                        )
-                        return program
-                    except (json.JSONDecodeError, TypeError) as e:
-                        logger.warning(f"Could not parse cached program_json for user {user_id}: {e}")
+                    program['from_cache'] = True
+                    logger.info(
+                        f"Returning existing plan for user {user_id}, "
+                        f"week {plan_start} (day {(today - plan_start).days + 1} of 7)"
+                    )
+                    return program
         week_start = get_current_week_start()
     else:
         # Explicit week_start — check exact cache entry
@@ -1690,7 +1530,6 @@ def get_or_generate_weekly_program(
             cached = get_cached_weekly_program(user_id, week_start)
             if cached:
                 cached['from_cache'] = True
-                _apply_structured_totals(cached)
                 return cached
 
     # Generate new program
@@ -16,6 +16,7 @@ class DatabaseConnectionManager:
     
     _instance = None
     _lock = threading.Lock()
+    _pool_lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
@@ -95,6 +96,11 @@ class DatabaseConnectionManager:
     @contextmanager
     def get_connection(self):
         """Get connection from pool with enhanced error handling"""
+        if self.pool is None:
+            # Created on first use rather than at app import, so cold start does no DB work
+            with self._pool_lock:
+                if self.pool is None and os.environ.get('DATABASE_URL'):
+                    self.initialize_pool(os.environ['DATABASE_URL'])
         if self.pool is None:
             raise RuntimeError("Connection pool not initialized")
         
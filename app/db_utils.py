@@ -6,6 +6,9 @@ from datetime import datetime, timedelta
 from contextlib import contextmanager
 import logging
 import re
+import threading
+import time
+import copy
 import psycopg2
 import psycopg2.extras
 
@@ -35,7 +38,6 @@ DATABASE_URL = clean_database_url(os.environ.get('DATABASE_URL'))
 if not DATABASE_URL:
     raise ValueError('DATABASE_URL environment variable is required for PostgreSQL connection')
 
-print(f"Using PostgreSQL with connection: {DATABASE_URL[:50]}...")
 logger.info(f"db_utils: Using PostgreSQL. URL: {DATABASE_URL[:50]}...")
 
 # Legacy compatibility variables (PostgreSQL only)
@@ -200,6 +202,26 @@ def execute_query_direct(query, params=(), fetch=False):
         logger.error(f"Params were: {params}")
         raise
 
+_pool_scope = threading.local()
+
+
+@contextmanager
+def pooled_queries():
+    """
+    Route every execute_query() call made by this thread through the connection pool.
+
+    For fan-out reads (weekly_program_context runs its blocks on worker threads)
+    that would otherwise open a direct connection per query. Read paths only: the
+    pool does not commit statements executed with fetch=True.
+    """
+    previous = getattr(_pool_scope, 'active', False)
+    _pool_scope.active = True
+    try:
+        yield
+    finally:
+        _pool_scope.active = previous
+
+
 def execute_query(query, params=(), fetch=False, use_pool=False):
     """
     Execute a database query with optional parameter binding.
@@ -208,9 +230,10 @@ def execute_query(query, params=(), fetch=False, use_pool=False):
         query: SQL query string
         params: Query parameters
         fetch: Whether to fetch results
-        use_pool: Whether to use connection pool (for onboarding operations)
+        use_pool: Whether to use connection pool (for onboarding operations);
+            implied inside pooled_queries()
     """
-    if use_pool:
+    if use_pool or getattr(_pool_scope, 'active', False):
         # Use connection pool for onboarding and user management operations
         try:
             logger.debug("Using connection pool for operation")
@@ -535,25 +558,64 @@ def save_llm_recommendation(recommendation):
         raise
 
 
+# Athlete models are read on every prompt build and change only when an autopsy,
+# a test result or the model API writes them; those writers call
+# invalidate_athlete_model(). Other instances see a write within the TTL.
+ATHLETE_MODEL_TTL_SECONDS = 60
+_athlete_models = {}  # user_id -> (model, loaded_at)
+_athlete_model_generations = {}  # user_id -> bumped on every invalidation
+_athlete_model_lock = threading.Lock()
+
+
 def get_athlete_model(user_id):
     """Return the athlete_models row for user_id as a dict, or None if not found.
 
+    Served from a short per-process cache; the returned dict is a copy. The
+    internal model_stats column is not included.
+
     Phase 3 — Persistent Athlete Model.
     """
     try:
-        result = execute_query(
-            "SELECT * FROM athlete_models WHERE user_id = %s",
-            (user_id,),
-            fetch=True
-        )
-        if result:
-            return dict(result[0])
-        return None
+        user_id = int(user_id)
+        with _athlete_model_lock:
+            cached = _athlete_models.get(user_id)
+            generation = _athlete_model_generations.get(user_id, 0)
+
+        if cached and time.monotonic() - cached[1] < ATHLETE_MODEL_TTL_SECONDS:
+            model = cached[0]
+        else:
+            result = execute_query(
+                "SELECT * FROM athlete_models WHERE user_id = %s",
+                (user_id,),
+                fetch=True
+            )
+            model = dict(result[0]) if result else None
+            if model is not None:
+                model.pop('model_stats', None)
+            with _athlete_model_lock:
+                # An invalidation during the query means this row may already be stale
+                if _athlete_model_generations.get(user_id, 0) == generation:
+                    _athlete_models[user_id] = (model, time.monotonic())
+
+        return copy.deepcopy(model)
     except Exception as e:
         logger.error(f"Error fetching athlete model for user {user_id}: {e}")
         return None
 
 
+def invalidate_athlete_model(user_id=None):
+    """Drop the cached athlete model for a user (or all users) after athlete_models changes"""
+    with _athlete_model_lock:
+        if user_id is None:
+            for uid in list(_athlete_models) + list(_athlete_model_generations):
+                _athlete_model_generations[uid] = _athlete_model_generations.get(uid, 0) + 1
+            _athlete_models.clear()
+        else:
+            user_id = int(user_id)
+            _athlete_models.pop(user_id, None)
+            _athlete_model_generations[user_id] = _athlete_model_generations.get(user_id, 0) + 1
+
+
 def upsert_athlete_model(user_id, model_data):
     """INSERT or UPDATE the athlete_models row for user_id.
 
@@ -606,6 +668,7 @@ def upsert_athlete_model(user_id, model_data):
         """
 
         execute_query(query, [user_id] + set_values)
+        invalidate_athlete_model(user_id)
         logger.info(f"Upserted athlete model for user {user_id}: {list(filtered.keys())}")
 
     except Exception as e:
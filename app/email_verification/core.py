@@ -52,6 +52,7 @@ def create_verification_token(user_id, email):
     """
     try:
         from db_utils import execute_query
+        from user_profile_cache import invalidate_user_profile
 
         # Generate token
         raw_token = generate_verification_token()
@@ -70,6 +71,7 @@ def create_verification_token(user_id, email):
             (hashed_token, expires_at, user_id),
             fetch=False
         )
+        invalidate_user_profile(user_id)
 
         logger.info(f"Created verification token for user {user_id}, expires at {expires_at}")
         return True, raw_token, None
@@ -91,6 +93,7 @@ def verify_token(token):
     """
     try:
         from db_utils import execute_query
+        from user_profile_cache import invalidate_user_profile
 
         # Hash the incoming token
         hashed_token = hash_token(token)
@@ -128,6 +131,7 @@ def verify_token(token):
             (user_id,),
             fetch=False
         )
+        invalidate_user_profile(user_id)
 
         logger.info(f"Email verified successfully for user {user_id}")
         return True, user_id, None
@@ -0,0 +1,184 @@
+# engagement_signals.py
+
+"""
+Engagement signals: the per-user numbers tiered feature unlocking is judged on.
+
+check_tiered_feature_unlock() used to run its own COUNT queries for every
+requirement of every feature (activity count, distinct active days, registration
+date, features_unlocked), so one progress page issued dozens of identical
+aggregates. get_engagement_signals() loads all of them in one aggregate query
+and caches the resulting EngagementSignals for ENGAGEMENT_TTL_SECONDS;
+get_engagement_signals_batch() does the same for many (or all) users at once
+for admin reports.
+
+Writers that change the inputs call invalidate_engagement_signals(): the Strava
+sync, journal saves and auto rest days (both insert rest-day activities), and
+feature unlocks.
+"""
+
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, Optional
+
+from db_utils import execute_query
+
+logger = logging.getLogger(__name__)
+
+ENGAGEMENT_TTL_SECONDS = 300
+
+_SIGNALS_QUERY = """
+    SELECT us.id AS user_id,
+           us.registration_date,
+           us.features_unlocked,
+           COALESCE(a.activity_count, 0) AS activity_count,
+           COALESCE(a.days_active, 0) AS days_active
+    FROM user_settings us
+    LEFT JOIN (
+        SELECT user_id, COUNT(*) AS activity_count, COUNT(DISTINCT date) AS days_active
+        FROM activities
+        {activity_filter}
+        GROUP BY user_id
+    ) a ON a.user_id = us.id
+    {user_filter}
+"""
+
+_signals: Dict[int, tuple] = {}  # user_id -> (EngagementSignals, loaded_at)
+_generations: Dict[int, int] = {}  # user_id -> bumped on every invalidation
+_global_generation = 0
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class EngagementSignals:
+    """One user's engagement inputs and the scores derived from them"""
+    user_id: int
+    activity_count: int = 0
+    days_active: int = 0
+    days_registered: Optional[int] = None  # None when registration_date is unknown
+    features_unlocked: FrozenSet[str] = frozenset()
+
+    @property
+    def usage_frequency(self) -> float:
+        """Share of registered days with an activity (0.0 to 1.0)"""
+        if self.days_active == 0 or self.days_registered is None:
+            return 0.0
+        if self.days_registered == 0:
+            return 1.0
+        return min(self.days_active / self.days_registered, 1.0)
+
+    @property
+    def performance_score(self) -> float:
+        """Activity consistency (0.0 to 1.0); 2 activities per active day is excellent"""
+        if self.activity_count == 0 or self.days_active == 0:
+            return 0.0
+        return min(self.activity_count / (self.days_active * 2), 1.0)
+
+    @property
+    def engagement_level(self) -> float:
+        """Blend of usage frequency and activity volume (0.0 to 1.0)"""
+        if self.activity_count == 0:
+            return 0.0
+        return min((self.usage_frequency * 0.6) + (min(self.activity_count / 10, 1.0) * 0.4), 1.0)
+
+    @property
+    def social_score(self) -> int:
+        """Placeholder social score: 1 once the user has 5 activities"""
+        return 1 if self.activity_count >= 5 else 0
+
+
+def _from_row(row) -> EngagementSignals:
+    features = row.get('features_unlocked') or []
+    if isinstance(features, str):
+        try:
+            features = json.loads(features)
+        except ValueError:
+            features = []
+
+    registered = row.get('registration_date')
+    days_registered = None
+    if isinstance(registered, str):
+        registered = datetime.fromisoformat(registered.replace('Z', '+00:00'))
+    if registered is not None:
+        days_registered = max((datetime.now() - registered.replace(tzinfo=None)).days, 0)
+
+    return EngagementSignals(
+        user_id=int(row['user_id']),
+        activity_count=int(row.get('activity_count') or 0),
+        days_active=int(row.get('days_active') or 0),
+        days_registered=days_registered,
+        features_unlocked=frozenset(features),
+    )
+
+
+def _load(user_ids: Optional[list]) -> Dict[int, EngagementSignals]:
+    if user_ids is None:
+        query = _SIGNALS_QUERY.format(activity_filter='', user_filter='')
+        params = ()
+    else:
+        query = _SIGNALS_QUERY.format(activity_filter='WHERE user_id = ANY(%s)', user_filter='WHERE us.id = ANY(%s)')
+        params = (user_ids, user_ids)
+    rows = execute_query(query, params, fetch=True, use_pool=True) or []
+    return {signals.user_id: signals for signals in map(_from_row, rows)}
+
+
+def _store(loaded: Dict[int, EngagementSignals], generations: Dict[int, int], global_generation: int):
+    now = time.monotonic()
+    with _lock:
+        if _global_generation != global_generation:
+            return
+        for user_id, signals in loaded.items():
+            # An invalidation during the query means this row may already be stale
+            if _generations.get(user_id, 0) == generations.get(user_id, 0):
+                _signals[user_id] = (signals, now)
+
+
+def get_engagement_signals_batch(user_ids: Optional[Iterable[int]] = None) -> Dict[int, EngagementSignals]:
+    """
+    Signals for many users in one query (user_ids=None: every user).
+
+    Cached entries are reused; only the missing or expired users are queried.
+    Users that do not exist are left out of the result.
+    """
+    now = time.monotonic()
+    with _lock:
+        global_generation = _global_generation
+        if user_ids is None:
+            wanted = None
+            cached = {}
+        else:
+            wanted = [int(user_id) for user_id in user_ids]
+            cached = {user_id: _signals[user_id][0] for user_id in wanted
+                      if user_id in _signals and now - _signals[user_id][1] < ENGAGEMENT_TTL_SECONDS}
+        generations = dict(_generations)
+
+    missing = None if wanted is None else [user_id for user_id in wanted if user_id not in cached]
+    if missing == []:
+        return cached
+
+    loaded = _load(missing)
+    _store(loaded, generations, global_generation)
+    cached.update(loaded)
+    return cached
+
+
+def get_engagement_signals(user_id) -> EngagementSignals:
+    """Signals for one user; a user with no row gets all-zero signals"""
+    user_id = int(user_id)
+    return get_engagement_signals_batch([user_id]).get(user_id) or EngagementSignals(user_id=user_id)
+
+
+def invalidate_engagement_signals(user_id=None) -> None:
+    """Drop cached signals for a user (or all users) after activities or unlocks change"""
+    global _global_generation
+    with _lock:
+        if user_id is None:
+            _global_generation += 1
+            _signals.clear()
+        else:
+            user_id = int(user_id)
+            _signals.pop(user_id, None)
+            _generations[user_id] = _generations.get(user_id, 0) + 1
@@ -6,7 +6,6 @@ import logging
 import json
 import os
 from datetime import datetime
-from stravalib.client import Client
 import db_utils
 
 logger = logging.getLogger(__name__)
@@ -355,8 +354,8 @@ class SimpleTokenManager:
     def _attempt_token_refresh(self, client_id, client_secret, refresh_token):
         """Attempt a single token refresh operation"""
         try:
-            from stravalib.client import Client
-            client = Client()
+            from http_clients import get_strava_client
+            client = get_strava_client()
 
             logger.info(f"Attempting token refresh with client_id: {client_id[:8]}...")
 
@@ -511,7 +510,8 @@ class SimpleTokenManager:
                 tokens = refresh_result
 
             # Create client with valid token
-            client = Client(access_token=tokens['access_token'])
+            from http_clients import get_strava_client
+            client = get_strava_client(tokens['access_token'])
 
             # Validate connection if requested
             if validate_connection:
@@ -525,7 +525,7 @@ class SimpleTokenManager:
                         emergency_refresh_result = self.refresh_strava_tokens()
                         if emergency_refresh_result:
                             tokens = emergency_refresh_result
-                            client = Client(access_token=tokens['access_token'])
+                            client = get_strava_client(tokens['access_token'])
                             validation_result = self._validate_client_connection(client)
                             if not validation_result['valid']:
                                 logger.error(f"Emergency refresh also failed for user {self.user_id}")
@@ -587,10 +587,10 @@ class SimpleTokenManager:
     def _validate_tokens_with_strava(self, tokens):
         """Validate tokens by making a test API call to Strava"""
         try:
-            from stravalib.client import Client
+            from http_clients import get_strava_client
             
             # Create a client with the access token
-            client = Client(access_token=tokens.get('access_token'))
+            client = get_strava_client(tokens.get('access_token'))
             
             # Make a simple API call to validate the token
             # Using get_athlete() as it's a lightweight call
@@ -967,19 +967,13 @@ def get_token_refresh_status(user_id):
 
 
 def bulk_refresh_tokens(user_ids=None, max_retries=3):
-    """Refresh tokens for multiple users"""
+    """Refresh tokens for multiple users (concurrently, see strava_token_refresh)"""
     try:
-        if user_ids is None:
-            # Get all users with tokens from database
-            query = """
-                SELECT id FROM user_settings 
-                WHERE strava_access_token IS NOT NULL 
-                  AND strava_refresh_token IS NOT NULL
-            """
-            result = db_utils.execute_query(query, fetch=True)
-            user_ids = [user['id'] for user in result] if result else []
-        
-        if not user_ids:
+        from strava_token_refresh import TOKEN_BUFFER_MINUTES, run_bulk_token_refresh, select_token_refresh_candidates
+
+        # One query for every user with tokens; only the expiring ones are refreshed
+        rows = select_token_refresh_candidates(user_ids, buffer_minutes=None)
+        if not rows:
             return {
                 'success': True,
                 'message': 'No users to refresh',
@@ -988,26 +982,44 @@ def bulk_refresh_tokens(user_ids=None, max_retries=3):
                 'failed_refreshes': 0,
                 'results': []
             }
-        
+
+        refresh_before = int(time.time()) + TOKEN_BUFFER_MINUTES * 60
+        expiring = [row for row in rows
+                    if not row.get('strava_token_expires_at') or row['strava_token_expires_at'] <= refresh_before]
+        summary = run_bulk_token_refresh(max_retries=max_retries, candidates=expiring)
+        outcomes = {outcome['user_id']: outcome for outcome in summary['outcomes']}
+
         results = []
-        successful = 0
-        failed = 0
-        
-        for user_id in user_ids:
-            refresh_result = refresh_tokens_for_user(user_id, max_retries)
-            results.append(refresh_result)
-            
-            if refresh_result['success'] and refresh_result['refreshed']:
-                successful += 1
-            elif not refresh_result['success']:
-                failed += 1
-        
+        for row in rows:
+            outcome = outcomes.get(row['id'])
+            if outcome is None:
+                results.append({
+                    'success': True,
+                    'message': 'Tokens are still valid',
+                    'refreshed': False,
+                    'user_id': row['id']
+                })
+                continue
+            result = {
+                'success': outcome['status'] in ('refreshed', 'rate_limited'),
+                'message': outcome['message'],
+                'refreshed': outcome['status'] == 'refreshed',
+                'user_id': row['id'],
+                'status': outcome['status']
+            }
+            if outcome['expires_at']:
+                result['expires_at'] = outcome['expires_at']
+            results.append(result)
+
+        successful = summary['refreshed']
+        failed = summary['failed']
         return {
             'success': True,
             'message': f'Bulk refresh completed: {successful} successful, {failed} failed',
-            'total_users': len(user_ids),
+            'total_users': len(rows),
             'successful_refreshes': successful,
             'failed_refreshes': failed,
+            'deferred_refreshes': summary['deferred'],
             'results': results
         }
         
@@ -1064,9 +1076,12 @@ def get_all_users_needing_token_refresh():
 def proactive_token_refresh_for_all_users():
     """Proactively refresh tokens for all users who need it"""
     try:
-        users_needing_refresh = get_all_users_needing_token_refresh()
+        from strava_token_refresh import run_bulk_token_refresh
+
+        # Selects the expiring tokens in one query and refreshes them concurrently
+        summary = run_bulk_token_refresh()
         
-        if not users_needing_refresh:
+        if not summary['checked']:
             logger.info("No users need token refresh")
             return {
                 'success': True,
@@ -1076,55 +1091,22 @@ def proactive_token_refresh_for_all_users():
                 'users_failed': 0
             }
         
-        logger.info(f"Proactively refreshing tokens for {len(users_needing_refresh)} users")
-        
-        results = []
-        successful_refreshes = 0
-        failed_refreshes = 0
-        
-        for user_info in users_needing_refresh:
-            user_id = user_info['user_id']
-            try:
-                logger.info(f"Proactively refreshing tokens for user {user_id}")
-                
-                token_manager = SimpleTokenManager(user_id)
-                refresh_result = token_manager.refresh_strava_tokens()
-                
-                if refresh_result:
-                    successful_refreshes += 1
-                    results.append({
-                        'user_id': user_id,
-                        'email': user_info['email'],
-                        'status': 'success',
-                        'message': 'Tokens refreshed successfully'
-                    })
-                    logger.info(f"Successfully refreshed tokens for user {user_id}")
-                else:
-                    failed_refreshes += 1
-                    results.append({
-                        'user_id': user_id,
-                        'email': user_info['email'],
-                        'status': 'failed',
-                        'message': 'Token refresh failed'
-                    })
-                    logger.error(f"Failed to refresh tokens for user {user_id}")
-                    
-            except Exception as e:
-                failed_refreshes += 1
-                results.append({
-                    'user_id': user_id,
-                    'email': user_info['email'],
-                    'status': 'error',
-                    'message': f'Error during refresh: {str(e)}'
-                })
-                logger.error(f"Error refreshing tokens for user {user_id}: {str(e)}")
+        results = [{
+            'user_id': outcome['user_id'],
+            'email': outcome['email'],
+            'status': 'success' if outcome['status'] == 'refreshed' else outcome['status'],
+            'message': outcome['message']
+        } for outcome in summary['outcomes']]
         
         return {
             'success': True,
-            'message': f'Proactive token refresh completed: {successful_refreshes} successful, {failed_refreshes} failed',
-            'users_checked': len(users_needing_refresh),
-            'users_refreshed': successful_refreshes,
-            'users_failed': failed_refreshes,
+            'message': (f"Proactive token refresh completed: {summary['refreshed']} successful, "
+                        f"{summary['failed']} failed, {summary['deferred']} deferred"),
+            'users_checked': summary['checked'],
+            'users_refreshed': summary['refreshed'],
+            'users_failed': summary['failed'],
+            'users_deferred': summary['deferred'],
+            'rate_limit': summary['rate_limit'],
             'results': results
         }
         
@@ -1136,4 +1118,4 @@ def proactive_token_refresh_for_all_users():
             'users_checked': 0,
             'users_refreshed': 0,
             'users_failed': 0
-        }
\ No newline at end of file
+        }
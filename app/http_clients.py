@@ -0,0 +1,276 @@
+# http_clients.py
+
+"""
+Process-wide outbound HTTP clients, one per provider (Strava, intervals.icu,
+Anthropic).
+
+Callers used to build a fresh anthropic.Anthropic client, stravalib Client or
+bare requests.get() per call, so every request paid a TLS handshake and a new
+connection pool. The clients here are created once and keep their connections
+alive; each provider has its own pool size, timeouts, retry/backoff policy and
+concurrency limit (PROVIDERS, overridable with HTTP_<PROVIDER>_<SETTING>
+environment variables, e.g. HTTP_STRAVA_POOL_SIZE=20).
+
+- get_session(provider): a requests.Session whose adapter applies the provider's
+  default timeout, retries idempotent requests on the provider's retry statuses,
+  bounds concurrency and records metrics.
+- get_strava_client(access_token): a stravalib Client on the shared Strava session.
+- get_anthropic_client() / get_async_anthropic_client(): shared SDK clients with
+  a sized keep-alive pool; wrap calls in track_call('anthropic') /
+  track_call_async('anthropic') for the concurrency limit and metrics.
+- HTTP_METRICS.snapshot(): per-provider call counts, error rate and latency.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+LATENCY_WINDOW = 500  # recent calls per provider kept for percentiles
+
+
+class ProviderBusyError(TimeoutError):
+    """A provider's concurrency limit stayed saturated for the whole queue timeout"""
+
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    """Connection and retry policy for one outbound provider"""
+    name: str
+    pool_size: int
+    connect_timeout: float
+    read_timeout: float
+    max_retries: int
+    backoff_factor: float
+    retry_statuses: Tuple[int, ...]
+    max_concurrency: int
+    queue_timeout: float
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+
+def _provider(name, **defaults) -> ProviderConfig:
+    settings = {}
+    for key, default in defaults.items():
+        raw = os.environ.get(f'HTTP_{name.upper()}_{key.upper()}')
+        if raw is None:
+            settings[key] = default
+        elif key == 'retry_statuses':
+            settings[key] = tuple(int(code) for code in raw.split(',') if code.strip())
+        else:
+            settings[key] = type(default)(raw)
+    return ProviderConfig(name=name, **settings)
+
+
+PROVIDERS: Dict[str, ProviderConfig] = {
+    # stravalib and the token refresh engine read Strava's rate-limit headers
+    # themselves, so 429s are not retried here
+    'strava': _provider('strava', pool_size=10, connect_timeout=5.0, read_timeout=30.0, max_retries=2,
+                        backoff_factor=0.5, retry_statuses=(500, 502, 503, 504), max_concurrency=8,
+                        queue_timeout=30.0),
+    'intervals_icu': _provider('intervals_icu', pool_size=8, connect_timeout=5.0, read_timeout=15.0,
+                               max_retries=2, backoff_factor=0.5, retry_statuses=(429, 500, 502, 503, 504),
+                               max_concurrency=4, queue_timeout=30.0),
+    # The SDK retries (with backoff) itself; max_retries is handed to it
+    'anthropic': _provider('anthropic', pool_size=20, connect_timeout=5.0, read_timeout=600.0, max_retries=2,
+                           backoff_factor=0.5, retry_statuses=(429, 500, 502, 503, 504, 529),
+                           max_concurrency=16, queue_timeout=60.0),
+}
+
+
+class HttpClientMetrics:
+    """Process-wide per-provider request counters and latencies (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers = {}
+
+    def _stats(self, provider):
+        return self._providers.setdefault(provider, {
+            'calls': 0, 'errors': 0, 'in_flight': 0, 'total_seconds': 0.0,
+            'statuses': {}, 'latencies': deque(maxlen=LATENCY_WINDOW),
+        })
+
+    def started(self, provider):
+        with self._lock:
+            self._stats(provider)['in_flight'] += 1
+
+    def record(self, provider, seconds, ok=True, status=None):
+        with self._lock:
+            stats = self._stats(provider)
+            stats['in_flight'] -= 1
+            stats['calls'] += 1
+            stats['total_seconds'] += seconds
+            stats['latencies'].append(seconds)
+            if not ok:
+                stats['errors'] += 1
+            key = str(status) if status is not None else ('ok' if ok else 'exception')
+            stats['statuses'][key] = stats['statuses'].get(key, 0) + 1
+
+    def snapshot(self):
+        """Per-provider metrics with error rate and mean/p50/p95 latency"""
+        with self._lock:
+            providers = {name: dict(stats, statuses=dict(stats['statuses']), latencies=sorted(stats['latencies']))
+                         for name, stats in self._providers.items()}
+        for stats in providers.values():
+            latencies = stats.pop('latencies')
+            calls = stats['calls']
+            stats['error_rate'] = round(stats['errors'] / calls, 4) if calls else None
+            stats['mean_ms'] = round(stats['total_seconds'] / calls * 1000, 1) if calls else None
+            stats['p50_ms'] = _percentile_ms(latencies, 0.50)
+            stats['p95_ms'] = _percentile_ms(latencies, 0.95)
+            stats['total_seconds'] = round(stats['total_seconds'], 3)
+        return providers
+
+
+def _percentile_ms(sorted_seconds, fraction):
+    if not sorted_seconds:
+        return None
+    index = min(int(len(sorted_seconds) * fraction), len(sorted_seconds) - 1)
+    return round(sorted_seconds[index] * 1000, 1)
+
+
+HTTP_METRICS = HttpClientMetrics()
+
+_semaphores = {name: threading.BoundedSemaphore(config.max_concurrency) for name, config in PROVIDERS.items()}
+_async_semaphores = {}
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+@contextmanager
+def track_call(provider):
+    """Hold one of the provider's concurrency slots and record the call's latency/outcome"""
+    config = PROVIDERS[provider]
+    if not _semaphores[provider].acquire(timeout=config.queue_timeout):
+        HTTP_METRICS.started(provider)
+        HTTP_METRICS.record(provider, 0.0, ok=False, status='busy')
+        raise ProviderBusyError(f'{provider}: {config.max_concurrency} requests already in flight')
+    HTTP_METRICS.started(provider)
+    started = time.perf_counter()
+    outcome = {'ok': True, 'status': None}
+    try:
+        yield outcome
+    except BaseException:
+        outcome['ok'] = False
+        raise
+    finally:
+        _semaphores[provider].release()
+        HTTP_METRICS.record(provider, time.perf_counter() - started, outcome['ok'], outcome['status'])
+
+
+@asynccontextmanager
+async def track_call_async(provider):
+    """track_call() for coroutines: the concurrency slot is an asyncio.Semaphore"""
+    config = PROVIDERS[provider]
+    semaphore = _async_semaphores.setdefault(provider, asyncio.Semaphore(config.max_concurrency))
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=config.queue_timeout)
+    except asyncio.TimeoutError:
+        HTTP_METRICS.started(provider)
+        HTTP_METRICS.record(provider, 0.0, ok=False, status='busy')
+        raise ProviderBusyError(f'{provider}: {config.max_concurrency} requests already in flight')
+    HTTP_METRICS.started(provider)
+    started = time.perf_counter()
+    outcome = {'ok': True, 'status': None}
+    try:
+        yield outcome
+    except BaseException:
+        outcome['ok'] = False
+        raise
+    finally:
+        semaphore.release()
+        HTTP_METRICS.record(provider, time.perf_counter() - started, outcome['ok'], outcome['status'])
+
+
+class _ProviderAdapter(HTTPAdapter):
+    """Applies the provider's default timeout, concurrency limit and metrics to every request"""
+
+    def __init__(self, config: ProviderConfig):
+        self.provider = config
+        retry = Retry(total=config.max_retries, backoff_factor=config.backoff_factor,
+                      status_forcelist=config.retry_statuses, respect_retry_after_header=True,
+                      raise_on_status=False)
+        super().__init__(pool_connections=1, pool_maxsize=config.pool_size, max_retries=retry)
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.provider.timeout
+        try:
+            with track_call(self.provider.name) as outcome:
+                response = super().send(request, timeout=timeout, **kwargs)
+                outcome['status'] = response.status_code
+                outcome['ok'] = response.status_code < 500 and response.status_code != 429
+                return response
+        except ProviderBusyError as e:
+            raise requests.exceptions.ConnectTimeout(str(e), request=request)
+
+
+def get_session(provider) -> requests.Session:
+    """The shared keep-alive session for a provider"""
+    key = ('session', provider)
+    session = _clients.get(key)
+    if session is None:
+        with _clients_lock:
+            session = _clients.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = _ProviderAdapter(PROVIDERS[provider])
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _clients[key] = session
+    return session
+
+
+def get_strava_client(access_token=None):
+    """A stravalib Client on the shared Strava session (stravalib sends auth per request)"""
+    from stravalib.client import Client
+    return Client(access_token=access_token, requests_session=get_session('strava'))
+
+
+def _anthropic_client(kind, api_key):
+    import anthropic
+
+    key = (kind, api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                config = PROVIDERS['anthropic']
+                timeout = anthropic.Timeout(config.read_timeout, connect=config.connect_timeout)
+                limits = type(anthropic.DEFAULT_CONNECTION_LIMITS)(
+                    max_connections=config.pool_size, max_keepalive_connections=config.pool_size)
+                if kind == 'async':
+                    client = anthropic.AsyncAnthropic(
+                        api_key=api_key, timeout=timeout, max_retries=config.max_retries,
+                        http_client=anthropic.DefaultAsyncHttpxClient(limits=limits))
+                else:
+                    client = anthropic.Anthropic(
+                        api_key=api_key, timeout=timeout, max_retries=config.max_retries,
+                        http_client=anthropic.DefaultHttpxClient(limits=limits))
+                _clients[key] = client
+    return client
+
+
+def get_anthropic_client(api_key):
+    """The shared synchronous Anthropic client for api_key"""
+    return _anthropic_client('sync', api_key)
+
+
+def get_async_anthropic_client(api_key):
+    """The shared AsyncAnthropic client for api_key"""
+    return _anthropic_client('async', api_key)
@@ -5,89 +5,217 @@ Pulls HRV, resting HR, sleep, weight, spO2, respiration, and VO2max
 for all users with intervals.icu credentials. Writes to journal_entries.
 
 Called from strava_app.py daily scheduler before the 6AM recommendation job.
+
+Each user's whole date range is one wellness request (oldest/newest span; backfills
+are split into BACKFILL_CHUNK_DAYS requests). Users are fetched concurrently on a
+bounded pool over the shared keep-alive intervals.icu session, and the rows are
+written with multi-row upserts of up to UPSERT_BATCH_ROWS, so one slow athlete no
+longer holds up everyone behind them.
 """
 
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import requests
+from psycopg2.extras import execute_values
 
+import db_utils
 from db_utils import execute_query
+from http_clients import get_session
 
 logger = logging.getLogger(__name__)
 
 INTERVALS_ICU_BASE = "https://intervals.icu/api/v1"
 
+SYNC_WORKERS = int(os.environ.get('INTERVALS_ICU_SYNC_WORKERS', '4'))
+UPSERT_BATCH_ROWS = 500
+BACKFILL_DAYS = 180
+BACKFILL_CHUNK_DAYS = 90  # Days per wellness request during a backfill
 
-def sync_wellness_for_user(user_id: int, api_key: str, athlete_id: str, target_date: date) -> bool:
+WELLNESS_FIELDS = (
+    "hrv",          # rMSSD ms
+    "restingHR",    # bpm
+    "sleepSecs",    # seconds
+    "sleepScore",   # 0–100
+    "weight",       # kg
+    "spO2",         # %
+    "respiration",  # breaths/min
+    "vo2max",       # ml/kg/min
+)
+
+UPSERT_WELLNESS_SQL = """
+    INSERT INTO journal_entries
+        (user_id, date, hrv_value, hrv_source, resting_hr,
+         sleep_duration_secs, sleep_score, weight, spo2, respiration_rate, vo2max,
+         updated_at)
+    VALUES %s
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        hrv_value           = COALESCE(EXCLUDED.hrv_value,           journal_entries.hrv_value),
+        hrv_source          = COALESCE(EXCLUDED.hrv_source,          journal_entries.hrv_source),
+        resting_hr          = COALESCE(EXCLUDED.resting_hr,          journal_entries.resting_hr),
+        sleep_duration_secs = COALESCE(EXCLUDED.sleep_duration_secs, journal_entries.sleep_duration_secs),
+        sleep_score         = COALESCE(EXCLUDED.sleep_score,         journal_entries.sleep_score),
+        weight              = COALESCE(EXCLUDED.weight,              journal_entries.weight),
+        spo2                = COALESCE(EXCLUDED.spo2,                journal_entries.spo2),
+        respiration_rate    = COALESCE(EXCLUDED.respiration_rate,    journal_entries.respiration_rate),
+        vo2max              = COALESCE(EXCLUDED.vo2max,              journal_entries.vo2max),
+        updated_at          = NOW()
+"""
+UPSERT_WELLNESS_TEMPLATE = "(%s, %s, %s, 'intervals_icu', %s, %s, %s, %s, %s, %s, %s, NOW())"
+
+
+def fetch_wellness(api_key: str, athlete_id: str, oldest: date, newest: date) -> List[Dict]:
     """
-    Fetch one day of wellness data from intervals.icu and upsert into journal_entries.
+    Wellness records for oldest..newest (inclusive) in one request.
 
     intervals.icu uses the same date convention as Garmin Connect: sleep is labeled
     by the morning you wake up (e.g. sleep ending April 14 morning → labeled "April 14").
-    So we fetch target_date from intervals.icu and write to the same date in the DB.
+    Each record's "id" is that date, and it is written to the same date in the DB.
 
-    Returns True if data was found and written, False if no data for that date.
+    Raises requests.RequestException on transport or HTTP errors.
     """
-    date_str = target_date.isoformat()   # for API request and DB write
     url = f"{INTERVALS_ICU_BASE}/athlete/{athlete_id}/wellness"
-    params = {"oldest": date_str, "newest": date_str}
+    params = {"oldest": oldest.isoformat(), "newest": newest.isoformat()}
+    resp = get_session("intervals_icu").get(url, params=params, auth=("API_KEY", api_key))
+    resp.raise_for_status()
+    return resp.json() or []
+
+
+def wellness_rows(user_id: int, records: Iterable[Dict]) -> List[Tuple]:
+    """journal_entries upsert rows for records with at least one wellness value, one per date"""
+    rows = {}
+    for w in records:
+        values = [w.get(field) for field in WELLNESS_FIELDS]
+        # Skip if all fields are null — nothing to write
+        if not w.get("id") or all(v is None for v in values):
+            continue
+        # A multi-row upsert cannot touch the same (user_id, date) twice
+        rows[w["id"][:10]] = (user_id, w["id"][:10], *values)
+    return list(rows.values())
+
+
+def upsert_wellness_rows(rows: List[Tuple]) -> int:
+    """Write wellness rows with one multi-row upsert per UPSERT_BATCH_ROWS; returns rows written"""
+    if not rows:
+        return 0
+    with db_utils.get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            execute_values(cursor, UPSERT_WELLNESS_SQL, rows,
+                           template=UPSERT_WELLNESS_TEMPLATE, page_size=UPSERT_BATCH_ROWS)
+        conn.commit()
+    return len(rows)
+
+
+def _date_chunks(oldest: date, newest: date, chunk_days: int) -> List[Tuple[date, date]]:
+    chunks = []
+    start = oldest
+    while start <= newest:
+        end = min(newest, start + timedelta(days=chunk_days - 1))
+        chunks.append((start, end))
+        start = end + timedelta(days=1)
+    return chunks
 
+
+def fetch_wellness_rows(user_id: int, api_key: str, athlete_id: str, oldest: date, newest: date,
+                        chunk_days: int = BACKFILL_CHUNK_DAYS) -> List[Tuple]:
+    """Upsert rows for one user's oldest..newest, one request per chunk_days"""
+    rows = []
+    for start, end in _date_chunks(oldest, newest, chunk_days):
+        rows.extend(wellness_rows(user_id, fetch_wellness(api_key, athlete_id, start, end)))
+    return rows
+
+
+def sync_wellness_range(user_id: int, api_key: str, athlete_id: str, oldest: date, newest: date) -> int:
+    """
+    Fetch and upsert one user's wellness for oldest..newest.
+
+    Returns the number of days written (0 if there was no data or the request failed).
+    """
     try:
-        resp = requests.get(url, params=params, auth=("API_KEY", api_key), timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
+        rows = fetch_wellness_rows(user_id, api_key, athlete_id, oldest, newest)
     except requests.RequestException as e:
         logger.error(f"[intervals.icu] API request failed for user {user_id}: {e}")
-        return False
-
-    if not data:
-        logger.debug(f"[intervals.icu] No wellness data for user {user_id} on {date_str}")
-        return False
-
-    w = data[0]
-
-    hrv_value        = w.get("hrv")           # rMSSD ms
-    resting_hr       = w.get("restingHR")     # bpm
-    sleep_secs       = w.get("sleepSecs")     # seconds
-    sleep_score      = w.get("sleepScore")    # 0–100
-    weight           = w.get("weight")        # kg
-    spo2             = w.get("spO2")          # %
-    respiration_rate = w.get("respiration")   # breaths/min
-    vo2max           = w.get("vo2max")        # ml/kg/min
-
-    # Skip upsert if all fields are null — nothing to write
-    if all(v is None for v in [hrv_value, resting_hr, sleep_secs, sleep_score,
-                                weight, spo2, respiration_rate, vo2max]):
-        logger.debug(f"[intervals.icu] All fields null for user {user_id} on {date_str} — skipping")
-        return False
-
-    execute_query("""
-        INSERT INTO journal_entries
-            (user_id, date, hrv_value, hrv_source, resting_hr,
-             sleep_duration_secs, sleep_score, weight, spo2, respiration_rate, vo2max,
-             updated_at)
-        VALUES (%s, %s, %s, 'intervals_icu', %s, %s, %s, %s, %s, %s, %s, NOW())
-        ON CONFLICT (user_id, date) DO UPDATE SET
-            hrv_value           = COALESCE(EXCLUDED.hrv_value,           journal_entries.hrv_value),
-            hrv_source          = COALESCE(EXCLUDED.hrv_source,          journal_entries.hrv_source),
-            resting_hr          = COALESCE(EXCLUDED.resting_hr,          journal_entries.resting_hr),
-            sleep_duration_secs = COALESCE(EXCLUDED.sleep_duration_secs, journal_entries.sleep_duration_secs),
-            sleep_score         = COALESCE(EXCLUDED.sleep_score,         journal_entries.sleep_score),
-            weight              = COALESCE(EXCLUDED.weight,              journal_entries.weight),
-            spo2                = COALESCE(EXCLUDED.spo2,                journal_entries.spo2),
-            respiration_rate    = COALESCE(EXCLUDED.respiration_rate,    journal_entries.respiration_rate),
-            vo2max              = COALESCE(EXCLUDED.vo2max,              journal_entries.vo2max),
-            updated_at          = NOW()
-    """, (user_id, date_str, hrv_value, resting_hr, sleep_secs,
-          sleep_score, weight, spo2, respiration_rate, vo2max))
-
-    logger.info(
-        f"[intervals.icu] Synced wellness for user {user_id} on {date_str}: "
-        f"hrv={hrv_value}, rhr={resting_hr}, sleep={sleep_secs}s, "
-        f"weight={weight}, spo2={spo2}, resp={respiration_rate}, vo2max={vo2max}"
-    )
-    return True
+        return 0
+
+    if not rows:
+        logger.debug(f"[intervals.icu] No wellness data for user {user_id} from {oldest} to {newest}")
+        return 0
+
+    written = upsert_wellness_rows(rows)
+    logger.info(f"[intervals.icu] Synced {written} wellness days for user {user_id} ({oldest}..{newest})")
+    return written
+
+
+def sync_wellness_for_user(user_id: int, api_key: str, athlete_id: str, target_date: date) -> bool:
+    """
+    Fetch one day of wellness data from intervals.icu and upsert into journal_entries.
+
+    Returns True if data was found and written, False if no data for that date.
+    """
+    return sync_wellness_range(user_id, api_key, athlete_id, target_date, target_date) > 0
+
+
+def sync_users(users: List[Dict], oldest: date, newest: date, workers: int = SYNC_WORKERS) -> dict:
+    """
+    Sync oldest..newest for many users concurrently.
+
+    users are user_settings rows (id, intervals_icu_api_key, intervals_icu_athlete_id).
+    Rows are flushed in multi-row upserts as users finish. Counts are user-days:
+    synced (written), skipped (no data) and errors (request or write failed).
+    """
+    days = (newest - oldest).days + 1
+    synced = skipped = errors = 0
+    pending: List[Tuple] = []
+
+    def flush():
+        nonlocal synced, errors, pending
+        batch, pending = pending, []
+        try:
+            synced += upsert_wellness_rows(batch)
+        except Exception as e:
+            logger.error(f"[intervals.icu] Wellness upsert of {len(batch)} rows failed: {e}", exc_info=True)
+            errors += len(batch)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(users))),
+                            thread_name_prefix='intervals-icu-sync') as pool:
+        futures = {
+            pool.submit(fetch_wellness_rows, row["id"], row["intervals_icu_api_key"],
+                        row["intervals_icu_athlete_id"], oldest, newest): row["id"]
+            for row in users
+        }
+        for future in as_completed(futures):
+            user_id = futures[future]
+            try:
+                rows = future.result()
+            except requests.RequestException as e:
+                logger.error(f"[intervals.icu] API request failed for user {user_id}: {e}")
+                errors += days
+                continue
+            except Exception as e:
+                logger.error(f"[intervals.icu] Unexpected error for user {user_id}: {e}", exc_info=True)
+                errors += days
+                continue
+            skipped += days - len(rows)
+            pending.extend(rows)
+            if len(pending) >= UPSERT_BATCH_ROWS:
+                flush()
+    if pending:
+        flush()
+
+    return {"synced": synced, "skipped": skipped, "errors": errors}
+
+
+def _connected_users(user_ids: Optional[Iterable[int]] = None) -> List[Dict]:
+    query = """SELECT id, intervals_icu_api_key, intervals_icu_athlete_id
+               FROM user_settings
+               WHERE intervals_icu_api_key IS NOT NULL
+                 AND intervals_icu_athlete_id IS NOT NULL"""
+    if user_ids is None:
+        return execute_query(query, fetch=True) or []
+    return execute_query(query + " AND id = ANY(%s)", ([int(u) for u in user_ids],), fetch=True) or []
 
 
 def run_daily_sync(target_date: date = None) -> dict:
@@ -103,38 +231,35 @@ def run_daily_sync(target_date: date = None) -> dict:
     Returns summary: {synced: N, skipped: N, errors: N}
     """
     if target_date is not None:
-        dates_to_sync = [target_date]
+        oldest = newest = target_date
     else:
-        today = date.today()
-        dates_to_sync = [today - timedelta(days=1), today]
-
-    users = execute_query(
-        """SELECT id, intervals_icu_api_key, intervals_icu_athlete_id
-           FROM user_settings
-           WHERE intervals_icu_api_key IS NOT NULL
-             AND intervals_icu_athlete_id IS NOT NULL""",
-        fetch=True
-    )
+        newest = date.today()
+        oldest = newest - timedelta(days=1)
 
+    users = _connected_users()
     if not users:
         logger.info("[intervals.icu] No users with intervals.icu credentials — skipping sync")
         return {"synced": 0, "skipped": 0, "errors": 0}
 
-    synced = skipped = errors = 0
-    for row in users:
-        user_id    = row["id"]
-        api_key    = row["intervals_icu_api_key"]
-        athlete_id = row["intervals_icu_athlete_id"]
-        for d in dates_to_sync:
-            try:
-                result = sync_wellness_for_user(user_id, api_key, athlete_id, d)
-                if result:
-                    synced += 1
-                else:
-                    skipped += 1
-            except Exception as e:
-                logger.error(f"[intervals.icu] Unexpected error for user {user_id} on {d}: {e}", exc_info=True)
-                errors += 1
+    summary = sync_users(users, oldest, newest)
+    logger.info(f"[intervals.icu] Daily sync complete: synced={summary['synced']}, "
+                f"skipped={summary['skipped']}, errors={summary['errors']}")
+    return summary
 
-    logger.info(f"[intervals.icu] Daily sync complete: synced={synced}, skipped={skipped}, errors={errors}")
-    return {"synced": synced, "skipped": skipped, "errors": errors}
+
+def run_backfill(days: int = BACKFILL_DAYS, user_ids: Optional[Iterable[int]] = None,
+                 newest: date = None) -> dict:
+    """
+    Pull `days` of wellness history ending at newest (default today) for the given
+    users (default: everyone connected), BACKFILL_CHUNK_DAYS per request.
+    Returns the same summary as run_daily_sync.
+    """
+    newest = newest or date.today()
+    oldest = newest - timedelta(days=max(1, days) - 1)
+    users = _connected_users(user_ids)
+    if not users:
+        return {"synced": 0, "skipped": 0, "errors": 0}
+
+    summary = sync_users(users, oldest, newest)
+    logger.info(f"[intervals.icu] Backfill {oldest}..{newest} for {len(users)} users: {summary}")
+    return summary
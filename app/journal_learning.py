@@ -0,0 +1,280 @@
+# journal_learning.py
+
+"""
+Durable queue for the learning work that follows a journal save.
+
+POST /api/journal used to generate the activity autopsy, classify the deviation,
+update the athlete model and regenerate tomorrow's decision before returning, so
+the request held a worker thread through two or three LLM round trips. The route
+now commits the journal row and calls enqueue(); worker threads claim jobs from
+journal_learning_jobs and run the handler registered with register_handler()
+(strava_app._run_journal_learning). Clients poll get_status() through
+GET /api/journal/learning-status.
+
+- Jobs are keyed by (user_id, date). Saving the same day again while its job is
+  pending coalesces into that job; saving while it runs bumps its generation, and
+  the worker requeues it on completion so the newest entry is always learned from.
+- Claims use FOR UPDATE SKIP LOCKED with a lease, so every process can run workers
+  and a job left 'running' by a process that died is reclaimed once its lease ends
+  (or failed, if that was its last attempt).
+- A handler exception retries the job with backoff up to MAX_ATTEMPTS, then marks
+  it failed. The handler raises when the autopsy or recommendation step raised, so
+  those are retried; steps it can go without are reported in its result.
+- Steps with side effects that must not repeat (a paid autopsy call, the athlete
+  model update) are recorded in the job's steps column for the current generation,
+  and a retry skips them. A new save starts a new generation with no steps.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import db_utils
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_LEARNING_WORKERS = int(os.environ.get('JOURNAL_LEARNING_WORKERS', '2'))
+MAX_ATTEMPTS = 3
+LEASE_SECONDS = 600  # Longer than any autopsy + decision run
+RETRY_DELAY_SECONDS = 30  # Multiplied by the attempt number
+IDLE_POLL_SECONDS = 15  # Picks up retries and jobs enqueued by other processes
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_ENQUEUE_SQL = """
+    INSERT INTO journal_learning_jobs
+        (user_id, date, is_rest_day, status, generation, attempts, requested_at, available_at)
+    VALUES (%s, %s, %s, 'pending', 1, 0, NOW(), NOW())
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        is_rest_day = EXCLUDED.is_rest_day,
+        status = CASE WHEN journal_learning_jobs.status = 'running' THEN 'running' ELSE 'pending' END,
+        generation = journal_learning_jobs.generation + 1,
+        attempts = 0,
+        steps = '{}'::jsonb,
+        requested_at = NOW(),
+        available_at = NOW(),
+        result = NULL,
+        error = NULL
+    RETURNING status, generation
+"""
+
+# A lease that ran out on the last attempt (the worker died mid-run every time)
+# fails the job rather than reclaiming it again
+_CLAIM_SQL = """
+    WITH abandoned AS (
+        UPDATE journal_learning_jobs
+        SET status = 'failed',
+            finished_at = NOW(),
+            lease_expires_at = NULL,
+            error = 'Lease expired on the final attempt'
+        WHERE status = 'running' AND lease_expires_at < NOW() AND attempts >= %(max_attempts)s
+    )
+    UPDATE journal_learning_jobs j
+    SET status = 'running',
+        attempts = j.attempts + 1,
+        started_at = NOW(),
+        lease_expires_at = NOW() + make_interval(secs => %(lease)s)
+    FROM (
+        SELECT user_id, date FROM journal_learning_jobs
+        WHERE (status = 'pending' AND available_at <= NOW())
+           OR (status = 'running' AND lease_expires_at < NOW() AND attempts < %(max_attempts)s)
+        ORDER BY requested_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ) next_job
+    WHERE j.user_id = next_job.user_id AND j.date = next_job.date
+    RETURNING j.user_id, j.date, j.is_rest_day, j.generation, j.attempts, j.steps
+"""
+
+# Only for the generation that ran the step; a newer save has cleared steps
+_RECORD_STEP_SQL = """
+    UPDATE journal_learning_jobs
+    SET steps = steps || jsonb_build_object(%(step)s, %(output)s::jsonb)
+    WHERE user_id = %(user_id)s AND date = %(date)s AND generation = %(generation)s
+"""
+
+# A newer save during the run requeues the job instead of finishing it
+_COMPLETE_SQL = """
+    UPDATE journal_learning_jobs
+    SET status = CASE WHEN generation = %(generation)s THEN 'done' ELSE 'pending' END,
+        result = CASE WHEN generation = %(generation)s THEN %(result)s::jsonb END,
+        attempts = CASE WHEN generation = %(generation)s THEN attempts ELSE 0 END,
+        finished_at = NOW(),
+        lease_expires_at = NULL,
+        error = NULL
+    WHERE user_id = %(user_id)s AND date = %(date)s
+"""
+
+_FAIL_SQL = """
+    UPDATE journal_learning_jobs
+    SET status = CASE
+            WHEN generation <> %(generation)s THEN 'pending'
+            WHEN attempts >= %(max_attempts)s THEN 'failed'
+            ELSE 'pending'
+        END,
+        attempts = CASE WHEN generation <> %(generation)s THEN 0 ELSE attempts END,
+        available_at = CASE
+            WHEN generation <> %(generation)s THEN NOW()
+            ELSE NOW() + make_interval(secs => %(delay)s * attempts)
+        END,
+        finished_at = NOW(),
+        lease_expires_at = NULL,
+        error = %(error)s
+    WHERE user_id = %(user_id)s AND date = %(date)s
+"""
+
+_handler: Optional[Callable[..., Dict]] = None
+_wake = threading.Event()
+_workers = []
+_workers_pid = None
+_workers_lock = threading.Lock()
+
+
+class JobSteps:
+    """
+    Steps a job finished on earlier attempts of its current generation.
+
+    Usage (inside a handler):
+        if 'autopsy' not in steps:
+            ...
+            steps.record('autopsy', {'alignment_score': 7})
+        output = steps.get('autopsy')
+
+    JobSteps() with no job keeps the record in memory only.
+    """
+
+    def __init__(self, job: Optional[Dict] = None):
+        self.job = job
+        self.completed = dict((job or {}).get('steps') or {})
+
+    def __contains__(self, step: str) -> bool:
+        return step in self.completed
+
+    def get(self, step: str) -> Optional[Dict]:
+        return self.completed.get(step)
+
+    def record(self, step: str, output: Optional[Dict] = None) -> None:
+        output = output or {}
+        self.completed[step] = output
+        if self.job is not None:
+            db_utils.execute_query(_RECORD_STEP_SQL, {
+                'step': step, 'output': json.dumps(output, default=str),
+                'user_id': self.job['user_id'], 'date': self.job['date'],
+                'generation': self.job['generation'],
+            })
+
+
+def register_handler(handler: Callable[..., Dict]) -> None:
+    """Set the pipeline workers run: handler(user_id, date_str, is_rest_day, steps) -> result dict"""
+    global _handler
+    _handler = handler
+
+
+def enqueue(user_id: int, date_str: str, is_rest_day: bool) -> Dict:
+    """Queue (or coalesce into) the learning job for one journal day and wake a worker"""
+    rows = db_utils.execute_query(_ENQUEUE_SQL, (user_id, date_str, bool(is_rest_day)), fetch=True)
+    job = dict(rows[0]) if rows else {'status': PENDING, 'generation': 1}
+    start_workers()
+    _wake.set()
+    return {'status': job['status'], 'generation': job['generation']}
+
+
+def get_status(user_id: int, date_str: str) -> Optional[Dict]:
+    """The learning job for a journal day, or None if none was queued"""
+    rows = db_utils.execute_query(
+        """
+        SELECT status, generation, attempts, is_rest_day, requested_at, started_at,
+               finished_at, result, error
+        FROM journal_learning_jobs
+        WHERE user_id = %s AND date = %s
+        """,
+        (user_id, date_str),
+        fetch=True
+    )
+    if not rows:
+        return None
+    job = dict(rows[0])
+    if job['status'] in (PENDING, RUNNING):
+        start_workers()  # e.g. this process restarted with jobs still queued
+    return job
+
+
+def claim_next() -> Optional[Dict]:
+    """Lease the oldest runnable job, or return None when the queue is empty"""
+    rows = db_utils.execute_query(_CLAIM_SQL, {'lease': LEASE_SECONDS, 'max_attempts': MAX_ATTEMPTS},
+                                  fetch=True)
+    if not rows:
+        return None
+    job = dict(rows[0])
+    job['date'] = str(job['date'])
+    return job
+
+
+def complete(job: Dict, result: Dict) -> None:
+    db_utils.execute_query(_COMPLETE_SQL, {
+        'generation': job['generation'], 'result': json.dumps(result, default=str),
+        'user_id': job['user_id'], 'date': job['date'],
+    })
+
+
+def fail(job: Dict, error: str) -> None:
+    db_utils.execute_query(_FAIL_SQL, {
+        'generation': job['generation'], 'max_attempts': MAX_ATTEMPTS, 'delay': RETRY_DELAY_SECONDS,
+        'error': error[:2000], 'user_id': job['user_id'], 'date': job['date'],
+    })
+
+
+def run_once(handler: Optional[Callable[..., Dict]] = None) -> bool:
+    """Claim and run one job. Returns False when there was nothing to run."""
+    handler = handler or _handler
+    if handler is None:
+        raise RuntimeError('No journal learning handler registered')
+    job = claim_next()
+    if job is None:
+        return False
+    started = time.time()
+    try:
+        result = handler(job['user_id'], job['date'], job['is_rest_day'], JobSteps(job))
+    except Exception as e:
+        logger.error(f"Journal learning for user {job['user_id']} on {job['date']} failed "
+                     f"(attempt {job['attempts']}/{MAX_ATTEMPTS}): {e}", exc_info=True)
+        fail(job, str(e))
+        return True
+    complete(job, result or {})
+    logger.info(f"Journal learning for user {job['user_id']} on {job['date']} finished "
+                f"in {time.time() - started:.1f}s")
+    return True
+
+
+def _worker_loop():
+    while True:
+        try:
+            if run_once():
+                continue
+        except Exception as e:
+            logger.error(f"Journal learning worker error: {e}")
+        _wake.wait(IDLE_POLL_SECONDS)
+        _wake.clear()
+
+
+def start_workers(count: int = JOURNAL_LEARNING_WORKERS) -> None:
+    """Start this process's worker threads once (again after a fork)"""
+    global _workers_pid
+    if _handler is None or (_workers_pid == os.getpid() and _workers):
+        return
+    with _workers_lock:
+        if _workers_pid == os.getpid() and _workers:
+            return
+        _workers.clear()
+        for index in range(count):
+            thread = threading.Thread(target=_worker_loop, name=f'journal-learning-{index}', daemon=True)
+            thread.start()
+            _workers.append(thread)
+        _workers_pid = os.getpid()
+        logger.info(f"Started {count} journal learning workers")
@@ -0,0 +1,320 @@
+# landing_chart_cache.py
+
+"""
+Landing chart cache: the public /api/landing-chart-data payload, built in the
+background and served from memory.
+
+The landing page is unauthenticated, so every view (and every bot) used to run
+the 60-day activities query for the admin account or regenerate the demo
+series. Instead the payload is built at most once per LANDING_CHART_REFRESH_SECONDS
+per process, serialized once, gzipped once, and served as bytes with an ETag
+and a public Cache-Control:
+
+- a daemon thread rebuilds the snapshot shortly before it expires
+- a request that finds no snapshot (cold start) or an expired one triggers a
+  single-flight rebuild; concurrent misses wait for that one build rather than
+  each querying the database, and callers holding a stale snapshot are served
+  it while the rebuild runs
+- a failed build keeps the last good snapshot (or serves the static fallback
+  series on a cold start, with no-store so no cache outlives the outage) and
+  retries after ERROR_RETRY_SECONDS
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+import db_utils
+from static_assets import StaticAsset, etag_matches
+
+logger = logging.getLogger(__name__)
+
+LANDING_CHART_USER_ID = 1  # admin account showcased on the landing page
+REFRESH_SECONDS = int(os.environ.get('LANDING_CHART_REFRESH_SECONDS', '900'))
+ERROR_RETRY_SECONDS = 60
+BUILD_WAIT_SECONDS = 30  # how long a concurrent miss waits for the in-flight build
+CLIENT_MAX_AGE_SECONDS = 300
+
+# Realistic training patterns for the demo series (4 weeks: build, peak,
+# divergence/overtraining risk, recovery)
+DEMO_TRAINING_PATTERNS = [
+    # Week 1: Building up
+    {'external': 0.8, 'internal': 0.7, 'distance': 5.2, 'elevation': 800, 'type': 'Trail Run'},
+    {'external': 0.9, 'internal': 0.8, 'distance': 6.1, 'elevation': 950, 'type': 'Trail Run'},
+    {'external': 1.1, 'internal': 1.0, 'distance': 7.5, 'elevation': 1200, 'type': 'Trail Run'},
+    {'external': 0.7, 'internal': 0.8, 'distance': 3.2, 'elevation': 400, 'type': 'Easy Run'},
+    {'external': 1.2, 'internal': 1.1, 'distance': 8.2, 'elevation': 1400, 'type': 'Trail Run'},
+    {'external': 0.6, 'internal': 0.7, 'distance': 2.8, 'elevation': 200, 'type': 'Recovery'},
+    {'external': 0.8, 'internal': 0.9, 'distance': 4.1, 'elevation': 600, 'type': 'Easy Run'},
+
+    # Week 2: Peak training
+    {'external': 1.3, 'internal': 1.2, 'distance': 9.5, 'elevation': 1800, 'type': 'Trail Run'},
+    {'external': 1.4, 'internal': 1.3, 'distance': 10.2, 'elevation': 2100, 'type': 'Trail Run'},
+    {'external': 0.9, 'internal': 1.0, 'distance': 5.8, 'elevation': 900, 'type': 'Easy Run'},
+    {'external': 1.5, 'internal': 1.4, 'distance': 11.1, 'elevation': 2400, 'type': 'Trail Run'},
+    {'external': 1.6, 'internal': 1.5, 'distance': 12.3, 'elevation': 2800, 'type': 'Trail Run'},
+    {'external': 0.7, 'internal': 0.8, 'distance': 3.5, 'elevation': 500, 'type': 'Recovery'},
+    {'external': 1.1, 'internal': 1.2, 'distance': 7.2, 'elevation': 1100, 'type': 'Trail Run'},
+
+    # Week 3: Showing divergence (overtraining risk)
+    {'external': 1.7, 'internal': 1.6, 'distance': 13.1, 'elevation': 3200, 'type': 'Trail Run'},
+    {'external': 1.8, 'internal': 1.7, 'distance': 14.2, 'elevation': 3600, 'type': 'Trail Run'},
+    {'external': 1.9, 'internal': 1.8, 'distance': 15.5, 'elevation': 4000, 'type': 'Trail Run'},
+    {'external': 0.8, 'internal': 0.9, 'distance': 4.5, 'elevation': 700, 'type': 'Easy Run'},
+    {'external': 2.0, 'internal': 1.9, 'distance': 16.8, 'elevation': 4500, 'type': 'Trail Run'},
+    {'external': 2.1, 'internal': 2.0, 'distance': 18.1, 'elevation': 5000, 'type': 'Trail Run'},
+    {'external': 0.6, 'internal': 0.7, 'distance': 2.9, 'elevation': 300, 'type': 'Recovery'},
+    {'external': 1.2, 'internal': 1.3, 'distance': 8.5, 'elevation': 1300, 'type': 'Trail Run'},
+
+    # Week 4: Recovery and balance
+    {'external': 0.9, 'internal': 1.0, 'distance': 6.2, 'elevation': 900, 'type': 'Trail Run'},
+    {'external': 1.0, 'internal': 1.1, 'distance': 7.1, 'elevation': 1100, 'type': 'Trail Run'},
+    {'external': 0.8, 'internal': 0.9, 'distance': 5.5, 'elevation': 800, 'type': 'Easy Run'},
+    {'external': 1.1, 'internal': 1.0, 'distance': 7.8, 'elevation': 1200, 'type': 'Trail Run'},
+    {'external': 0.7, 'internal': 0.8, 'distance': 4.2, 'elevation': 600, 'type': 'Recovery'},
+    {'external': 1.0, 'internal': 1.1, 'distance': 6.9, 'elevation': 1000, 'type': 'Trail Run'},
+    {'external': 0.9, 'internal': 0.8, 'distance': 5.8, 'elevation': 850, 'type': 'Easy Run'},
+]
+
+# Served only when the database is unreachable and nothing has been built yet
+FALLBACK_DATA = [
+    {'dateFormatted': '11/1', 'acute_chronic_ratio': 0.9, 'trimp_acute_chronic_ratio': 0.8, 'distance_miles': 5.2, 'elevation_gain_feet': 800, 'trimp': 75, 'type': 'Trail Run', 'name': 'Morning Trail'},
+    {'dateFormatted': '11/5', 'acute_chronic_ratio': 1.1, 'trimp_acute_chronic_ratio': 1.0, 'distance_miles': 7.1, 'elevation_gain_feet': 1200, 'trimp': 85, 'type': 'Trail Run', 'name': 'Hill Training'},
+    {'dateFormatted': '11/10', 'acute_chronic_ratio': 1.3, 'trimp_acute_chronic_ratio': 1.2, 'distance_miles': 9.5, 'elevation_gain_feet': 1800, 'trimp': 95, 'type': 'Trail Run', 'name': 'Long Run'},
+    {'dateFormatted': '11/15', 'acute_chronic_ratio': 1.0, 'trimp_acute_chronic_ratio': 1.1, 'distance_miles': 6.8, 'elevation_gain_feet': 1100, 'trimp': 80, 'type': 'Trail Run', 'name': 'Recovery Run'},
+    {'dateFormatted': '11/20', 'acute_chronic_ratio': 0.8, 'trimp_acute_chronic_ratio': 0.9, 'distance_miles': 4.2, 'elevation_gain_feet': 600, 'trimp': 65, 'type': 'Easy Run', 'name': 'Easy Day'},
+    {'dateFormatted': '11/25', 'acute_chronic_ratio': 1.2, 'trimp_acute_chronic_ratio': 1.3, 'distance_miles': 8.5, 'elevation_gain_feet': 1400, 'trimp': 90, 'type': 'Trail Run', 'name': 'Tempo Run'},
+    {'dateFormatted': '11/30', 'acute_chronic_ratio': 0.9, 'trimp_acute_chronic_ratio': 0.8, 'distance_miles': 5.5, 'elevation_gain_feet': 850, 'trimp': 70, 'type': 'Trail Run', 'name': 'Easy Trail'}
+]
+
+
+def _payload(data, is_demo: bool) -> dict:
+    return {
+        'success': True,
+        'data': data,
+        'dataPoints': len(data),
+        'dateRange': {
+            'start': data[0]['date'] if data else None,
+            'end': data[-1]['date'] if data else None
+        },
+        'isDemo': is_demo
+    }
+
+
+def _demo_data() -> list:
+    """30 days of demo chart points with some realistic variation"""
+    base_date = datetime.now() - timedelta(days=30)
+    demo_data = []
+    for i, pattern in enumerate(DEMO_TRAINING_PATTERNS):
+        date = base_date + timedelta(days=i)
+        demo_data.append({
+            'date': date.strftime('%Y-%m-%d'),
+            'dateFormatted': f"{date.month}/{date.day}",
+            'acute_chronic_ratio': round(pattern['external'] + random.uniform(-0.1, 0.1), 2),
+            'trimp_acute_chronic_ratio': round(pattern['internal'] + random.uniform(-0.1, 0.1), 2),
+            'distance_miles': round(pattern['distance'] + random.uniform(-0.5, 0.5), 1),
+            'elevation_gain_feet': int(pattern['elevation'] + random.uniform(-100, 100)),
+            'trimp': int(50 + pattern['external'] * 30 + random.uniform(-10, 10)),
+            'type': pattern['type'],
+            'name': f"{pattern['type']} - {pattern['distance']}mi"
+        })
+    return demo_data
+
+
+def build_landing_chart_payload() -> dict:
+    """
+    The landing chart payload: the admin user's last 60 days, or the demo
+    series when there are none. Raises on database errors so the cache can
+    keep its last good snapshot.
+    """
+    activities = db_utils.execute_query(
+        """
+        SELECT date, acute_chronic_ratio, trimp_acute_chronic_ratio,
+               distance_miles, elevation_gain_feet, trimp, type, name
+        FROM activities
+        WHERE user_id = %s
+          AND date >= CURRENT_DATE - INTERVAL '60 days'
+          AND date <= CURRENT_DATE
+        ORDER BY date ASC
+        """,
+        (LANDING_CHART_USER_ID,),
+        fetch=True
+    )
+
+    if not activities:
+        logger.info("No real activities found for landing page chart, using demo data")
+        return _payload(_demo_data(), is_demo=True)
+
+    chart_data = []
+    for activity in activities:
+        date_str = str(activity['date'])[:10]
+        date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+        chart_data.append({
+            'date': date_str,
+            'dateFormatted': f"{date_obj.month}/{date_obj.day}",
+            'acute_chronic_ratio': round(activity.get('acute_chronic_ratio') or 0, 2),
+            'trimp_acute_chronic_ratio': round(activity.get('trimp_acute_chronic_ratio') or 0, 2),
+            'distance_miles': round(activity.get('distance_miles') or 0, 1),
+            'elevation_gain_feet': int(activity.get('elevation_gain_feet') or 0),
+            'trimp': int(activity.get('trimp') or 0),
+            'type': activity.get('type', 'Unknown'),
+            'name': activity.get('name', 'Workout')
+        })
+
+    logger.info(f"Built {len(chart_data)} real data points for landing page chart")
+    return _payload(chart_data, is_demo=False)
+
+
+def fallback_landing_chart_payload() -> dict:
+    """Static demo series so the chart still renders when the build fails (the error is only logged)"""
+    return {
+        'success': True,
+        'data': FALLBACK_DATA,
+        'dataPoints': len(FALLBACK_DATA),
+        'dateRange': {'start': '2024-11-01', 'end': '2024-11-30'},
+        'isDemo': True,
+        'isFallback': True
+    }
+
+
+def serialize_payload(payload: dict) -> StaticAsset:
+    """JSON + gzip bytes for a payload, fingerprinted for the ETag"""
+    body = json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+    return StaticAsset(
+        rel_path='api/landing-chart-data',
+        body=body,
+        content_type='application/json',
+        fingerprint=hashlib.sha256(body).hexdigest()[:16],
+        variants={'gzip': gzip.compress(body, compresslevel=9, mtime=0)},
+    )
+
+
+class LandingChartCache:
+    """
+    One serialized landing chart snapshot per process with single-flight refresh.
+
+    Usage:
+        snapshot = landing_chart_cache.get()   # StaticAsset
+    """
+
+    def __init__(self, builder: Callable[[], dict] = build_landing_chart_payload,
+                 fallback: Callable[[], dict] = fallback_landing_chart_payload,
+                 refresh_seconds: int = REFRESH_SECONDS, background: bool = True,
+                 clock: Callable[[], float] = time.monotonic):
+        self.builder = builder
+        self.fallback = fallback
+        self.refresh_seconds = refresh_seconds
+        self.background = background
+        self.clock = clock
+        self.builds = 0
+        self._snapshot: Optional[StaticAsset] = None
+        self._fallback_fingerprint: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._inflight: Optional[threading.Event] = None
+        self._refresher: Optional[threading.Thread] = None
+
+    def get(self) -> StaticAsset:
+        """The current snapshot, rebuilding it (once, for all callers) when missing or expired"""
+        self._ensure_refresher()
+        snapshot = self._snapshot
+        if snapshot is not None and self.clock() < self._expires_at:
+            return snapshot
+        return self.refresh()
+
+    def refresh(self) -> StaticAsset:
+        """Rebuild the snapshot unless a rebuild is already in flight"""
+        with self._lock:
+            event = self._inflight
+            leader = event is None
+            if leader:
+                event = self._inflight = threading.Event()
+
+        if leader:
+            try:
+                self._build()
+            finally:
+                with self._lock:
+                    self._inflight = None
+                event.set()
+            return self._snapshot
+
+        if self._snapshot is None:
+            event.wait(BUILD_WAIT_SECONDS)
+        return self._snapshot or self._fallback_snapshot()
+
+    def is_fallback(self, snapshot: StaticAsset) -> bool:
+        """Whether a snapshot is the static fallback rather than a built payload"""
+        return snapshot.fingerprint == self._fallback_fingerprint
+
+    def _fallback_snapshot(self) -> StaticAsset:
+        snapshot = serialize_payload(self.fallback())
+        self._fallback_fingerprint = snapshot.fingerprint
+        return snapshot
+
+    def _build(self):
+        self.builds += 1
+        try:
+            snapshot = serialize_payload(self.builder())
+            expires_at = self.clock() + self.refresh_seconds
+        except Exception as e:
+            logger.error(f"Error building landing page chart data: {str(e)}")
+            expires_at = self.clock() + ERROR_RETRY_SECONDS
+            if self._snapshot is not None:
+                logger.info("Keeping previous landing chart snapshot until the retry")
+                snapshot = self._snapshot
+            else:
+                logger.info("Serving fallback demo data due to error")
+                snapshot = self._fallback_snapshot()
+        self._snapshot = snapshot
+        self._expires_at = expires_at
+
+    def _ensure_refresher(self):
+        if not self.background or self._refresher is not None:
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop,
+                                                   name='landing-chart-refresher', daemon=True)
+                self._refresher.start()
+
+    def _refresh_loop(self):
+        # Rebuild a little before expiry so request threads keep hitting memory
+        lead = min(30, self.refresh_seconds / 10)
+        while True:
+            time.sleep(max(self._expires_at - lead - self.clock(), 1))
+            if self.clock() >= self._expires_at - lead:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Landing chart refresher error: {str(e)}")
+
+
+landing_chart_cache = LandingChartCache()
+
+
+def landing_chart_response(cache: Optional[LandingChartCache] = None):
+    """Flask response for /api/landing-chart-data: gzip when accepted, ETag, 304"""
+    from flask import request, Response
+
+    cache = cache or landing_chart_cache
+    snapshot = cache.get()
+    coding, body, etag = snapshot.select(request.headers.get('Accept-Encoding', ''))
+    headers = {
+        'ETag': etag,
+        # The fallback stands in for a failed build, so browsers and proxies must not keep it
+        'Cache-Control': 'no-store' if cache.is_fallback(snapshot) else f'public, max-age={CLIENT_MAX_AGE_SECONDS}',
+        'Vary': 'Accept-Encoding',
+    }
+    if etag_matches(request.headers.get('If-None-Match', ''), (etag, snapshot.etag)):
+        return Response(status=304, headers=headers)
+    if coding:
+        headers['Content-Encoding'] = coding
+    return Response(body, mimetype=snapshot.content_type, headers=headers)
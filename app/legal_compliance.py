@@ -4,15 +4,31 @@ Legal Compliance Tracking Module
 This module handles tracking and validation of user acceptance of legal documents
 (Terms and Conditions, Privacy Policy, Medical Disclaimer) with version control
 and audit trail functionality.
+
+Compliance is checked on hot user flows but changes rarely, so each user's state is
+reduced to two bitmaps over DOCUMENT_BITS (documents accepted, and documents whose
+latest accepted version is still current) and cached in memory for
+LEGAL_STATUS_TTL_SECONDS. log_legal_acceptance()/revoke_legal_acceptance() invalidate
+a user's entry; entries are keyed by the versions fingerprint, so a document version
+bump in legal_document_versioning invalidates every entry.
+
+Admin statistics read legal_acceptance_counts - users per acceptance bitmap - which a
+trigger on user_settings keeps current for every writer (see ACCEPTANCE_COUNTS_DDL and
+scripts/migrations/add_legal_acceptance_counts_2026-10-18.py).
 """
 
+import copy
 import logging
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Any
 from flask import request
 import json
 
 from db_utils import get_db_connection, execute_query
+from user_profile_cache import invalidate_user_profile
 from legal_document_versioning import (
     LegalDocumentVersioning, 
     validate_legal_acceptance, 
@@ -24,6 +40,146 @@ logger = logging.getLogger(__name__)
 # Global versioning instance
 legal_versioning = LegalDocumentVersioning()
 
+DOCUMENT_BITS = {'terms': 1, 'privacy': 2, 'disclaimer': 4}
+ALL_DOCUMENTS = 7
+
+ACCEPTED_AT_COLUMNS = {
+    'terms': 'terms_accepted_at',
+    'privacy': 'privacy_policy_accepted_at',
+    'disclaimer': 'disclaimer_accepted_at',
+}
+
+LEGAL_STATUS_TTL_SECONDS = 300
+
+# One round trip: the acceptance timestamps and the latest accepted version per document
+COMPLIANCE_STATE_SQL = """
+SELECT us.terms_accepted_at, us.privacy_policy_accepted_at, us.disclaimer_accepted_at,
+       us.account_status, us.registration_date,
+       (SELECT json_object_agg(latest.document_type, latest.version)
+        FROM (SELECT DISTINCT ON (document_type) document_type, version
+              FROM legal_compliance
+              WHERE user_id = us.id
+              ORDER BY document_type, accepted_at DESC, id DESC) latest) AS versions
+FROM user_settings us
+WHERE us.id = %s
+"""
+
+# Users per acceptance bitmap, maintained by a trigger on user_settings so signup,
+# onboarding, account deletion and the tracker all keep it current
+ACCEPTANCE_COUNTS_DDL = """
+CREATE TABLE IF NOT EXISTS legal_acceptance_counts (
+    acceptance_bits SMALLINT PRIMARY KEY,
+    users BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION legal_acceptance_bits(terms TIMESTAMP, privacy TIMESTAMP, disclaimer TIMESTAMP)
+RETURNS SMALLINT LANGUAGE sql IMMUTABLE AS $$
+    SELECT ((terms IS NOT NULL)::int
+            | ((privacy IS NOT NULL)::int << 1)
+            | ((disclaimer IS NOT NULL)::int << 2))::smallint
+$$;
+
+CREATE OR REPLACE FUNCTION count_legal_acceptance() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    old_bits SMALLINT;
+    new_bits SMALLINT;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        old_bits := legal_acceptance_bits(OLD.terms_accepted_at, OLD.privacy_policy_accepted_at,
+                                          OLD.disclaimer_accepted_at);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        new_bits := legal_acceptance_bits(NEW.terms_accepted_at, NEW.privacy_policy_accepted_at,
+                                          NEW.disclaimer_accepted_at);
+    END IF;
+    IF old_bits IS NOT DISTINCT FROM new_bits THEN
+        RETURN NULL;
+    END IF;
+    IF old_bits IS NOT NULL THEN
+        UPDATE legal_acceptance_counts SET users = users - 1 WHERE acceptance_bits = old_bits;
+    END IF;
+    IF new_bits IS NOT NULL THEN
+        INSERT INTO legal_acceptance_counts (acceptance_bits, users) VALUES (new_bits, 1)
+        ON CONFLICT (acceptance_bits) DO UPDATE SET users = legal_acceptance_counts.users + 1;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS user_settings_legal_acceptance_counts ON user_settings;
+CREATE TRIGGER user_settings_legal_acceptance_counts
+AFTER INSERT OR DELETE OR UPDATE OF terms_accepted_at, privacy_policy_accepted_at, disclaimer_accepted_at
+ON user_settings
+FOR EACH ROW EXECUTE FUNCTION count_legal_acceptance();
+"""
+
+RECOUNT_SQL = """
+LOCK TABLE user_settings IN SHARE MODE;
+DELETE FROM legal_acceptance_counts;
+INSERT INTO legal_acceptance_counts (acceptance_bits, users)
+SELECT legal_acceptance_bits(terms_accepted_at, privacy_policy_accepted_at, disclaimer_accepted_at), COUNT(*)
+FROM user_settings
+GROUP BY 1;
+"""
+
+
+@dataclass(frozen=True)
+class ComplianceState:
+    """One user's legal acceptance, reduced to bitmaps over DOCUMENT_BITS"""
+    accepted: int  # An acceptance timestamp is recorded in user_settings
+    current: int  # Accepted, and the latest accepted version (if recorded) is still valid
+    accepted_at: Dict[str, Optional[datetime]]
+    versions: Dict[str, str]
+    required_updates: Dict[str, Dict]
+    account_status: Optional[str]
+    registration_date: Optional[datetime]
+    fingerprint: Tuple
+
+    @property
+    def is_compliant(self) -> bool:
+        return self.current == ALL_DOCUMENTS
+
+
+def _documents(bits: int) -> List[str]:
+    return [doc_type for doc_type, bit in DOCUMENT_BITS.items() if bits & bit]
+
+
+_states: Dict[int, tuple] = {}  # user_id -> (ComplianceState, loaded_at)
+_generations: Dict[int, int] = {}  # user_id -> bumped on every invalidation
+_epoch = 0  # Bumped when every user is invalidated
+_lock = threading.Lock()
+
+
+def invalidate_legal_status(user_id=None) -> None:
+    """Drop the cached compliance state for a user (or all users) after acceptances change"""
+    global _epoch
+    with _lock:
+        if user_id is None:
+            _epoch += 1
+            _states.clear()
+        else:
+            user_id = int(user_id)
+            _states.pop(user_id, None)
+            _generations[user_id] = _generations.get(user_id, 0) + 1
+
+
+def recount_legal_acceptances() -> Dict[int, int]:
+    """
+    Rebuild legal_acceptance_counts from user_settings.
+
+    Holds a SHARE lock on user_settings for the recount, so it is safe to run on a
+    live table; writers wait for it rather than being miscounted.
+
+    Returns:
+        Dictionary of {acceptance_bits: users}
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(RECOUNT_SQL)
+        conn.commit()
+    rows = execute_query("SELECT acceptance_bits, users FROM legal_acceptance_counts", fetch=True)
+    return {row['acceptance_bits']: row['users'] for row in rows or []}
+
 
 class LegalComplianceTracker:
     """
@@ -103,6 +259,8 @@ class LegalComplianceTracker:
                 cursor.execute(update_sql, (current_time, user_id))
                 
                 conn.commit()
+                invalidate_legal_status(user_id)
+                invalidate_user_profile(user_id)
                 
                 logger.info(f"Legal acceptance logged: user_id={user_id}, document={document_type}, version={version}")
                 return True
@@ -111,6 +269,63 @@ class LegalComplianceTracker:
             logger.error(f"Error logging legal acceptance: {str(e)}")
             return False
     
+    def get_compliance_state(self, user_id: int) -> Optional[ComplianceState]:
+        """
+        Get a user's compliance state, from the in-memory cache when it is fresh.
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            ComplianceState, or None if the user does not exist
+
+        Raises:
+            Database errors from loading the state
+        """
+        user_id = int(user_id)
+        fingerprint = self.versioning.get_versions_fingerprint()
+
+        with _lock:
+            cached = _states.get(user_id)
+            generation = (_epoch, _generations.get(user_id, 0))
+
+        if (cached and cached[0].fingerprint == fingerprint
+                and time.monotonic() - cached[1] < LEGAL_STATUS_TTL_SECONDS):
+            return cached[0]
+
+        state = self._load_compliance_state(user_id, fingerprint)
+        if state is not None:
+            with _lock:
+                # An invalidation during the query means this state may already be stale
+                if (_epoch, _generations.get(user_id, 0)) == generation:
+                    _states[user_id] = (state, time.monotonic())
+        return state
+
+    def _load_compliance_state(self, user_id: int, fingerprint: Tuple) -> Optional[ComplianceState]:
+        rows = execute_query(COMPLIANCE_STATE_SQL, (user_id,), fetch=True)
+        if not rows:
+            return None
+        row = rows[0]
+
+        accepted_at = {doc_type: row[column] for doc_type, column in ACCEPTED_AT_COLUMNS.items()}
+        versions = {doc_type: version for doc_type, version in (row['versions'] or {}).items()
+                    if doc_type in DOCUMENT_BITS}
+        required_updates = self.versioning.get_required_updates(versions)
+
+        accepted = sum(DOCUMENT_BITS[doc_type] for doc_type, at in accepted_at.items() if at)
+        outdated = sum(DOCUMENT_BITS[doc_type] for doc_type in required_updates)
+
+        return ComplianceState(
+            accepted=accepted,
+            current=accepted & ~outdated,
+            accepted_at=accepted_at,
+            versions=versions,
+            required_updates=required_updates,
+            account_status=row['account_status'],
+            registration_date=row['registration_date'],
+            fingerprint=fingerprint,
+        )
+
     def get_user_legal_status(self, user_id: int) -> Dict[str, Any]:
         """
         Get comprehensive legal compliance status for a user.
@@ -122,93 +337,42 @@ class LegalComplianceTracker:
             Dictionary with legal compliance status
         """
         try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Get user's legal acceptance timestamps - PostgreSQL syntax
-                select_sql = """
-                SELECT terms_accepted_at, privacy_policy_accepted_at, disclaimer_accepted_at,
-                       account_status, registration_date
-                FROM user_settings 
-                WHERE id = %s
-                """
-                
-                cursor.execute(select_sql, (user_id,))
-                result = cursor.fetchone()
-                
-                if not result:
-                    return {"error": "User not found"}
-                
-                terms_accepted_at, privacy_accepted_at, disclaimer_accepted_at, account_status, registration_date = result
-                
-                # Get latest acceptance records from legal_compliance table - PostgreSQL syntax
-                compliance_sql = """
-                SELECT document_type, version, accepted_at
-                FROM legal_compliance 
-                WHERE user_id = %s 
-                AND (document_type, accepted_at) IN (
-                    SELECT document_type, MAX(accepted_at)
-                    FROM legal_compliance 
-                    WHERE user_id = %s 
-                    GROUP BY document_type
-                )
-                """
-                
-                cursor.execute(compliance_sql, (user_id, user_id))
-                compliance_records = cursor.fetchall()
-                
-                # Build user versions dictionary
-                user_versions = {}
-                for doc_type, version, accepted_at in compliance_records:
-                    user_versions[doc_type] = version
-                
-                # Validate current versions
-                current_versions = get_current_legal_versions()
-                required_updates = validate_legal_acceptance(user_versions)
-                
-                # Build status response
-                status = {
-                    "user_id": user_id,
-                    "account_status": account_status,
-                    "registration_date": registration_date.isoformat() if registration_date else None,
-                    "legal_documents": {
-                        "terms": {
-                            "accepted_at": terms_accepted_at.isoformat() if terms_accepted_at else None,
-                            "version": user_versions.get("terms"),
-                            "current_version": current_versions.get("terms"),
-                            "needs_update": "terms" in required_updates
-                        },
-                        "privacy": {
-                            "accepted_at": privacy_accepted_at.isoformat() if privacy_accepted_at else None,
-                            "version": user_versions.get("privacy"),
-                            "current_version": current_versions.get("privacy"),
-                            "needs_update": "privacy" in required_updates
-                        },
-                        "disclaimer": {
-                            "accepted_at": disclaimer_accepted_at.isoformat() if disclaimer_accepted_at else None,
-                            "version": user_versions.get("disclaimer"),
-                            "current_version": current_versions.get("disclaimer"),
-                            "needs_update": "disclaimer" in required_updates
-                        }
-                    },
-                    "compliance_status": {
-                        "all_documents_accepted": all([
-                            terms_accepted_at, privacy_accepted_at, disclaimer_accepted_at
-                        ]),
-                        "all_versions_current": len(required_updates) == 0,
-                        "required_updates": required_updates
-                    }
-                }
-                
-                return status
-                
+            state = self.get_compliance_state(user_id)
         except Exception as e:
             logger.error(f"Error getting user legal status: {str(e)}")
             return {"error": f"Database error: {str(e)}"}
+
+        if state is None:
+            return {"error": "User not found"}
+
+        legal_documents = {}
+        for doc_type in DOCUMENT_BITS:
+            accepted_at = state.accepted_at[doc_type]
+            legal_documents[doc_type] = {
+                "accepted_at": accepted_at.isoformat() if accepted_at else None,
+                "version": state.versions.get(doc_type),
+                "current_version": self.versioning.get_current_version(doc_type),
+                "needs_update": doc_type in state.required_updates
+            }
+
+        return {
+            "user_id": user_id,
+            "account_status": state.account_status,
+            "registration_date": state.registration_date.isoformat() if state.registration_date else None,
+            "legal_documents": legal_documents,
+            "compliance_status": {
+                "all_documents_accepted": state.accepted == ALL_DOCUMENTS,
+                "all_versions_current": len(state.required_updates) == 0,
+                "required_updates": copy.deepcopy(state.required_updates)
+            }
+        }
     
     def validate_user_compliance(self, user_id: int) -> Tuple[bool, Dict[str, Any]]:
         """
         Validate if a user is fully compliant with all legal requirements.
+
+        Compliant means every document is accepted at a current version; this is a
+        bitmap check on the cached compliance state.
         
         Args:
             user_id: User ID
@@ -216,38 +380,24 @@ class LegalComplianceTracker:
         Returns:
             Tuple of (is_compliant, details)
         """
-        status = self.get_user_legal_status(user_id)
-        
-        if "error" in status:
-            return False, status
-        
-        # Check if all documents are accepted
-        docs = status["legal_documents"]
-        all_accepted = all([
-            docs["terms"]["accepted_at"] is not None,
-            docs["privacy"]["accepted_at"] is not None,
-            docs["disclaimer"]["accepted_at"] is not None
-        ])
-        
-        # Check if all versions are current
-        all_current = status["compliance_status"]["all_versions_current"]
-        
-        is_compliant = all_accepted and all_current
-        
+        try:
+            state = self.get_compliance_state(user_id)
+        except Exception as e:
+            logger.error(f"Error validating user compliance: {str(e)}")
+            return False, {"error": f"Database error: {str(e)}"}
+
+        if state is None:
+            return False, {"error": "User not found"}
+
         details = {
-            "is_compliant": is_compliant,
-            "all_documents_accepted": all_accepted,
-            "all_versions_current": all_current,
-            "required_updates": status["compliance_status"]["required_updates"],
-            "missing_documents": []
+            "is_compliant": state.is_compliant,
+            "all_documents_accepted": state.accepted == ALL_DOCUMENTS,
+            "all_versions_current": len(state.required_updates) == 0,
+            "required_updates": copy.deepcopy(state.required_updates),
+            "missing_documents": _documents(ALL_DOCUMENTS & ~state.accepted)
         }
         
-        # Identify missing documents
-        for doc_type, doc_info in docs.items():
-            if doc_info["accepted_at"] is None:
-                details["missing_documents"].append(doc_type)
-        
-        return is_compliant, details
+        return state.is_compliant, details
     
     def get_legal_acceptance_history(self, user_id: int, document_type: str = None) -> List[Dict]:
         """
@@ -332,6 +482,8 @@ class LegalComplianceTracker:
                 cursor.execute(update_sql, (user_id,))
                 
                 conn.commit()
+                invalidate_legal_status(user_id)
+                invalidate_user_profile(user_id)
                 
                 logger.info(f"Legal acceptance revoked: user_id={user_id}, document={document_type}")
                 return True
@@ -340,61 +492,45 @@ class LegalComplianceTracker:
             logger.error(f"Error revoking legal acceptance: {str(e)}")
             return False
     
+    def get_acceptance_counts(self) -> Dict[int, int]:
+        """
+        Get the number of users per acceptance bitmap (bits from DOCUMENT_BITS).
+
+        Returns:
+            Dictionary of {acceptance_bits: users}
+        """
+        rows = execute_query("SELECT acceptance_bits, users FROM legal_acceptance_counts", fetch=True)
+        return {row['acceptance_bits']: row['users'] for row in rows or []}
+
     def get_compliance_statistics(self) -> Dict[str, Any]:
         """
         Get compliance statistics across all users.
+
+        Read from the eight legal_acceptance_counts rows rather than scanning
+        user_settings.
         
         Returns:
             Dictionary with compliance statistics
         """
         try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Get total user count - PostgreSQL syntax
-                total_sql = "SELECT COUNT(*) as count FROM user_settings"
-                cursor.execute(total_sql)
-                result = cursor.fetchone()
-                total_users = result['count'] if result else 0
-                
-                # Get compliance counts - PostgreSQL syntax
-                compliance_sql = """
-                SELECT 
-                    COUNT(CASE WHEN terms_accepted_at IS NOT NULL THEN 1 END) as terms_accepted,
-                    COUNT(CASE WHEN privacy_policy_accepted_at IS NOT NULL THEN 1 END) as privacy_accepted,
-                    COUNT(CASE WHEN disclaimer_accepted_at IS NOT NULL THEN 1 END) as disclaimer_accepted,
-                    COUNT(CASE WHEN terms_accepted_at IS NOT NULL 
-                               AND privacy_policy_accepted_at IS NOT NULL 
-                               AND disclaimer_accepted_at IS NOT NULL THEN 1 END) as fully_compliant
-                FROM user_settings
-                """
-                
-                cursor.execute(compliance_sql)
-                result = cursor.fetchone()
-                terms_accepted, privacy_accepted, disclaimer_accepted, fully_compliant = result
-                
-                # Calculate percentages
-                stats = {
-                    "total_users": total_users,
-                    "terms_acceptance": {
-                        "count": terms_accepted,
-                        "percentage": round((terms_accepted / total_users * 100), 2) if total_users > 0 else 0
-                    },
-                    "privacy_acceptance": {
-                        "count": privacy_accepted,
-                        "percentage": round((privacy_accepted / total_users * 100), 2) if total_users > 0 else 0
-                    },
-                    "disclaimer_acceptance": {
-                        "count": disclaimer_accepted,
-                        "percentage": round((disclaimer_accepted / total_users * 100), 2) if total_users > 0 else 0
-                    },
-                    "fully_compliant": {
-                        "count": fully_compliant,
-                        "percentage": round((fully_compliant / total_users * 100), 2) if total_users > 0 else 0
-                    }
+            counts = self.get_acceptance_counts()
+            total_users = sum(counts.values())
+
+            def acceptance(bits: int) -> Dict[str, Any]:
+                count = sum(users for acceptance_bits, users in counts.items()
+                            if acceptance_bits & bits == bits)
+                return {
+                    "count": count,
+                    "percentage": round((count / total_users * 100), 2) if total_users > 0 else 0
                 }
-                
-                return stats
+
+            return {
+                "total_users": total_users,
+                "terms_acceptance": acceptance(DOCUMENT_BITS['terms']),
+                "privacy_acceptance": acceptance(DOCUMENT_BITS['privacy']),
+                "disclaimer_acceptance": acceptance(DOCUMENT_BITS['disclaimer']),
+                "fully_compliant": acceptance(ALL_DOCUMENTS)
+            }
                 
         except Exception as e:
             logger.error(f"Error getting compliance statistics: {str(e)}")
@@ -403,36 +539,15 @@ class LegalComplianceTracker:
     def get_total_users_count(self) -> int:
         """Get total number of users in the system"""
         try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute("SELECT COUNT(*) FROM users")
-                
-                result = cursor.fetchone()
-                return result[0] if result else 0
-                
+            return sum(self.get_acceptance_counts().values())
         except Exception as e:
             logger.error(f"Error getting total users count: {str(e)}")
             return 0
 
     def get_compliant_users_count(self) -> int:
-        """Get number of users who are fully compliant with all legal documents"""
+        """Get number of users who have accepted all legal documents"""
         try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    SELECT COUNT(DISTINCT u.id) 
-                    FROM users u
-                    JOIN user_settings us ON u.id = us.user_id
-                    WHERE us.legal_terms_accepted_at IS NOT NULL
-                    AND us.legal_privacy_accepted_at IS NOT NULL
-                    AND us.legal_disclaimer_accepted_at IS NOT NULL
-                """)
-                
-                result = cursor.fetchone()
-                return result[0] if result else 0
-                
+            return self.get_acceptance_counts().get(ALL_DOCUMENTS, 0)
         except Exception as e:
             logger.error(f"Error getting compliant users count: {str(e)}")
             return 0
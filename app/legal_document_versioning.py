@@ -234,7 +234,23 @@ class LegalDocumentVersioning:
             raise ValueError(f"Unknown document type: {document_type}")
         
         return list(self.config[document_type]["versions"].keys())
-    
+
+    def get_versions_fingerprint(self) -> Tuple:
+        """
+        Get a value that changes whenever any document's current version bumps.
+
+        Anything derived from "has the user accepted the current version" (see
+        the compliance status cache in legal_compliance.py) is keyed by this, so
+        a version bump invalidates it without a restart.
+
+        Returns:
+            Tuple of (document_type, current_version, effective_date) per document
+        """
+        return tuple(
+            (doc_type, doc_config["current_version"], doc_config["effective_date"])
+            for doc_type, doc_config in self.config.items()
+        )
+
     def validate_user_acceptance(self, document_type: str, user_version: str) -> Tuple[bool, str]:
         """
         Validate if a user's accepted version is still valid.
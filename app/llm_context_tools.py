@@ -7,10 +7,19 @@ instead of receiving all data in a single monolithic prompt.
 
 Table / column names verified against live queries in strava_app.py and
 coach_recommendations.py — no guessing.
+
+Tool calls from one model turn run concurrently on a small shared pool
+(execute_tool_calls), each borrowing a connection from the shared psycopg2
+pool. ToolPrefetch optionally starts the most-requested calls while turn 1 is
+still in flight; TOOL_METRICS records per-tool latency, prefetch hit rate and
+time saved.
 """
 
 import json
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date, timedelta
 
 from db_utils import execute_query, get_athlete_model
@@ -66,7 +75,8 @@ def get_activities(user_id: int, days: int) -> list:
         ORDER BY date ASC
         """,
         (user_id, cutoff),
-        fetch=True
+        fetch=True,
+        use_pool=True
     )
 
     if not rows:
@@ -101,7 +111,8 @@ def get_race_goals(user_id: int) -> dict:
         ORDER BY race_date ASC
         """,
         (user_id,),
-        fetch=True
+        fetch=True,
+        use_pool=True
     )
 
     if not rows:
@@ -181,7 +192,8 @@ def get_weekly_program_day(user_id: int, target_date: str) -> dict:
             LIMIT 1
             """,
             (user_id, candidate_week.strftime('%Y-%m-%d')),
-            fetch=True
+            fetch=True,
+            use_pool=True
         )
         if not rows:
             continue
@@ -231,7 +243,8 @@ def get_journal_entries(user_id: int, days: int) -> list:
         ORDER BY date DESC
         """,
         (user_id, cutoff),
-        fetch=True
+        fetch=True,
+        use_pool=True
     )
 
     if not rows:
@@ -355,3 +368,212 @@ TOOL_DEFINITIONS = [
         }
     },
 ]
+
+
+# ---------------------------------------------------------------------------
+# Concurrent execution, speculative prefetch and per-tool metrics
+# ---------------------------------------------------------------------------
+
+# Bounded below the shared connection pool's maxconn (10) so tool calls never
+# queue on a connection
+TOOL_WORKERS = 4
+
+# Calls prefetched before enough generations have been observed to rank them
+DEFAULT_PREFETCH_CALLS = (
+    ("get_activities", {"days": 14}),
+    ("get_race_goals", {}),
+    ("get_weekly_program_day", {"target_date": "$target_date"}),
+    ("get_journal_entries", {"days": 7}),
+    ("get_athlete_model", {}),
+)
+PREFETCH_MIN_GENERATIONS = 10  # observed generations before the learned ranking takes over
+PREFETCH_MIN_REQUEST_RATE = 0.5  # prefetch calls requested in at least half of generations
+PREFETCH_MAX_CALLS = 5
+
+_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix='agentic-tool')
+
+
+def _call_pattern(tool_name, tool_input, target_date=None):
+    """Stable key for a call; the recommendation's target_date is abstracted so it recurs across days"""
+    normalized = {k: ("$target_date" if target_date and v == target_date else v)
+                  for k, v in (tool_input or {}).items()}
+    return f"{tool_name}:{json.dumps(normalized, sort_keys=True)}"
+
+
+def _pattern_call(pattern, target_date):
+    tool_name, raw_input = pattern.split(':', 1)
+    tool_input = {k: (target_date if v == "$target_date" else v) for k, v in json.loads(raw_input).items()}
+    return tool_name, tool_input
+
+
+class ToolCallMetrics:
+    """Process-wide counters for agentic tool calls (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools = {}
+        self._pattern_counts = {}
+        self._generations = 0
+
+    def _tool(self, tool_name):
+        return self._tools.setdefault(tool_name, {
+            'calls': 0, 'errors': 0, 'total_seconds': 0.0,
+            'prefetch_hits': 0, 'prefetch_unused': 0, 'seconds_saved': 0.0,
+        })
+
+    def record_call(self, tool_name, seconds, ok=True, prefetch_hit=False, seconds_saved=0.0):
+        with self._lock:
+            stats = self._tool(tool_name)
+            stats['calls'] += 1
+            stats['total_seconds'] += seconds
+            if not ok:
+                stats['errors'] += 1
+            if prefetch_hit:
+                stats['prefetch_hits'] += 1
+                stats['seconds_saved'] += seconds_saved
+
+    def record_unused_prefetch(self, tool_name):
+        with self._lock:
+            self._tool(tool_name)['prefetch_unused'] += 1
+
+    def record_generation(self, patterns):
+        """Record which call patterns one generation's turn 1 requested"""
+        with self._lock:
+            self._generations += 1
+            for pattern in set(patterns):
+                self._pattern_counts[pattern] = self._pattern_counts.get(pattern, 0) + 1
+
+    def prefetch_patterns(self):
+        """Call patterns worth prefetching, most requested first"""
+        with self._lock:
+            generations = self._generations
+            counts = dict(self._pattern_counts)
+        if generations < PREFETCH_MIN_GENERATIONS:
+            return [_call_pattern(name, tool_input) for name, tool_input in DEFAULT_PREFETCH_CALLS][:PREFETCH_MAX_CALLS]
+        ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+        return [pattern for pattern, count in ranked
+                if count / generations >= PREFETCH_MIN_REQUEST_RATE][:PREFETCH_MAX_CALLS]
+
+    def snapshot(self):
+        """Per-tool metrics with derived hit rate and mean latency"""
+        with self._lock:
+            tools = {name: dict(stats) for name, stats in self._tools.items()}
+            generations = self._generations
+        for stats in tools.values():
+            prefetched = stats['prefetch_hits'] + stats['prefetch_unused']
+            stats['prefetch_hit_rate'] = round(stats['prefetch_hits'] / prefetched, 3) if prefetched else None
+            stats['mean_ms'] = round(stats['total_seconds'] / stats['calls'] * 1000, 1) if stats['calls'] else None
+            stats['seconds_saved'] = round(stats['seconds_saved'], 3)
+            stats['total_seconds'] = round(stats['total_seconds'], 3)
+        return {'generations': generations, 'tools': tools}
+
+
+TOOL_METRICS = ToolCallMetrics()
+
+
+class _ToolRun:
+    """One submitted tool call and its timing"""
+
+    def __init__(self, dispatch, user_id, tool_name, tool_input):
+        self.tool_name = tool_name
+        self.started = time.perf_counter()
+        self.finished = None
+        self.future = _executor.submit(self._run, dispatch, user_id, tool_name, tool_input)
+
+    def _run(self, dispatch, user_id, tool_name, tool_input):
+        try:
+            return dispatch(user_id, tool_name, tool_input)
+        finally:
+            self.finished = time.perf_counter()
+
+    @property
+    def seconds(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+
+class ToolPrefetch:
+    """
+    Speculatively start the most-requested tool calls while turn 1 is in flight.
+
+    Usage:
+        prefetch = ToolPrefetch(execute_tool_call, user_id, target_date)
+        turn1 = call_claude_with_tools(...)
+        results = execute_tool_calls(execute_tool_call, user_id, calls, prefetch=prefetch)
+    """
+
+    def __init__(self, dispatch, user_id, target_date, metrics=None):
+        self.target_date = target_date
+        self.metrics = metrics or TOOL_METRICS
+        self._runs = {}
+        for pattern in self.metrics.prefetch_patterns():
+            tool_name, tool_input = _pattern_call(pattern, target_date)
+            self._runs[pattern] = _ToolRun(dispatch, user_id, tool_name, tool_input)
+        logger.info(f"ToolPrefetch(user={user_id}): started {sorted(self._runs)}")
+
+    def take(self, tool_name, tool_input):
+        """The prefetched run for this call, or None"""
+        return self._runs.pop(_call_pattern(tool_name, tool_input, self.target_date), None)
+
+    def discard_unused(self):
+        for run in self._runs.values():
+            run.future.cancel()
+            self.metrics.record_unused_prefetch(run.tool_name)
+        self._runs = {}
+
+
+def execute_tool_calls(dispatch, user_id, calls, prefetch=None, target_date=None, metrics=None):
+    """
+    Execute one turn's tool calls concurrently, reusing prefetched results.
+
+    Args:
+        dispatch: dispatch(user_id, tool_name, tool_input) -> JSON-serialisable result
+        user_id: User ID passed to every tool
+        calls: List of (tool_use_id, tool_name, tool_input) in the model's order
+        prefetch: Optional ToolPrefetch started before turn 1
+        target_date: The recommendation's target date (for call-pattern stats)
+
+    Returns:
+        List of Anthropic tool_result blocks in the same order as `calls`.
+        A failing tool yields {"error": ...} content, as before.
+    """
+    metrics = metrics or TOOL_METRICS
+    if prefetch is not None:
+        target_date = target_date or prefetch.target_date
+
+    runs = []
+    for tool_use_id, tool_name, tool_input in calls:
+        run = prefetch.take(tool_name, tool_input) if prefetch is not None else None
+        hit = run is not None
+        if run is None:
+            run = _ToolRun(dispatch, user_id, tool_name, tool_input)
+        runs.append((tool_use_id, run, hit))
+    if prefetch is not None:
+        prefetch.discard_unused()
+
+    metrics.record_generation([_call_pattern(name, tool_input, target_date) for _, name, tool_input in calls])
+
+    waited_from = time.perf_counter()
+    tool_results = []
+    for tool_use_id, run, hit in runs:
+        ok = True
+        try:
+            content = json.dumps(run.future.result())
+            logger.info(f"Tool {run.tool_name!r} executed OK, result length={len(content)}"
+                        + (" (prefetched)" if hit else ""))
+        except Exception as tool_err:
+            ok = False
+            content = json.dumps({"error": str(tool_err)})
+            logger.warning(f"Tool {run.tool_name!r} failed: {tool_err}")
+
+        # A prefetched call saved whatever part of it ran before results were needed
+        saved = max(0.0, min(run.seconds, waited_from - run.started)) if hit else 0.0
+        metrics.record_call(run.tool_name, run.seconds, ok=ok, prefetch_hit=hit, seconds_saved=saved)
+        tool_results.append({"type": "tool_result", "tool_use_id": tool_use_id, "content": content})
+
+    serial = sum(run.seconds for _, run, hit in runs if not hit)
+    logger.info(
+        f"execute_tool_calls(user={user_id}): {len(runs)} calls "
+        f"({sum(1 for _, _, hit in runs if hit)} prefetched) in {time.perf_counter() - waited_from:.3f}s "
+        f"(serial would be {serial:.3f}s)"
+    )
+    return tool_results
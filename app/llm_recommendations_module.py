@@ -9,16 +9,16 @@ sophisticated, evidence-based training recommendations through Claude API.
 import os
 import json
 import logging
-import requests
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date, timedelta
 import time
 from timezone_utils import get_app_current_date
 from unified_metrics_service import UnifiedMetricsService
 from prompt_constants import NORMALIZED_DIVERGENCE_FORMULA, format_divergence_for_prompt
+from user_profile_cache import get_user_profile
+from athlete_model_stats import AUTOPSY_FACTS_SQL, AthleteModelStats, apply_autopsy, fold_history, load_history
 
 # Import database utilities
-from readiness_engine import get_ans_readiness
 from db_utils import (
     execute_query,
     save_llm_recommendation,
@@ -28,7 +28,8 @@ from db_utils import (
     cleanup_old_recommendations,  # Updated from deprecated clear_old_recommendations
     get_last_activity_date,
     get_athlete_model,
-    upsert_athlete_model,
+    invalidate_athlete_model,
+    get_db_connection,
     get_current_week_context,  # Phase B: Macro→Meso→Micro injection
     append_deviation_log,      # Phase C: Deviation classification
     set_revision_pending,      # Phase C: Deviation classification
@@ -151,8 +152,9 @@ _COACHING_CONTEXT_FILES = [
 def validate_coaching_context_files():
     """Verify all expected coaching context files exist on disk.
 
-    Called once at startup. Logs ERROR for any missing file so renames or
-    deletions are caught immediately rather than silently dropped at inference time.
+    Called once when this module is first imported (the first LLM request, not app
+    startup). Logs ERROR for any missing file so renames or deletions are caught
+    immediately rather than silently dropped at inference time.
     """
     context_dir = os.path.join(os.path.dirname(__file__), 'coaching_context')
     missing = [f for f in _COACHING_CONTEXT_FILES
@@ -165,6 +167,9 @@ def validate_coaching_context_files():
     return len(missing) == 0
 
 
+validate_coaching_context_files()
+
+
 def _load_coaching_context(user_id: int, readiness_state: str, current_date: str) -> str:
     """State-gated injection of coaching context library.
 
@@ -413,14 +418,10 @@ def get_user_hr_thresholds(user_id):
     Returns None if user settings are missing or invalid.
     """
     try:
-        result = execute_query(
-            "SELECT resting_hr, max_hr, hr_zones_method, custom_hr_zones FROM user_settings WHERE id = %s",
-            (user_id,), fetch=True
-        )
-        if not result:
+        row = get_user_profile(user_id)
+        if not row:
             return None
 
-        row = result[0]
         resting_hr = row.get('resting_hr') or 65
         max_hr = row.get('max_hr') or 185
         method = row.get('hr_zones_method') or 'percentage'
@@ -1006,7 +1007,7 @@ def call_claude(prompt, model=None, temperature=None, max_tokens=None, timeout=6
         model: Claude model override (uses task routing if None)
         temperature: Sampling temperature (uses RECOMMENDATION_TEMPERATURE if None)
         max_tokens: Maximum tokens to generate
-        timeout: Unused (SDK handles timeouts internally — kept for signature compat)
+        timeout: Unused (the shared client timeout is set in http_clients — kept for signature compat)
         task: Task type for model routing ('daily', 'autopsy', 'weekly', 'weekly_comprehensive')
     """
     if model is None:
@@ -1017,18 +1018,18 @@ def call_claude(prompt, model=None, temperature=None, max_tokens=None, timeout=6
         temperature = RECOMMENDATION_TEMPERATURE
 
     try:
-        import anthropic as anthropic_sdk
-        api_key = get_api_key()
-        client = anthropic_sdk.Anthropic(api_key=api_key)
+        from http_clients import get_anthropic_client, track_call
+        client = get_anthropic_client(get_api_key())
 
         logger.info(f"Calling Claude (SDK) model={model}, max_tokens={max_tokens}, temperature={temperature}, task={task}")
 
-        message = client.messages.create(
-            model=model,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        with track_call('anthropic'):
+            message = client.messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                messages=[{"role": "user", "content": prompt}]
+            )
 
         response_text = message.content[0].text
         logger.info(
@@ -1819,13 +1820,9 @@ def create_enhanced_prompt_with_tone(current_metrics, activities, pattern_analys
         raise ValueError("user_id is required for multi-user support")
 
     # Get athlete experience level and age from user profile
-    athlete_experience = execute_query(
-        "SELECT training_experience, age FROM user_settings WHERE id = %s",
-        (user_id,),
-        fetch=True
-    )
-    athlete_profile = athlete_experience[0]['training_experience'].capitalize() if (athlete_experience and athlete_experience[0].get('training_experience')) else "Intermediate"
-    athlete_age = athlete_experience[0]['age'] if (athlete_experience and athlete_experience[0].get('age')) else None
+    user_profile = get_user_profile(user_id) or {}
+    athlete_profile = user_profile['training_experience'].capitalize() if user_profile.get('training_experience') else "Intermediate"
+    athlete_age = user_profile['age'] if user_profile.get('age') else None
 
     # Use pre-fetched recommendation_style if provided, otherwise query (fallback for other callers)
     if recommendation_style is None:
@@ -1891,6 +1888,7 @@ def create_enhanced_prompt_with_tone(current_metrics, activities, pattern_analys
     )
 
     # ANS readiness: z-score based HRV+RHR assessment with overreaching trend detection
+    from readiness_engine import get_ans_readiness
     _ans = get_ans_readiness(user_id)
 
     # Dynamic AeT (Effect A): today's effective aerobic threshold = calibrated baseline
@@ -2959,14 +2957,9 @@ def generate_activity_autopsy_enhanced(user_id, date_str, prescribed_action, act
 def get_user_coaching_spectrum(user_id):
     """Get user's coaching spectrum preference with fallback"""
     try:
-        result = execute_query("""
-            SELECT coaching_style_spectrum, coaching_tone 
-            FROM user_settings 
-            WHERE id = %s
-        """, (user_id,), fetch=True)
-
-        if result and len(result) > 0:
-            user_data = result[0]
+        user_data = get_user_profile(user_id)
+
+        if user_data:
             spectrum_value = user_data.get('coaching_style_spectrum')
 
             # Fallback to coaching_tone if spectrum not set
@@ -3001,13 +2994,10 @@ def get_user_autopsy_weights(user_id):
     athlete can bias the composite toward plan compliance or intrinsic session value.
     """
     try:
-        result = execute_query(
-            "SELECT autopsy_weight_alignment, autopsy_weight_quality FROM user_settings WHERE id = %s",
-            (user_id,), fetch=True
-        )
-        if result and result[0]:
-            w_align = result[0].get('autopsy_weight_alignment')
-            w_quality = result[0].get('autopsy_weight_quality')
+        profile = get_user_profile(user_id)
+        if profile:
+            w_align = profile.get('autopsy_weight_alignment')
+            w_quality = profile.get('autopsy_weight_quality')
             if w_align is not None and w_quality is not None:
                 return (float(w_align), float(w_quality))
     except Exception as e:
@@ -3067,14 +3057,9 @@ def get_user_preferences(user_id):
     in the recommendation generation path.
     """
     try:
-        result = execute_query("""
-            SELECT coaching_style_spectrum, coaching_tone, recommendation_style
-            FROM user_settings
-            WHERE id = %s
-        """, (user_id,), fetch=True)
-
-        if result and len(result) > 0:
-            row = result[0]
+        row = get_user_profile(user_id)
+
+        if row:
             spectrum_value = row.get('coaching_style_spectrum')
             if spectrum_value is None:
                 spectrum_value = map_coaching_tone_to_spectrum(row.get('coaching_tone', 'supportive'))
@@ -3092,14 +3077,10 @@ def get_user_preferences(user_id):
 def get_user_recommendation_style(user_id):
     """Get user's recommendation style preference (conservative/balanced/adaptive/aggressive)"""
     try:
-        result = execute_query("""
-            SELECT recommendation_style
-            FROM user_settings
-            WHERE id = %s
-        """, (user_id,), fetch=True)
-
-        if result and len(result) > 0:
-            style = result[0].get('recommendation_style', 'balanced')
+        profile = get_user_profile(user_id)
+
+        if profile:
+            style = profile.get('recommendation_style', 'balanced')
             logger.info(f"User {user_id} recommendation_style: {style}")
             return style
         else:
@@ -3162,16 +3143,17 @@ def get_adjusted_thresholds(recommendation_style):
     return selected_thresholds
 
 
-def apply_athlete_model_to_thresholds(thresholds, user_id):
+def apply_athlete_model_to_thresholds(thresholds, user_id, athlete_model=None):
     """Override style-based divergence thresholds with the athlete's personal values when
     the model has been calibrated from real autopsy data.
 
+    athlete_model: Optional pre-fetched model dict. If None, fetches from DB.
     Returns a new dict — never mutates the input.
     The injury signal framework is divergence-based; ACWR thresholds are not overridden
     here (the acwr_sweet_spot_low/high fields are retired — see Phase 3-A of QC plan).
     """
     try:
-        model = get_athlete_model(user_id)
+        model = athlete_model if athlete_model is not None else get_athlete_model(user_id)
         if not model:
             return thresholds
 
@@ -3896,7 +3878,8 @@ def get_athlete_model_context(user_id, athlete_model=None):
 
     Args:
         user_id: User ID.
-        athlete_model: Optional pre-fetched model dict. If None, fetches from DB.
+        athlete_model: Optional pre-fetched model dict. If None, reads the cached
+            model (get_athlete_model).
 
     Returns:
         str: Multi-line context block ready to embed in a prompt, OR
@@ -3961,15 +3944,17 @@ def update_athlete_model(user_id, autopsy_data):
     """Update the athlete's persistent model after a successful autopsy.
 
     Uses a weighted moving average (30% new, 70% historical) for alignment.
-    Increments total_autopsies, updates last_autopsy_date, computes recent trend.
-
-    Also checks the last 10 autopsies to update divergence_injury_threshold:
-    if alignment drops below 5 on days where normalised divergence exceeded a
-    threshold, that threshold is updated in the model.
-
-    Computes typical_divergence_low/high from healthy training days (alignment >= 7,
-    no pain, adequate energy) to establish the athlete's personal safe range.
-    Requires N>=5 qualifying days; otherwise leaves the existing value untouched.
+    Increments total_autopsies, updates last_autopsy_date, computes recent trend,
+    the early-warning flag, divergence_injury_threshold (median physical-distress
+    divergence beyond the productive window edge, N>=3), typical_divergence_low
+    (P20 of recent healthy training days, N>=5) and the HRV/RHR baselines and HRV
+    suppression threshold.
+
+    Incremental: the statistics behind those fields live in athlete_models.model_stats
+    (see athlete_model_stats.py), so an autopsy reads its own day's facts and writes
+    the row back in one transaction, holding the row lock so concurrent autopsies for
+    the same athlete apply in turn. A model without model_stats is rebuilt from
+    history once.
 
     Phase 3 — Persistent Athlete Model.
 
@@ -3979,284 +3964,76 @@ def update_athlete_model(user_id, autopsy_data):
     """
     try:
         alignment_score = float(autopsy_data.get('alignment_score', 5))
-        date_str = autopsy_data.get('date')
-
-        # Fetch existing model (or create default values if not yet present)
-        existing = get_athlete_model(user_id)
-        if existing is None:
-            # Bootstrap an empty row so the upsert has something to merge into
-            upsert_athlete_model(user_id, {})
-            existing = {
-                'total_autopsies': 0,
-                'avg_lifetime_alignment': 5.0,
-            }
-
-        prev_total = existing.get('total_autopsies', 0) or 0
-        prev_avg = existing.get('avg_lifetime_alignment', 5.0) or 5.0
-
-        # Weighted moving average: 30% new, 70% historical
-        new_avg = (0.7 * prev_avg) + (0.3 * alignment_score)
-        new_total = prev_total + 1
-
-        # Compute recent_alignment_trend from last 5 autopsies (most recent first)
-        recent_scores_rows = execute_query(
-            """
-            SELECT alignment_score FROM ai_autopsies
-            WHERE user_id = %s AND alignment_score IS NOT NULL
-            ORDER BY date DESC
-            LIMIT 5
-            """,
-            (user_id,),
-            fetch=True
-        )
-        recent_scores = [r['alignment_score'] for r in (recent_scores_rows or [])]
-
-        if len(recent_scores) >= 3:
-            # Scores are in DESC order (most recent first).
-            # Use endpoint comparison (most recent vs. oldest) to detect directional
-            # movement — strict monotonicity nearly always produced 'stable'.
-            if recent_scores[0] > recent_scores[-1]:
-                trend = 'improving'
-            elif recent_scores[0] < recent_scores[-1]:
-                trend = 'declining'
-            else:
-                trend = 'stable'
-        else:
-            trend = 'insufficient_data'
+        date_str = autopsy_data.get('date') or get_app_current_date().strftime('%Y-%m-%d')
 
-        # Update divergence_injury_threshold:
-        # Collect all physical-cause distress events where divergence is beyond the
-        # athlete's productive training window edge (typical_divergence_low).
-        # Requires N>=3 qualifying events; uses median for robustness.
-        new_div_threshold = None
-        new_threshold_n = None
-        try:
-            current_div_low = (existing or {}).get('typical_divergence_low') or -0.05
-            distress_rows = execute_query(
-                """
-                SELECT act.normalized_divergence
-                FROM ai_autopsies a
-                JOIN activities act ON act.user_id = a.user_id AND act.date = a.date
-                WHERE a.user_id = %s
-                  AND a.deviation_reason = 'physical'
-                  AND act.normalized_divergence IS NOT NULL
-                  AND act.normalized_divergence < %s
-                ORDER BY a.date DESC
-                """,
-                (user_id, current_div_low),
-                fetch=True
-            )
-            if distress_rows and len(distress_rows) >= 3:
-                distress_vals = sorted([r['normalized_divergence'] for r in distress_rows])
-                mid = len(distress_vals) // 2
-                median_div = distress_vals[mid]
-                new_div_threshold = round(abs(median_div), 3)
-                new_threshold_n = len(distress_vals)
-                logger.info(
-                    f"Computed breakdown threshold for user {user_id}: "
-                    f"{-new_div_threshold:.3f} (median of {new_threshold_n} distress events, "
-                    f"anchored to div_low={current_div_low:.3f})"
-                )
-        except Exception as div_err:
-            logger.warning(f"Could not compute divergence_injury_threshold for user {user_id}: {div_err}")
-
-        # Compute typical_divergence_low from healthy training days.
-        # Healthy day = high alignment, no pain reported, adequate energy, real activity.
-        # P20 of the distribution gives the lower edge of the productive training window.
-        # Zero is the natural upper boundary (positive divergence = recovery by definition).
-        # typical_divergence_high is not computed — positive divergence needs no personal calibration.
-        new_div_low = None
-        new_div_low_n = None
-        try:
-            healthy_rows = execute_query(
-                """
-                SELECT act.normalized_divergence
-                FROM activities act
-                JOIN ai_autopsies a ON a.user_id = act.user_id AND a.date = act.date
-                LEFT JOIN journal_entries j ON j.user_id = act.user_id AND j.date = act.date
-                WHERE act.user_id = %s
-                  AND act.normalized_divergence IS NOT NULL
-                  AND act.activity_id > 0
-                  AND act.type != 'rest'
-                  AND a.alignment_score >= 7
-                  AND (j.pain_percentage IS NULL OR j.pain_percentage = 0)
-                  AND (j.energy_level IS NULL OR j.energy_level >= 3)
-                ORDER BY act.date DESC
-                LIMIT 60
-                """,
-                (user_id,),
-                fetch=True
-            )
-            if healthy_rows and len(healthy_rows) >= 5:
-                div_values = sorted([r['normalized_divergence'] for r in healthy_rows])
-                n = len(div_values)
-                p20_idx = max(0, int(n * 0.20) - 1)
-                new_div_low = round(div_values[p20_idx], 3)
-                new_div_low_n = n
-                logger.info(
-                    f"Computed productive training window edge for user {user_id}: "
-                    f"div_low={new_div_low} (n={n} healthy days)"
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO athlete_models (user_id) VALUES (%s) ON CONFLICT (user_id) DO NOTHING",
+                    (user_id,)
                 )
-        except Exception as div_range_err:
-            logger.warning(f"Could not compute typical_divergence_low for user {user_id}: {div_range_err}")
-
-        # Cache current HRV/RHR baselines and tighten HRV suppression threshold when
-        # athlete underperformed on a day where HRV appeared normal (false negative).
-        new_hrv_baseline_30d = None
-        new_rhr_baseline_7d = None
-        new_hrv_suppression_threshold = None
-        try:
-            hrv_b_row = execute_query(
-                """SELECT AVG(hrv_value) AS hrv_avg
-                   FROM journal_entries
-                   WHERE user_id = %s
-                     AND date >= CURRENT_DATE - INTERVAL '30 days'
-                     AND hrv_value IS NOT NULL""",
-                (user_id,), fetch=True
-            )
-            if hrv_b_row and hrv_b_row[0] and hrv_b_row[0]['hrv_avg']:
-                new_hrv_baseline_30d = round(float(hrv_b_row[0]['hrv_avg']), 1)
-
-            rhr_b_row = execute_query(
-                """SELECT AVG(resting_hr) AS rhr_avg
-                   FROM journal_entries
-                   WHERE user_id = %s
-                     AND date >= CURRENT_DATE - INTERVAL '7 days'
-                     AND resting_hr IS NOT NULL""",
-                (user_id,), fetch=True
-            )
-            if rhr_b_row and rhr_b_row[0] and rhr_b_row[0]['rhr_avg']:
-                new_rhr_baseline_7d = int(round(float(rhr_b_row[0]['rhr_avg'])))
-
-            # Tighten HRV suppression threshold if athlete underperformed (alignment < 5)
-            # Adjust HRV suppression threshold based on alignment outcome:
-            # - Tighten (+0.02) when athlete underperformed (alignment < 5) but HRV looked
-            #   normal — threshold was too lenient, missing a real suppression signal.
-            # - Loosen (-0.01) when athlete performed well (alignment >= 7) and HRV was
-            #   above the threshold — threshold may be too aggressive, causing false positives.
-            # Bounds: [0.75, 0.95]
-            if new_hrv_baseline_30d and date_str:
-                hrv_day_row = execute_query(
-                    "SELECT hrv_value FROM journal_entries WHERE user_id = %s AND date = %s",
-                    (user_id, date_str), fetch=True
-                )
-                hrv_today = hrv_day_row[0]['hrv_value'] if hrv_day_row and hrv_day_row[0] else None
-                if hrv_today is not None:
-                    current_threshold = float((existing or {}).get('hrv_suppression_threshold') or 0.85)
-                    hrv_ratio = float(hrv_today) / new_hrv_baseline_30d
-                    if alignment_score < 5 and hrv_ratio >= current_threshold:
-                        # HRV appeared normal but athlete underperformed — tighten
-                        new_hrv_suppression_threshold = min(round(current_threshold + 0.02, 2), 0.95)
-                        logger.info(
-                            f"Tightening HRV suppression threshold for user {user_id}: "
-                            f"{current_threshold:.2f} → {new_hrv_suppression_threshold:.2f} "
-                            f"(hrv_ratio={hrv_ratio:.2f}, alignment={alignment_score})"
-                        )
-                    elif alignment_score >= 7 and hrv_ratio >= current_threshold:
-                        # HRV above threshold and athlete performed well — loosen slightly
-                        new_hrv_suppression_threshold = max(round(current_threshold - 0.01, 2), 0.75)
-                        logger.info(
-                            f"Loosening HRV suppression threshold for user {user_id}: "
-                            f"{current_threshold:.2f} → {new_hrv_suppression_threshold:.2f} "
-                            f"(hrv_ratio={hrv_ratio:.2f}, alignment={alignment_score})"
-                        )
-        except Exception as hrv_learn_err:
-            logger.warning(f"Could not update wellness thresholds for user {user_id}: {hrv_learn_err}")
-
-        # Check for sustained physical distress pattern: 2 of last 5 autopsies physical.
-        # Auto-sets or auto-clears early_warning_active based on current pattern.
-        early_warning_active = False
-        early_warning_message = None
-        try:
-            recent_rows = execute_query(
-                """
-                SELECT deviation_reason
-                FROM ai_autopsies
-                WHERE user_id = %s
-                  AND deviation_reason IS NOT NULL
-                ORDER BY date DESC
-                LIMIT 5
-                """,
-                (user_id,),
-                fetch=True
-            )
-            if recent_rows:
-                physical_count = sum(1 for r in recent_rows if r['deviation_reason'] == 'physical')
-                total_classified = len(recent_rows)
-                if physical_count >= 2:
-                    early_warning_active = True
-                    early_warning_message = (
-                        f"Physical distress signals on {physical_count} of your last "
-                        f"{total_classified} workouts. Your coach is monitoring this pattern — "
-                        f"consider reducing load until symptoms resolve."
-                    )
-                    logger.info(
-                        f"Early warning SET for user {user_id}: "
-                        f"{physical_count}/{total_classified} recent workouts physical distress"
-                    )
-        except Exception as ew_err:
-            logger.warning(f"Could not compute early warning for user {user_id}: {ew_err}")
-
-        updates = {
-            'total_autopsies': new_total,
-            'avg_lifetime_alignment': round(new_avg, 3),
-            'recent_alignment_trend': trend,
-            'early_warning_active': early_warning_active,
-            'early_warning_message': early_warning_message,
-        }
-        if date_str:
-            updates['last_autopsy_date'] = date_str
-        if new_div_threshold is not None:
-            updates['divergence_injury_threshold'] = new_div_threshold
-        if new_threshold_n is not None:
-            updates['threshold_n'] = new_threshold_n
-        if new_div_low is not None:
-            updates['typical_divergence_low'] = new_div_low
-        if new_div_low_n is not None:
-            updates['div_low_n'] = new_div_low_n
-        if new_hrv_baseline_30d is not None:
-            updates['hrv_baseline_30d'] = new_hrv_baseline_30d
-        if new_rhr_baseline_7d is not None:
-            updates['rhr_baseline_7d'] = new_rhr_baseline_7d
-        if new_hrv_suppression_threshold is not None:
-            updates['hrv_suppression_threshold'] = new_hrv_suppression_threshold
-
-        # Carry forward session-type-specific adjustments.
-        # If the autopsy named a next-session type and adjustment, upsert it into
-        # pending_session_adjustments keyed by session type with a 14-day expiry.
-        next_session_type = autopsy_data.get('next_session_type')
-        next_session_adjustment = autopsy_data.get('next_session_adjustment')
-        _valid_session_types = {'tempo', 'intervals', 'hills', 'race_sim'}
-        if next_session_type in _valid_session_types and next_session_adjustment:
-            try:
-                import json as _json
-                expiry = (get_app_current_date() + timedelta(days=14)).strftime('%Y-%m-%d')
-                pending = {}
-                existing_pending = (existing or {}).get('pending_session_adjustments')
-                if existing_pending and isinstance(existing_pending, dict):
-                    pending = existing_pending
-                elif existing_pending and isinstance(existing_pending, str):
+                cursor.execute("SELECT * FROM athlete_models WHERE user_id = %s FOR UPDATE", (user_id,))
+                existing = dict(cursor.fetchone())
+                stats = AthleteModelStats.from_json(existing.get('model_stats'))
+
+                if stats is None and (existing.get('total_autopsies') or 0) > 0:
+                    # Learned before model_stats existed: replay history (this autopsy included)
+                    stats, updates = fold_history(load_history(cursor, user_id))
+                    logger.info(f"Rebuilt athlete model statistics for user {user_id} from "
+                                f"{stats.autopsies} autopsies")
+                else:
+                    stats = stats or AthleteModelStats()
+                    cursor.execute(AUTOPSY_FACTS_SQL.format(where="a.user_id = %s AND a.date = %s"),
+                                   (user_id, date_str))
+                    facts = cursor.fetchone()
+                    facts = dict(facts) if facts else {'date': date_str}
+                    facts['alignment_score'] = alignment_score
+                    updates = apply_autopsy(stats, existing, facts)
+
+                # Carry forward session-type-specific adjustments.
+                # If the autopsy named a next-session type and adjustment, upsert it into
+                # pending_session_adjustments keyed by session type with a 14-day expiry.
+                next_session_type = autopsy_data.get('next_session_type')
+                next_session_adjustment = autopsy_data.get('next_session_adjustment')
+                _valid_session_types = {'tempo', 'intervals', 'hills', 'race_sim'}
+                if next_session_type in _valid_session_types and next_session_adjustment:
                     try:
-                        pending = _json.loads(existing_pending)
-                    except Exception:
+                        import json as _json
+                        expiry = (get_app_current_date() + timedelta(days=14)).strftime('%Y-%m-%d')
                         pending = {}
-                pending[next_session_type] = {
-                    'adjustment': next_session_adjustment,
-                    'from_date': date_str or get_app_current_date().strftime('%Y-%m-%d'),
-                    'expires': expiry,
-                }
-                updates['pending_session_adjustments'] = _json.dumps(pending)
-                logger.info(
-                    f"Stored pending {next_session_type} adjustment for user {user_id} "
-                    f"(expires {expiry}): {next_session_adjustment[:80]}"
+                        existing_pending = existing.get('pending_session_adjustments')
+                        if existing_pending and isinstance(existing_pending, dict):
+                            pending = existing_pending
+                        elif existing_pending and isinstance(existing_pending, str):
+                            try:
+                                pending = _json.loads(existing_pending)
+                            except Exception:
+                                pending = {}
+                        pending[next_session_type] = {
+                            'adjustment': next_session_adjustment,
+                            'from_date': date_str,
+                            'expires': expiry,
+                        }
+                        updates['pending_session_adjustments'] = _json.dumps(pending)
+                        logger.info(
+                            f"Stored pending {next_session_type} adjustment for user {user_id} "
+                            f"(expires {expiry}): {next_session_adjustment[:80]}"
+                        )
+                    except Exception as adj_err:
+                        logger.warning(f"Could not store pending session adjustment for user {user_id}: {adj_err}")
+
+                updates['model_stats'] = stats.to_json()
+                set_clauses = ', '.join(f"{col} = %s" for col in updates)
+                cursor.execute(
+                    f"UPDATE athlete_models SET {set_clauses}, updated_at = NOW() WHERE user_id = %s",
+                    list(updates.values()) + [user_id]
                 )
-            except Exception as adj_err:
-                logger.warning(f"Could not store pending session adjustment for user {user_id}: {adj_err}")
+            conn.commit()
 
-        upsert_athlete_model(user_id, updates)
+        invalidate_athlete_model(user_id)
         logger.info(
-            f"Updated athlete model for user {user_id}: total_autopsies={new_total}, "
-            f"avg_alignment={new_avg:.2f}, trend={trend}"
+            f"Updated athlete model for user {user_id}: total_autopsies={updates.get('total_autopsies')}, "
+            f"avg_alignment={updates.get('avg_lifetime_alignment')}, trend={updates.get('recent_alignment_trend')}"
         )
 
     except Exception as e:
@@ -5213,22 +4990,22 @@ def call_claude_with_tools(messages, tools, model=None, temperature=None, max_to
     if temperature is None:
         temperature = RECOMMENDATION_TEMPERATURE
 
-    import anthropic as anthropic_sdk
-    api_key = get_api_key()
-    client = anthropic_sdk.Anthropic(api_key=api_key)
+    from http_clients import get_anthropic_client, track_call
+    client = get_anthropic_client(get_api_key())
 
     logger.info(
         f"call_claude_with_tools: model={model}, max_tokens={max_tokens}, "
         f"temperature={temperature}, messages={len(messages)}, tools={len(tools)}"
     )
 
-    message = client.messages.create(
-        model=model,
-        max_tokens=max_tokens,
-        temperature=temperature,
-        tools=tools,
-        messages=messages,
-    )
+    with track_call('anthropic'):
+        message = client.messages.create(
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            tools=tools,
+            messages=messages,
+        )
 
     logger.info(
         f"call_claude_with_tools: stop_reason={message.stop_reason}, "
@@ -5277,15 +5054,18 @@ def execute_tool_call(user_id, tool_name, tool_input):
     raise ValueError(f"Unknown tool: {tool_name!r}")
 
 
-def generate_recommendations_agentic(user_id, target_date=None, force=False):
+def generate_recommendations_agentic(user_id, target_date=None, force=False, prefetch=None):
     """Generate training recommendations using the two-turn agentic pattern.
 
     Phase 4 — Agentic Context Assembly.
 
     Turn 1: Send minimal context (current metrics + tool list) → model responds
             with tool_use blocks requesting the data it needs.
-    Turn 2: Execute the requested tools, send results back → model generates the
-            full recommendation.
+    Turn 2: Execute the requested tools (concurrently), send results back → model
+            generates the full recommendation.
+
+    With prefetch on, the most-requested tool calls start while turn 1 is in
+    flight, so turn 2 usually only waits on calls the model rarely makes.
 
     The function returns the SAME dict structure as generate_recommendations()
     so callers can treat both paths identically.
@@ -5294,6 +5074,8 @@ def generate_recommendations_agentic(user_id, target_date=None, force=False):
         user_id: Required — user ID.
         target_date: Optional YYYY-MM-DD string.  Derived from current date /
                      activity status if not provided.
+        prefetch: Speculatively prefetch tool results during turn 1. Defaults to
+                  the 'agentic_tool_prefetch' feature flag.
 
     Returns:
         Recommendation dict (same structure as generate_recommendations()) or None.
@@ -5301,7 +5083,7 @@ def generate_recommendations_agentic(user_id, target_date=None, force=False):
     if user_id is None:
         raise ValueError("user_id is required for generate_recommendations_agentic")
 
-    from llm_context_tools import TOOL_DEFINITIONS
+    from llm_context_tools import TOOL_DEFINITIONS, ToolPrefetch, execute_tool_calls
 
     try:
         logger.info(f"[AGENTIC] Starting agentic recommendation generation for user {user_id}")
@@ -5391,6 +5173,7 @@ def generate_recommendations_agentic(user_id, target_date=None, force=False):
             # z-score readiness engine (same call the standard path makes) — supersedes
             # the ratio-based fallback so both paths narrate the same HRV/RHR reading
             # the same way, and both feed compute_readiness_state the same signal.
+            from readiness_engine import get_ans_readiness
             _ans = get_ans_readiness(user_id)
             readiness_data = execute_query(
                 """SELECT sleep_quality, morning_soreness, hrv_value, resting_hr,
@@ -5639,12 +5422,22 @@ def generate_recommendations_agentic(user_id, target_date=None, force=False):
             {"role": "user", "content": user_turn1}
         ]
 
+        if prefetch is None:
+            from utils.feature_flags import is_feature_enabled
+            prefetch = is_feature_enabled('agentic_tool_prefetch', user_id)
+        tool_prefetch = ToolPrefetch(execute_tool_call, user_id, target_date) if prefetch else None
+
         logger.info(f"[AGENTIC] Turn 1: sending minimal context to model")
-        turn1_response = call_claude_with_tools(
-            messages=messages,
-            tools=TOOL_DEFINITIONS,
-            max_tokens=3000,
-        )
+        try:
+            turn1_response = call_claude_with_tools(
+                messages=messages,
+                tools=TOOL_DEFINITIONS,
+                max_tokens=3000,
+            )
+        except Exception:
+            if tool_prefetch is not None:
+                tool_prefetch.discard_unused()
+            raise
 
         total_input_tokens = turn1_response.usage.input_tokens
         total_output_tokens = turn1_response.usage.output_tokens
@@ -5655,34 +5448,12 @@ def generate_recommendations_agentic(user_id, target_date=None, force=False):
         if turn1_response.stop_reason == "tool_use":
             logger.info(f"[AGENTIC] Turn 1 stop_reason=tool_use — executing tool calls")
 
-            # Build tool results
-            tool_results = []
-            for block in turn1_response.content:
-                if block.type != "tool_use":
-                    continue
-
-                tool_name = block.name
-                tool_input_data = block.input
-                tool_use_id = block.id
-
-                try:
-                    result = execute_tool_call(user_id, tool_name, tool_input_data)
-                    result_content = json.dumps(result)
-                    logger.info(
-                        f"[AGENTIC] Tool {tool_name!r} executed OK, "
-                        f"result length={len(result_content)}"
-                    )
-                except Exception as tool_err:
-                    result_content = json.dumps({"error": str(tool_err)})
-                    logger.warning(
-                        f"[AGENTIC] Tool {tool_name!r} failed: {tool_err}"
-                    )
-
-                tool_results.append({
-                    "type": "tool_result",
-                    "tool_use_id": tool_use_id,
-                    "content": result_content,
-                })
+            # Build tool results — calls run concurrently, prefetched ones are reused
+            tool_calls = [(block.id, block.name, block.input)
+                          for block in turn1_response.content if block.type == "tool_use"]
+            tool_results = execute_tool_calls(
+                execute_tool_call, user_id, tool_calls, prefetch=tool_prefetch, target_date=target_date
+            )
 
             # Append Turn 1 assistant message + tool results to conversation
             messages.append({"role": "assistant", "content": turn1_response.content})
@@ -5705,6 +5476,8 @@ def generate_recommendations_agentic(user_id, target_date=None, force=False):
                     llm_response += block.text
 
         else:
+            if tool_prefetch is not None:
+                tool_prefetch.discard_unused()
             # Model returned the recommendation directly without tool calls
             logger.info(
                 f"[AGENTIC] Turn 1 stop_reason={turn1_response.stop_reason} — "
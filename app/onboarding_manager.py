@@ -17,6 +17,7 @@ from dataclasses import dataclass
 from enum import Enum
 
 from db_utils import get_db_connection, execute_query
+from user_profile_cache import invalidate_user_profile
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +36,16 @@ class OnboardingStep(Enum):
     COMPLETED = 'completed'
 
 
+# Unlocked features -> the onboarding steps they imply (simplified mapping)
+FEATURE_STEP_MAPPING = {
+    'dashboard_basic': [OnboardingStep.WELCOME],
+    'dashboard_advanced': [OnboardingStep.DASHBOARD_INTRO, OnboardingStep.FIRST_ACTIVITY],
+    'recommendations': [OnboardingStep.FIRST_RECOMMENDATION],
+    'journal': [OnboardingStep.JOURNAL_INTRO],
+    'custom_goals': [OnboardingStep.GOALS_SETUP]
+}
+
+
 class FeatureTier(Enum):
     """Enumeration of feature tiers for progressive unlocking"""
     BASIC = 'basic'
@@ -215,6 +226,7 @@ class OnboardingManager:
                         last_onboarding_activity = %s
                     WHERE id = %s
                 """, (OnboardingStep.WELCOME.value, datetime.now(), user_id))
+                invalidate_user_profile(user_id)
                 
                 # Log onboarding start
                 self._log_onboarding_event(user_id, 'onboarding_started', {
@@ -305,6 +317,7 @@ class OnboardingManager:
                         last_onboarding_activity = %s
                     WHERE id = %s
                 """, (step.value, datetime.now(), user_id))
+                invalidate_user_profile(user_id)
                 
                 # Log step completion
                 self._log_onboarding_event(user_id, 'step_completed', {
@@ -398,6 +411,7 @@ class OnboardingManager:
                         SET features_unlocked = %s
                         WHERE id = %s
                     """, (json.dumps(unlocked_features), user_id))
+                invalidate_user_profile(user_id)
                 
                 # Log feature unlock
                 self._log_onboarding_event(user_id, 'feature_unlocked', {
@@ -483,18 +497,9 @@ class OnboardingManager:
                 features_unlocked = json.loads(result[0]) if isinstance(result[0], str) else result[0]
                 completed_steps = []
                 
-                # Map features to steps (simplified mapping)
-                step_mapping = {
-                    'dashboard_basic': [OnboardingStep.WELCOME],
-                    'dashboard_advanced': [OnboardingStep.DASHBOARD_INTRO, OnboardingStep.FIRST_ACTIVITY],
-                    'recommendations': [OnboardingStep.FIRST_RECOMMENDATION],
-                    'journal': [OnboardingStep.JOURNAL_INTRO],
-                    'custom_goals': [OnboardingStep.GOALS_SETUP]
-                }
-                
                 for feature in features_unlocked:
-                    if feature in step_mapping:
-                        completed_steps.extend(step_mapping[feature])
+                    if feature in FEATURE_STEP_MAPPING:
+                        completed_steps.extend(FEATURE_STEP_MAPPING[feature])
                 
                 return list(set(completed_steps))  # Remove duplicates
                 
@@ -601,6 +606,7 @@ class OnboardingManager:
                         onboarding_step = 'completed'
                     WHERE id = %s
                 """, (datetime.now(), user_id))
+                invalidate_user_profile(user_id)
                 
                 # Log onboarding completion
                 self._log_onboarding_event(user_id, 'onboarding_completed', {
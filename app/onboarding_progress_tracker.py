@@ -22,6 +22,7 @@ from dataclasses import dataclass, field
 from enum import Enum
 
 from db_utils import get_db_connection, execute_query
+from user_profile_cache import invalidate_user_profile
 from onboarding_manager import OnboardingManager, OnboardingStep, FeatureTier
 from tiered_feature_unlock import TieredFeatureUnlockManager, UnlockCondition
 
@@ -492,8 +493,9 @@ class OnboardingProgressTracker:
             
             # Create feature progress data
             feature_progress = []
+            evaluations = self.tiered_feature_manager.evaluate_all_features(user_id)
             for feature_name, feature_def in self.tiered_feature_manager.feature_definitions.items():
-                can_unlock, analysis = self.tiered_feature_manager.check_tiered_feature_unlock(user_id, feature_name)
+                can_unlock, analysis = evaluations[feature_name]
                 feature_progress.append({
                     'name': feature_name,
                     'tier': feature_def.tier.value,
@@ -953,6 +955,7 @@ class OnboardingProgressTracker:
                         last_onboarding_activity = %s
                     WHERE id = %s
                 """, (progress.current_step.value, progress.last_activity, progress.user_id))
+            invalidate_user_profile(progress.user_id)
             
         except Exception as e:
             logger.error(f"Error saving progress: {str(e)}")
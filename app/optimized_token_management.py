@@ -98,61 +98,32 @@ class OptimizedTokenManager:
             raise
     
     def batch_refresh_tokens(self, user_tokens: Dict[int, Dict[str, Any]]) -> Dict[int, Any]:
-        """Refresh tokens for multiple users in batch"""
+        """Refresh tokens for multiple users concurrently and save them in one batch"""
         try:
+            from strava_token_refresh import run_bulk_token_refresh
+            
+            candidates = [{'id': user_id, 'strava_refresh_token': tokens.get('refresh_token')}
+                          for user_id, tokens in user_tokens.items()]
+            summary = run_bulk_token_refresh(candidates=candidates)
+            
             refresh_results = {}
-            successful_refreshes = []
-            failed_refreshes = []
-            
-            # Process each user's token refresh
-            for user_id, tokens in user_tokens.items():
-                try:
-                    # Import here to avoid circular imports
-                    from enhanced_token_management import SimpleTokenManager
-                    
-                    token_manager = SimpleTokenManager(user_id)
-                    refresh_result = token_manager.refresh_strava_tokens()
-                    
-                    if refresh_result:
-                        refresh_results[user_id] = {
-                            'success': True,
-                            'tokens': refresh_result,
-                            'refreshed_at': datetime.now()
-                        }
-                        successful_refreshes.append(user_id)
-                    else:
-                        refresh_results[user_id] = {
-                            'success': False,
-                            'error': 'Token refresh failed',
-                            'refreshed_at': datetime.now()
-                        }
-                        failed_refreshes.append(user_id)
-                        
-                except Exception as e:
-                    refresh_results[user_id] = {
+            for outcome in summary['outcomes']:
+                if outcome['status'] == 'refreshed':
+                    refresh_results[outcome['user_id']] = {
+                        'success': True,
+                        'expires_at': outcome['expires_at'],
+                        'refreshed_at': datetime.now()
+                    }
+                else:
+                    refresh_results[outcome['user_id']] = {
                         'success': False,
-                        'error': str(e),
+                        'error': outcome['message'],
+                        'status': outcome['status'],
                         'refreshed_at': datetime.now()
                     }
-                    failed_refreshes.append(user_id)
-            
-            # Batch save successful refreshes
-            if successful_refreshes:
-                save_operations = []
-                for user_id in successful_refreshes:
-                    save_operations.append({
-                        'user_id': user_id,
-                        'tokens': refresh_results[user_id]['tokens'],
-                        'context': {
-                            'operation': 'batch_refresh',
-                            'timestamp': datetime.now(),
-                            'audit_enabled': True
-                        }
-                    })
-                
-                self.batch_save_tokens(save_operations)
             
-            logger.info(f"Batch token refresh completed: {len(successful_refreshes)} successful, {len(failed_refreshes)} failed")
+            logger.info(f"Batch token refresh completed: {summary['refreshed']} successful, "
+                        f"{len(refresh_results) - summary['refreshed']} failed")
             return refresh_results
             
         except Exception as e:
@@ -1,7 +1,7 @@
 import logging
 import json
 
-import anthropic as anthropic_sdk
+from http_clients import get_anthropic_client, track_call
 
 from llm_recommendations_module import (
     get_api_key, MODEL_HAIKU, MODEL_SONNET,
@@ -60,20 +60,20 @@ def generate_why_explanation(user_id, recommendation_date, structured_output, to
             f"Explain the logic. Why this workout? What is the binding constraint?"
         )
 
-        api_key = get_api_key()
-        client = anthropic_sdk.Anthropic(api_key=api_key)
+        client = get_anthropic_client(get_api_key())
 
         logger.info(
             f"generate_why_explanation: user={user_id}, date={recommendation_date}, "
             f"model={MODEL_HAIKU}, max_tokens=500"
         )
 
-        message = client.messages.create(
-            model=MODEL_HAIKU,
-            max_tokens=500,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}],
-        )
+        with track_call('anthropic'):
+            message = client.messages.create(
+                model=MODEL_HAIKU,
+                max_tokens=500,
+                system=system_prompt,
+                messages=[{"role": "user", "content": user_prompt}],
+            )
 
         explanation = message.content[0].text
         logger.info(
@@ -114,20 +114,20 @@ def chat_turn(user_id, recommendation_date, user_message, conversation_history,
         capped_history = conversation_history[-10:]
         messages = capped_history + [{"role": "user", "content": user_message}]
 
-        api_key = get_api_key()
-        client = anthropic_sdk.Anthropic(api_key=api_key)
+        client = get_anthropic_client(get_api_key())
 
         logger.info(
             f"chat_turn: user={user_id}, date={recommendation_date}, "
             f"model={MODEL_HAIKU}, max_tokens=500, history_len={len(capped_history)}"
         )
 
-        message = client.messages.create(
-            model=MODEL_HAIKU,
-            max_tokens=500,
-            system=system_prompt,
-            messages=messages,
-        )
+        with track_call('anthropic'):
+            message = client.messages.create(
+                model=MODEL_HAIKU,
+                max_tokens=500,
+                system=system_prompt,
+                messages=messages,
+            )
 
         reply = message.content[0].text
         logger.info(
@@ -191,20 +191,20 @@ def run_extraction_pass(user_id, recommendation_date, conversation_messages):
             f"- Set nothing_significant: true if none of the above apply"
         )
 
-        api_key = get_api_key()
-        client = anthropic_sdk.Anthropic(api_key=api_key)
+        client = get_anthropic_client(get_api_key())
 
         logger.info(
             f"run_extraction_pass: user={user_id}, date={recommendation_date}, "
             f"model={MODEL_SONNET}, max_tokens=800, messages={len(conversation_messages)}"
         )
 
-        message = client.messages.create(
-            model=MODEL_SONNET,
-            max_tokens=800,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}],
-        )
+        with track_call('anthropic'):
+            message = client.messages.create(
+                model=MODEL_SONNET,
+                max_tokens=800,
+                system=system_prompt,
+                messages=[{"role": "user", "content": user_prompt}],
+            )
 
         raw_response = message.content[0].text
         logger.info(
@@ -4,23 +4,101 @@ Registration Session Manager Module
 This module handles session management for pending registrations, allowing users
 to resume their registration process where they left off. It includes session
 creation, validation, resumption, and cleanup functionality.
+
+Session lifecycle at onboarding-burst scale:
+- validate_session() no longer writes. Last-activity times are coalesced in memory
+  (SessionActivityBuffer, one entry per session, newest time wins) and a background
+  thread writes them with one multi-row UPDATE per ACTIVITY_FLUSH_BATCH.
+- Expiry is one set-based UPDATE over the partial expires_at index
+  (cleanup_expired_sessions, run by POST /cron/registration-sessions).
+- Every status change goes through TRANSITION_SQL, which moves the per
+  (session_type, status) counters in registration_session_counts in the same
+  statement, so get_session_analytics() reads a handful of counter rows instead of
+  scanning registration_sessions.
+
+Schema: scripts/migrations/add_registration_session_lifecycle_2026-10-18.py
 """
 
+import ast
+import atexit
+import json
 import logging
 import secrets
-import hashlib
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, Optional, Tuple, List
+from typing import Any, Dict, Optional, Tuple, List
 from enum import Enum
-from flask import request, session, current_app
+from flask import request, session
 from dataclasses import dataclass
 
-from db_utils import execute_query
+from psycopg2.extras import execute_values
+
+from db_utils import execute_query, get_db_connection
 from user_account_manager import user_account_manager
 from registration_status_tracker import registration_status_tracker
 
 logger = logging.getLogger(__name__)
 
+ACTIVITY_FLUSH_SECONDS = 5.0
+ACTIVITY_FLUSH_BATCH = 1000
+
+SESSION_COLUMNS = """session_id, user_id, session_type, status, created_at, expires_at,
+                     last_activity, ip_address, user_agent, metadata"""
+
+CREATE_SESSION_SQL = """
+    WITH created AS (
+        INSERT INTO registration_sessions (
+            session_id, user_id, session_type, status, created_at, expires_at,
+            last_activity, ip_address, user_agent, metadata, updated_at
+        ) VALUES (%(session_id)s, %(user_id)s, %(session_type)s, 'active', %(now)s, %(expires_at)s,
+                  %(now)s, %(ip_address)s, %(user_agent)s, %(metadata)s, %(now)s)
+        RETURNING session_type
+    )
+    INSERT INTO registration_session_counts (session_type, status, sessions)
+    SELECT session_type, 'active', 1 FROM created
+    ON CONFLICT (session_type, status)
+    DO UPDATE SET sessions = registration_session_counts.sessions + EXCLUDED.sessions
+"""
+
+# Moves active sessions matching {where} to %(status)s and the counters with them.
+# FOR UPDATE re-checks status after waiting on a concurrent transition, so each
+# session is counted out of 'active' exactly once.
+TRANSITION_SQL = """
+    WITH target AS (
+        SELECT session_id, session_type, status
+        FROM registration_sessions
+        WHERE status = 'active' AND {where}
+        FOR UPDATE
+    ), changed AS (
+        UPDATE registration_sessions r
+        SET status = %(status)s, updated_at = %(now)s,
+            metadata = COALESCE(%(metadata)s, r.metadata)
+        FROM target t
+        WHERE r.session_id = t.session_id
+        RETURNING t.session_type, t.status AS previous_status
+    ), counted AS (
+        INSERT INTO registration_session_counts (session_type, status, sessions)
+        SELECT session_type, status, SUM(delta) FROM (
+            SELECT session_type, previous_status AS status, -1 AS delta FROM changed
+            UNION ALL
+            SELECT session_type, %(status)s, 1 FROM changed
+        ) moves
+        GROUP BY session_type, status
+        ON CONFLICT (session_type, status)
+        DO UPDATE SET sessions = registration_session_counts.sessions + EXCLUDED.sessions
+    )
+    SELECT COUNT(*) AS transitioned FROM changed
+"""
+
+FLUSH_ACTIVITY_SQL = """
+    UPDATE registration_sessions r
+    SET last_activity = GREATEST(r.last_activity, v.last_activity)
+    FROM (VALUES %s) AS v (session_id, last_activity)
+    WHERE r.session_id = v.session_id AND r.status = 'active'
+"""
+FLUSH_ACTIVITY_TEMPLATE = "(%s, %s::timestamp)"
+
 
 class SessionStatus(Enum):
     """Enumeration of session statuses"""
@@ -53,13 +131,121 @@ class RegistrationSession:
     metadata: Dict = None
 
 
+class SessionActivityBuffer:
+    """
+    Coalesces last-activity updates and writes them in batches.
+
+    touch() only records the newest time per session in memory; a background
+    thread (started on first use) writes the pending times every flush_interval,
+    or as soon as batch_size sessions are waiting, with one multi-row UPDATE per
+    batch. A failed write is merged back and retried on the next flush.
+    """
+
+    def __init__(self, flush_interval: float = ACTIVITY_FLUSH_SECONDS,
+                 batch_size: int = ACTIVITY_FLUSH_BATCH):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._metrics = {
+            'touches': 0,
+            'coalesced': 0,
+            'written': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'last_flush_ms': None,
+            'last_flush_at': None
+        }
+
+    def touch(self, session_id: str, when: Optional[datetime] = None) -> None:
+        when = when or datetime.now()
+        with self._lock:
+            previous = self._pending.get(session_id)
+            if previous is not None:
+                self._metrics['coalesced'] += 1
+            if previous is None or when > previous:
+                self._pending[session_id] = when
+            self._metrics['touches'] += 1
+            pending = len(self._pending)
+        self._ensure_worker()
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def pending_activity(self, session_id: str) -> Optional[datetime]:
+        """The not yet written last-activity time for a session, if any"""
+        with self._lock:
+            return self._pending.get(session_id)
+
+    def flush(self) -> int:
+        """Write everything pending now. Returns sessions written."""
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            start = time.perf_counter()
+            rows = list(pending.items())
+            try:
+                with get_db_connection() as conn:
+                    with conn.cursor() as cursor:
+                        execute_values(cursor, FLUSH_ACTIVITY_SQL, rows,
+                                       template=FLUSH_ACTIVITY_TEMPLATE, page_size=self.batch_size)
+                    conn.commit()
+            except Exception as e:
+                with self._lock:
+                    for session_id, when in pending.items():
+                        newer = self._pending.get(session_id)
+                        if newer is None or when > newer:
+                            self._pending[session_id] = when
+                    self._metrics['failed_flushes'] += 1
+                logger.error(f"Error flushing last activity for {len(rows)} sessions: {str(e)}")
+                return 0
+
+            with self._lock:
+                self._metrics['written'] += len(rows)
+                self._metrics['flushes'] += 1
+                self._metrics['last_flush_ms'] = round((time.perf_counter() - start) * 1000, 2)
+                self._metrics['last_flush_at'] = datetime.now().isoformat()
+            return len(rows)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['pending'] = len(self._pending)
+        metrics['worker_alive'] = bool(self._worker and self._worker.is_alive())
+        return metrics
+
+    def _ensure_worker(self) -> None:
+        if self._worker and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name='registration-session-activity', daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Session activity flush worker error: {str(e)}")
+
+
 class RegistrationSessionManager:
     """Manages registration sessions for pending registrations"""
     
-    def __init__(self):
+    def __init__(self, activity_buffer: Optional[SessionActivityBuffer] = None):
         self.logger = logging.getLogger(__name__)
         self.session_timeout_hours = 24  # Default 24-hour timeout
         self.max_sessions_per_user = 3   # Maximum active sessions per user
+        self.activity_buffer = activity_buffer or SessionActivityBuffer()
     
     def create_registration_session(self, user_id: int, session_type: SessionType, 
                                    metadata: Dict = None) -> Tuple[bool, Optional[str], str]:
@@ -123,6 +309,9 @@ class RegistrationSessionManager:
     def validate_session(self, session_id: str) -> Tuple[bool, Optional[RegistrationSession], str]:
         """
         Validate a registration session
+
+        Reads the session by primary key; the last-activity update is buffered,
+        not written.
         
         Args:
             session_id: Session ID to validate
@@ -147,7 +336,7 @@ class RegistrationSessionManager:
                 return False, None, "Session has expired"
             
             # Update last activity
-            self._update_last_activity(session_id)
+            session_data.last_activity = self._update_last_activity(session_id)
             
             return True, session_data, ""
             
@@ -197,7 +386,7 @@ class RegistrationSessionManager:
     
     def complete_session(self, session_id: str, completion_data: Dict = None) -> bool:
         """
-        Mark a session as completed
+        Mark an active session as completed
         
         Args:
             session_id: Session ID
@@ -225,7 +414,7 @@ class RegistrationSessionManager:
     
     def invalidate_session(self, session_id: str, reason: str = "manual_invalidation") -> bool:
         """
-        Invalidate a session
+        Invalidate an active session
         
         Args:
             session_id: Session ID
@@ -269,44 +458,29 @@ class RegistrationSessionManager:
     
     def cleanup_expired_sessions(self) -> int:
         """
-        Clean up expired sessions
+        Expire every active session past its expires_at
+
+        One set-based UPDATE over the partial (expires_at) WHERE status = 'active'
+        index; the counters move in the same statement.
         
         Returns:
-            Number of sessions cleaned up
+            Number of sessions expired
         """
         try:
-            query = """
-                UPDATE registration_sessions 
-                SET %s = %s WHERE status = %s AND expires_at < %s
-            """
-            
-            current_time = datetime.now()
-            execute_query(query, (
-                SessionStatus.EXPIRED.value,
-                current_time,
-                SessionStatus.ACTIVE.value,
-                current_time
-            ))
-            
-            # Get count of updated sessions
-            count_query = """
-                SELECT COUNT(*) as count
-                FROM registration_sessions
-                WHERE status = %s AND updated_at = %s
-            """
-            
-            result = execute_query(count_query, (SessionStatus.EXPIRED.value, current_time), fetch=True)
-            
-            if result:
-                cleaned_count = result[0]['count']
-                self.logger.info(f"Cleaned up {cleaned_count} expired sessions")
-                return cleaned_count
-            else:
-                return 0
+            cleaned_count = self._transition("expires_at < %(now)s", {}, SessionStatus.EXPIRED)
+            self.logger.info(f"Cleaned up {cleaned_count} expired sessions")
+            return cleaned_count
                 
         except Exception as e:
             self.logger.error(f"Error cleaning up expired sessions: {str(e)}")
             return 0
+
+    def run_maintenance(self) -> Dict:
+        """Scheduled upkeep: write buffered last-activity times, then expire sessions"""
+        return {
+            'activity_flushed': self.activity_buffer.flush(),
+            'sessions_expired': self.cleanup_expired_sessions()
+        }
     
     def extend_session(self, session_id: str, hours: int = 24) -> bool:
         """
@@ -326,16 +500,17 @@ class RegistrationSessionManager:
                 return False
             
             # Calculate new expiration time
-            new_expires_at = datetime.now() + timedelta(hours=hours)
+            current_time = datetime.now()
+            new_expires_at = current_time + timedelta(hours=hours)
             
             # Update session
             query = """
                 UPDATE registration_sessions 
-                SET %s = %s WHERE session_id = %s
+                SET expires_at = %s, updated_at = %s
+                WHERE session_id = %s AND status = %s
             """
             
-            current_time = datetime.now()
-            execute_query(query, (new_expires_at, current_time, session_id))
+            execute_query(query, (new_expires_at, current_time, session_id, SessionStatus.ACTIVE.value))
             
             self.logger.info(f"Extended session {session_id} by {hours} hours")
             return True
@@ -347,47 +522,38 @@ class RegistrationSessionManager:
     def get_session_analytics(self) -> Dict:
         """
         Get session analytics
+
+        Served from registration_session_counts, which every create and status
+        change keeps current. Active counts include sessions past expires_at until
+        the next scheduled expiry run.
         
         Returns:
             Dictionary with session statistics
         """
         try:
-            # Get total sessions
-            total_query = "SELECT COUNT(*) as count FROM registration_sessions"
-            total_result = execute_query(total_query, fetch=True)
-            total_sessions = total_result[0]['count'] if total_result else 0
-            
-            # Get active sessions
-            active_query = "SELECT COUNT(*) as count FROM registration_sessions WHERE status = %s"
-            active_result = execute_query(active_query, (SessionStatus.ACTIVE.value,), fetch=True)
-            active_sessions = active_result[0]['count'] if active_result else 0
-            
-            # Get completed sessions
-            completed_query = "SELECT COUNT(*) as count FROM registration_sessions WHERE status = %s"
-            completed_result = execute_query(completed_query, (SessionStatus.COMPLETED.value,), fetch=True)
-            completed_sessions = completed_result[0]['count'] if completed_result else 0
-            
-            # Get expired sessions
-            expired_query = "SELECT COUNT(*) as count FROM registration_sessions WHERE status = %s"
-            expired_result = execute_query(expired_query, (SessionStatus.EXPIRED.value,), fetch=True)
-            expired_sessions = expired_result[0]['count'] if expired_result else 0
-            
-            # Get sessions by type
-            type_query = """
-                SELECT session_type, COUNT(*) as count
-                FROM registration_sessions
-                GROUP BY session_type
-            """
-            type_result = execute_query(type_query, fetch=True)
-            sessions_by_type = {row['session_type']: row['count'] for row in type_result} if type_result else {}
+            rows = execute_query(
+                "SELECT session_type, status, sessions FROM registration_session_counts",
+                fetch=True
+            ) or []
+            
+            by_status: Dict[str, int] = {}
+            sessions_by_type: Dict[str, int] = {}
+            for row in rows:
+                by_status[row['status']] = by_status.get(row['status'], 0) + row['sessions']
+                sessions_by_type[row['session_type']] = sessions_by_type.get(row['session_type'], 0) + row['sessions']
+            
+            total_sessions = sum(by_status.values())
+            completed_sessions = by_status.get(SessionStatus.COMPLETED.value, 0)
             
             return {
                 'total_sessions': total_sessions,
-                'active_sessions': active_sessions,
+                'active_sessions': by_status.get(SessionStatus.ACTIVE.value, 0),
                 'completed_sessions': completed_sessions,
-                'expired_sessions': expired_sessions,
+                'expired_sessions': by_status.get(SessionStatus.EXPIRED.value, 0),
+                'invalidated_sessions': by_status.get(SessionStatus.INVALIDATED.value, 0),
                 'sessions_by_type': sessions_by_type,
-                'completion_rate': (completed_sessions / total_sessions * 100) if total_sessions > 0 else 0
+                'completion_rate': (completed_sessions / total_sessions * 100) if total_sessions > 0 else 0,
+                'activity_buffer': self.activity_buffer.get_metrics()
             }
             
         except Exception as e:
@@ -401,23 +567,18 @@ class RegistrationSessionManager:
     def _create_session_record(self, session_id: str, user_id: int, session_type: SessionType,
                               expires_at: datetime, ip_address: str, user_agent: str, 
                               metadata: Dict = None) -> bool:
-        """Create session record in database"""
+        """Create session record in database, counting it as active"""
         try:
-            query = """
-                INSERT INTO registration_sessions (
-                    session_id, user_id, session_type, status, created_at, expires_at,
-                    last_activity, ip_address, user_agent, metadata, updated_at
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            current_time = datetime.now()
-            params = (
-                session_id, user_id, session_type.value, SessionStatus.ACTIVE.value,
-                current_time, expires_at, current_time, ip_address, user_agent,
-                str(metadata) if metadata else None, current_time
-            )
-            
-            execute_query(query, params)
+            execute_query(CREATE_SESSION_SQL, {
+                'session_id': session_id,
+                'user_id': user_id,
+                'session_type': session_type.value,
+                'now': datetime.now(),
+                'expires_at': expires_at,
+                'ip_address': ip_address,
+                'user_agent': user_agent,
+                'metadata': json.dumps(metadata) if metadata else None
+            })
             return True
             
         except Exception as e:
@@ -427,29 +588,13 @@ class RegistrationSessionManager:
     def _get_session_data(self, session_id: str) -> Optional[RegistrationSession]:
         """Get session data from database"""
         try:
-            query = """
-                SELECT session_id, user_id, session_type, status, created_at, expires_at,
-                       last_activity, ip_address, user_agent, metadata
-                FROM registration_sessions
-                WHERE session_id = %s
-            """
+            query = f"SELECT {SESSION_COLUMNS} FROM registration_sessions WHERE session_id = %s"
             
-            result = execute_query(query, (session_id,), fetch=True)
+            # Read-only primary-key lookup on every validate: use the pool
+            result = execute_query(query, (session_id,), fetch=True, use_pool=True)
             
             if result and len(result) > 0:
-                row = result[0]
-                return RegistrationSession(
-                    session_id=row['session_id'],
-                    user_id=row['user_id'],
-                    session_type=SessionType(row['session_type']),
-                    status=SessionStatus(row['status']),
-                    created_at=row['created_at'],
-                    expires_at=row['expires_at'],
-                    last_activity=row['last_activity'],
-                    ip_address=row['ip_address'],
-                    user_agent=row['user_agent'],
-                    metadata=eval(row['metadata']) if row['metadata'] else None
-                )
+                return self._session_from_row(result[0])
             else:
                 return None
                 
@@ -460,89 +605,83 @@ class RegistrationSessionManager:
     def _get_active_sessions_for_user(self, user_id: int) -> List[RegistrationSession]:
         """Get active sessions for a user"""
         try:
-            query = """
-                SELECT session_id, user_id, session_type, status, created_at, expires_at,
-                       last_activity, ip_address, user_agent, metadata
+            query = f"""
+                SELECT {SESSION_COLUMNS}
                 FROM registration_sessions
                 WHERE user_id = %s AND status = %s
                 ORDER BY created_at DESC
             """
             
-            result = execute_query(query, (user_id, SessionStatus.ACTIVE.value), fetch=True)
-            
-            sessions = []
-            for row in result:
-                sessions.append(RegistrationSession(
-                    session_id=row['session_id'],
-                    user_id=row['user_id'],
-                    session_type=SessionType(row['session_type']),
-                    status=SessionStatus(row['status']),
-                    created_at=row['created_at'],
-                    expires_at=row['expires_at'],
-                    last_activity=row['last_activity'],
-                    ip_address=row['ip_address'],
-                    user_agent=row['user_agent'],
-                    metadata=eval(row['metadata']) if row['metadata'] else None
-                ))
-            
-            return sessions
+            result = execute_query(query, (user_id, SessionStatus.ACTIVE.value), fetch=True) or []
+            return [self._session_from_row(row) for row in result]
             
         except Exception as e:
             self.logger.error(f"Error getting active sessions for user: {str(e)}")
             return []
+
+    def _session_from_row(self, row: Dict) -> RegistrationSession:
+        session_data = RegistrationSession(
+            session_id=row['session_id'],
+            user_id=row['user_id'],
+            session_type=SessionType(row['session_type']),
+            status=SessionStatus(row['status']),
+            created_at=row['created_at'],
+            expires_at=row['expires_at'],
+            last_activity=row['last_activity'],
+            ip_address=row['ip_address'],
+            user_agent=row['user_agent'],
+            metadata=self._load_metadata(row['metadata'])
+        )
+        pending = self.activity_buffer.pending_activity(session_data.session_id)
+        if pending and (session_data.last_activity is None or pending > session_data.last_activity):
+            session_data.last_activity = pending
+        return session_data
+
+    @staticmethod
+    def _load_metadata(value: Optional[str]) -> Optional[Dict]:
+        """JSON metadata; rows written before it was JSON hold a Python dict repr"""
+        if not value:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError:
+            try:
+                return ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                return None
+
+    def _transition(self, where: str, params: Dict, status: SessionStatus,
+                    metadata: Dict = None) -> int:
+        """Move the active sessions matching `where` to status; returns how many moved"""
+        result = execute_query(TRANSITION_SQL.format(where=where), {
+            **params,
+            'status': status.value,
+            'now': datetime.now(),
+            'metadata': json.dumps(metadata) if metadata else None
+        }, fetch=True)
+        return result[0]['transitioned'] if result else 0
     
     def _update_session_status(self, session_id: str, status: SessionStatus, 
                               metadata: Dict = None) -> bool:
-        """Update session status"""
+        """Update an active session's status; False if it was not active"""
         try:
-            query = """
-                UPDATE registration_sessions 
-                SET %s = %s WHERE session_id = %s
-            """
-            
-            current_time = datetime.now()
-            metadata_str = str(metadata) if metadata else None
-            
-            execute_query(query, (status.value, current_time, metadata_str, session_id))
-            return True
+            return self._transition("session_id = %(session_id)s", {'session_id': session_id},
+                                    status, metadata) > 0
             
         except Exception as e:
             self.logger.error(f"Error updating session status: {str(e)}")
             return False
     
-    def _update_last_activity(self, session_id: str) -> bool:
-        """Update session last activity time"""
-        try:
-            query = """
-                UPDATE registration_sessions 
-                SET %s = %s WHERE session_id = %s
-            """
-            
-            current_time = datetime.now()
-            execute_query(query, (current_time, current_time, session_id))
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"Error updating last activity: {str(e)}")
-            return False
+    def _update_last_activity(self, session_id: str) -> datetime:
+        """Record session activity; written by the activity buffer's next flush"""
+        current_time = datetime.now()
+        self.activity_buffer.touch(session_id, current_time)
+        return current_time
     
     def _invalidate_session(self, session_id: str, reason: str) -> bool:
         """Invalidate a session"""
-        try:
-            query = """
-                UPDATE registration_sessions 
-                SET %s = %s WHERE session_id = %s
-            """
-            
-            current_time = datetime.now()
-            metadata = {'invalidation_reason': reason}
-            
-            execute_query(query, (SessionStatus.INVALIDATED.value, current_time, str(metadata), session_id))
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"Error invalidating session: {str(e)}")
-            return False
+        return self._update_session_status(session_id, SessionStatus.INVALIDATED,
+                                           {'invalidation_reason': reason})
     
     def _get_resume_url(self, session_type: SessionType, user_id: int) -> str:
         """Get resume URL based on session type"""
@@ -560,3 +699,4 @@ class RegistrationSessionManager:
 
 # Global instance
 registration_session_manager = RegistrationSessionManager()
+atexit.register(registration_session_manager.activity_buffer.flush)
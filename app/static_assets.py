@@ -0,0 +1,391 @@
+# static_assets.py
+
+"""
+Static asset layer: precompressed, fingerprinted files served from memory.
+
+At deploy time (Dockerfile.strava) `python static_assets.py build` writes .gz and
+.br variants next to every compressible file in build/, static/ and
+landing_static/ and records each file's content hash in static_manifest.json.
+
+At runtime AssetIndex loads every file and its variants into memory once, keyed
+by URL, so a request is a dict lookup plus one send of a bytes object - no file
+opens, no chunked reads, no compression in the request path:
+
+- StaticAssetMiddleware (asgi.py) answers GET/HEAD for indexed URLs before they
+  reach the Flask worker threads; everything else passes through.
+- Content-hashed URLs (CRA's main.<hash>.js, or ?v=<hash> added to
+  url_for('static', ...) by strava_app's url_defaults hook) are served
+  `immutable` for a year. Other assets revalidate with their ETag.
+- index_html_response() serves build/index.html for the SPA routes with an ETag
+  and `no-cache`, answering If-None-Match with 304.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # .br variants are skipped; gzip is still served
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_FILE = 'static_manifest.json'
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+
+COMPRESSIBLE_EXTENSIONS = {'.js', '.css', '.html', '.svg', '.json', '.txt', '.xml', '.map', '.ico'}
+MIN_COMPRESS_BYTES = 512
+VARIANT_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# CRA output names: main.7f752b7c.js, 206.f8819006.chunk.js, main.5f10ff3c.css
+_HASHED_NAME = re.compile(r'\.[0-9a-f]{8}(\.chunk)?\.(js|css)$')
+
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('application/manifest+json', '.webmanifest')
+
+# URL prefix -> directories searched in order (mirrors serve_landing_static)
+ASSET_DIRECTORIES = {
+    '/static/': ('static',),
+    '/landing-static/': ('landing_static', 'static', 'static/static'),
+}
+
+# Single URLs with their own route in strava_app.py
+ASSET_FILES = {
+    '/favicon.ico': 'build/favicon.ico',
+    '/manifest.json': 'build/manifest.json',
+    '/YTM_Logo_byandfor_110.webp': 'build/YTM_Logo_byandfor_110.webp',
+    '/logo192.png': 'static/logo192.png',
+    '/sitemap.xml': 'static/sitemap.xml',
+}
+
+# serve_landing_static special cases: first existing file wins
+ASSET_ALIASES = {
+    '/landing-static/acwr-chart.html': ('static/acwr-chart.html',),
+    '/landing-static/images/wireframe-runner.jpg': ('static/images/wireframe-runner.jpg',),
+    '/landing-static/wireframe-runner.jpg': ('static/wireframe-runner.jpg',),
+    '/landing-static/btn_strava_connect_with_orange_x2.svg': (
+        'static/btn_strava_connect_with_orange.svg',
+        'static/api_logo_pwrdBy_strava_horiz_orange.svg',
+        'static/btn_strava_connect_with_orange_x2.svg',
+        'static/static/btn_strava_connect_with_orange.svg',
+    ),
+}
+
+INDEX_HTML = 'build/index.html'
+
+BUILD_ROOTS = ('build', 'static', 'landing_static')
+
+
+@dataclass
+class StaticAsset:
+    """One file held in memory with its precompressed variants"""
+    rel_path: str
+    body: bytes
+    content_type: str
+    fingerprint: str
+    variants: Dict[str, bytes] = field(default_factory=dict)  # content-coding -> body
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.fingerprint}"'
+
+    @property
+    def hashed_name(self) -> bool:
+        return bool(_HASHED_NAME.search(self.rel_path))
+
+    def select(self, accept_encoding: str):
+        """(content-coding or None, body, etag) for the client's Accept-Encoding"""
+        accepted = _accepted_encodings(accept_encoding)
+        for coding in ('br', 'gzip'):
+            if coding in self.variants and coding in accepted:
+                return coding, self.variants[coding], f'"{self.fingerprint}-{coding}"'
+        return None, self.body, self.etag
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                pass
+        if coding and quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def etag_matches(if_none_match: str, etags) -> bool:
+    """Weak comparison of an If-None-Match header against any of `etags`"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = {tag.strip()[2:] if tag.strip().startswith('W/') else tag.strip()
+                  for tag in if_none_match.split(',')}
+    return any(etag in candidates for etag in etags)
+
+
+def _content_type(rel_path: str) -> str:
+    content_type = mimetypes.guess_type(rel_path)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+        content_type += '; charset=utf-8'
+    return content_type
+
+
+def _fingerprint(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:16]
+
+
+def _is_variant(name: str) -> bool:
+    return name.endswith(tuple(VARIANT_SUFFIXES.values()))
+
+
+class AssetIndex:
+    """
+    In-memory index of every servable static file, keyed by URL path.
+
+    Usage:
+        index = AssetIndex.load()
+        asset = index.lookup('/static/js/main.7f752b7c.js')
+    """
+
+    def __init__(self, root: str = APP_DIR):
+        self.root = root
+        self.assets: Dict[str, StaticAsset] = {}
+        self.index_html: Optional[StaticAsset] = None
+        self._files: Dict[str, StaticAsset] = {}  # rel_path -> asset, shared between URLs
+
+    @classmethod
+    def load(cls, root: str = APP_DIR) -> 'AssetIndex':
+        index = cls(root)
+        manifest = index._read_manifest()
+
+        for prefix, directories in ASSET_DIRECTORIES.items():
+            for directory in directories:
+                for rel_path in index._walk(directory):
+                    url = prefix + rel_path[len(directory) + 1:]
+                    if url not in index.assets:
+                        index._add(url, rel_path, manifest)
+
+        for url, rel_path in ASSET_FILES.items():
+            index._add(url, rel_path, manifest)
+        for url, candidates in ASSET_ALIASES.items():
+            for rel_path in candidates:
+                if index._add(url, rel_path, manifest):
+                    break
+
+        index.index_html = index._file(INDEX_HTML, manifest)
+        logger.info(
+            f"Static asset index: {len(index.assets)} URLs, {len(index._files)} files, "
+            f"{sum(len(a.body) + sum(map(len, a.variants.values())) for a in index._files.values()) // 1024} KiB"
+            + (" (from manifest)" if manifest else "")
+        )
+        return index
+
+    def lookup(self, path: str) -> Optional[StaticAsset]:
+        return self.assets.get(path)
+
+    def fingerprint(self, url: str) -> Optional[str]:
+        asset = self.assets.get(url)
+        return asset.fingerprint if asset else None
+
+    def cache_control(self, asset: StaticAsset, version: Optional[str] = None) -> str:
+        if asset.hashed_name or (version and version == asset.fingerprint):
+            return IMMUTABLE_CACHE_CONTROL
+        return REVALIDATE_CACHE_CONTROL
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.root, MANIFEST_FILE), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _walk(self, directory: str):
+        base = os.path.join(self.root, directory)
+        for dirpath, _, filenames in os.walk(base):
+            for name in sorted(filenames):
+                if not _is_variant(name):
+                    yield os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, '/')
+
+    def _add(self, url: str, rel_path: str, manifest: dict) -> bool:
+        asset = self._file(rel_path, manifest)
+        if asset is None:
+            return False
+        self.assets[url] = asset
+        return True
+
+    def _file(self, rel_path: str, manifest: dict) -> Optional[StaticAsset]:
+        if rel_path in self._files:
+            return self._files[rel_path]
+        path = os.path.join(self.root, rel_path)
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            body = f.read()
+
+        entry = manifest.get(rel_path)
+        fingerprint = entry['fingerprint'] if entry and entry.get('size') == len(body) else _fingerprint(body)
+
+        variants = {}
+        for coding, suffix in VARIANT_SUFFIXES.items():
+            if entry and coding not in entry.get('variants', ()):
+                continue
+            try:
+                with open(path + suffix, 'rb') as f:
+                    variants[coding] = f.read()
+            except OSError:
+                pass
+
+        asset = StaticAsset(rel_path, body, _content_type(rel_path), fingerprint, variants)
+        self._files[rel_path] = asset
+        return asset
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_asset_index() -> AssetIndex:
+    """The process-wide index, loaded on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = AssetIndex.load()
+    return _index
+
+
+def index_html_response():
+    """
+    build/index.html for the SPA routes: ETag + no-cache, 304 on If-None-Match.
+
+    Browsers revalidate on every navigation (so a deploy's new JS references are
+    picked up immediately) but only re-download the page when it changed.
+    """
+    from flask import request, Response
+    from werkzeug.exceptions import NotFound
+
+    asset = get_asset_index().index_html
+    if asset is None:
+        raise NotFound()
+
+    coding, body, etag = asset.select(request.headers.get('Accept-Encoding', ''))
+    headers = {'ETag': etag, 'Cache-Control': REVALIDATE_CACHE_CONTROL, 'Vary': 'Accept-Encoding'}
+    if etag_matches(request.headers.get('If-None-Match', ''), (etag, asset.etag)):
+        return Response(status=304, headers=headers)
+    if coding:
+        headers['Content-Encoding'] = coding
+    return Response(body, mimetype=asset.content_type, headers=headers)
+
+
+class StaticAssetMiddleware:
+    """
+    ASGI middleware serving indexed static files from memory.
+
+    Usage:
+        app = StaticAssetMiddleware(inner_asgi_app)
+    """
+
+    def __init__(self, app, index: Optional[AssetIndex] = None):
+        self.app = app
+        self.index = index or get_asset_index()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD'):
+            await self.app(scope, receive, send)
+            return
+        asset = self.index.lookup(scope['path'])
+        if asset is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = {}
+        for key, value in scope.get('headers', []):
+            request_headers[key.decode('latin-1').lower()] = value.decode('latin-1')
+
+        version = None
+        query = scope.get('query_string', b'').decode('latin-1')
+        for pair in query.split('&'):
+            if pair.startswith('v='):
+                version = pair[2:]
+
+        coding, body, etag = asset.select(request_headers.get('accept-encoding', ''))
+        headers = [
+            (b'etag', etag.encode('latin-1')),
+            (b'cache-control', self.index.cache_control(asset, version).encode('latin-1')),
+            (b'vary', b'Accept-Encoding'),
+        ]
+
+        if etag_matches(request_headers.get('if-none-match', ''), (etag, asset.etag)):
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        headers.append((b'content-type', asset.content_type.encode('latin-1')))
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+        if coding:
+            headers.append((b'content-encoding', coding.encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
+
+
+def build_variants(root: str = APP_DIR, roots=BUILD_ROOTS) -> dict:
+    """
+    Write .gz/.br variants and static_manifest.json (run at deploy time).
+
+    A variant is kept only when it is at least 10% smaller than the original.
+    """
+    manifest = {}
+    index = AssetIndex(root)
+    for directory in roots:
+        for rel_path in index._walk(directory):
+            path = os.path.join(root, rel_path)
+            with open(path, 'rb') as f:
+                body = f.read()
+            entry = {'fingerprint': _fingerprint(body), 'size': len(body), 'variants': []}
+
+            if os.path.splitext(rel_path)[1].lower() in COMPRESSIBLE_EXTENSIONS and len(body) >= MIN_COMPRESS_BYTES:
+                compressed = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+                if brotli is not None:
+                    compressed['br'] = brotli.compress(body, quality=11)
+                for coding, data in compressed.items():
+                    variant_path = path + VARIANT_SUFFIXES[coding]
+                    if len(data) <= len(body) * 0.9:
+                        with open(variant_path, 'wb') as f:
+                            f.write(data)
+                        entry['variants'].append(coding)
+                    elif os.path.exists(variant_path):
+                        os.remove(variant_path)
+
+            manifest[rel_path] = entry
+
+    with open(os.path.join(root, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] != ['build']:
+        print('Usage: python static_assets.py build')
+        sys.exit(2)
+    logging.basicConfig(level=logging.INFO)
+    built = build_variants()
+    print(f"{len(built)} files, {sum(len(e['variants']) for e in built.values())} compressed variants"
+          + ("" if brotli else " (brotli not installed: gzip only)"))
@@ -21,11 +21,11 @@ import json
 import threading
 import uuid
 import db_utils
+import journal_learning
 from datetime import datetime, timedelta, date
 from timezone_utils import get_app_current_date, log_timezone_debug
-from llm_recommendations_module import generate_recommendations, generate_recommendations_agentic, update_recommendations_with_autopsy_learning
 from utils.feature_flags import is_feature_enabled as _is_feature_enabled
-from flask import Flask, request, jsonify, redirect, url_for, render_template, send_from_directory, session, flash, Response
+from flask import Flask, request, jsonify, redirect, url_for, render_template, send_from_directory, session, flash, Response, stream_with_context
 from csrf_protection import csrf_protected, require_csrf_token, CSRFTokenType
 from enhanced_token_management import SimpleTokenManager, check_token_status
 from flask_login import LoginManager, login_required as _login_required, current_user, login_user, logout_user
@@ -40,6 +40,10 @@ if os.environ.get('USE_MOCK_DB', '').lower() == 'true':
 else:
     login_required = _login_required
 from auth import User
+from user_profile_cache import get_user_profile, invalidate_user_profile
+from weekly_program_cache import invalidate_weekly_programs
+from engagement_signals import invalidate_engagement_signals
+from static_assets import get_asset_index, index_html_response
 from email_verification.service import EmailVerificationService
 from settings_utils import handle_settings_change, track_settings_changes
 from werkzeug.security import generate_password_hash
@@ -50,15 +54,11 @@ from sync_fix import apply_sync_fix
 from utils import ensure_date_serialization, aggregate_daily_activities_with_rest, is_feature_enabled, get_secret
 
 # Import database optimization modules
-from db_connection_manager import initialize_database_pool, get_database_manager
-from optimized_token_management import OptimizedTokenManager, batch_refresh_all_tokens
-from optimized_acwr_service import OptimizedACWRService, batch_recalculate_all_acwr
+from db_connection_manager import get_database_manager
 from prompt_constants import format_divergence_for_prompt
-from readiness_engine import get_ans_readiness
-from aerobic_assessment_engine import (
-    analyze_hr_drift_test, segment_pace_from_distance, parse_pace_from_notes,
-)
-from intervals_icu_sync import run_daily_sync as intervals_icu_daily_sync
+# Heavy subsystems (LLM recommendations, readiness/pandas, aerobic assessment,
+# intervals.icu, optimized batch services) are imported inside the routes that use
+# them so they are not paid for on cold start - see tests/test_import_budget.py.
 
 # Import Strava processing functions
 from strava_training_load import (
@@ -156,6 +156,22 @@ def log_request_end(response):
     
     return response
 
+# Routes that change weekly program inputs (see weekly_program_cache.py): the current
+# user's race goals, schedule and constraints, and ACWR configurations (any user's)
+PROGRAM_INPUT_WRITE_PREFIXES = ('/api/coach/race-goals', '/api/coach/training-schedule',
+                                '/api/coach/cross-training-disciplines', '/api/coach/schedule-constraints')
+ACWR_CONFIG_WRITE_PREFIX = '/api/admin/acwr-configurations'
+
+@app.after_request
+def invalidate_weekly_programs_after_input_write(response):
+    """Drop cached weekly programs once a route has changed their planning inputs"""
+    if request.method in ('POST', 'PUT', 'PATCH', 'DELETE'):
+        if request.path.startswith(ACWR_CONFIG_WRITE_PREFIX):
+            invalidate_weekly_programs()
+        elif request.path.startswith(PROGRAM_INPUT_WRITE_PREFIXES) and current_user.is_authenticated:
+            invalidate_weekly_programs(current_user.id)
+    return response
+
 def log_api_request_async(endpoint, method, response_time_ms, status_code, user_id=None, 
                          request_size=0, response_size=0, user_agent='', ip_address='', error_message=None):
     """Log API request to database (non-blocking)"""
@@ -176,55 +192,7 @@ def log_api_request_async(endpoint, method, response_time_ms, status_code, user_
         # Log to application logger if database logging fails
         logger.error(f"Failed to log API request to database: {str(e)}")
 
-# Initialize database connection pool
-def initialize_database_pool_on_startup():
-    """Initialize database connection pool for improved performance with robust error handling"""
-    try:
-        database_url = os.environ.get('DATABASE_URL')
-        if not database_url:
-            logger.error("❌ DATABASE_URL environment variable not found")
-            logger.warning("⚠️  Falling back to direct database connections")
-            return False
-            
-        logger.info(f"🔗 Initializing database connection pool...")
-        logger.info(f"📊 Database URL: {database_url[:50]}...")
-        
-        # Try to initialize the connection pool
-        success = initialize_database_pool(database_url)
-        
-        if success:
-            # Test the connection pool
-            try:
-                from db_connection_manager import db_manager
-                with db_manager.get_connection() as conn:
-                    with conn.cursor() as cursor:
-                        cursor.execute("SELECT 1")
-                        result = cursor.fetchone()
-                        if result:
-                            logger.info("✅ Database connection pool initialized and tested successfully")
-                            return True
-                        else:
-                            logger.error("❌ Connection pool test failed - no result returned")
-                            return False
-            except Exception as test_error:
-                logger.error(f"❌ Connection pool test failed: {str(test_error)}")
-                return False
-        else:
-            logger.error("❌ Failed to initialize database connection pool")
-            logger.warning("⚠️  Falling back to direct database connections")
-            return False
-            
-    except Exception as e:
-        logger.error(f"❌ Error initializing database connection pool: {str(e)}")
-        logger.warning("⚠️  Falling back to direct database connections")
-        return False
-
-# Initialize database pool immediately after app creation
-initialize_database_pool_on_startup()
-
-# Validate coaching context files exist (catches renames/deletions before first inference)
-from llm_recommendations_module import validate_coaching_context_files
-validate_coaching_context_files()
+# The database connection pool is created on first use (db_connection_manager.get_connection)
 
 # Cleanup database pool on app shutdown
 @app.teardown_appcontext
@@ -378,8 +346,8 @@ def sync_strava_data():
 
         # Connect to Strava using token
         logger.info("Attempting to connect to Strava...")
-        from stravalib.client import Client
-        client = Client(access_token=access_token)
+        from http_clients import get_strava_client
+        client = get_strava_client(access_token)
 
         # Test connection
         try:
@@ -431,6 +399,8 @@ def sync_strava_data():
             "UPDATE user_settings SET last_sync_date = %s WHERE id = %s",
             (sync_date, user_id)
         )
+        invalidate_user_profile(user_id)
+        invalidate_engagement_signals(user_id)
         logger.info(f"Updated last_sync_date to {sync_date} for user {user_id}")
 
         # Success response
@@ -479,8 +449,8 @@ def oauth_callback():
 
         logger.info("Processing OAuth callback...")
 
-        from stravalib.client import Client
-        client = Client()
+        from http_clients import get_strava_client
+        client = get_strava_client()
 
         # Exchange code for tokens
         try:
@@ -501,7 +471,7 @@ def oauth_callback():
                 return redirect('/')
 
         # Get athlete info
-        temp_client = Client(access_token=token_response['access_token'])
+        temp_client = get_strava_client(token_response['access_token'])
         athlete = temp_client.get_athlete()
         athlete_id = str(athlete.id)
 
@@ -543,6 +513,7 @@ def oauth_callback():
                     fetch=False
                 )
                 
+                invalidate_user_profile(existing_user.id)
                 logger.info(f"Database update result: {result}")
                 logger.info(f"Successfully updated tokens for user {existing_user.id}")
                 
@@ -699,7 +670,7 @@ def oauth_callback():
                 try:
                     # Import the sync function
                     from strava_training_load import process_activities_for_date_range
-                    from stravalib.client import Client
+                    from http_clients import get_strava_client
                     from datetime import datetime, timedelta
                     from timezone_utils import get_user_current_date
 
@@ -730,7 +701,7 @@ def oauth_callback():
                     logger.info(f"Loaded tokens for new user {new_user.id}, expires at: {tokens.get('strava_token_expires_at')}")
                     
                     # Create Strava client with user's tokens
-                    client = Client(access_token=tokens['strava_access_token'])
+                    client = get_strava_client(tokens['strava_access_token'])
                     
                     # Test connection
                     try:
@@ -753,6 +724,7 @@ def oauth_callback():
                         "UPDATE user_settings SET last_sync_date = %s WHERE id = %s",
                         (sync_date, new_user.id)
                     )
+                    invalidate_user_profile(new_user.id)
                     logger.info(f"Strava sync completed for new user {new_user.id}, last_sync_date={sync_date}")
                     # Note: Cannot update session from background thread
                     
@@ -1274,15 +1246,9 @@ def process_user_sync(user_id, days):
 
         # Try to get user's HR settings from database
         try:
-            user_hr_query = """
-                SELECT resting_hr, max_hr, gender 
-                FROM user_settings 
-                WHERE id = %s
-            """
-            user_hr_result = db_utils.execute_query(user_hr_query, (user_id,), fetch=True)
+            hr_data = get_user_profile(user_id)
 
-            if user_hr_result and user_hr_result[0]:
-                hr_data = user_hr_result[0]
+            if hr_data:
                 if hr_data.get('resting_hr'):
                     hr_config['resting_hr'] = hr_data['resting_hr']
                 if hr_data.get('max_hr'):
@@ -1364,6 +1330,8 @@ def process_user_sync(user_id, days):
             "UPDATE user_settings SET last_sync_date = %s WHERE id = %s",
             (sync_date, user_id)
         )
+        invalidate_user_profile(user_id)
+        invalidate_engagement_signals(user_id)
         logger.info(f"Updated last_sync_date to {sync_date} for user {user_id}")
 
         return {
@@ -1561,6 +1529,7 @@ def database_optimization_status():
 def admin_batch_refresh_tokens():
     """Admin endpoint to batch refresh all tokens"""
     try:
+        from optimized_token_management import batch_refresh_all_tokens
         result = batch_refresh_all_tokens()
         
         return jsonify({
@@ -1586,6 +1555,7 @@ def admin_batch_recalculate_acwr():
     """Admin endpoint to batch recalculate ACWR values"""
     try:
         days_back = request.json.get('days_back', 30) if request.is_json else 30
+        from optimized_acwr_service import batch_recalculate_all_acwr
         result = batch_recalculate_all_acwr(days_back)
         
         return jsonify({
@@ -1918,11 +1888,8 @@ def get_training_data():
                     f"days_since_rest={days_since_rest}")
 
         # Fetch last_sync_date for sync status display
-        sync_info = db_utils.execute_query(
-            "SELECT last_sync_date FROM user_settings WHERE id = %s",
-            (current_user.id,), fetch=True
-        )
-        last_sync_date = str(sync_info[0].get('last_sync_date') or '') if sync_info else ''
+        sync_info = get_user_profile(current_user.id)
+        last_sync_date = str(sync_info.get('last_sync_date') or '') if sync_info else ''
 
         # Rolling 7-day total load — direct sum, avoids avg*7 distortion from decay weighting
         _today = get_app_current_date()
@@ -1985,12 +1952,8 @@ def home():
     """Landing page for new users, dashboard for existing users"""
     if current_user.is_authenticated:
         # Existing user - redirect to dashboard
-        response = send_from_directory('build', 'index.html')
-        # CRITICAL: Prevent caching of index.html so users always get latest JS file references
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        return response
+        # index.html is revalidated on every load so users always get the latest JS file references
+        return index_html_response()
 
     # New/unauthenticated user - show landing page
     return render_template('landing.html')
@@ -2023,20 +1986,25 @@ def dashboard():
         if not current_user.email or '@training-monkey.com' in current_user.email:
             return redirect('/collect-email')
 
-    response = send_from_directory('build', 'index.html')
-    # CRITICAL: Prevent caching of index.html so users always get latest JS file references
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    return response
+    # index.html is revalidated on every load so users always get the latest JS file references
+    return index_html_response()
 
 # =============================================================================
 # SECTION 4: STATIC FILE SERVING
 # =============================================================================
 # Routes for serving static files, favicon, manifest, etc.
 
-# Flask's default static file serving will handle /static/ requests
-# No custom route needed since files are now in the default static folder
+# Under asgi.py, static_assets.StaticAssetMiddleware serves /static/, /landing-static/
+# and the single-file routes below from memory, precompressed; these Flask routes
+# are the fallback (local dev server, files missing from the index).
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    """url_for('static', ...) -> /static/<file>?v=<content hash>, served immutable"""
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        fingerprint = get_asset_index().fingerprint('/static/' + values['filename'])
+        if fingerprint:
+            values['v'] = fingerprint
 
 @app.route('/test-image')
 def test_image():
@@ -2744,6 +2712,7 @@ def update_user_email():
             (new_email, current_user.id),
             fetch=False
         )
+        invalidate_user_profile(current_user.id)
 
         # Update current user object
         current_user.email = new_email
@@ -2831,6 +2800,7 @@ def dismiss_email_modal():
                 (new_count, current_user.id),
                 fetch=False
             )
+            invalidate_user_profile(current_user.id)
         except:
             # Column doesn't exist yet - log but don't fail
             logger.warning(f"email_modal_dismissals column not yet added to database")
@@ -3073,31 +3043,9 @@ def track_rum_metrics():
                    f"Load Complete: {data.get('load_complete')}ms, "
                    f"LCP: {data.get('lcp', 'N/A')}ms")
         
-        # Store in database (using db_utils connection)
-        with db_utils.get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO rum_metrics (
-                    page, user_id, ttfb, fcp, lcp, dns_time, connection_time,
-                    request_time, response_time, dom_interactive_time, dom_complete_time,
-                    load_complete, resource_count, total_resource_size,
-                    user_agent, viewport_width, viewport_height, connection_type,
-                    timestamp
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                )
-            """, (
-                page, user_id,
-                data.get('ttfb'), data.get('fcp'), data.get('lcp'),
-                data.get('dns_time'), data.get('connection_time'),
-                data.get('request_time'), data.get('response_time'),
-                data.get('dom_interactive_time'), data.get('dom_complete_time'),
-                data.get('load_complete'), data.get('resource_count'),
-                data.get('total_resource_size'), data.get('user_agent'),
-                data.get('viewport_width'), data.get('viewport_height'),
-                data.get('connection_type'), data.get('timestamp')
-            ))
-            conn.commit()
+        # Queue for batched insert - the request never waits on the database
+        from analytics_tracker import enqueue_rum_metrics
+        enqueue_rum_metrics(data, user_id)
         
         return jsonify({'success': True})
         
@@ -3126,23 +3074,9 @@ def track_component_performance():
                    f"Render: {data.get('render_time_ms')}ms, "
                    f"Total: {data.get('total_time_ms')}ms")
         
-        # Store in database
-        with db_utils.get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO component_performance (
-                    page, user_id, fetch_time_ms, process_time_ms, render_time_ms,
-                    total_time_ms, data_points, error, timestamp
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, NOW()
-                )
-            """, (
-                page, user_id,
-                data.get('fetch_time_ms'), data.get('process_time_ms'),
-                data.get('render_time_ms'), data.get('total_time_ms'),
-                data.get('data_points'), data.get('error')
-            ))
-            conn.commit()
+        # Queue for batched insert
+        from analytics_tracker import enqueue_component_performance
+        enqueue_component_performance(data, user_id)
         
         return jsonify({'success': True})
         
@@ -3169,20 +3103,9 @@ def track_api_timing():
         else:
             logger.warning(f"API Timing - {api_name} FAILED: {data.get('duration_ms')}ms - {data.get('error')}")
         
-        # Store in database
-        with db_utils.get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO api_timing_client (
-                    api_name, user_id, duration_ms, success, error, timestamp
-                ) VALUES (
-                    %s, %s, %s, %s, %s, NOW()
-                )
-            """, (
-                api_name, user_id, data.get('duration_ms'),
-                data.get('success'), data.get('error')
-            ))
-            conn.commit()
+        # Queue for batched insert
+        from analytics_tracker import enqueue_api_timing
+        enqueue_api_timing(data, user_id)
         
         return jsonify({'success': True})
         
@@ -3191,6 +3114,23 @@ def track_api_timing():
         return jsonify({'success': False, 'error': 'Metrics logging failed'}), 200
 
 
+@app.route('/api/admin/analytics/ingestion-metrics', methods=['GET'])
+@login_required
+def get_analytics_ingestion_metrics():
+    """Backpressure metrics for the batched analytics ingestion queue (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        from analytics_tracker import analytics_tracker
+        
+        return jsonify({'success': True, 'data': analytics_tracker.get_ingestion_metrics()})
+        
+    except Exception as e:
+        logger.error(f"Error getting analytics ingestion metrics: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
 # ============================================================================
 # END PERFORMANCE MONITORING ENDPOINTS
 # ============================================================================
@@ -3926,7 +3866,7 @@ def sync_strava_data_for_user():
             try:
                 # Import the sync function
                 from strava_training_load import process_activities_for_date_range
-                from stravalib.client import Client
+                from http_clients import get_strava_client
                 from datetime import datetime, timedelta
                 from timezone_utils import get_user_current_date
 
@@ -3949,7 +3889,7 @@ def sync_strava_data_for_user():
                 logger.info(f"Loaded tokens for user {user_id}, expires at: {tokens.get('strava_token_expires_at')}")
                 
                 # Create Strava client with user's tokens
-                client = Client(access_token=tokens['strava_access_token'])
+                client = get_strava_client(tokens['strava_access_token'])
                 
                 # Test connection
                 try:
@@ -4205,10 +4145,24 @@ def elevation_migration():
                     <li>Activities with Elevation: {results['elevation_activities']}</li>
                     <li>Activities Updated: {results['updated_activities']}</li>
                     <li>Users Processed: {results['updated_users']}</li>
+                    <li>ACWR Values Recomputed: {results['acwr_rows_updated']} in {results['chunks']} chunks</li>
                 </ul>
             </div>
         '''
 
+        diff = results.get('dry_run_diff')
+        if diff:
+            html_response += f'''
+            <div class="info">
+                <h4>Dry Run Diff</h4>
+                <ul>
+                    <li>Activities whose load would change: {diff['activities_changed']} ({diff['users_changed']} users)</li>
+                    <li>Total load change: {diff['total_load_delta_miles']:+.1f} mi (largest {diff['max_load_change_miles']:.3f} mi)</li>
+                    <li>ACWR values changing by 0.01 or more: {diff['acwr_values_changed']} of {diff['acwr_values_recomputed']} (largest {diff['max_acwr_change']:.3f})</li>
+                </ul>
+            </div>
+            '''
+
         # Add sample calculations
         if results['sample_calculations']:
             html_response += '''
@@ -5257,6 +5211,7 @@ def trigger_autopsy_and_update_recommendations(user_id, completed_date):
                 logger.info(f"Updating recommendation for {tomorrow} with autopsy learning")
 
                 # Trigger learning-based recommendation update
+                from llm_recommendations_module import update_recommendations_with_autopsy_learning
                 update_recommendations_with_autopsy_learning(user_id, completed_date)
 
                 return {
@@ -5348,6 +5303,426 @@ def _recompute_journal_power(user_id, date_str):
     )
 
 
+def _run_journal_learning(user_id, date_str, is_rest_day, steps=None):
+    """
+    Post-journal learning for one day, run by the journal_learning workers after
+    POST /api/journal has committed the entry.
+
+    When saving journal for date X:
+      - If rest day: Generate recommendation for X+1
+      - If workout: Generate autopsy for X (its alignment and quality tracks run
+        concurrently), classify the deviation, update the athlete model, queue
+        alignment queries, then generate the recommendation for X+1
+
+    Returns the outcome stored on the job and served by /api/journal/learning-status.
+    Raises once both steps have been tried if either raised, so the job is retried.
+    The autopsy, deviation classification and athlete model update are recorded in
+    steps (journal_learning.JobSteps) and skipped on retry: they cost an LLM call or
+    are not idempotent.
+    """
+    steps = steps or journal_learning.JobSteps()
+    date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+    autopsy_is_fallback = False
+    autopsy_generated = False
+    recommendation_generated = False
+    autopsy_error = None
+    recommendation_error = None
+    autopsy_analysis = None
+    alignment_score = None
+
+    # Calculate tomorrow's date explicitly (no timezone magic)
+    tomorrow_date = date_obj + timedelta(days=1)
+    tomorrow_date_str = tomorrow_date.strftime('%Y-%m-%d')
+
+    logger.info(f"🧠 Journal learning for {date_str}, will process tomorrow = {tomorrow_date_str}")
+
+    if is_rest_day:
+        # ===== REST DAY PATH =====
+        logger.info(f"🛌 Rest day for {date_str} - generating recommendation for {tomorrow_date_str}")
+        try:
+            # Recalculate moving averages for the rest day BEFORE generating tomorrow's
+            # recommendation — ensures days_since_rest reflects the just-inserted rest day
+            try:
+                from strava_training_load import update_moving_averages
+                update_moving_averages(date_str, user_id)
+                logger.info(f"Updated moving averages for rest day {date_str}")
+            except Exception as ma_err:
+                logger.warning(f"Could not update moving averages for rest day: {ma_err}")
+
+            from llm_recommendations_module import generate_autopsy_informed_daily_decision
+            decision = generate_autopsy_informed_daily_decision(
+                user_id=user_id,
+                target_date=tomorrow_date
+            )
+
+            if decision:
+                # Save recommendation to database with explicit target_date
+                # (decision is pre-parsed dict with daily/weekly/pattern/raw fields)
+                from unified_metrics_service import UnifiedMetricsService
+                current_metrics = UnifiedMetricsService.get_latest_complete_metrics(user_id) or {}
+
+                from llm_recommendations_module import save_llm_recommendation, fix_dates_for_json
+                recommendation_data = {
+                    'generation_date': date_str,
+                    'target_date': tomorrow_date_str,
+                    'valid_until': None,
+                    'data_start_date': date_str,
+                    'data_end_date': date_str,
+                    'metrics_snapshot': current_metrics,
+                    'daily_recommendation': decision['daily_recommendation'],
+                    'raw_response': decision['raw_response'],
+                    'structured_output': decision.get('structured_output'),
+                    'user_id': user_id,
+                    'is_autopsy_informed': False,
+                    'autopsy_count': 0,
+                    'avg_alignment_score': None
+                }
+                recommendation_data = fix_dates_for_json(recommendation_data)
+                save_llm_recommendation(recommendation_data)
+
+                recommendation_generated = True
+                logger.info(f"✅ Generated recommendation for {tomorrow_date_str} after rest day")
+            else:
+                logger.warning(f"❌ Failed to generate recommendation for {tomorrow_date_str}")
+
+        except Exception as e:
+            recommendation_error = str(e)
+            logger.error(f"❌ Error generating recommendation after rest day: {e}", exc_info=True)
+
+    else:
+        # ===== WORKOUT PATH =====
+        logger.info(f"🏃 Workout day for {date_str} - will generate autopsy + recommendation")
+
+        # STEP 1: Generate autopsy for THIS date
+        autopsy_analysis = None
+        alignment_score = None
+        try:
+            if 'autopsy' in steps:
+                # Generated on an earlier attempt of this job; another LLM call would only cost money
+                _autopsy_step = steps.get('autopsy')
+                autopsy_is_fallback = _autopsy_step['is_fallback']
+                _autopsy_next_session_type = _autopsy_step['next_session_type']
+                _autopsy_next_session_adjustment = _autopsy_step['next_session_adjustment']
+                autopsy_analysis = _autopsy_step['autopsy_analysis']
+                alignment_score = _autopsy_step['alignment_score']
+                autopsy_generated = True
+                logger.info(f"♻️ Reusing autopsy for {date_str} from an earlier attempt")
+            else:
+                logger.info(f"🔍 Step 1: Generating autopsy for {date_str}")
+                _autopsy_result = generate_autopsy_for_date(date_str, user_id)
+                if isinstance(_autopsy_result, dict):
+                    autopsy_is_fallback = _autopsy_result.get('is_fallback', False)
+                    _autopsy_next_session_type = _autopsy_result.get('next_session_type')
+                    _autopsy_next_session_adjustment = _autopsy_result.get('next_session_adjustment')
+                else:
+                    autopsy_is_fallback = bool(_autopsy_result)
+                    _autopsy_next_session_type = None
+                    _autopsy_next_session_adjustment = None
+                autopsy_generated = True
+                logger.info(f"✅ Autopsy generated for {date_str}")
+
+                # Get the JUST-generated autopsy for use in recommendation
+                autopsy_info = db_utils.execute_query(
+                    "SELECT autopsy_analysis, alignment_score FROM ai_autopsies WHERE user_id = %s AND date = %s ORDER BY generated_at DESC LIMIT 1",
+                    (user_id, date_str),
+                    fetch=True
+                )
+                if autopsy_info and autopsy_info[0]:
+                    autopsy_analysis = autopsy_info[0]['autopsy_analysis'] if hasattr(autopsy_info[0], 'keys') else autopsy_info[0][0]
+                    alignment_score = autopsy_info[0]['alignment_score'] if hasattr(autopsy_info[0], 'keys') else autopsy_info[0][1]
+                    logger.info(f"📋 Retrieved autopsy for {date_str}: alignment={alignment_score}/10")
+
+                steps.record('autopsy', {
+                    'is_fallback': autopsy_is_fallback,
+                    'next_session_type': _autopsy_next_session_type,
+                    'next_session_adjustment': _autopsy_next_session_adjustment,
+                    'autopsy_analysis': autopsy_analysis,
+                    'alignment_score': alignment_score,
+                })
+
+        except Exception as e:
+            autopsy_error = str(e)
+            logger.error(f"❌ Autopsy generation failed for {date_str}: {e}", exc_info=True)
+
+        # STEP 1.5: Phase C — Deviation Classification
+        # Run only when autopsy succeeded and an alignment score is available.
+        # Fetch extraction_result from the recommendation conversation for date_str,
+        # and structured_output from the llm_recommendations row for date_str.
+        if autopsy_generated and alignment_score is not None and 'deviation' not in steps:
+            try:
+                from llm_recommendations_module import classify_deviation
+
+                conv_row = db_utils.get_recommendation_conversation(user_id, date_str)
+                extraction_result_for_classification = (
+                    conv_row.get('extraction_result') if conv_row else None
+                ) or {}
+
+                rec_row = db_utils.execute_query(
+                    "SELECT structured_output FROM llm_recommendations "
+                    "WHERE user_id = %s AND target_date = %s "
+                    "ORDER BY generated_at DESC LIMIT 1",
+                    (user_id, date_str),
+                    fetch=True
+                )
+                structured_output_for_classification = (
+                    rec_row[0].get('structured_output') if rec_row and rec_row[0] else None
+                ) or {}
+
+                classify_deviation(
+                    user_id=user_id,
+                    activity_date=date_str,
+                    alignment_score=alignment_score,
+                    extraction_result=extraction_result_for_classification,
+                    structured_output=structured_output_for_classification,
+                )
+                steps.record('deviation')
+            except Exception as classify_err:
+                logger.warning(
+                    f"classify_deviation failed for user {user_id}, "
+                    f"date {date_str}: {classify_err}"
+                )
+
+        # Update athlete model AFTER Phase C so deviation_reason is available
+        # for threshold calibration in update_athlete_model().
+        # Skip when the autopsy is a fallback — it uses a hardcoded score=6 that
+        # does not reflect real compliance and would bias avg_lifetime_alignment.
+        # Never twice per generation: apply_autopsy() folds the day in again on every call.
+        if (autopsy_generated and alignment_score is not None and not autopsy_is_fallback
+                and 'athlete_model' not in steps):
+            try:
+                from llm_recommendations_module import update_athlete_model
+                update_athlete_model(user_id, {
+                    'alignment_score': alignment_score,
+                    'date': date_str,
+                    'next_session_type': _autopsy_next_session_type,
+                    'next_session_adjustment': _autopsy_next_session_adjustment,
+                })
+                steps.record('athlete_model')
+            except Exception as model_err:
+                logger.warning(
+                    f"Athlete model update failed for user {user_id}, "
+                    f"date {date_str}: {model_err}"
+                )
+
+        # Phase D: Insert alignment query when score is poor and autopsy found nothing significant
+        if autopsy_generated and alignment_score is not None and alignment_score < 4:
+            try:
+                # Check whether autopsy extraction surfaced any meaningful insight
+                conv_row_for_query = db_utils.get_recommendation_conversation(user_id, date_str)
+                extraction_for_query = (
+                    conv_row_for_query.get('extraction_result') if conv_row_for_query else None
+                ) or {}
+                nothing_significant = (
+                    extraction_for_query is None
+                    or extraction_for_query.get('nothing_significant') is True
+                    or not extraction_for_query
+                )
+                if nothing_significant:
+                    db_utils.execute_query(
+                        """
+                        INSERT INTO alignment_queries
+                            (user_id, activity_date, alignment_score, status)
+                        VALUES (%s, %s, %s, 'pending')
+                        ON CONFLICT (user_id, activity_date) DO NOTHING
+                        """,
+                        (user_id, date_str, alignment_score),
+                        fetch=False
+                    )
+                    logger.info(
+                        f"Phase D: alignment query queued for user {user_id}, "
+                        f"date {date_str}, alignment={alignment_score}"
+                    )
+            except Exception as aq_err:
+                logger.warning(
+                    f"Phase D: alignment query insertion failed for user {user_id}, "
+                    f"date {date_str}: {aq_err}"
+                )
+
+        # Phase E: K-of-N pattern check — upgrade to pattern query when ≥2 of last 5 sessions missed.
+        # Fires whenever today is a miss (score < 7), regardless of whether Phase D also fired.
+        # ON CONFLICT DO UPDATE means Phase E supersedes any per_session query Phase D just created.
+        if autopsy_generated and alignment_score is not None and alignment_score < 7:
+            try:
+                recent_rows = db_utils.execute_query(
+                    """
+                    SELECT alignment_score FROM ai_autopsies
+                    WHERE user_id = %s AND date <= %s AND alignment_score IS NOT NULL
+                    ORDER BY date DESC LIMIT 5
+                    """,
+                    (user_id, date_str),
+                    fetch=True
+                )
+                if recent_rows and len(recent_rows) >= 3:
+                    scores = [row['alignment_score'] for row in recent_rows]
+                    n = len(scores)
+                    k_on_target = sum(1 for s in scores if s >= 7)
+                    k_missed = n - k_on_target
+                    if k_missed >= 2:
+                        context_msg = (
+                            f"You missed today — that's {k_missed} of your last {n} sessions "
+                            f"off target. Your weekly plan isn't landing the way it should. "
+                            f"Before I regenerate it, is there something going on I should "
+                            f"know about and account for?"
+                        )
+                        db_utils.execute_query(
+                            """
+                            INSERT INTO alignment_queries
+                                (user_id, activity_date, alignment_score, status,
+                                 query_type, context_message)
+                            VALUES (%s, %s, %s, 'pending', 'pattern', %s)
+                            ON CONFLICT (user_id, activity_date)
+                            DO UPDATE SET query_type = 'pattern',
+                                         context_message = EXCLUDED.context_message
+                            """,
+                            (user_id, date_str, alignment_score, context_msg),
+                            fetch=False
+                        )
+                        logger.info(
+                            f"Phase E: pattern query queued for user {user_id}, "
+                            f"date {date_str}, k_missed={k_missed}/{n}"
+                        )
+                        if k_on_target <= 2:
+                            week_ctx = db_utils.get_current_week_context(user_id)
+                            if week_ctx and week_ctx.get('week_start_date'):
+                                proposal = (
+                                    f"Alignment K-of-N: {k_on_target}/{n} sessions on target. "
+                                    f"Pattern query pending athlete response before regeneration."
+                                )
+                                db_utils.set_revision_pending(
+                                    user_id, week_ctx['week_start_date'], proposal
+                                )
+                                logger.info(
+                                    f"Phase E: revision_pending set for user {user_id}, "
+                                    f"k_on_target={k_on_target}/{n}"
+                                )
+            except Exception as kn_err:
+                logger.warning(
+                    f"Phase E: K-of-N check failed for user {user_id}, "
+                    f"date {date_str}: {kn_err}"
+                )
+
+        # STEP 2: Generate/update recommendation for TOMORROW using THIS autopsy
+        try:
+            logger.info(f"🤖 Step 2: Generating recommendation for {tomorrow_date_str} using autopsy from {date_str}")
+
+            # Create autopsy insights dict with the JUST-generated autopsy
+            if autopsy_analysis and alignment_score:
+                logger.info(f"✅ Using fresh autopsy from {date_str} (alignment: {alignment_score}/10)")
+                autopsy_insights = {
+                    'count': 1,
+                    'avg_alignment': alignment_score,
+                    'latest_insights': autopsy_analysis,  # Full autopsy for complete context
+                    'alignment_trend': [alignment_score],
+                    'date': date_str  # Which day this autopsy analyzed
+                }
+            else:
+                logger.warning(f"⚠️ No autopsy available for {date_str}, using recent autopsy data")
+                autopsy_insights = None  # Let the function fetch recent insights
+
+            # Generate recommendation (returns pre-parsed dict)
+            from llm_recommendations_module import generate_autopsy_informed_daily_decision
+            decision = generate_autopsy_informed_daily_decision(
+                user_id=user_id,
+                target_date=tomorrow_date,
+                autopsy_insights=autopsy_insights
+            )
+
+            if decision:
+                # save_llm_recommendation() upserts (DELETE then INSERT keyed on
+                # user_id + target_date), so no existence check is needed here —
+                # this also guarantees structured_output is always written,
+                # whether tomorrow's recommendation already existed or not.
+                logger.info(f"📝 Saving recommendation for {tomorrow_date_str}")
+                from unified_metrics_service import UnifiedMetricsService
+                current_metrics_for_save = UnifiedMetricsService.get_latest_complete_metrics(user_id) or {}
+
+                from llm_recommendations_module import save_llm_recommendation, fix_dates_for_json
+                recommendation_data = {
+                    'generation_date': date_str,
+                    'target_date': tomorrow_date_str,
+                    'valid_until': None,
+                    'data_start_date': date_str,
+                    'data_end_date': date_str,
+                    'metrics_snapshot': current_metrics_for_save,
+                    'daily_recommendation': decision['daily_recommendation'],
+                    'raw_response': decision['raw_response'],
+                    'structured_output': decision.get('structured_output'),
+                    'user_id': user_id,
+                    'is_autopsy_informed': True,
+                    'autopsy_count': 1,
+                    'avg_alignment_score': alignment_score
+                }
+                recommendation_data = fix_dates_for_json(recommendation_data)
+                save_llm_recommendation(recommendation_data)
+
+                recommendation_generated = True
+                logger.info(f"✅ Recommendation for {tomorrow_date_str} is autopsy-informed")
+            else:
+                logger.warning(f"❌ Failed to generate recommendation for {tomorrow_date_str}")
+
+        except Exception as e:
+            recommendation_error = str(e)
+            logger.error(f"❌ Error generating recommendation for {tomorrow_date_str}: {e}", exc_info=True)
+
+    # The steps above run independently so one failure doesn't skip the other, but
+    # either raising must reach the job runner so it retries with backoff
+    step_errors = [f"{step}: {error}" for step, error in
+                   (('autopsy', autopsy_error), ('recommendation', recommendation_error)) if error]
+    if step_errors:
+        raise RuntimeError('; '.join(step_errors))
+
+    if is_rest_day and recommendation_generated:
+        user_message = "🛌 Rest day marked! Tomorrow's workout recommendation generated based on your current metrics."
+    elif autopsy_generated and recommendation_generated:
+        user_message = "✅ AI autopsy generated and tomorrow's recommendation updated with latest insights."
+    elif is_rest_day:
+        user_message = "🛌 Rest day marked! Note: Recommendation generation encountered an issue."
+    elif autopsy_generated:
+        user_message = "✅ AI autopsy generated. Note: Recommendation update encountered an issue."
+    else:
+        user_message = "✅ Observations saved successfully!"
+
+    return {
+        'is_rest_day': is_rest_day,
+        'target_date': tomorrow_date_str,
+        'autopsy_generated': autopsy_generated,
+        'autopsy_is_fallback': autopsy_is_fallback,
+        'recommendation_generated': recommendation_generated,
+        'autopsy_analysis': autopsy_analysis,
+        'alignment_score': alignment_score,
+        'user_message': user_message,
+    }
+
+
+journal_learning.register_handler(_run_journal_learning)
+
+
+@app.route('/api/journal/learning-status', methods=['GET'])
+@login_required
+def get_journal_learning_status():
+    """Poll the learning job queued by POST /api/journal for ?date=YYYY-MM-DD."""
+    date_str = request.args.get('date')
+    try:
+        datetime.strptime(date_str or '', '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    try:
+        job = journal_learning.get_status(current_user.id, date_str)
+        if not job:
+            return jsonify({'success': False, 'status': 'not_found', 'date': date_str}), 404
+        return jsonify({
+            'success': True,
+            'date': date_str,
+            'status': job['status'],
+            'attempts': job['attempts'],
+            'error': job['error'],
+            'result': job['result'] if job['status'] == journal_learning.DONE else None,
+        })
+    except Exception as e:
+        logger.error(f"Error getting journal learning status: {str(e)}")
+        return jsonify({'success': False, 'error': 'Internal server error'}), 500
+
+
 @login_required
 @app.route('/api/today-activity-info', methods=['GET'])
 def get_today_activity_info():
@@ -5448,10 +5823,6 @@ def save_journal_entry():
         _recompute_journal_power(current_user.id, date_str)
         logger.info(f"Saved journal entry for user {current_user.id} on {date_str}")
 
-        # EXISTING AUTOPSY TRIGGER LOGIC - ONLY ENHANCED WITH BETTER TRACKING
-        autopsy_generated = False
-        autopsy_is_fallback = False
-        autopsy_error = None
         is_rest_day = data.get('is_rest_day', False)  # NEW: Rest day flag
 
         # Auto-detect rest day: if no real Strava activity exists for this date, treat as rest day.
@@ -5517,6 +5888,7 @@ def save_journal_entry():
                         tuple(rest_day_record.values())
                     )
                     
+                    invalidate_engagement_signals(current_user.id)
                     logger.info(f"✅ Created rest day activity record for {date_str}")
 
                     try:
@@ -5532,379 +5904,30 @@ def save_journal_entry():
                 logger.warning(f"Failed to create rest day activity: {rest_error}")
                 # Continue anyway - journal entry is more important
 
-        # ========================================================================
-        # SIMPLIFIED WORKFLOW WITH EXPLICIT DATES
-        # ========================================================================
-        # When saving journal for date X:
-        #   - If rest day: Generate recommendation for X+1
-        #   - If workout: Generate autopsy for X, then recommendation for X+1
-        # ========================================================================
-        
-        autopsy_generated = False
-        recommendation_generated = False
-        autopsy_error = None
-        recommendation_error = None
-        autopsy_analysis = None
-        alignment_score = None
-        
-        # Calculate tomorrow's date explicitly (no timezone magic)
-        tomorrow_date = date_obj + timedelta(days=1)
-        tomorrow_date_str = tomorrow_date.strftime('%Y-%m-%d')
-        
-        logger.info(f"📝 Journal saved for {date_str}, will process tomorrow = {tomorrow_date_str}")
-        
-        if is_rest_day:
-            # ===== REST DAY PATH =====
-            logger.info(f"🛌 Rest day for {date_str} - generating recommendation for {tomorrow_date_str}")
-            try:
-                # Recalculate moving averages for the rest day BEFORE generating tomorrow's
-                # recommendation — ensures days_since_rest reflects the just-inserted rest day
-                try:
-                    from strava_training_load import update_moving_averages
-                    update_moving_averages(date_str, current_user.id)
-                    logger.info(f"Updated moving averages for rest day {date_str}")
-                except Exception as ma_err:
-                    logger.warning(f"Could not update moving averages for rest day: {ma_err}")
-
-                from llm_recommendations_module import generate_autopsy_informed_daily_decision
-                decision = generate_autopsy_informed_daily_decision(
-                    user_id=current_user.id,
-                    target_date=tomorrow_date
-                )
-
-                if decision:
-                    # Save recommendation to database with explicit target_date
-                    # (decision is pre-parsed dict with daily/weekly/pattern/raw fields)
-                    from unified_metrics_service import UnifiedMetricsService
-                    current_metrics = UnifiedMetricsService.get_latest_complete_metrics(current_user.id) or {}
-
-                    from llm_recommendations_module import save_llm_recommendation, fix_dates_for_json
-                    recommendation_data = {
-                        'generation_date': date_str,
-                        'target_date': tomorrow_date_str,
-                        'valid_until': None,
-                        'data_start_date': date_str,
-                        'data_end_date': date_str,
-                        'metrics_snapshot': current_metrics,
-                        'daily_recommendation': decision['daily_recommendation'],
-                        'raw_response': decision['raw_response'],
-                        'structured_output': decision.get('structured_output'),
-                        'user_id': current_user.id,
-                        'is_autopsy_informed': False,
-                        'autopsy_count': 0,
-                        'avg_alignment_score': None
-                    }
-                    recommendation_data = fix_dates_for_json(recommendation_data)
-                    save_llm_recommendation(recommendation_data)
-
-                    recommendation_generated = True
-                    logger.info(f"✅ Generated recommendation for {tomorrow_date_str} after rest day")
-                else:
-                    logger.warning(f"❌ Failed to generate recommendation for {tomorrow_date_str}")
-                    
-            except Exception as e:
-                recommendation_error = str(e)
-                logger.error(f"❌ Error generating recommendation after rest day: {e}", exc_info=True)
-        
-        else:
-            # ===== WORKOUT PATH =====
-            logger.info(f"🏃 Workout day for {date_str} - will generate autopsy + recommendation")
-            
-            # STEP 1: Generate autopsy for THIS date
-            autopsy_analysis = None
-            alignment_score = None
-            try:
-                logger.info(f"🔍 Step 1: Generating autopsy for {date_str}")
-                _autopsy_result = generate_autopsy_for_date(date_str, current_user.id)
-                if isinstance(_autopsy_result, dict):
-                    autopsy_is_fallback = _autopsy_result.get('is_fallback', False)
-                    _autopsy_next_session_type = _autopsy_result.get('next_session_type')
-                    _autopsy_next_session_adjustment = _autopsy_result.get('next_session_adjustment')
-                else:
-                    autopsy_is_fallback = bool(_autopsy_result)
-                    _autopsy_next_session_type = None
-                    _autopsy_next_session_adjustment = None
-                autopsy_generated = True
-                logger.info(f"✅ Autopsy generated for {date_str}")
-                
-                # Get the JUST-generated autopsy for use in recommendation
-                autopsy_info = db_utils.execute_query(
-                    "SELECT autopsy_analysis, alignment_score FROM ai_autopsies WHERE user_id = %s AND date = %s ORDER BY generated_at DESC LIMIT 1",
-                    (current_user.id, date_str),
-                    fetch=True
-                )
-                if autopsy_info and autopsy_info[0]:
-                    autopsy_analysis = autopsy_info[0]['autopsy_analysis'] if hasattr(autopsy_info[0], 'keys') else autopsy_info[0][0]
-                    alignment_score = autopsy_info[0]['alignment_score'] if hasattr(autopsy_info[0], 'keys') else autopsy_info[0][1]
-                    logger.info(f"📋 Retrieved autopsy for {date_str}: alignment={alignment_score}/10")
-                
-            except Exception as e:
-                autopsy_error = str(e)
-                logger.error(f"❌ Autopsy generation failed for {date_str}: {e}", exc_info=True)
-            
-            # STEP 1.5: Phase C — Deviation Classification
-            # Run only when autopsy succeeded and an alignment score is available.
-            # Fetch extraction_result from the recommendation conversation for date_str,
-            # and structured_output from the llm_recommendations row for date_str.
-            if autopsy_generated and alignment_score is not None:
-                try:
-                    from llm_recommendations_module import classify_deviation
-
-                    conv_row = db_utils.get_recommendation_conversation(current_user.id, date_str)
-                    extraction_result_for_classification = (
-                        conv_row.get('extraction_result') if conv_row else None
-                    ) or {}
-
-                    rec_row = db_utils.execute_query(
-                        "SELECT structured_output FROM llm_recommendations "
-                        "WHERE user_id = %s AND target_date = %s "
-                        "ORDER BY generated_at DESC LIMIT 1",
-                        (current_user.id, date_str),
-                        fetch=True
-                    )
-                    structured_output_for_classification = (
-                        rec_row[0].get('structured_output') if rec_row and rec_row[0] else None
-                    ) or {}
-
-                    classify_deviation(
-                        user_id=current_user.id,
-                        activity_date=date_str,
-                        alignment_score=alignment_score,
-                        extraction_result=extraction_result_for_classification,
-                        structured_output=structured_output_for_classification,
-                    )
-                except Exception as classify_err:
-                    logger.warning(
-                        f"classify_deviation failed for user {current_user.id}, "
-                        f"date {date_str}: {classify_err}"
-                    )
-
-            # Update athlete model AFTER Phase C so deviation_reason is available
-            # for threshold calibration in update_athlete_model().
-            # Skip when the autopsy is a fallback — it uses a hardcoded score=6 that
-            # does not reflect real compliance and would bias avg_lifetime_alignment.
-            if autopsy_generated and alignment_score is not None and not autopsy_is_fallback:
-                try:
-                    from llm_recommendations_module import update_athlete_model
-                    update_athlete_model(current_user.id, {
-                        'alignment_score': alignment_score,
-                        'date': date_str,
-                        'next_session_type': _autopsy_next_session_type,
-                        'next_session_adjustment': _autopsy_next_session_adjustment,
-                    })
-                except Exception as model_err:
-                    logger.warning(
-                        f"Athlete model update failed for user {current_user.id}, "
-                        f"date {date_str}: {model_err}"
-                    )
-
-            # Phase D: Insert alignment query when score is poor and autopsy found nothing significant
-            if autopsy_generated and alignment_score is not None and alignment_score < 4:
-                try:
-                    # Check whether autopsy extraction surfaced any meaningful insight
-                    conv_row_for_query = db_utils.get_recommendation_conversation(current_user.id, date_str)
-                    extraction_for_query = (
-                        conv_row_for_query.get('extraction_result') if conv_row_for_query else None
-                    ) or {}
-                    nothing_significant = (
-                        extraction_for_query is None
-                        or extraction_for_query.get('nothing_significant') is True
-                        or not extraction_for_query
-                    )
-                    if nothing_significant:
-                        db_utils.execute_query(
-                            """
-                            INSERT INTO alignment_queries
-                                (user_id, activity_date, alignment_score, status)
-                            VALUES (%s, %s, %s, 'pending')
-                            ON CONFLICT (user_id, activity_date) DO NOTHING
-                            """,
-                            (current_user.id, date_str, alignment_score),
-                            fetch=False
-                        )
-                        logger.info(
-                            f"Phase D: alignment query queued for user {current_user.id}, "
-                            f"date {date_str}, alignment={alignment_score}"
-                        )
-                except Exception as aq_err:
-                    logger.warning(
-                        f"Phase D: alignment query insertion failed for user {current_user.id}, "
-                        f"date {date_str}: {aq_err}"
-                    )
-
-            # Phase E: K-of-N pattern check — upgrade to pattern query when ≥2 of last 5 sessions missed.
-            # Fires whenever today is a miss (score < 7), regardless of whether Phase D also fired.
-            # ON CONFLICT DO UPDATE means Phase E supersedes any per_session query Phase D just created.
-            if autopsy_generated and alignment_score is not None and alignment_score < 7:
-                try:
-                    recent_rows = db_utils.execute_query(
-                        """
-                        SELECT alignment_score FROM ai_autopsies
-                        WHERE user_id = %s AND date <= %s AND alignment_score IS NOT NULL
-                        ORDER BY date DESC LIMIT 5
-                        """,
-                        (current_user.id, date_str),
-                        fetch=True
-                    )
-                    if recent_rows and len(recent_rows) >= 3:
-                        scores = [row['alignment_score'] for row in recent_rows]
-                        n = len(scores)
-                        k_on_target = sum(1 for s in scores if s >= 7)
-                        k_missed = n - k_on_target
-                        if k_missed >= 2:
-                            context_msg = (
-                                f"You missed today — that's {k_missed} of your last {n} sessions "
-                                f"off target. Your weekly plan isn't landing the way it should. "
-                                f"Before I regenerate it, is there something going on I should "
-                                f"know about and account for?"
-                            )
-                            db_utils.execute_query(
-                                """
-                                INSERT INTO alignment_queries
-                                    (user_id, activity_date, alignment_score, status,
-                                     query_type, context_message)
-                                VALUES (%s, %s, %s, 'pending', 'pattern', %s)
-                                ON CONFLICT (user_id, activity_date)
-                                DO UPDATE SET query_type = 'pattern',
-                                             context_message = EXCLUDED.context_message
-                                """,
-                                (current_user.id, date_str, alignment_score, context_msg),
-                                fetch=False
-                            )
-                            logger.info(
-                                f"Phase E: pattern query queued for user {current_user.id}, "
-                                f"date {date_str}, k_missed={k_missed}/{n}"
-                            )
-                            if k_on_target <= 2:
-                                week_ctx = db_utils.get_current_week_context(current_user.id)
-                                if week_ctx and week_ctx.get('week_start_date'):
-                                    proposal = (
-                                        f"Alignment K-of-N: {k_on_target}/{n} sessions on target. "
-                                        f"Pattern query pending athlete response before regeneration."
-                                    )
-                                    db_utils.set_revision_pending(
-                                        current_user.id, week_ctx['week_start_date'], proposal
-                                    )
-                                    logger.info(
-                                        f"Phase E: revision_pending set for user {current_user.id}, "
-                                        f"k_on_target={k_on_target}/{n}"
-                                    )
-                except Exception as kn_err:
-                    logger.warning(
-                        f"Phase E: K-of-N check failed for user {current_user.id}, "
-                        f"date {date_str}: {kn_err}"
-                    )
-
-            # STEP 2: Generate/update recommendation for TOMORROW using THIS autopsy
-            try:
-                logger.info(f"🤖 Step 2: Generating recommendation for {tomorrow_date_str} using autopsy from {date_str}")
-
-                # Create autopsy insights dict with the JUST-generated autopsy
-                if autopsy_analysis and alignment_score:
-                    logger.info(f"✅ Using fresh autopsy from {date_str} (alignment: {alignment_score}/10)")
-                    autopsy_insights = {
-                        'count': 1,
-                        'avg_alignment': alignment_score,
-                        'latest_insights': autopsy_analysis,  # Full autopsy for complete context
-                        'alignment_trend': [alignment_score],
-                        'date': date_str  # Which day this autopsy analyzed
-                    }
-                else:
-                    logger.warning(f"⚠️ No autopsy available for {date_str}, using recent autopsy data")
-                    autopsy_insights = None  # Let the function fetch recent insights
-
-                # Generate recommendation (returns pre-parsed dict)
-                from llm_recommendations_module import generate_autopsy_informed_daily_decision
-                decision = generate_autopsy_informed_daily_decision(
-                    user_id=current_user.id,
-                    target_date=tomorrow_date,
-                    autopsy_insights=autopsy_insights
-                )
-
-                if decision:
-                    # save_llm_recommendation() upserts (DELETE then INSERT keyed on
-                    # user_id + target_date), so no existence check is needed here —
-                    # this also guarantees structured_output is always written,
-                    # whether tomorrow's recommendation already existed or not.
-                    logger.info(f"📝 Saving recommendation for {tomorrow_date_str}")
-                    from unified_metrics_service import UnifiedMetricsService
-                    current_metrics_for_save = UnifiedMetricsService.get_latest_complete_metrics(current_user.id) or {}
-
-                    from llm_recommendations_module import save_llm_recommendation, fix_dates_for_json
-                    recommendation_data = {
-                        'generation_date': date_str,
-                        'target_date': tomorrow_date_str,
-                        'valid_until': None,
-                        'data_start_date': date_str,
-                        'data_end_date': date_str,
-                        'metrics_snapshot': current_metrics_for_save,
-                        'daily_recommendation': decision['daily_recommendation'],
-                        'raw_response': decision['raw_response'],
-                        'structured_output': decision.get('structured_output'),
-                        'user_id': current_user.id,
-                        'is_autopsy_informed': True,
-                        'autopsy_count': 1,
-                        'avg_alignment_score': alignment_score
-                    }
-                    recommendation_data = fix_dates_for_json(recommendation_data)
-                    save_llm_recommendation(recommendation_data)
-
-                    recommendation_generated = True
-                    logger.info(f"✅ Recommendation for {tomorrow_date_str} is autopsy-informed")
-                else:
-                    logger.warning(f"❌ Failed to generate recommendation for {tomorrow_date_str}")
-                    
-            except Exception as e:
-                recommendation_error = str(e)
-                logger.error(f"❌ Error generating recommendation for {tomorrow_date_str}: {e}", exc_info=True)
-
-        # ENHANCED USER RESPONSE - This is the main addition
-        response_data = {
-            'success': True,
-            'message': 'Journal entry saved successfully',
-            'date': date_str
-        }
+        # The autopsy, athlete model update and tomorrow's decision run on the journal
+        # learning workers; clients poll /api/journal/learning-status for the outcome
+        try:
+            learning = journal_learning.enqueue(current_user.id, date_str, is_rest_day)
+            learning_status = learning['status']
+        except Exception as queue_error:
+            logger.error(f"Failed to queue journal learning for user {current_user.id} on {date_str}: {queue_error}")
+            learning_status = 'unavailable'
+        logger.info(f"📝 Journal saved for {date_str}, learning job {learning_status}")
 
-        # Add helpful user messaging based on what happened
-        if is_rest_day and recommendation_generated:
-            response_data['user_message'] = (
-                "🛌 Rest day marked! Tomorrow's workout recommendation generated based on your current metrics."
-            )
-            response_data['is_rest_day'] = True
-            response_data['recommendation_generated'] = True
-        elif autopsy_generated and recommendation_generated:
-            response_data['user_message'] = (
-                "✅ Observations saved! AI autopsy generated and tomorrow's recommendation updated with latest insights."
-            )
-            response_data['autopsy_generated'] = True
-            response_data['recommendation_generated'] = True
-        elif is_rest_day:
-            response_data['user_message'] = (
-                f"🛌 Rest day marked! {'Note: Recommendation generation encountered an issue.' if recommendation_error else ''}"
-            )
-            response_data['is_rest_day'] = True
-            response_data['recommendation_generated'] = False
-        elif autopsy_generated:
-            response_data['user_message'] = (
-                "✅ Observations saved! AI autopsy generated. "
-                f"{'Note: Recommendation update encountered an issue.' if recommendation_error else ''}"
-            )
-            response_data['autopsy_generated'] = True
-            response_data['recommendation_generated'] = False
-        elif autopsy_error:
-            response_data['user_message'] = (
-                "✅ Observations saved! Note: AI analysis generation encountered an issue. "
-                "Your data is safe - try refreshing AI Analysis on the Dashboard."
-            )
-            response_data['autopsy_error'] = autopsy_error
+        if is_rest_day:
+            user_message = "🛌 Rest day marked! Tomorrow's workout recommendation is being generated."
         else:
-            response_data['user_message'] = "✅ Observations saved successfully!"
-            response_data['autopsy_generated'] = False
-
-        response_data['autopsy_analysis'] = autopsy_analysis
-        response_data['alignment_score'] = alignment_score
+            user_message = "✅ Observations saved! AI autopsy and tomorrow's recommendation are being generated."
 
-        return jsonify(response_data)
+        return jsonify({
+            'success': True,
+            'message': 'Journal entry saved successfully',
+            'date': date_str,
+            'is_rest_day': is_rest_day,
+            'user_message': user_message,
+            'learning_status': learning_status,
+            'learning_status_url': f"/api/journal/learning-status?date={date_str}",
+        })
 
     except Exception as e:
         logger.error(f"Error saving journal entry: {str(e)}", exc_info=True)
@@ -6031,6 +6054,7 @@ def get_readiness():
                 weight_baseline = round(float(b[0]['baseline']), 2)
 
         # ANS readiness: z-score pipeline with four-state classification
+        from readiness_engine import get_ans_readiness
         _ans = get_ans_readiness(current_user.id)
 
         # Component flags (sleep, soreness) via legacy path — HRV/RHR driven by ans_result
@@ -6729,6 +6753,7 @@ def auto_mark_rest_day_and_generate_recommendation(user_id, rest_date):
                 tuple(rest_day_record.values())
             )
 
+            invalidate_engagement_signals(user_id)
             logger.info(f"✅ Created auto rest day activity for {rest_date_str}")
 
             # Update moving averages for the rest day
@@ -6823,6 +6848,7 @@ def daily_recommendations_cron():
 
         # Sync intervals.icu wellness data before generating recommendations
         try:
+            from intervals_icu_sync import run_daily_sync as intervals_icu_daily_sync
             sync_result = intervals_icu_daily_sync()
             logger.info(f"intervals.icu sync: {sync_result}")
         except Exception as sync_err:
@@ -6919,6 +6945,7 @@ def daily_recommendations_cron():
                 # directly contradict the Coach page (e.g. plan calls for a peak long run,
                 # daily Rx says "4 mi easy"). force=True + explicit target_date force-regens
                 # tomorrow's rec deterministically.
+                from llm_recommendations_module import generate_recommendations
                 recommendation = generate_recommendations(force=True, user_id=user_id, target_date=tomorrow)
 
                 if recommendation:
@@ -6983,6 +7010,66 @@ def token_refresh_cron():
         }), 500
 
 
+@app.route('/cron/analytics-rollup', methods=['POST'])
+def analytics_rollup_cron():
+    """
+    Fold new analytics_events into the analytics_daily_rollup aggregates.
+    Called by Cloud Scheduler; report endpoints also refresh lazily when stale.
+    """
+    try:
+        if not request.headers.get('X-Cloudscheduler'):
+            logger.warning("Unauthorized analytics rollup request")
+            return jsonify({'error': 'Unauthorized'}), 401
+        
+        from analytics_tracker import analytics_tracker
+        
+        result = analytics_tracker.refresh_daily_rollup()
+        
+        logger.info(f"Analytics rollup cron completed: {result}")
+        
+        return jsonify({
+            'success': True,
+            'result': result
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in analytics rollup cron: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/cron/registration-sessions', methods=['POST'])
+def registration_sessions_cron():
+    """
+    Write buffered registration-session activity and expire overdue sessions
+    in one set-based UPDATE. Called by Cloud Scheduler every few minutes.
+    """
+    try:
+        if not request.headers.get('X-Cloudscheduler'):
+            logger.warning("Unauthorized registration sessions request")
+            return jsonify({'error': 'Unauthorized'}), 401
+        
+        from registration_session_manager import registration_session_manager
+        
+        result = registration_session_manager.run_maintenance()
+        
+        logger.info(f"Registration sessions cron completed: {result}")
+        
+        return jsonify({
+            'success': True,
+            'result': result
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in registration sessions cron: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @app.route('/cron/weekly-comprehensive', methods=['POST'])
 def weekly_comprehensive_cron():
     """
@@ -7028,6 +7115,7 @@ def weekly_comprehensive_cron():
                 # Generate full comprehensive recommendation
                 if _is_feature_enabled('agentic_context', user_id):
                     logger.info(f"Using agentic path for user {user_id}")
+                    from llm_recommendations_module import generate_recommendations, generate_recommendations_agentic
                     recommendation = generate_recommendations_agentic(user_id=user_id)
                 else:
                     recommendation = generate_recommendations(force=True, user_id=user_id)
@@ -7073,7 +7161,9 @@ def weekly_program_cron():
       then weekly-comprehensive runs at 4am to generate full 7-day Sun-Sat program
     - Wednesday ~6 PM Pacific: Regenerate remaining days (adjust based on Mon-Wed performance)
     
-    Runs for active users only (activity in last 14 days).
+    Runs for active users only (activity in last 14 days), several at a time
+    (weekly_program_cache.prewarm). ?week_start=YYYY-MM-DD targets a given week, so an
+    off-peak schedule can prewarm next week's programs ahead of time.
     """
     try:
         # Verify this is coming from Cloud Scheduler
@@ -7123,66 +7213,37 @@ def weekly_program_cron():
 
         logger.info(f"Found {len(active_users)} active users")
 
-        # Import the generation function
-        from coach_recommendations import generate_weekly_program, save_weekly_program
-        
-        success_count = 0
-        error_count = 0
-        skipped_count = 0
-
-        for user_row in active_users:
-            user_dict = dict(user_row)
-            user_id = user_dict['user_id']
-            email = user_dict.get('email', 'unknown')
+        from timezone_utils import get_current_week_start
+        from weekly_program_cache import prewarm
 
+        # An explicit week_start prewarms that week (e.g. next week, ahead of time)
+        week_start_str = request.args.get('week_start')
+        if week_start_str:
             try:
-                logger.info(f"Generating weekly program for user {user_id} ({email})")
-                
-                # Calculate target week start based on mode
-                from timezone_utils import get_current_week_start
-                target_week_start = get_current_week_start()
-                
-                logger.info(f"Target week start: {target_week_start} (mode: {mode})")
-                
-                # Check if user has race goals configured
-                race_goals = execute_query(
-                    "SELECT COUNT(*) as count FROM race_goals WHERE user_id = %s",
-                    (user_id,),
-                    fetch=True
-                )
-                
-                if race_goals and race_goals[0]['count'] == 0:
-                    logger.info(f"Skipping user {user_id}: No race goals configured")
-                    skipped_count += 1
-                    continue
-                
-                # Generate the weekly program
-                # Force regeneration for adjustment mode, allow cache for full mode
-                result = generate_weekly_program(
-                    user_id=user_id,
-                    target_week_start=target_week_start,
-                    force_regenerate=(mode == 'adjustment')
-                )
-
-                if result:
-                    save_weekly_program(
-                        user_id=user_id,
-                        week_start=target_week_start,
-                        program_data=result,
-                        generation_type='scheduled'
-                    )
-                    success_count += 1
-                    logger.info(f"✓ Generated and saved weekly program for user {user_id}")
-                else:
-                    error_count += 1
-                    logger.warning(f"✗ Failed to generate program for user {user_id}")
-
-                # Delay between users to avoid API rate limits
-                time.sleep(2)
+                target_week_start = datetime.strptime(week_start_str, '%Y-%m-%d').date()
+            except ValueError:
+                return jsonify({'error': 'Invalid week_start. Use YYYY-MM-DD'}), 400
+        else:
+            target_week_start = get_current_week_start()
+        logger.info(f"Target week start: {target_week_start} (mode: {mode})")
+
+        # Users without race goals are skipped
+        user_ids = [dict(row)['user_id'] for row in active_users]
+        with_goals = execute_query(
+            "SELECT DISTINCT user_id FROM race_goals WHERE user_id = ANY(%s)",
+            (user_ids,),
+            fetch=True
+        )
+        goal_user_ids = {row['user_id'] for row in with_goals or []}
+        eligible = [user_id for user_id in user_ids if user_id in goal_user_ids]
+        skipped_count = len(user_ids) - len(eligible)
 
-            except Exception as user_error:
-                error_count += 1
-                logger.error(f"Error generating program for user {user_id}: {str(user_error)}", exc_info=True)
+        # Generated in parallel. Full mode skips users whose program for the week was
+        # already built from their current inputs; adjustment mode regenerates everyone.
+        outcome = prewarm(target_week_start, eligible, force=(mode == 'adjustment'))
+        success_count = outcome['generated']
+        error_count = outcome['errors']
+        unchanged_count = outcome['skipped']
 
         # Reset schedule review status for all users (prepare for next week's review)
         if mode == 'full':  # Only on Sunday full generation
@@ -7196,6 +7257,7 @@ def weekly_program_cron():
                        OR schedule_review_week_start < CURRENT_DATE
                     """
                 )
+                invalidate_user_profile()
                 logger.info("✓ Schedule review status reset complete")
             except Exception as reset_error:
                 logger.error(f"Error resetting schedule review status: {reset_error}")
@@ -7207,6 +7269,8 @@ def weekly_program_cron():
             'successful': success_count,
             'errors': error_count,
             'skipped': skipped_count,
+            'unchanged': unchanged_count,
+            'week_start': target_week_start.isoformat(),
             'timestamp': datetime.now().isoformat()
         }
 
@@ -7520,165 +7584,12 @@ def get_landing_chart_data():
     """
     Public endpoint to serve ACWR chart data for landing page demonstration.
     Uses admin user data (user_id = 1) to showcase real training metrics.
-    """
-    try:
-        # Use admin user data for demonstration (your account)
-        admin_user_id = 1
-
-        # Get the last 60 days of data for a good demonstration
-        activities = db_utils.execute_query(
-            """
-            SELECT date, acute_chronic_ratio, trimp_acute_chronic_ratio, 
-                   distance_miles, elevation_gain_feet, trimp, type, name
-            FROM activities 
-            WHERE user_id = %s 
-              AND date >= CURRENT_DATE - INTERVAL '60 days'
-              AND date <= CURRENT_DATE
-            ORDER BY date ASC
-            """,
-            (admin_user_id,),
-            fetch=True
-        )
-
-        if not activities:
-            logger.info("No real activities found for landing page chart, using demo data")
-            
-            # Generate realistic demo data for the landing page
-            from datetime import datetime, timedelta
-            import random
-            
-            # Create 30 days of demo data
-            demo_data = []
-            base_date = datetime.now() - timedelta(days=30)
-            
-            # Realistic training patterns
-            training_patterns = [
-                # Week 1: Building up
-                {'external': 0.8, 'internal': 0.7, 'distance': 5.2, 'elevation': 800, 'type': 'Trail Run'},
-                {'external': 0.9, 'internal': 0.8, 'distance': 6.1, 'elevation': 950, 'type': 'Trail Run'},
-                {'external': 1.1, 'internal': 1.0, 'distance': 7.5, 'elevation': 1200, 'type': 'Trail Run'},
-                {'external': 0.7, 'internal': 0.8, 'distance': 3.2, 'elevation': 400, 'type': 'Easy Run'},
-                {'external': 1.2, 'internal': 1.1, 'distance': 8.2, 'elevation': 1400, 'type': 'Trail Run'},
-                {'external': 0.6, 'internal': 0.7, 'distance': 2.8, 'elevation': 200, 'type': 'Recovery'},
-                {'external': 0.8, 'internal': 0.9, 'distance': 4.1, 'elevation': 600, 'type': 'Easy Run'},
-                
-                # Week 2: Peak training
-                {'external': 1.3, 'internal': 1.2, 'distance': 9.5, 'elevation': 1800, 'type': 'Trail Run'},
-                {'external': 1.4, 'internal': 1.3, 'distance': 10.2, 'elevation': 2100, 'type': 'Trail Run'},
-                {'external': 0.9, 'internal': 1.0, 'distance': 5.8, 'elevation': 900, 'type': 'Easy Run'},
-                {'external': 1.5, 'internal': 1.4, 'distance': 11.1, 'elevation': 2400, 'type': 'Trail Run'},
-                {'external': 1.6, 'internal': 1.5, 'distance': 12.3, 'elevation': 2800, 'type': 'Trail Run'},
-                {'external': 0.7, 'internal': 0.8, 'distance': 3.5, 'elevation': 500, 'type': 'Recovery'},
-                {'external': 1.1, 'internal': 1.2, 'distance': 7.2, 'elevation': 1100, 'type': 'Trail Run'},
-                
-                # Week 3: Showing divergence (overtraining risk)
-                {'external': 1.7, 'internal': 1.6, 'distance': 13.1, 'elevation': 3200, 'type': 'Trail Run'},
-                {'external': 1.8, 'internal': 1.7, 'distance': 14.2, 'elevation': 3600, 'type': 'Trail Run'},
-                {'external': 1.9, 'internal': 1.8, 'distance': 15.5, 'elevation': 4000, 'type': 'Trail Run'},
-                {'external': 0.8, 'internal': 0.9, 'distance': 4.5, 'elevation': 700, 'type': 'Easy Run'},
-                {'external': 2.0, 'internal': 1.9, 'distance': 16.8, 'elevation': 4500, 'type': 'Trail Run'},
-                {'external': 2.1, 'internal': 2.0, 'distance': 18.1, 'elevation': 5000, 'type': 'Trail Run'},
-                {'external': 0.6, 'internal': 0.7, 'distance': 2.9, 'elevation': 300, 'type': 'Recovery'},
-                {'external': 1.2, 'internal': 1.3, 'distance': 8.5, 'elevation': 1300, 'type': 'Trail Run'},
-                
-                # Week 4: Recovery and balance
-                {'external': 0.9, 'internal': 1.0, 'distance': 6.2, 'elevation': 900, 'type': 'Trail Run'},
-                {'external': 1.0, 'internal': 1.1, 'distance': 7.1, 'elevation': 1100, 'type': 'Trail Run'},
-                {'external': 0.8, 'internal': 0.9, 'distance': 5.5, 'elevation': 800, 'type': 'Easy Run'},
-                {'external': 1.1, 'internal': 1.0, 'distance': 7.8, 'elevation': 1200, 'type': 'Trail Run'},
-                {'external': 0.7, 'internal': 0.8, 'distance': 4.2, 'elevation': 600, 'type': 'Recovery'},
-                {'external': 1.0, 'internal': 1.1, 'distance': 6.9, 'elevation': 1000, 'type': 'Trail Run'},
-                {'external': 0.9, 'internal': 0.8, 'distance': 5.8, 'elevation': 850, 'type': 'Easy Run'},
-            ]
-            
-            for i, pattern in enumerate(training_patterns):
-                date = base_date + timedelta(days=i)
-                formatted_date = f"{date.month}/{date.day}"
-                
-                # Add some realistic variation
-                external_variation = random.uniform(-0.1, 0.1)
-                internal_variation = random.uniform(-0.1, 0.1)
-                
-                demo_data.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'dateFormatted': formatted_date,
-                    'acute_chronic_ratio': round(pattern['external'] + external_variation, 2),
-                    'trimp_acute_chronic_ratio': round(pattern['internal'] + internal_variation, 2),
-                    'distance_miles': round(pattern['distance'] + random.uniform(-0.5, 0.5), 1),
-                    'elevation_gain_feet': int(pattern['elevation'] + random.uniform(-100, 100)),
-                    'trimp': int(50 + pattern['external'] * 30 + random.uniform(-10, 10)),
-                    'type': pattern['type'],
-                    'name': f"{pattern['type']} - {pattern['distance']}mi"
-                })
-
-            return jsonify({
-                'success': True,
-                'data': demo_data,
-                'dataPoints': len(demo_data),
-                'dateRange': {
-                    'start': demo_data[0]['date'] if demo_data else None,
-                    'end': demo_data[-1]['date'] if demo_data else None
-                },
-                'isDemo': True
-            })
-
-        # Process real data for chart display
-        chart_data = []
-        for activity in activities:
-            # Format date for display
-            date_obj = datetime.strptime(activity['date'], '%Y-%m-%d')
-            formatted_date = f"{date_obj.month}/{date_obj.day}"
-
-            chart_data.append({
-                'date': activity['date'],
-                'dateFormatted': formatted_date,
-                'acute_chronic_ratio': round(activity.get('acute_chronic_ratio', 0), 2),
-                'trimp_acute_chronic_ratio': round(activity.get('trimp_acute_chronic_ratio', 0), 2),
-                'distance_miles': round(activity.get('distance_miles', 0), 1),
-                'elevation_gain_feet': int(activity.get('elevation_gain_feet', 0)),
-                'trimp': int(activity.get('trimp', 0)),
-                'type': activity.get('type', 'Unknown'),
-                'name': activity.get('name', 'Workout')
-            })
-
-        logger.info(f"Serving {len(chart_data)} real data points for landing page chart")
-
-        return jsonify({
-            'success': True,
-            'data': chart_data,
-            'dataPoints': len(chart_data),
-            'dateRange': {
-                'start': chart_data[0]['date'] if chart_data else None,
-                'end': chart_data[-1]['date'] if chart_data else None
-            },
-            'isDemo': False
-        })
 
-    except Exception as e:
-        logger.error(f"Error fetching landing page chart data: {str(e)}")
-        
-        # Even if there's an error, return demo data so the chart still works
-        logger.info("Returning fallback demo data due to error")
-        
-        # Simple fallback demo data
-        fallback_data = [
-            {'dateFormatted': '11/1', 'acute_chronic_ratio': 0.9, 'trimp_acute_chronic_ratio': 0.8, 'distance_miles': 5.2, 'elevation_gain_feet': 800, 'trimp': 75, 'type': 'Trail Run', 'name': 'Morning Trail'},
-            {'dateFormatted': '11/5', 'acute_chronic_ratio': 1.1, 'trimp_acute_chronic_ratio': 1.0, 'distance_miles': 7.1, 'elevation_gain_feet': 1200, 'trimp': 85, 'type': 'Trail Run', 'name': 'Hill Training'},
-            {'dateFormatted': '11/10', 'acute_chronic_ratio': 1.3, 'trimp_acute_chronic_ratio': 1.2, 'distance_miles': 9.5, 'elevation_gain_feet': 1800, 'trimp': 95, 'type': 'Trail Run', 'name': 'Long Run'},
-            {'dateFormatted': '11/15', 'acute_chronic_ratio': 1.0, 'trimp_acute_chronic_ratio': 1.1, 'distance_miles': 6.8, 'elevation_gain_feet': 1100, 'trimp': 80, 'type': 'Trail Run', 'name': 'Recovery Run'},
-            {'dateFormatted': '11/20', 'acute_chronic_ratio': 0.8, 'trimp_acute_chronic_ratio': 0.9, 'distance_miles': 4.2, 'elevation_gain_feet': 600, 'trimp': 65, 'type': 'Easy Run', 'name': 'Easy Day'},
-            {'dateFormatted': '11/25', 'acute_chronic_ratio': 1.2, 'trimp_acute_chronic_ratio': 1.3, 'distance_miles': 8.5, 'elevation_gain_feet': 1400, 'trimp': 90, 'type': 'Trail Run', 'name': 'Tempo Run'},
-            {'dateFormatted': '11/30', 'acute_chronic_ratio': 0.9, 'trimp_acute_chronic_ratio': 0.8, 'distance_miles': 5.5, 'elevation_gain_feet': 850, 'trimp': 70, 'type': 'Trail Run', 'name': 'Easy Trail'}
-        ]
-        
-        return jsonify({
-            'success': True,
-            'data': fallback_data,
-            'dataPoints': len(fallback_data),
-            'dateRange': {'start': '2024-11-01', 'end': '2024-11-30'},
-            'isDemo': True,
-            'error': str(e)
-        })
+    The payload is prebuilt by landing_chart_cache (background refresh,
+    single-flight on a miss) and served from memory with ETag/Cache-Control.
+    """
+    from landing_chart_cache import landing_chart_response
+    return landing_chart_response()
 
 @app.route('/landing-static/<path:filename>')
 def serve_landing_static(filename):
@@ -8012,6 +7923,7 @@ def update_settings():
         logger.info(f"Update values: {update_values}")
 
         db_utils.execute_query(update_query, tuple(update_values))
+        invalidate_user_profile(current_user.id)
 
         # Get updated settings to verify the save
         updated_user = db_utils.execute_query(
@@ -8151,6 +8063,7 @@ def update_user_settings():
                 SET coaching_style_spectrum = %s, updated_at = NOW()
                 WHERE id = %s
             """, (coaching_spectrum, current_user.id))
+            invalidate_user_profile(current_user.id)
             logger.info(f"Updated coaching style spectrum to {coaching_spectrum} for user {current_user.id}")
 
         if recommendation_style is not None:
@@ -8162,6 +8075,7 @@ def update_user_settings():
                 SET recommendation_style = %s, updated_at = NOW()
                 WHERE id = %s
             """, (recommendation_style, current_user.id))
+            invalidate_user_profile(current_user.id)
             logger.info(f"Updated recommendation style to {recommendation_style} for user {current_user.id}")
 
         if primary_sport is not None or secondary_sport is not None or training_experience is not None:
@@ -8186,6 +8100,7 @@ def update_user_settings():
                     updated_at = NOW()
                 WHERE id = %s
             """, (primary_sport, secondary_sport, training_experience, current_user.id))
+            invalidate_user_profile(current_user.id)
 
         return jsonify({'success': True})
 
@@ -8199,16 +8114,9 @@ def update_user_settings():
 def get_user_settings():
     """Get current user settings"""
     try:
-        result = db_utils.execute_query("""
-            SELECT coaching_style_spectrum, coaching_tone, recommendation_style,
-                   primary_sport, secondary_sport, training_experience,
-                   aet_assessment_method
-            FROM user_settings
-            WHERE id = %s
-        """, (current_user.id,), fetch=True)
+        settings = get_user_profile(current_user.id)
 
-        if result and len(result) > 0:
-            settings = result[0]
+        if settings:
             return jsonify({
                 'coaching_style_spectrum': settings.get('coaching_style_spectrum', 50),
                 'coaching_tone': settings.get('coaching_tone', 'supportive'),
@@ -8241,16 +8149,11 @@ def get_heart_rate_zones():
             return jsonify({'error': 'Heart rate zones not available'}), 403
 
         # Get user settings
-        user_data = db_utils.execute_query(
-            "SELECT resting_hr, max_hr, hr_zones_method, custom_hr_zones FROM user_settings WHERE id = %s",
-            (current_user.id,),
-            fetch=True
-        )
+        user = get_user_profile(current_user.id)
 
-        if not user_data:
+        if not user:
             return jsonify({'error': 'User not found'}), 404
 
-        user = user_data[0]
         resting_hr = user.get('resting_hr', 65)
         max_hr = user.get('max_hr', 185)
         method = user.get('hr_zones_method', 'percentage')
@@ -8478,6 +8381,7 @@ def update_profile_settings():
                 SET birthdate = %s, age = %s, updated_at = NOW()
                 WHERE id = %s
             """, (birthdate, age, current_user.id))
+        invalidate_user_profile(current_user.id)
 
         return jsonify({'success': True, 'message': 'Profile settings updated successfully'})
 
@@ -8543,6 +8447,7 @@ def update_training_settings():
             WHERE id = %s
         """, (data['primary_sport'], secondary_sport, data['training_experience'], 
               weekly_hours, current_phase, race_goal_date, current_user.id))
+        invalidate_user_profile(current_user.id)
         
         return jsonify({'success': True, 'message': 'Training settings updated successfully'})
         
@@ -8580,6 +8485,7 @@ def update_coaching_settings():
             SET coaching_tone = %s, recommendation_style = %s, updated_at = NOW()
             WHERE id = %s
         """, (data['coaching_tone'], data['recommendation_style'], current_user.id))
+        invalidate_user_profile(current_user.id)
         
         return jsonify({'success': True, 'message': 'Coaching settings updated successfully'})
         
@@ -8614,6 +8520,7 @@ def update_alert_settings():
             SET acwr_alert_threshold = %s, injury_risk_alerts = %s, updated_at = NOW()
             WHERE id = %s
         """, (acwr_threshold, injury_risk_alerts, current_user.id))
+        invalidate_user_profile(current_user.id)
         
         return jsonify({'success': True, 'message': 'Alert settings updated successfully'})
         
@@ -8662,14 +8569,16 @@ def trigger_integrations_sync():
         if not api_key or not athlete_id:
             return jsonify({'success': False, 'error': 'intervals.icu not connected'}), 400
 
-        from intervals_icu_sync import sync_wellness_for_user
-        # Sync today and yesterday to catch overnight data
-        today     = date.today()
-        yesterday = today - timedelta(days=1)
-        synced = 0
-        for d in [yesterday, today]:
-            if sync_wellness_for_user(current_user.id, api_key, athlete_id, d):
-                synced += 1
+        from intervals_icu_sync import BACKFILL_DAYS, sync_wellness_range
+        # Sync today and yesterday to catch overnight data, or backfill_days of history
+        data = request.get_json(silent=True) or {}
+        try:
+            days = min(max(int(data.get('backfill_days') or 2), 2), BACKFILL_DAYS * 2)
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'backfill_days must be a number'}), 400
+        today = date.today()
+        synced = sync_wellness_range(current_user.id, api_key, athlete_id,
+                                     today - timedelta(days=days - 1), today)
 
         return jsonify({'success': True, 'days_synced': synced})
     except Exception as e:
@@ -8700,6 +8609,7 @@ def save_integrations():
                WHERE id = %s""",
             (api_key, athlete_id, current_user.id)
         )
+        invalidate_user_profile(current_user.id)
 
         action = "connected" if api_key else "disconnected"
         logger.info(f"intervals.icu {action} for user {current_user.id}")
@@ -8832,6 +8742,7 @@ def save_custom_heart_rate_zones():
             "UPDATE user_settings SET custom_hr_zones = %s, updated_at = NOW() WHERE id = %s",
             (custom_zones_json, current_user.id)
         )
+        invalidate_user_profile(current_user.id)
 
         logger.info(f"Custom heart rate zones saved for user {current_user.id}: {list(merged_zones.keys())}")
 
@@ -10022,6 +9933,92 @@ def get_trimp_schema_status():
         return jsonify({'error': 'Internal server error'}), 500
 
 
+@app.route('/api/admin/agentic-tool-metrics', methods=['GET'])
+@login_required
+def get_agentic_tool_metrics():
+    """Per-tool latency, prefetch hit rate and time saved for the agentic path (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+
+        from llm_context_tools import TOOL_METRICS
+
+        return jsonify({
+            'success': True,
+            'metrics': TOOL_METRICS.snapshot()
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting agentic tool metrics: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/admin/http-metrics', methods=['GET'])
+@login_required
+def get_http_client_metrics():
+    """Per-provider outbound request counts, error rate and latency (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+
+        from http_clients import HTTP_METRICS, PROVIDERS
+
+        return jsonify({
+            'success': True,
+            'metrics': HTTP_METRICS.snapshot(),
+            'providers': {name: {
+                'pool_size': config.pool_size,
+                'timeout': list(config.timeout),
+                'max_retries': config.max_retries,
+                'max_concurrency': config.max_concurrency,
+            } for name, config in PROVIDERS.items()}
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting HTTP client metrics: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/admin/weekly-context-metrics', methods=['GET'])
+@login_required
+def get_weekly_context_metrics():
+    """Weekly program prompt context build times, overall and per block (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+
+        from weekly_program_context import WEEKLY_CONTEXT_METRICS
+
+        return jsonify({
+            'success': True,
+            'metrics': WEEKLY_CONTEXT_METRICS.snapshot()
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting weekly context metrics: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/admin/feature-tiers', methods=['GET'])
+@login_required
+def get_feature_tier_report():
+    """Current tier and unlockable features for every user, from one batch query (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+
+        from tiered_feature_unlock import get_tier_report
+
+        return jsonify({
+            'success': True,
+            'report': get_tier_report()
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting feature tier report: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
 @app.route('/api/admin/trimp-recalculation-stats', methods=['GET'])
 @login_required
 def get_trimp_recalculation_stats():
@@ -10189,31 +10186,28 @@ def get_feature_flags():
         if not current_user.is_admin:
             return jsonify({'error': 'Admin access required'}), 403
         
-        from utils.feature_flags import is_feature_enabled
-        
+        from utils.feature_flags import flag_store
+
         # Get feature flag status for different user types
-        feature_flags = {
-            'enhanced_trimp_calculation': {
-                'name': 'Enhanced TRIMP Calculation',
-                'description': 'Uses heart rate stream data for improved TRIMP accuracy',
-                'admin_enabled': is_feature_enabled('enhanced_trimp_calculation', 1),
-                'beta_enabled': is_feature_enabled('enhanced_trimp_calculation', 2),
-                'regular_enabled': is_feature_enabled('enhanced_trimp_calculation', 4),
-                'rollout_phase': 'beta'
-            },
-            'settings_page_enabled': {
-                'name': 'Settings Page',
-                'description': 'Access to user settings and configuration',
-                'admin_enabled': is_feature_enabled('settings_page_enabled', 1),
-                'beta_enabled': is_feature_enabled('settings_page_enabled', 2),
-                'regular_enabled': is_feature_enabled('settings_page_enabled', 4),
-                'rollout_phase': 'beta'
+        snapshot = flag_store.snapshot()
+        feature_flags = {}
+        for flag_name, flag in snapshot.definitions.items():
+            feature_flags[flag_name] = {
+                'name': flag_name.replace('_', ' ').title(),
+                'description': flag.description,
+                'admin_enabled': snapshot.evaluate(flag_name, 1),
+                'beta_enabled': snapshot.evaluate(flag_name, 2),
+                'regular_enabled': snapshot.evaluate(flag_name, 4),
+                'default_enabled': flag.enabled,
+                'admin_early_access': flag.admin_early_access,
+                'overrides': {str(user_id): enabled for user_id, enabled in snapshot.overrides_for(flag_name).items()},
+                'rollout_phase': 'general' if flag.enabled else 'beta'
             }
-        }
-        
+
         return jsonify({
             'success': True,
-            'feature_flags': feature_flags
+            'feature_flags': feature_flags,
+            'version': snapshot.version
         })
         
     except Exception as e:
@@ -10240,10 +10234,15 @@ def toggle_feature_flag(feature_name):
         if user_type not in ['admin', 'beta', 'regular']:
             return jsonify({'error': 'Invalid user type. Must be admin, beta, or regular'}), 400
         
-        # Note: This is a simplified implementation
-        # In a production system, you would want to store feature flags in a database
-        # For now, we'll just return a success message indicating the change would be made
-        
+        from utils.feature_flags import flag_store, set_feature_flag, ADMIN_USER_ID, BETA_USER_IDS
+
+        if feature_name not in flag_store.snapshot().definitions:
+            return jsonify({'error': f'Unknown feature flag: {feature_name}'}), 404
+
+        # regular = the flag's default; admin/beta = per-user overrides
+        user_ids = {'admin': (ADMIN_USER_ID,), 'beta': BETA_USER_IDS, 'regular': None}[user_type]
+        snapshot = set_feature_flag(feature_name, bool(enabled), user_ids=user_ids, admin_user_id=current_user.id)
+
         logger.info(f"Admin {current_user.id} toggled {feature_name} for {user_type} users to {enabled}")
         
         return jsonify({
@@ -10251,7 +10250,8 @@ def toggle_feature_flag(feature_name):
             'message': f'Feature flag {feature_name} for {user_type} users set to {enabled}',
             'feature_name': feature_name,
             'user_type': user_type,
-            'enabled': enabled
+            'enabled': enabled,
+            'version': snapshot.version
         })
         
     except Exception as e:
@@ -11747,7 +11747,11 @@ def welcome_stage1():
             except Exception as e:
                 logger.error(f"Error logging legal compliance for user {user_id}: {e}")
                 # Don't fail the form submission if legal logging fails
-        
+
+        from legal_compliance import invalidate_legal_status
+        invalidate_legal_status(user_id)
+        invalidate_user_profile(user_id)
+
         # Update onboarding progress using existing system
         from user_account_manager import user_account_manager
         success = user_account_manager.complete_onboarding(user_id)
@@ -11783,6 +11787,7 @@ def welcome_stage1():
                         "UPDATE user_settings SET email = %s WHERE id = %s",
                         (user_provided_email, user_id), fetch=False
                     )
+                    invalidate_user_profile(user_id)
 
                     # Send verification
                     base_url = os.environ.get('APP_BASE_URL', 'https://yourtrainingmonkey.com')
@@ -11835,6 +11840,7 @@ def welcome_skip_stage3():
                     WHERE id = %s
                 """, (user_id,))
                 conn.commit()
+        invalidate_user_profile(user_id)
         
         # Complete onboarding using existing system
         from onboarding_manager import complete_onboarding_step, OnboardingStep
@@ -11878,6 +11884,7 @@ def goals_setup():
                     goals_setup_date = NOW()
                 WHERE user_id = %s
             """, (goal_type, target_value, timeframe, user_id))
+            invalidate_user_profile(current_user.id)
             
             # Mark onboarding step as complete
             from onboarding_manager import onboarding_manager
@@ -11996,32 +12003,23 @@ def get_athlete_model_api():
             except (TypeError, ValueError):
                 return None
 
+        # Sections 1, 2, 3 and 5 all read the same user_settings row
+        user_row = get_user_profile(user_id) or {}
+
         # ── 1. Athlete Profile ─────────────────────────────────────────────────
-        profile_row = db_utils.execute_query(
-            "SELECT age, gender, primary_sport, training_experience FROM user_settings WHERE id = %s",
-            (user_id,), fetch=True
-        )
-        profile = dict(profile_row[0]) if profile_row else {}
+        profile = user_row
         profile_fields = ['age', 'gender', 'primary_sport', 'training_experience']
         profile_pts = sum(1 for f in profile_fields if profile.get(f) not in (None, ''))
         profile_score = round(profile_pts / len(profile_fields) * 100)
         profile_missing = [f for f in profile_fields if profile.get(f) in (None, '')]
 
         # ── 2. HR Calibration ─────────────────────────────────────────────────
-        hr_row = db_utils.execute_query(
-            "SELECT max_hr, resting_hr FROM user_settings WHERE id = %s",
-            (user_id,), fetch=True
-        )
-        hr = dict(hr_row[0]) if hr_row else {}
+        hr = user_row
         hr_pts = sum([1 if hr.get('max_hr') else 0, 1 if hr.get('resting_hr') else 0])
         hr_score = hr_pts * 50  # 0, 50, or 100
 
         # ── 3. Coaching Preferences ───────────────────────────────────────────
-        prefs_row = db_utils.execute_query(
-            "SELECT coaching_tone, recommendation_style, coaching_style_spectrum FROM user_settings WHERE id = %s",
-            (user_id,), fetch=True
-        )
-        prefs = dict(prefs_row[0]) if prefs_row else {}
+        prefs = user_row
         prefs_complete = all(prefs.get(f) is not None for f in ['coaching_tone', 'recommendation_style', 'coaching_style_spectrum'])
         prefs_score = 100 if prefs_complete else 0
 
@@ -12044,11 +12042,7 @@ def get_athlete_model_api():
             has_distance  = False
 
         # ── 5. Weekly Schedule ────────────────────────────────────────────────
-        sched_row = db_utils.execute_query(
-            "SELECT training_schedule_json FROM user_settings WHERE id = %s",
-            (user_id,), fetch=True
-        )
-        sched_json = (dict(sched_row[0]) if sched_row else {}).get('training_schedule_json') or {}
+        sched_json = user_row.get('training_schedule_json') or {}
         if isinstance(sched_json, str):
             import json as _json
             try:
@@ -12171,6 +12165,7 @@ def get_athlete_model_api():
             "UPDATE athlete_models SET model_confidence_pct = %s, updated_at = NOW() WHERE user_id = %s",
             (composite, user_id)
         )
+        db_utils.invalidate_athlete_model(user_id)
 
         return jsonify({'success': True, 'model': payload})
     except Exception as e:
@@ -13262,6 +13257,7 @@ def preview_aerobic_assessment():
         hr_data = stream['hr_data']
         sample_rate = float(stream.get('sample_rate') or 1.0)
 
+        from aerobic_assessment_engine import analyze_hr_drift_test, segment_pace_from_distance, parse_pace_from_notes
         result = analyze_hr_drift_test(hr_data, sample_rate, warmup_minutes, ant_bpm, cooldown_minutes)
 
         if not result['valid']:
@@ -13305,6 +13301,7 @@ def save_aerobic_assessment_endpoint():
         hr_data = stream['hr_data']
         sample_rate = float(stream.get('sample_rate') or 1.0)
 
+        from aerobic_assessment_engine import analyze_hr_drift_test, segment_pace_from_distance, parse_pace_from_notes
         result = analyze_hr_drift_test(hr_data, sample_rate, warmup_minutes, ant_bpm, cooldown_minutes)
         if not result['valid']:
             return jsonify({'success': False, 'error': result['error']}), 400
@@ -13372,6 +13369,7 @@ def get_aerobic_assessments_endpoint():
             # notes, then the journal entry for the test date (where the treadmill pace is
             # usually logged, e.g. "set treadmill at 8:00 min/mi").
             if a.get('avg_pace_sec_per_mi') is None:
+                from aerobic_assessment_engine import parse_pace_from_notes
                 parsed = parse_pace_from_notes(a.get('notes')) or parse_pace_from_notes(a.get('journal_notes'))
                 if parsed:
                     a['avg_pace_sec_per_mi'] = parsed['avg_pace_sec_per_mi']
@@ -13470,6 +13468,7 @@ def set_aet_assessment_method():
             "UPDATE user_settings SET aet_assessment_method = %s, updated_at = NOW() WHERE id = %s",
             (method, current_user.id)
         )
+        invalidate_user_profile(current_user.id)
         return jsonify({'success': True, 'method': method})
     except Exception as e:
         logger.error(f"Error setting AeT method for user {current_user.id}: {e}")
@@ -13612,12 +13611,36 @@ def delete_lactate_step_test(test_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def _screenshot_parse_response(user_id, result):
+    """The review payload for a finished screenshot parse, as (body, status)"""
+    if not result['success']:
+        return result, 400
+
+    # Log API usage and cost
+    api_cost = result.get('api_cost_estimate', 0)
+    logger.info(f"Screenshot parsed for user {user_id}: {result['total_valid']} valid races extracted (estimated cost: ${api_cost:.2f})")
+
+    # Return extracted races for user review
+    return {
+        'success': True,
+        'races': result['races'],
+        'total_extracted': result.get('total_extracted', len(result['races'])),
+        'total_valid': result.get('total_valid', len(result['races'])),
+        'warnings': result.get('warnings', []),
+        'message': f"Extracted {len(result['races'])} race(s) from screenshot. Please review and edit before saving."
+    }, 200
+
+
 @app.route('/api/coach/race-history/screenshot', methods=['POST'])
 @login_required
 def upload_race_history_screenshot():
     """
-    Upload and parse ultrasignup.com screenshot to extract race history
-    Returns extracted races for user review before saving
+    Upload an ultrasignup.com screenshot for race history extraction
+
+    A screenshot parsed before is answered at once (200, with the races for review).
+    Otherwise parsing runs in the background (202): follow events_url for progress
+    or poll status_url for the result, on any instance. If the job cannot be stored
+    for the other instances, the screenshot is parsed within the request (200).
     """
     try:
         user_id = current_user.id
@@ -13645,33 +13668,31 @@ def upload_race_history_screenshot():
         
         # Import parser (lazy import to avoid startup issues if anthropic not installed)
         try:
-            from ultrasignup_parser import parse_ultrasignup_screenshot
+            from ultrasignup_parser import validate_image_file
+            import ultrasignup_parse_jobs
         except ImportError as e:
             logger.error(f"Failed to import ultrasignup_parser: {str(e)}")
             return jsonify({
                 'success': False,
                 'error': 'Screenshot parsing feature is not available. Please contact support.'
             }), 500
+
+        is_valid, error_message = validate_image_file(file_data, filename)
+        if not is_valid:
+            return jsonify({'success': False, 'error': error_message, 'races': []}), 400
         
-        # Parse screenshot
-        result = parse_ultrasignup_screenshot(file_data, filename)
-        
-        if not result['success']:
-            return jsonify(result), 400
-        
-        # Log API usage and cost
-        api_cost = result.get('api_cost_estimate', 0)
-        logger.info(f"Screenshot parsed for user {user_id}: {result['total_valid']} valid races extracted (estimated cost: ${api_cost:.2f})")
-        
-        # Return extracted races for user review
+        submitted = ultrasignup_parse_jobs.submit(user_id, file_data, filename)
+        if 'result' in submitted:
+            body, status = _screenshot_parse_response(user_id, submitted['result'])
+            return jsonify({**body, 'cached': submitted['cached']}), status
+
+        job_id = submitted['job_id']
         return jsonify({
             'success': True,
-            'races': result['races'],
-            'total_extracted': result.get('total_extracted', len(result['races'])),
-            'total_valid': result.get('total_valid', len(result['races'])),
-            'warnings': result.get('warnings', []),
-            'message': f"Extracted {len(result['races'])} race(s) from screenshot. Please review and edit before saving."
-        }), 200
+            'job_id': job_id,
+            'status_url': f'/api/coach/race-history/screenshot/{job_id}',
+            'events_url': f'/api/coach/race-history/screenshot/{job_id}/events'
+        }), 202
         
     except Exception as e:
         logger.error(f"Error processing screenshot upload for user {current_user.id}: {str(e)}", exc_info=True)
@@ -13681,6 +13702,44 @@ def upload_race_history_screenshot():
         }), 500
 
 
+@app.route('/api/coach/race-history/screenshot/<job_id>', methods=['GET'])
+@login_required
+def get_race_history_screenshot_job(job_id):
+    """Poll a background screenshot parse; the review payload is included once it is done"""
+    import ultrasignup_parse_jobs
+
+    job = ultrasignup_parse_jobs.get_job(job_id, current_user.id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Parse job not found'}), 404
+
+    state = job.snapshot()
+    if state['status'] not in ultrasignup_parse_jobs.TERMINAL:
+        return jsonify({'success': True, 'job_id': job_id, 'status': state['status'],
+                        'progress': state['progress']}), 200
+    body, status = _screenshot_parse_response(current_user.id, state['result'])
+    return jsonify({**body, 'job_id': job_id, 'status': state['status'], 'progress': 100}), status
+
+
+@app.route('/api/coach/race-history/screenshot/<job_id>/events', methods=['GET'])
+@login_required
+def stream_race_history_screenshot_job(job_id):
+    """Server-Sent Events with a background screenshot parse's progress and final result"""
+    import ultrasignup_parse_jobs
+
+    job = ultrasignup_parse_jobs.get_job(job_id, current_user.id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Parse job not found'}), 404
+
+    return Response(
+        stream_with_context(ultrasignup_parse_jobs.stream_events(job)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',  # Disable nginx buffering
+        }
+    )
+
+
 @app.route('/api/coach/training-schedule', methods=['GET'])
 @login_required
 def get_training_schedule():
@@ -13866,6 +13925,7 @@ def save_training_schedule():
              cross_training_hours, user_id),
             fetch=False
         )
+        invalidate_user_profile(user_id)
         
         # Save cross-training disciplines to new table
         cross_training_disciplines = data.get('cross_training_disciplines', [])
@@ -13912,6 +13972,7 @@ def save_training_schedule():
                 """,
                 (next_monday, user_id)
             )
+            invalidate_user_profile(user_id)
             logger.info(f"Marked schedule as reviewed for week of {next_monday}")
         
         return jsonify({
@@ -14167,6 +14228,7 @@ def accept_current_schedule():
             """,
             (next_monday, user_id)
         )
+        invalidate_user_profile(user_id)
         
         logger.info(f"User {user_id} accepted current schedule for week of {next_monday}")
         
@@ -14755,6 +14817,7 @@ def set_training_stage_override():
             (override_stage, user_id),
             fetch=False
         )
+        invalidate_user_profile(user_id)
         
         if override_stage:
             message = f'Training stage manually set to: {override_stage}'
@@ -15254,12 +15317,8 @@ def catch_all(path):
         return '', 404
     
     # Serve index.html for React client-side routes (journal, activities, guide, etc.)
-    response = send_from_directory('build', 'index.html')
-    # CRITICAL: Prevent caching of index.html so users always get latest JS file references
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    return response
+    # index.html is revalidated on every load so users always get the latest JS file references
+    return index_html_response()
 
 if __name__ == '__main__':
     # For local testing
@@ -0,0 +1,419 @@
+# strava_token_refresh.py
+
+"""
+Bulk Strava token refresh engine.
+
+proactive_token_refresh_for_all_users(), bulk_refresh_tokens() and
+OptimizedTokenManager.batch_refresh_tokens() used to refresh users one after
+another through SimpleTokenManager: one stravalib client, one token POST, one
+UPDATE and up to several retry sleeps per user, so /cron/token-refresh grew
+linearly with the user count.
+
+run_bulk_token_refresh() instead:
+
+1. selects every candidate token row in one query (select_token_refresh_candidates),
+2. POSTs the refreshes concurrently from a bounded thread pool over the shared
+   keep-alive Strava session (http_clients.get_session('strava')),
+3. reads Strava's X-RateLimit-Limit / X-RateLimit-Usage headers on every
+   response and stops dispatching (deferring the rest to the next cron run)
+   once a window is nearly spent or a 429 asks for a long wait,
+4. writes every refreshed token back in a single batched UPDATE and clears
+   revoked refresh tokens in another (only when Strava's error names the refresh
+   token itself; a rejected client_id/client_secret fails the whole run and
+   clears nothing),
+5. returns one outcome per user (refreshed / needs_reauth / failed /
+   rate_limited / skipped).
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import db_utils
+from http_clients import get_session
+
+logger = logging.getLogger(__name__)
+
+STRAVA_TOKEN_URL = os.environ.get('STRAVA_TOKEN_URL', 'https://www.strava.com/oauth/token')
+TOKEN_REFRESH_WORKERS = int(os.environ.get('TOKEN_REFRESH_WORKERS', '8'))
+TOKEN_BUFFER_MINUTES = 30  # Same buffer as SimpleTokenManager
+REQUEST_TIMEOUT_SECONDS = 10
+RETRY_BACKOFF_SECONDS = 0.5
+# Keep this many requests of each window in reserve for interactive traffic
+RATE_LIMIT_RESERVE = int(os.environ.get('STRAVA_RATE_LIMIT_RESERVE', '20'))
+# Waits longer than this are not slept through; remaining users are deferred
+MAX_RATE_LIMIT_WAIT_SECONDS = 30
+SHORT_WINDOW_SECONDS = 15 * 60
+
+REFRESHED = 'refreshed'
+NEEDS_REAUTH = 'needs_reauth'
+FAILED = 'failed'
+RATE_LIMITED = 'rate_limited'
+SKIPPED = 'skipped'
+
+_CANDIDATES_QUERY = """
+    SELECT id, email, strava_refresh_token, strava_token_expires_at
+    FROM user_settings
+    WHERE strava_access_token IS NOT NULL
+      AND strava_refresh_token IS NOT NULL
+      {filters}
+    ORDER BY id
+"""
+
+_SAVE_TOKENS_SQL = """
+    UPDATE user_settings AS us
+    SET strava_access_token = v.access_token,
+        strava_refresh_token = v.refresh_token,
+        strava_token_expires_at = v.expires_at,
+        strava_token_created_at = NOW()
+    FROM (VALUES %s) AS v(user_id, access_token, refresh_token, expires_at)
+    WHERE us.id = v.user_id
+"""
+
+_CLEAR_TOKENS_SQL = """
+    UPDATE user_settings
+    SET strava_access_token = NULL,
+        strava_refresh_token = NULL,
+        strava_token_expires_at = NULL,
+        strava_token_created_at = NULL
+    WHERE id = ANY(%s)
+"""
+
+
+class RateLimitExceeded(Exception):
+    """Strava's rate limit leaves no room for another request in this run"""
+
+
+class StravaRateLimiter:
+    """
+    Rate-limit state shared by all refresh workers.
+
+    Strava reports "short,daily" pairs in X-RateLimit-Limit and X-RateLimit-Usage;
+    the short window resets on the quarter hour. acquire() waits out short pauses
+    (a 429 with a small Retry-After) and raises RateLimitExceeded when the next
+    request would have to wait longer than max_wait_seconds.
+    """
+
+    def __init__(self, reserve=RATE_LIMIT_RESERVE, max_wait_seconds=MAX_RATE_LIMIT_WAIT_SECONDS,
+                 clock: Callable[[], float] = time.time, sleep: Callable[[float], None] = time.sleep):
+        self.reserve = reserve
+        self.max_wait_seconds = max_wait_seconds
+        self.clock = clock
+        self.sleep = sleep
+        self.limits = None  # (short, daily)
+        self.usage = None  # (short, daily)
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent, or raise RateLimitExceeded"""
+        with self._lock:
+            wait = self.blocked_until - self.clock()
+            if self.limits and self.usage:
+                if self.usage[1] >= self.limits[1] - self.reserve:
+                    raise RateLimitExceeded('daily Strava rate limit nearly exhausted')
+                if self.usage[0] >= self.limits[0] - self.reserve:
+                    wait = max(wait, self._seconds_until_short_window_reset())
+            if wait > self.max_wait_seconds:
+                raise RateLimitExceeded(f'Strava rate limit resets in {int(wait)}s')
+            if self.limits and self.usage:
+                # Count the request we are about to send so concurrent workers see it
+                self.usage = (self.usage[0] + 1, self.usage[1] + 1)
+        if wait > 0:
+            self.sleep(wait)
+
+    def update(self, headers, status_code=None):
+        """Record the limit headers of a response; a 429 pauses every worker"""
+        limits = _parse_pair(headers.get('X-RateLimit-Limit'))
+        usage = _parse_pair(headers.get('X-RateLimit-Usage'))
+        with self._lock:
+            if limits and usage:
+                self.limits, self.usage = limits, usage
+            if status_code == 429:
+                retry_after = headers.get('Retry-After')
+                try:
+                    pause = float(retry_after)
+                except (TypeError, ValueError):
+                    pause = self._seconds_until_short_window_reset()
+                self.blocked_until = max(self.blocked_until, self.clock() + pause)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'limits': self.limits, 'usage': self.usage}
+
+    def _seconds_until_short_window_reset(self) -> float:
+        return SHORT_WINDOW_SECONDS - (self.clock() % SHORT_WINDOW_SECONDS)
+
+
+def _parse_pair(value):
+    if not value:
+        return None
+    try:
+        short, daily = (int(part.strip()) for part in value.split(','))
+    except ValueError:
+        return None
+    return short, daily
+
+
+def _rejected_credential(response) -> Optional[str]:
+    """
+    Which credential a 400/401 from the token endpoint rejects: 'refresh_token' for
+    a revoked or invalid grant, 'client' for the application's client_id/secret,
+    None when the body does not say.
+
+    Strava reports {"message": ..., "errors": [{"resource", "field", "code"}]};
+    OAuth-style {"error": "invalid_grant" | "invalid_client"} bodies are accepted too.
+    """
+    try:
+        payload = response.json()
+    except ValueError:
+        return None
+    if not isinstance(payload, dict):
+        return None
+
+    error = str(payload.get('error') or '').lower()
+    if error == 'invalid_client':
+        return 'client'
+    errors = [e for e in payload.get('errors') or [] if isinstance(e, dict)]
+    fields = {str(e.get('field') or '').lower() for e in errors}
+    resources = {str(e.get('resource') or '').lower() for e in errors}
+    if 'application' in resources or fields & {'client_id', 'client_secret'}:
+        return 'client'
+    if error == 'invalid_grant' or 'refresh_token' in fields or 'refreshtoken' in resources:
+        return 'refresh_token'
+    return None
+
+
+def _outcome(candidate, status, message, attempts=0, expires_at=None):
+    return {
+        'user_id': candidate['id'],
+        'email': candidate.get('email'),
+        'status': status,
+        'message': message,
+        'attempts': attempts,
+        'expires_at': expires_at,
+    }
+
+
+class BulkTokenRefresher:
+    """Refreshes many users' tokens concurrently against one token endpoint"""
+
+    def __init__(self, client_id, client_secret, token_url=None, max_workers=TOKEN_REFRESH_WORKERS,
+                 max_retries=3, session=None, rate_limiter=None, sleep: Callable[[float], None] = time.sleep):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url or STRAVA_TOKEN_URL
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max(1, max_retries)
+        self.session = session or get_session('strava')
+        self.rate_limiter = rate_limiter or StravaRateLimiter()
+        self.sleep = sleep
+        self._stop = threading.Event()
+        self._abort_reason = None  # Set when Strava rejects the client credentials
+
+    def refresh_all(self, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Refresh every candidate; outcomes come back in candidate order"""
+        if not candidates:
+            return []
+        workers = min(self.max_workers, len(candidates))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='token-refresh') as pool:
+            return list(pool.map(self.refresh_one, candidates))
+
+    def refresh_one(self, candidate: Dict[str, Any]) -> Dict[str, Any]:
+        refresh_token = candidate.get('strava_refresh_token')
+        if not refresh_token:
+            return _outcome(candidate, SKIPPED, 'No refresh token stored')
+
+        error = 'Token refresh failed'
+        for attempt in range(1, self.max_retries + 1):
+            if self._stop.is_set():
+                if self._abort_reason:
+                    return _outcome(candidate, FAILED, f'Not attempted: {self._abort_reason}', attempt - 1)
+                return _outcome(candidate, RATE_LIMITED, 'Deferred: Strava rate limit reached', attempt - 1)
+            try:
+                self.rate_limiter.acquire()
+            except RateLimitExceeded as e:
+                self._stop.set()
+                return _outcome(candidate, RATE_LIMITED, f'Deferred: {e}', attempt - 1)
+
+            try:
+                response = self.session.post(self.token_url, data={
+                    'client_id': self.client_id,
+                    'client_secret': self.client_secret,
+                    'grant_type': 'refresh_token',
+                    'refresh_token': refresh_token,
+                }, timeout=REQUEST_TIMEOUT_SECONDS)
+            except Exception as e:  # Timeouts and connection errors are retryable
+                error = f'Connection error: {e}'
+                self.sleep(RETRY_BACKOFF_SECONDS * attempt)
+                continue
+
+            self.rate_limiter.update(response.headers, response.status_code)
+
+            if response.status_code == 200:
+                try:
+                    payload = response.json()
+                    tokens = {
+                        'access_token': payload['access_token'],
+                        'refresh_token': payload.get('refresh_token') or refresh_token,
+                        'expires_at': int(payload['expires_at']),
+                    }
+                except (ValueError, KeyError, TypeError):
+                    return _outcome(candidate, FAILED, 'Invalid refresh response from Strava API', attempt)
+                result = _outcome(candidate, REFRESHED, 'Tokens refreshed successfully', attempt,
+                                  tokens['expires_at'])
+                result['tokens'] = tokens
+                return result
+
+            if response.status_code in (400, 401):
+                rejected = _rejected_credential(response)
+                if rejected == 'refresh_token':
+                    # invalid_grant / revoked access: retrying cannot help
+                    return _outcome(candidate, NEEDS_REAUTH,
+                                    'Refresh token is invalid - re-authentication required', attempt)
+                if rejected == 'client':
+                    # Every other user would get the same answer: stop, and clear nothing
+                    self._abort_reason = 'Strava rejected the client credentials'
+                    self._stop.set()
+                    logger.error(f"Strava rejected the client credentials (HTTP {response.status_code}); "
+                                 f"aborting the token refresh run")
+                    return _outcome(candidate, FAILED, self._abort_reason, attempt)
+
+            error = f'Strava token endpoint returned HTTP {response.status_code}'
+            if response.status_code != 429:
+                if response.status_code < 500:
+                    return _outcome(candidate, FAILED, error, attempt)
+                self.sleep(RETRY_BACKOFF_SECONDS * attempt)
+
+        return _outcome(candidate, FAILED, error, self.max_retries)
+
+
+def select_token_refresh_candidates(user_ids: Optional[Iterable[int]] = None,
+                                    buffer_minutes: Optional[int] = TOKEN_BUFFER_MINUTES) -> List[Dict[str, Any]]:
+    """
+    Token rows to refresh, in one query.
+
+    buffer_minutes=None selects every user with tokens; otherwise only tokens that
+    expire within the buffer (or have no expiry recorded) are returned.
+    """
+    filters = []
+    params = []
+    if user_ids is not None:
+        filters.append('AND id = ANY(%s)')
+        params.append([int(user_id) for user_id in user_ids])
+    if buffer_minutes is not None:
+        filters.append('AND (strava_token_expires_at IS NULL OR strava_token_expires_at <= %s)')
+        params.append(int(time.time()) + buffer_minutes * 60)
+    query = _CANDIDATES_QUERY.format(filters='\n      '.join(filters))
+    return db_utils.execute_query(query, tuple(params), fetch=True) or []
+
+
+def _write_tokens(refreshed: List[Dict[str, Any]], revoked: List[int]) -> None:
+    """One transaction: the refreshed tokens in one UPDATE, the revoked ones in another"""
+    from psycopg2.extras import execute_values
+
+    rows = [(o['user_id'], o['tokens']['access_token'], o['tokens']['refresh_token'], o['tokens']['expires_at'])
+            for o in refreshed]
+    with db_utils.get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            if rows:
+                execute_values(cursor, _SAVE_TOKENS_SQL, rows,
+                               template='(%s::integer, %s, %s, %s::bigint)', page_size=len(rows))
+            if revoked:
+                cursor.execute(_CLEAR_TOKENS_SQL, (revoked,))
+        conn.commit()
+
+
+def save_refreshed_tokens(outcomes: List[Dict[str, Any]]) -> int:
+    """
+    Write refreshed tokens back and clear revoked ones; one statement each.
+
+    Strava has already rotated every refreshed user's refresh token, so if the batch
+    fails each user is saved again in a transaction of its own and only the ones that
+    still fail are marked FAILED. Returns the number of tokens saved.
+    """
+    refreshed = [o for o in outcomes if o['status'] == REFRESHED]
+    revoked = [o['user_id'] for o in outcomes if o['status'] == NEEDS_REAUTH]
+    if not refreshed and not revoked:
+        return 0
+
+    try:
+        _write_tokens(refreshed, revoked)
+        saved = len(refreshed)
+    except Exception as e:
+        logger.error(f"Batched token save failed, saving users one at a time: {str(e)}")
+        saved = 0
+        for outcome in refreshed:
+            try:
+                _write_tokens([outcome], [])
+                saved += 1
+            except Exception as row_error:
+                logger.error(f"Refreshed Strava token for user {outcome['user_id']} not saved: {str(row_error)}")
+                outcome.update(status=FAILED, message=f'Refreshed but not saved: {str(row_error)}')
+        if revoked:
+            try:
+                _write_tokens([], revoked)
+            except Exception as clear_error:
+                # Harmless to leave: the next run gets invalid_grant for them again
+                logger.error(f"Could not clear revoked Strava tokens for users {revoked}: {str(clear_error)}")
+                revoked = []
+
+    if revoked:
+        logger.warning(f"Cleared revoked Strava tokens for users {revoked} - re-authentication required")
+    return saved
+
+
+def _default_credentials():
+    from enhanced_token_management import SimpleTokenManager
+    return SimpleTokenManager().get_centralized_strava_credentials()
+
+
+def run_bulk_token_refresh(user_ids: Optional[Iterable[int]] = None,
+                           buffer_minutes: Optional[int] = TOKEN_BUFFER_MINUTES,
+                           max_retries: int = 3,
+                           candidates: Optional[List[Dict[str, Any]]] = None,
+                           refresher: Optional[BulkTokenRefresher] = None) -> Dict[str, Any]:
+    """
+    Select, refresh concurrently, save in one batch (per user if that fails) and
+    report per-user outcomes.
+
+    Pass candidates to skip the selection query (rows need id and
+    strava_refresh_token; email is optional).
+    """
+    started = time.monotonic()
+    if candidates is None:
+        candidates = select_token_refresh_candidates(user_ids, buffer_minutes)
+    if not candidates:
+        return {'checked': 0, 'refreshed': 0, 'failed': 0, 'deferred': 0, 'outcomes': [], 'rate_limit': None}
+
+    if refresher is None:
+        client_id, client_secret = _default_credentials()
+        if not client_id or not client_secret:
+            outcomes = [_outcome(c, FAILED, 'No centralized Strava credentials available') for c in candidates]
+            return {'checked': len(candidates), 'refreshed': 0, 'failed': len(candidates), 'deferred': 0,
+                    'outcomes': outcomes, 'rate_limit': None}
+        refresher = BulkTokenRefresher(client_id, client_secret, max_retries=max_retries)
+
+    outcomes = refresher.refresh_all(candidates)
+    save_refreshed_tokens(outcomes)  # Marks any user whose new tokens could not be saved FAILED
+
+    for outcome in outcomes:
+        outcome.pop('tokens', None)  # Never hand tokens back to callers
+        logger.info(f"Token refresh user={outcome['user_id']} status={outcome['status']} "
+                    f"attempts={outcome['attempts']}: {outcome['message']}")
+
+    counts = {status: sum(o['status'] == status for o in outcomes)
+              for status in (REFRESHED, NEEDS_REAUTH, FAILED, RATE_LIMITED, SKIPPED)}
+    logger.info(f"Bulk token refresh: {len(outcomes)} users in {time.monotonic() - started:.1f}s "
+                f"({', '.join(f'{k}={v}' for k, v in counts.items())})")
+    return {
+        'checked': len(outcomes),
+        'refreshed': counts[REFRESHED],
+        'failed': counts[FAILED] + counts[NEEDS_REAUTH],
+        'deferred': counts[RATE_LIMITED],
+        'outcomes': outcomes,
+        'rate_limit': refresher.rate_limiter.snapshot(),
+    }
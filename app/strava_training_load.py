@@ -14,8 +14,6 @@ import numpy as np
 import argparse
 from datetime import datetime, date, timedelta
 import pytz
-from stravalib.client import Client
-from stravalib.exc import ActivityUploadFailed, Fault
 from timezone_utils import should_create_rest_day, get_app_current_date, log_timezone_debug
 from db_utils import get_db_connection, execute_query, initialize_db, DB_FILE
 from utils.feature_flags import is_feature_enabled
@@ -239,11 +237,13 @@ def connect_to_strava():
         logger.error("No tokens available. Run authentication first.")
         return None
 
+    from http_clients import get_strava_client
+
     for attempt in range(MAX_RETRIES):
         try:
             logger.info(f"Connecting to Strava (Attempt {attempt + 1}/{MAX_RETRIES})")
 
-            client = Client(access_token=tokens['access_token'])
+            client = get_strava_client(tokens['access_token'])
 
             # Test connection
             athlete = client.get_athlete()
@@ -283,7 +283,8 @@ def refresh_strava_token():
             logger.error("No client credentials available for token refresh")
             return None
 
-        client = Client()
+        from http_clients import get_strava_client
+        client = get_strava_client()
         refresh_response = client.refresh_access_token(
             client_id=client_id,
             client_secret=client_secret,
@@ -299,7 +300,7 @@ def refresh_strava_token():
         save_tokens(new_tokens)
 
         # Return new client
-        return Client(access_token=new_tokens['access_token'])
+        return get_strava_client(new_tokens['access_token'])
 
     except Exception as e:
         logger.error(f"Error refreshing token: {str(e)}")
@@ -2335,6 +2336,7 @@ def setup_strava_authentication():
         return False
 
     # Create client and get auth URL
+    from stravalib.client import Client
     client = Client()
     auth_url = client.authorization_url(
         client_id=client_id,
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Per-request cost of the stateless CSRF tokens in csrf_protection.py.
+
+Times token generation and validation inside a Flask request context (the work
+csrf_protected/require_csrf_token add to each request) at each protection level,
+and the rejection of tampered and expired tokens. Then issues --tokens tokens in
+one session and checks that the session still holds a single CSRF value, so
+there is nothing per token to store or clean up.
+
+Usage (from app/):
+    python tests/benchmarks/csrf_validation.py [--tokens 100000] [--quick] [--save out.json]
+"""
+import argparse
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, '..', '..')))
+sys.path.insert(0, BENCH_DIR)
+
+from flask import Flask, session
+
+import harness
+from csrf_protection import CSRFProtectionLevel, CSRFProtectionManager, CSRFTokenType
+from run_benchmarks import quiet
+
+
+def cases(manager):
+    """(name, group, fn) to time inside one request context"""
+    token = manager.generate_csrf_token(CSRFTokenType.FORM, user_id=42)
+    nonce, issued_at, signature = token.split('.')
+    tampered = f"{nonce}.{issued_at}.{signature[:-2]}AA"
+    backdated = f"{nonce}.{int(issued_at) - 90000}.{signature}"
+
+    def validate(level, candidate, expect):
+        def fn():
+            manager.protection_level = level
+            assert manager.validate_csrf_token(candidate, CSRFTokenType.FORM, 42)[0] is expect
+        return fn
+
+    return [
+        ('generate_csrf_token', 'issue', lambda: manager.generate_csrf_token(CSRFTokenType.FORM, user_id=42)),
+        ('validate[basic]', 'validate', validate(CSRFProtectionLevel.BASIC, token, True)),
+        ('validate[enhanced]', 'validate', validate(CSRFProtectionLevel.ENHANCED, token, True)),
+        ('validate[strict]', 'validate', validate(CSRFProtectionLevel.STRICT, token, True)),
+        ('reject[tampered]', 'reject', validate(CSRFProtectionLevel.ENHANCED, tampered, False)),
+        ('reject[altered issued_at]', 'reject', validate(CSRFProtectionLevel.ENHANCED, backdated, False)),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stateless CSRF token generation/validation cost')
+    parser.add_argument('--tokens', type=int, default=100000, help='Tokens to issue in one session')
+    parser.add_argument('--quick', action='store_true', help='Shorter time budget per case')
+    parser.add_argument('--save', help='Write results JSON to this path')
+    args = parser.parse_args(argv)
+
+    app = Flask(__name__)
+    app.secret_key = 'benchmark-secret'
+    manager = CSRFProtectionManager()
+    min_time = 0.2 if args.quick else harness.DEFAULT_MIN_TIME_SECONDS
+    # Each round is a batch of calls so the timer resolution does not dominate
+    batch = 1000
+
+    results = []
+    with app.test_request_context('/signup', method='POST', base_url='https://example.com',
+                                  headers={'Origin': 'https://example.com'}):
+        for name, group, fn in cases(manager):
+            def run_batch(fn=fn):
+                for _ in range(batch):
+                    fn()
+            with quiet():
+                results.append(harness.run_benchmark(name, run_batch, group=group, items=batch,
+                                                     min_time=min_time))
+
+        started = time.perf_counter()
+        for _ in range(args.tokens):
+            manager.generate_csrf_token(CSRFTokenType.FORM)
+        issue_seconds = time.perf_counter() - started
+        csrf_keys = [key for key in session.keys() if key.startswith('csrf')]
+
+    print(harness.format_table(results))
+    print()
+    for result in results:
+        print(f"{result.name:<28} {result.median / batch * 1e6:8.2f} us per request")
+    print(f"\n{args.tokens} tokens issued in {issue_seconds:.2f}s; session CSRF keys afterwards: {csrf_keys}")
+    if args.save:
+        harness.save_results(results, args.save)
+    return 0 if len(csrf_keys) == 1 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Minimal pytest-benchmark-style timing harness.
+
+run_benchmark() calibrates rounds to a time budget and reports min/median/mean/stddev;
+results are saved as JSON and compare_results() flags any benchmark whose median got
+slower than the baseline by more than a threshold. Kept dependency-free so it runs in
+the same environment as the unittest suite.
+"""
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from typing import Callable, Dict, List
+
+DEFAULT_MIN_TIME_SECONDS = 1.0
+DEFAULT_MAX_ROUNDS = 200
+DEFAULT_MIN_ROUNDS = 3
+DEFAULT_REGRESSION_THRESHOLD = 0.20
+
+
+@dataclass
+class BenchmarkResult:
+    """Timing statistics for one benchmark, in seconds per call"""
+    name: str
+    group: str
+    rounds: int
+    min: float
+    median: float
+    mean: float
+    stddev: float
+    items: int = 1
+    extra: Dict = field(default_factory=dict)
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.median if self.median > 0 else 0.0
+
+
+def run_benchmark(name: str, fn: Callable[[], object], group: str = 'default', items: int = 1,
+                  min_time: float = DEFAULT_MIN_TIME_SECONDS, max_rounds: int = DEFAULT_MAX_ROUNDS,
+                  min_rounds: int = DEFAULT_MIN_ROUNDS, warmup: int = 1) -> BenchmarkResult:
+    """
+    Time fn() repeatedly until min_time has elapsed (bounded by min/max rounds).
+
+    Args:
+        name: Benchmark identifier (stable across runs; used as the comparison key)
+        fn: Zero-argument callable to time
+        group: Report grouping
+        items: Units of work per call (samples, activities...) for throughput
+        min_time: Time budget in seconds
+        max_rounds: Upper bound on timed calls
+        min_rounds: Lower bound on timed calls
+        warmup: Untimed calls before measuring
+
+    Returns:
+        BenchmarkResult
+    """
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_rounds:
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+        if len(timings) >= min_rounds and time.perf_counter() - started >= min_time:
+            break
+
+    return BenchmarkResult(
+        name=name,
+        group=group,
+        rounds=len(timings),
+        min=min(timings),
+        median=statistics.median(timings),
+        mean=statistics.mean(timings),
+        stddev=statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        items=items,
+    )
+
+
+def machine_info() -> Dict:
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def save_results(results: List[BenchmarkResult], path: str) -> None:
+    payload = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'machine_info': machine_info(),
+        'benchmarks': [dict(asdict(r), items_per_second=r.items_per_second) for r in results],
+    }
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+
+
+def load_results(path: str) -> Dict[str, Dict]:
+    with open(path) as f:
+        payload = json.load(f)
+    return {b['name']: b for b in payload.get('benchmarks', [])}
+
+
+def compare_results(current: Dict[str, Dict], baseline: Dict[str, Dict],
+                    threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> Dict[str, List[Dict]]:
+    """
+    Compare medians benchmark-by-benchmark.
+
+    Returns:
+        Dict with 'regressions', 'improvements', 'unchanged', 'new' and 'missing' lists.
+        Each comparison row carries baseline/current medians and the relative change
+        (positive = slower).
+    """
+    report = {'regressions': [], 'improvements': [], 'unchanged': [], 'new': [], 'missing': []}
+
+    for name, result in current.items():
+        base = baseline.get(name)
+        if base is None:
+            report['new'].append({'name': name, 'current': result['median']})
+            continue
+        change = (result['median'] - base['median']) / base['median'] if base['median'] > 0 else 0.0
+        row = {'name': name, 'baseline': base['median'], 'current': result['median'],
+               'change': round(change, 4)}
+        if change > threshold:
+            report['regressions'].append(row)
+        elif change < -threshold:
+            report['improvements'].append(row)
+        else:
+            report['unchanged'].append(row)
+
+    report['missing'] = [{'name': name} for name in baseline if name not in current]
+    return report
+
+
+def format_table(results: List[BenchmarkResult]) -> str:
+    lines = [f"{'benchmark':<58} {'rounds':>6} {'min ms':>10} {'median ms':>10} {'stddev ms':>10} {'items/s':>12}"]
+    for group in sorted({r.group for r in results}):
+        lines.append(f"-- {group}")
+        for r in (r for r in results if r.group == group):
+            lines.append(f"{r.name:<58} {r.rounds:>6} {r.min * 1000:>10.3f} {r.median * 1000:>10.3f} "
+                         f"{r.stddev * 1000:>10.3f} {r.items_per_second:>12.0f}")
+    return '\n'.join(lines)
+
+
+def format_comparison(report: Dict[str, List[Dict]], threshold: float) -> str:
+    lines = []
+    for label in ('regressions', 'improvements', 'unchanged'):
+        rows = report[label]
+        if not rows:
+            continue
+        lines.append(f"{label.upper()} ({len(rows)}, threshold {threshold:.0%})")
+        for row in rows:
+            lines.append(f"  {row['name']:<58} {row['baseline'] * 1000:>10.3f} ms -> "
+                         f"{row['current'] * 1000:>10.3f} ms  ({row['change']:+.1%})")
+    for label in ('new', 'missing'):
+        if report[label]:
+            lines.append(f"{label.upper()}: {', '.join(r['name'] for r in report[label])}")
+    return '\n'.join(lines)
@@ -0,0 +1,233 @@
+"""
+Throwaway Postgres for the DB-bound benchmarks.
+
+local_postgres() yields a DATABASE_URL for a database that exists only for the run:
+- BENCHMARK_DATABASE_URL set: a temporary database is created on that server and
+  dropped afterwards.
+- otherwise: initdb/pg_ctl (from PG_BIN or PATH) start a private cluster in a temp
+  directory on a free port, torn down afterwards.
+If neither is possible it yields None and the runner skips the DB-bound cases.
+
+seed_athlete() creates just the columns the benchmarked paths touch (types as in
+db_utils.initialize_db) and loads a synthetic athlete into them.
+"""
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import uuid
+from contextlib import contextmanager
+from urllib.parse import urlparse, urlunparse
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+SCHEMA_SQL = """
+CREATE TABLE activities (
+    activity_id BIGINT NOT NULL,
+    user_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    name TEXT,
+    type TEXT,
+    sport_type TEXT,
+    distance_miles REAL,
+    elevation_gain_feet REAL,
+    elevation_load_miles REAL,
+    total_load_miles REAL,
+    trimp REAL,
+    duration_minutes REAL,
+    seven_day_avg_load REAL,
+    twentyeight_day_avg_load REAL,
+    seven_day_avg_trimp REAL,
+    twentyeight_day_avg_trimp REAL,
+    acute_chronic_ratio REAL,
+    trimp_acute_chronic_ratio REAL,
+    normalized_divergence REAL,
+    PRIMARY KEY (activity_id, user_id)
+);
+CREATE INDEX idx_activities_user_date ON activities (user_id, date);
+
+CREATE TABLE journal_entries (
+    user_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    hrv_value NUMERIC,
+    resting_hr INTEGER,
+    sleep_quality INTEGER,
+    sleep_score INTEGER,
+    spo2 NUMERIC,
+    energy_level INTEGER,
+    rpe_score INTEGER,
+    pain_percentage INTEGER,
+    morning_soreness INTEGER,
+    notes TEXT,
+    journal_power_score INTEGER,
+    updated_at TIMESTAMP,
+    PRIMARY KEY (user_id, date)
+);
+
+CREATE TABLE journal_learning_jobs (
+    user_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    is_rest_day BOOLEAN NOT NULL DEFAULT FALSE,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    generation INTEGER NOT NULL DEFAULT 1,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    requested_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    available_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    lease_expires_at TIMESTAMP,
+    result JSONB,
+    error TEXT,
+    steps JSONB NOT NULL DEFAULT '{}'::jsonb,
+    PRIMARY KEY (user_id, date)
+);
+
+CREATE TABLE acwr_configurations (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    chronic_period_days INTEGER NOT NULL,
+    decay_rate REAL NOT NULL,
+    is_active BOOLEAN DEFAULT TRUE,
+    created_by INTEGER,
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE TABLE user_acwr_configurations (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    configuration_id INTEGER NOT NULL REFERENCES acwr_configurations(id),
+    assigned_by INTEGER,
+    assigned_at TIMESTAMP DEFAULT NOW(),
+    is_active BOOLEAN DEFAULT TRUE
+);
+"""
+
+ACTIVITY_COLUMNS = ('activity_id', 'user_id', 'date', 'name', 'type', 'sport_type',
+                    'distance_miles', 'elevation_gain_feet', 'elevation_load_miles',
+                    'total_load_miles', 'trimp', 'duration_minutes')
+JOURNAL_COLUMNS = ('user_id', 'date', 'hrv_value', 'resting_hr', 'sleep_quality',
+                   'sleep_score', 'spo2')
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _pg_tool(name):
+    pg_bin = os.environ.get('PG_BIN')
+    if pg_bin and os.path.exists(os.path.join(pg_bin, name)):
+        return os.path.join(pg_bin, name)
+    return shutil.which(name)
+
+
+def _with_database(url, dbname):
+    parsed = urlparse(url)
+    return urlunparse(parsed._replace(path='/' + dbname))
+
+
+@contextmanager
+def _temporary_database(server_url):
+    dbname = f"bench_{uuid.uuid4().hex[:10]}"
+    admin = psycopg2.connect(server_url)
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cur:
+            cur.execute(f'CREATE DATABASE "{dbname}"')
+        yield _with_database(server_url, dbname)
+    finally:
+        with admin.cursor() as cur:
+            cur.execute(f'DROP DATABASE IF EXISTS "{dbname}" WITH (FORCE)')
+        admin.close()
+
+
+@contextmanager
+def _private_cluster():
+    initdb, pg_ctl = _pg_tool('initdb'), _pg_tool('pg_ctl')
+    if not initdb or not pg_ctl:
+        yield None
+        return
+
+    data_dir = tempfile.mkdtemp(prefix='bench_pg_')
+    port = _free_port()
+    try:
+        subprocess.run([initdb, '-D', data_dir, '-U', 'bench', '--auth=trust'],
+                       check=True, capture_output=True)
+        subprocess.run([pg_ctl, '-D', data_dir, '-w', '-l', os.path.join(data_dir, 'server.log'),
+                        '-o', f'-p {port} -k {data_dir} -c listen_addresses=127.0.0.1', 'start'],
+                       check=True, capture_output=True)
+    except (subprocess.CalledProcessError, OSError):
+        shutil.rmtree(data_dir, ignore_errors=True)
+        yield None
+        return
+
+    try:
+        yield f'postgresql://bench@127.0.0.1:{port}/postgres'
+    finally:
+        subprocess.run([pg_ctl, '-D', data_dir, '-m', 'fast', 'stop'], capture_output=True)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+@contextmanager
+def local_postgres():
+    """Yield a DATABASE_URL for a throwaway database, or None if Postgres is unavailable"""
+    server_url = os.environ.get('BENCHMARK_DATABASE_URL')
+    if server_url:
+        with _temporary_database(server_url) as url:
+            yield url
+        return
+
+    with _private_cluster() as cluster_url:
+        if cluster_url is None:
+            yield None
+            return
+        with _temporary_database(cluster_url) as url:
+            yield url
+
+
+def use_database(url):
+    """Point db_utils (which reads DATABASE_URL at import) at the benchmark database"""
+    os.environ['DATABASE_URL'] = url
+    import db_utils
+    db_utils.DATABASE_URL = url
+
+
+def seed_athlete(url, activities, journal, user_id=1, chronic_period_days=42, decay_rate=0.05):
+    """Create the benchmark schema and load one athlete's history and ACWR configuration"""
+    conn = psycopg2.connect(url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SCHEMA_SQL)
+            execute_values(
+                cur,
+                f"INSERT INTO activities ({', '.join(ACTIVITY_COLUMNS)}) VALUES %s",
+                [tuple(row.get(col) for col in ACTIVITY_COLUMNS) for row in activities],
+                page_size=1000,
+            )
+            execute_values(
+                cur,
+                f"INSERT INTO journal_entries ({', '.join(JOURNAL_COLUMNS)}) VALUES %s",
+                [tuple(row.get(col) for col in JOURNAL_COLUMNS) for row in journal],
+                page_size=1000,
+            )
+            cur.execute(
+                """INSERT INTO acwr_configurations (name, chronic_period_days, decay_rate)
+                   VALUES ('benchmark', %s, %s) RETURNING id""",
+                (chronic_period_days, decay_rate),
+            )
+            configuration_id = cur.fetchone()[0]
+            cur.execute(
+                """INSERT INTO user_acwr_configurations (user_id, configuration_id, assigned_by)
+                   VALUES (%s, %s, %s)""",
+                (user_id, configuration_id, user_id),
+            )
+            cur.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
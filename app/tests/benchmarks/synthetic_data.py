@@ -0,0 +1,179 @@
+"""
+Synthetic athlete data for the training-load benchmarks.
+
+Everything is generated from a seeded random.Random so a benchmark run measures the
+code, not the data: the same seed gives the same multi-year history, the same 1 Hz
+HR streams and the same journal on every machine.
+"""
+import math
+import random
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+# Sport mix for a multi-sport athlete: (sport_type, strava type, share of sessions)
+SPORT_MIX = [
+    ('running', 'Run', 0.55),
+    ('cycling', 'Ride', 0.25),
+    ('swimming', 'Swim', 0.08),
+    ('strength', 'WeightTraining', 0.07),
+    ('rowing', 'Rowing', 0.05),
+]
+
+RESTING_HR = 52
+MAX_HR = 186
+
+
+def _pick_sport(rng):
+    roll = rng.random()
+    for sport_type, strava_type, share in SPORT_MIX:
+        roll -= share
+        if roll <= 0:
+            return sport_type, strava_type
+    return SPORT_MIX[0][:2]
+
+
+def _zone_times(rng, duration_minutes):
+    """time_in_zone1..5 (seconds) summing to the session duration, weighted toward Z2"""
+    seconds = int(duration_minutes * 60)
+    shares = [rng.uniform(0.5, 1.5) * w for w in (0.15, 0.5, 0.2, 0.1, 0.05)]
+    total = sum(shares)
+    return {f'time_in_zone{i + 1}': int(seconds * share / total) for i, share in enumerate(shares)}
+
+
+def _moving_averages(rng):
+    """The per-row ACWR columns the dashboard aggregation carries through"""
+    acute, chronic = rng.uniform(4, 12), rng.uniform(5, 10)
+    acute_trimp, chronic_trimp = acute * 12, chronic * 12
+    return {
+        'seven_day_avg_load': round(acute, 2), 'twentyeight_day_avg_load': round(chronic, 2),
+        'seven_day_avg_trimp': round(acute_trimp, 2), 'twentyeight_day_avg_trimp': round(chronic_trimp, 2),
+        'acute_chronic_ratio': round(acute / chronic, 2),
+        'trimp_acute_chronic_ratio': round(acute_trimp / chronic_trimp, 2),
+        'normalized_divergence': 0.0,
+    }
+
+
+def hr_stream(hours, seed=1, resting_hr=RESTING_HR, max_hr=MAX_HR, dropout_rate=0.002):
+    """
+    1 Hz heart-rate stream: warm-up ramp, slow cardiac drift, periodic surges and
+    sensor dropouts (zeros), like a long trail run from a chest strap.
+    """
+    rng = random.Random(seed)
+    samples = int(hours * 3600)
+    reserve = max_hr - resting_hr
+    stream = []
+    for t in range(samples):
+        warmup = min(1.0, t / 900.0)
+        drift = 0.04 * t / max(samples, 1)
+        surge = 0.12 if (t // 600) % 5 == 4 else 0.0
+        intensity = 0.45 + 0.2 * warmup + drift + surge + 0.03 * math.sin(t / 45.0)
+        if rng.random() < dropout_rate:
+            stream.append(0)
+            continue
+        stream.append(int(resting_hr + reserve * intensity + rng.gauss(0, 2)))
+    return stream
+
+
+def multi_year_activities(years=3, user_id=1, seed=7, end_date=None):
+    """
+    Activity rows shaped like the activities table for `years` of training:
+    4-6 sessions a week, about one multi-sport day in ten (2-3 sessions),
+    and rest-day placeholders (non-positive activity_id) on days off.
+    """
+    rng = random.Random(seed)
+    end_date = end_date or date(2026, 6, 30)
+    start_date = end_date - timedelta(days=int(365 * years) - 1)
+    rows = []
+    next_id = 10_000_000
+    rest_id = 0
+    day = start_date
+    while day <= end_date:
+        roll = rng.random()
+        sessions = 0 if roll < 0.22 else (rng.choice([2, 2, 3]) if roll > 0.9 else 1)
+        if sessions == 0:
+            rows.append({
+                'activity_id': rest_id, 'user_id': user_id, 'date': day.strftime('%Y-%m-%d'),
+                'name': 'Rest Day', 'type': 'Rest', 'sport_type': 'rest',
+                'distance_miles': 0, 'elevation_gain_feet': 0, 'elevation_load_miles': 0,
+                'total_load_miles': 0, 'trimp': 0, 'duration_minutes': 0,
+                'avg_heart_rate': None, 'max_heart_rate': None,
+                **_zone_times(rng, 0), **_moving_averages(rng),
+            })
+            rest_id -= 1
+        for _ in range(sessions):
+            sport_type, strava_type = _pick_sport(rng)
+            distance = round(rng.uniform(3, 14) * (3 if sport_type == 'cycling' else 1), 2)
+            elevation_feet = round(rng.uniform(0, 2500), 0)
+            elevation_load = round(elevation_feet / 750.0, 2)
+            duration = round(rng.uniform(30, 150), 1)
+            rows.append({
+                'activity_id': next_id, 'user_id': user_id, 'date': day.strftime('%Y-%m-%d'),
+                'name': f'{strava_type} {next_id}', 'type': strava_type, 'sport_type': sport_type,
+                'distance_miles': distance, 'elevation_gain_feet': elevation_feet,
+                'elevation_load_miles': elevation_load,
+                'total_load_miles': round(distance + elevation_load, 2),
+                'trimp': round(duration * rng.uniform(0.8, 2.2), 1),
+                'duration_minutes': duration,
+                'cycling_equivalent_miles': round(distance / 3.0, 2) if sport_type == 'cycling' else None,
+                'average_speed_mph': round(distance / (duration / 60.0), 2),
+                'avg_heart_rate': rng.randint(125, 160), 'max_heart_rate': rng.randint(160, 185),
+                **_zone_times(rng, duration), **_moving_averages(rng),
+            })
+            next_id += 1
+        day += timedelta(days=1)
+    return rows
+
+
+def journal_entries(days=365, user_id=1, seed=11, end_date=None):
+    """Daily wellness rows (HRV, resting HR, sleep, SpO2) with ~10% missing days"""
+    rng = random.Random(seed)
+    end_date = end_date or date(2026, 6, 30)
+    rows = []
+    for offset in range(days):
+        if rng.random() < 0.1:
+            continue
+        day = end_date - timedelta(days=days - 1 - offset)
+        rows.append({
+            'user_id': user_id, 'date': day,
+            'hrv_value': round(rng.gauss(62, 8), 1),
+            'resting_hr': int(rng.gauss(50, 2.5)),
+            'sleep_quality': rng.randint(2, 5),
+            'sleep_score': rng.randint(55, 95),
+            'spo2': round(rng.uniform(94, 99), 1),
+        })
+    return rows
+
+
+def strava_activity(hours=1.0, sport='Run', activity_id=424242):
+    """Duck-typed stravalib activity with the attributes calculate_training_load reads"""
+    return SimpleNamespace(
+        id=activity_id,
+        name=f'Synthetic {sport}',
+        start_date_local=datetime(2026, 6, 30, 7, 0, 0),
+        type=sport,
+        sport_type=sport,
+        trainer=False,
+        distance=hours * 10_000.0,
+        total_elevation_gain=hours * 250.0,
+        moving_time=int(hours * 3600),
+        average_heartrate=148.0,
+        max_heartrate=178.0,
+        device_name='Synthetic HRM',
+    )
+
+
+class FakeStravaClient:
+    """Answers get_activity_streams from memory so stream-bound paths stay CPU-only"""
+
+    def __init__(self, hours=1.0, seed=1):
+        hr = hr_stream(hours, seed=seed)
+        samples = len(hr)
+        self._streams = {
+            'heartrate': SimpleNamespace(data=hr),
+            'time': SimpleNamespace(data=list(range(samples))),
+            'distance': SimpleNamespace(data=[i * 2.8 for i in range(samples)]),
+            'temp': SimpleNamespace(data=[18 + (i % 600) / 100.0 for i in range(samples)]),
+        }
+
+    def get_activity_streams(self, activity_id, types=None, **kwargs):
+        return self._streams
@@ -0,0 +1,34 @@
+"""
+Cold-start guard for strava_app (see tests/benchmarks/import_budget.py).
+
+Importing the app must not pull in the subsystems that load on first use and must
+not open a database connection. Both are checked on what the import leaves in
+sys.modules; the wall-clock budget is left to the benchmark, which is too noisy
+to assert on here.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+import import_budget
+
+
+class TestImportBudget(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.result = import_budget.measure_import()
+
+    def test_deferred_modules_not_imported(self):
+        self.assertEqual(import_budget.deferred_modules_loaded(self.result), [])
+
+    def test_import_is_observed(self):  # Guards the check above against an empty module list
+        self.assertIn('strava_app', self.result['loaded'])
+
+    def test_no_database_connection_at_import(self):
+        self.assertEqual(self.result['db_connects'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
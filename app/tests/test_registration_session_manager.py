@@ -248,7 +248,7 @@ class TestRegistrationSessionManager(unittest.TestCase):
     @patch('registration_session_manager.execute_query')
     def test_cleanup_expired_sessions_success(self, mock_execute):
         """Test successful cleanup of expired sessions"""
-        mock_execute.side_effect = [True, [{'count': 5}]]  # Update, then count query
+        mock_execute.return_value = [{'transitioned': 5}]  # One set-based transition
         
         cleaned_count = self.manager.cleanup_expired_sessions()
         
@@ -287,12 +287,10 @@ class TestRegistrationSessionManager(unittest.TestCase):
     @patch('registration_session_manager.execute_query')
     def test_get_session_analytics_success(self, mock_execute):
         """Test successful session analytics retrieval"""
-        mock_execute.side_effect = [
-            [{'count': 100}],  # Total sessions
-            [{'count': 25}],   # Active sessions
-            [{'count': 60}],   # Completed sessions
-            [{'count': 15}],   # Expired sessions
-            [{'session_type': 'registration', 'count': 50}]  # Sessions by type
+        mock_execute.return_value = [  # Counter rows
+            {'session_type': 'registration', 'status': 'active', 'sessions': 25},
+            {'session_type': 'registration', 'status': 'completed', 'sessions': 60},
+            {'session_type': 'registration', 'status': 'expired', 'sessions': 15}
         ]
         
         analytics = self.manager.get_session_analytics()
@@ -409,7 +407,7 @@ class TestRegistrationSessionManager(unittest.TestCase):
     @patch('registration_session_manager.execute_query')
     def test_update_session_status_success(self, mock_execute):
         """Test successful session status update"""
-        mock_execute.return_value = True
+        mock_execute.return_value = [{'transitioned': 1}]
         
         success = self.manager._update_session_status(
             'test_session_123',
@@ -431,7 +429,7 @@ class TestRegistrationSessionManager(unittest.TestCase):
     @patch('registration_session_manager.execute_query')
     def test_invalidate_session_internal_success(self, mock_execute):
         """Test successful internal session invalidation"""
-        mock_execute.return_value = True
+        mock_execute.return_value = [{'transitioned': 1}]
         
         success = self.manager._invalidate_session('test_session_123', 'test_reason')
         
@@ -12,17 +12,22 @@ onboarding system. It provides advanced feature unlocking capabilities including
 - Social and engagement-based unlocking
 - Time-based feature availability
 - Custom unlock conditions and rules
+
+Every requirement is evaluated in memory against one EngagementSignals vector
+per user (engagement_signals.py: one aggregate query, cached), so checking all
+feature definitions for a user costs a single query, and get_tier_report()
+evaluates every user from one batch query.
 """
 
 import logging
-import json
 from typing import Dict, List, Optional, Tuple, Any, Set
-from datetime import datetime, timedelta
+from datetime import datetime
 from dataclasses import dataclass
 from enum import Enum
 
-from db_utils import get_db_connection, execute_query
-from onboarding_manager import OnboardingManager, OnboardingStep, FeatureTier, FeatureUnlock
+from engagement_signals import (EngagementSignals, get_engagement_signals, get_engagement_signals_batch,
+                                invalidate_engagement_signals)
+from onboarding_manager import OnboardingManager, OnboardingStep, FeatureTier, FEATURE_STEP_MAPPING
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +45,9 @@ class UnlockCondition(Enum):
     CUSTOM_RULE = 'custom_rule'
 
 
+TIER_ORDER = [FeatureTier.BASIC, FeatureTier.INTERMEDIATE, FeatureTier.ADVANCED, FeatureTier.EXPERT]
+
+
 class UnlockTrigger(Enum):
     """Types of unlock triggers"""
     AUTOMATIC = 'automatic'
@@ -260,13 +268,15 @@ class TieredFeatureUnlockManager:
             'goal_achievement': {}
         }
     
-    def check_tiered_feature_unlock(self, user_id: int, feature_name: str) -> Tuple[bool, Dict[str, Any]]:
+    def check_tiered_feature_unlock(self, user_id: int, feature_name: str,
+                                    signals: Optional[EngagementSignals] = None) -> Tuple[bool, Dict[str, Any]]:
         """
         Check if a user can unlock a specific feature with detailed analysis
         
         Args:
             user_id: User ID to check
             feature_name: Name of feature to check
+            signals: The user's engagement signals, if already loaded
             
         Returns:
             Tuple of (can_unlock, detailed_analysis)
@@ -276,6 +286,9 @@ class TieredFeatureUnlockManager:
             if not feature_def:
                 return False, {'error': f'Unknown feature: {feature_name}'}
             
+            if signals is None:
+                signals = get_engagement_signals(user_id)
+            
             analysis = {
                 'feature_name': feature_name,
                 'tier': feature_def.tier.value,
@@ -289,7 +302,7 @@ class TieredFeatureUnlockManager:
             
             # Check dependencies
             for dependency in feature_def.dependencies:
-                if not self.onboarding_manager.check_feature_unlock(user_id, dependency):
+                if not self._dependency_met(signals, dependency):
                     analysis['dependencies_met'] = False
                     analysis['requirements_failed'].append({
                         'type': 'dependency',
@@ -306,7 +319,7 @@ class TieredFeatureUnlockManager:
             
             for requirement in feature_def.requirements:
                 total_weight += requirement.weight
-                requirement_met = self._check_requirement(user_id, requirement)
+                requirement_met = self._check_requirement(signals, requirement)
                 
                 if requirement_met:
                     met_weight += requirement.weight
@@ -329,7 +342,7 @@ class TieredFeatureUnlockManager:
                 analysis['unlock_score'] = met_weight / total_weight
             
             # Check additional unlock conditions
-            conditions_met = self._check_unlock_conditions(user_id, feature_def)
+            conditions_met = self._check_unlock_conditions(signals, feature_def)
             analysis['conditions_met'] = conditions_met
             
             # Determine if can unlock
@@ -348,53 +361,71 @@ class TieredFeatureUnlockManager:
             logger.error(f"Error checking tiered feature unlock for user {user_id}, feature {feature_name}: {str(e)}")
             return False, {'error': str(e)}
     
-    def _check_requirement(self, user_id: int, requirement: UnlockRequirement) -> bool:
+    def evaluate_all_features(self, user_id: int,
+                              signals: Optional[EngagementSignals] = None) -> Dict[str, Tuple[bool, Dict[str, Any]]]:
+        """(can_unlock, analysis) for every feature definition, from one signals lookup"""
+        if signals is None:
+            signals = get_engagement_signals(user_id)
+        return {feature_name: self.check_tiered_feature_unlock(user_id, feature_name, signals)
+                for feature_name in self.feature_definitions}
+    
+    def _completed_steps(self, signals: EngagementSignals) -> Set[OnboardingStep]:
+        """Onboarding steps implied by the user's unlocked features (as OnboardingManager maps them)"""
+        steps = set()
+        for feature in signals.features_unlocked:
+            steps.update(FEATURE_STEP_MAPPING.get(feature, ()))
+        return steps
+    
+    def _dependency_met(self, signals: EngagementSignals, feature_name: str) -> bool:
+        """OnboardingManager.check_feature_unlock, evaluated against the signals"""
+        feature_def = self.onboarding_manager.feature_definitions.get(feature_name)
+        if not feature_def or signals.days_registered is None:
+            return False
+        completed_steps = self._completed_steps(signals)
+        if any(step not in completed_steps for step in feature_def.required_steps):
+            return False
+        return (signals.activity_count >= feature_def.required_activities and
+                signals.days_registered >= feature_def.required_days)
+    
+    def _check_requirement(self, signals: EngagementSignals, requirement: UnlockRequirement) -> bool:
         """Check if a specific requirement is met"""
         try:
             if requirement.condition == UnlockCondition.STEP_COMPLETION:
-                progress = self.onboarding_manager.get_onboarding_progress(user_id)
-                if not progress:
-                    return False
-                return requirement.value in progress.completed_steps
+                return requirement.value in self._completed_steps(signals)
             
             elif requirement.condition == UnlockCondition.ACTIVITY_COUNT:
-                activity_count = self._get_user_activity_count(user_id)
-                return self._compare_values(activity_count, requirement.value, requirement.operator)
+                return self._compare_values(signals.activity_count, requirement.value, requirement.operator)
             
             elif requirement.condition == UnlockCondition.DAYS_ACTIVE:
-                days_active = self._get_user_days_active(user_id)
-                return self._compare_values(days_active, requirement.value, requirement.operator)
+                return self._compare_values(signals.days_active, requirement.value, requirement.operator)
             
             elif requirement.condition == UnlockCondition.USAGE_FREQUENCY:
-                usage_freq = self._get_usage_frequency(user_id)
-                return self._compare_values(usage_freq, requirement.value, requirement.operator)
+                return self._compare_values(signals.usage_frequency, requirement.value, requirement.operator)
             
             elif requirement.condition == UnlockCondition.PERFORMANCE_THRESHOLD:
-                perf_score = self._get_performance_score(user_id)
-                return self._compare_values(perf_score, requirement.value, requirement.operator)
+                return self._compare_values(signals.performance_score, requirement.value, requirement.operator)
             
             elif requirement.condition == UnlockCondition.ENGAGEMENT_LEVEL:
-                engagement = self._get_engagement_level(user_id)
-                return self._compare_values(engagement, requirement.value, requirement.operator)
+                return self._compare_values(signals.engagement_level, requirement.value, requirement.operator)
             
             elif requirement.condition == UnlockCondition.SOCIAL_INTERACTION:
-                social_score = self._get_social_score(user_id)
-                return self._compare_values(social_score, requirement.value, requirement.operator)
+                return self._compare_values(signals.social_score, requirement.value, requirement.operator)
             
             elif requirement.condition == UnlockCondition.TIME_BASED:
-                return self._check_time_based_requirement(user_id, requirement)
+                return self._check_time_based_requirement(signals.user_id, requirement)
             
             elif requirement.condition == UnlockCondition.CUSTOM_RULE:
-                return self._check_custom_rule(user_id, requirement)
+                return self._check_custom_rule(signals.user_id, requirement)
             
             return False
             
         except Exception as e:
-            logger.error(f"Error checking requirement for user {user_id}: {str(e)}")
+            logger.error(f"Error checking requirement for user {signals.user_id}: {str(e)}")
             return False
     
-    def _check_unlock_conditions(self, user_id: int, feature_def: TieredFeatureDefinition) -> bool:
+    def _check_unlock_conditions(self, signals: EngagementSignals, feature_def: TieredFeatureDefinition) -> bool:
         """Check additional unlock conditions"""
+        user_id = signals.user_id
         try:
             conditions = feature_def.unlock_conditions
             
@@ -407,8 +438,7 @@ class TieredFeatureUnlockManager:
             
             # Check engagement threshold
             if 'engagement_threshold' in conditions:
-                engagement = self._get_engagement_level(user_id)
-                if engagement < conditions['engagement_threshold']:
+                if signals.engagement_level < conditions['engagement_threshold']:
                     return False
             
             # Check data quality threshold
@@ -472,6 +502,8 @@ class TieredFeatureUnlockManager:
             success = self.onboarding_manager.unlock_feature(user_id, feature_name)
             
             if success:
+                invalidate_engagement_signals(user_id)
+                
                 # Log tiered unlock event
                 self._log_tiered_unlock_event(user_id, feature_name, analysis)
                 
@@ -507,9 +539,11 @@ class TieredFeatureUnlockManager:
             Dictionary with progress information
         """
         try:
+            signals = get_engagement_signals(user_id)
+            evaluations = self.evaluate_all_features(user_id, signals)
             progress = {
                 'user_id': user_id,
-                'current_tier': self._get_current_tier(user_id),
+                'current_tier': self._current_tier(signals).value,
                 'features_by_tier': {},
                 'unlock_progress': {},
                 'recommendations': [],
@@ -522,7 +556,7 @@ class TieredFeatureUnlockManager:
                 if tier not in progress['features_by_tier']:
                     progress['features_by_tier'][tier] = []
                 
-                can_unlock, analysis = self.check_tiered_feature_unlock(user_id, feature_name)
+                can_unlock, analysis = evaluations[feature_name]
                 feature_info = {
                     'name': feature_name,
                     'description': feature_def.description,
@@ -540,10 +574,10 @@ class TieredFeatureUnlockManager:
                     progress['unlock_progress'][feature_name] = analysis
             
             # Generate recommendations
-            progress['recommendations'] = self._generate_user_recommendations(user_id)
+            progress['recommendations'] = self._generate_user_recommendations(user_id, signals)
             
             # Get next milestones
-            progress['next_milestones'] = self._get_next_milestones(user_id)
+            progress['next_milestones'] = self._get_next_milestones(user_id, signals)
             
             return progress
             
@@ -574,142 +608,71 @@ class TieredFeatureUnlockManager:
     
     def _get_user_activity_count(self, user_id: int) -> int:
         """Get user's activity count"""
-        try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) as count FROM activities WHERE user_id = %s", (user_id,))
-                result = cursor.fetchone()
-                return result['count'] if result else 0
-        except Exception as e:
-            logger.error(f"Error getting activity count for user {user_id}: {str(e)}")
-            return 0
+        return get_engagement_signals(user_id).activity_count
     
     def _get_user_days_active(self, user_id: int) -> int:
         """Get number of days user has been active"""
-        try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT COUNT(DISTINCT date) as count
-                    FROM activities
-                    WHERE user_id = %s
-                """, (user_id,))
-                result = cursor.fetchone()
-                return result['count'] if result else 0
-        except Exception as e:
-            logger.error(f"Error getting days active for user {user_id}: {str(e)}")
-            return 0
+        return get_engagement_signals(user_id).days_active
     
     def _get_usage_frequency(self, user_id: int) -> float:
         """Calculate user's usage frequency (0.0 to 1.0)"""
-        try:
-            # This is a simplified calculation - in practice, you'd track actual usage
-            days_active = self._get_user_days_active(user_id)
-            if days_active == 0:
-                return 0.0
-            
-            # Assume user has been registered for at least 1 day
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                # PostgreSQL syntax
-                    cursor.execute("""
-                        SELECT created_at FROM user_settings WHERE user_id = %s
-                    """, (user_id,))
-                else:
-                    cursor.execute("""
-                        SELECT created_at FROM user_settings WHERE user_id = %s
-                    """, (user_id,))
-                
-                result = cursor.fetchone()
-                if not result:
-                    return 0.0
-                
-                created_at = result[0]
-                if isinstance(created_at, str):
-                    created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                
-                days_registered = (datetime.now() - created_at).days
-                if days_registered == 0:
-                    return 1.0
-                
-                return min(days_active / days_registered, 1.0)
-                
-        except Exception as e:
-            logger.error(f"Error calculating usage frequency for user {user_id}: {str(e)}")
-            return 0.0
+        return get_engagement_signals(user_id).usage_frequency
     
     def _get_performance_score(self, user_id: int) -> float:
         """Calculate user's performance score (0.0 to 1.0)"""
-        try:
-            # Simplified performance calculation
-            # In practice, this would consider various metrics
-            activity_count = self._get_user_activity_count(user_id)
-            days_active = self._get_user_days_active(user_id)
-            
-            if activity_count == 0 or days_active == 0:
-                return 0.0
-            
-            # Basic performance score based on activity consistency
-            consistency = min(activity_count / (days_active * 2), 1.0)  # Assume 2 activities per day is excellent
-            
-            return consistency
-            
-        except Exception as e:
-            logger.error(f"Error calculating performance score for user {user_id}: {str(e)}")
-            return 0.0
+        return get_engagement_signals(user_id).performance_score
     
     def _get_engagement_level(self, user_id: int) -> float:
         """Calculate user's engagement level (0.0 to 1.0)"""
-        try:
-            # Simplified engagement calculation
-            usage_freq = self._get_usage_frequency(user_id)
-            activity_count = self._get_user_activity_count(user_id)
-            
-            # Basic engagement score
-            if activity_count == 0:
-                return 0.0
-            
-            engagement = (usage_freq * 0.6) + (min(activity_count / 10, 1.0) * 0.4)
-            return min(engagement, 1.0)
-            
-        except Exception as e:
-            logger.error(f"Error calculating engagement level for user {user_id}: {str(e)}")
-            return 0.0
+        return get_engagement_signals(user_id).engagement_level
     
     def _get_social_score(self, user_id: int) -> int:
         """Calculate user's social interaction score"""
-        try:
-            # Simplified social score - in practice, this would track actual social interactions
-            # For now, return a basic score based on activity count
-            activity_count = self._get_user_activity_count(user_id)
-            if activity_count >= 5:
-                return 1
-            return 0
-            
-        except Exception as e:
-            logger.error(f"Error calculating social score for user {user_id}: {str(e)}")
-            return 0
+        return get_engagement_signals(user_id).social_score
     
     def _get_current_tier(self, user_id: int) -> str:
         """Get user's current tier"""
         try:
-            unlocked_features = self.onboarding_manager._get_unlocked_features(user_id)
-            
-            # Determine highest tier based on unlocked features
-            tiers = [FeatureTier.BASIC, FeatureTier.INTERMEDIATE, FeatureTier.ADVANCED, FeatureTier.EXPERT]
-            current_tier = FeatureTier.BASIC
-            
-            for feature_name in unlocked_features:
-                feature_def = self.feature_definitions.get(feature_name)
-                if feature_def and feature_def.tier.value > current_tier.value:
-                    current_tier = feature_def.tier
-            
-            return current_tier.value
-            
+            return self._current_tier(get_engagement_signals(user_id)).value
         except Exception as e:
             logger.error(f"Error getting current tier for user {user_id}: {str(e)}")
             return FeatureTier.BASIC.value
     
+    def _current_tier(self, signals: EngagementSignals) -> FeatureTier:
+        """Highest tier among the user's unlocked features"""
+        current_tier = FeatureTier.BASIC
+        for feature_name in signals.features_unlocked:
+            feature_def = self.feature_definitions.get(feature_name)
+            if feature_def and TIER_ORDER.index(feature_def.tier) > TIER_ORDER.index(current_tier):
+                current_tier = feature_def.tier
+        return current_tier
+    
+    def get_tier_report(self, user_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+        """
+        Tiers and unlockable features for many users (default: all) for admin reports.
+        
+        Loads every user's signals in one query and evaluates all feature
+        definitions in memory.
+        """
+        signals_by_user = get_engagement_signals_batch(user_ids)
+        users = []
+        tier_counts = {tier.value: 0 for tier in TIER_ORDER}
+        for user_id, signals in sorted(signals_by_user.items()):
+            evaluations = self.evaluate_all_features(user_id, signals)
+            current_tier = self._current_tier(signals).value
+            tier_counts[current_tier] += 1
+            users.append({
+                'user_id': user_id,
+                'current_tier': current_tier,
+                'activity_count': signals.activity_count,
+                'days_active': signals.days_active,
+                'engagement_level': round(signals.engagement_level, 3),
+                'unlocked_features': sorted(signals.features_unlocked),
+                'can_unlock': sorted(name for name, (can_unlock, _) in evaluations.items()
+                                     if can_unlock and name not in signals.features_unlocked)
+            })
+        return {'total_users': len(users), 'tier_counts': tier_counts, 'users': users}
+    
     def _get_users_in_tier(self, tier: FeatureTier) -> int:
         """Get number of users in a specific tier"""
         try:
@@ -772,12 +735,13 @@ class TieredFeatureUnlockManager:
         
         return recommendations
     
-    def _generate_user_recommendations(self, user_id: int) -> List[str]:
+    def _generate_user_recommendations(self, user_id: int, signals: Optional[EngagementSignals] = None) -> List[str]:
         """Generate general recommendations for user progress"""
         recommendations = []
+        signals = signals or get_engagement_signals(user_id)
         
-        activity_count = self._get_user_activity_count(user_id)
-        days_active = self._get_user_days_active(user_id)
+        activity_count = signals.activity_count
+        days_active = signals.days_active
         
         if activity_count < 3:
             recommendations.append("Complete more activities to unlock advanced features")
@@ -785,18 +749,18 @@ class TieredFeatureUnlockManager:
         if days_active < 3:
             recommendations.append("Stay active for more days to unlock intermediate features")
         
-        usage_freq = self._get_usage_frequency(user_id)
-        if usage_freq < 0.5:
+        if signals.usage_frequency < 0.5:
             recommendations.append("Use the app more regularly to unlock features faster")
         
         return recommendations
     
-    def _get_next_milestones(self, user_id: int) -> List[Dict[str, Any]]:
+    def _get_next_milestones(self, user_id: int, signals: Optional[EngagementSignals] = None) -> List[Dict[str, Any]]:
         """Get next milestones for the user"""
         milestones = []
+        signals = signals or get_engagement_signals(user_id)
         
-        activity_count = self._get_user_activity_count(user_id)
-        days_active = self._get_user_days_active(user_id)
+        activity_count = signals.activity_count
+        days_active = signals.days_active
         
         if activity_count < 3:
             milestones.append({
@@ -838,17 +802,10 @@ class TieredFeatureUnlockManager:
     def _update_performance_metrics(self, user_id: int, feature_name: str):
         """Update performance metrics after feature unlock"""
         try:
-            # Update usage frequency
-            usage_freq = self._get_usage_frequency(user_id)
-            self.performance_metrics['usage_frequency'][user_id] = usage_freq
-            
-            # Update engagement level
-            engagement = self._get_engagement_level(user_id)
-            self.performance_metrics['engagement_level'][user_id] = engagement
-            
-            # Update performance score
-            perf_score = self._get_performance_score(user_id)
-            self.performance_metrics['performance_scores'][user_id] = perf_score
+            signals = get_engagement_signals(user_id)
+            self.performance_metrics['usage_frequency'][user_id] = signals.usage_frequency
+            self.performance_metrics['engagement_level'][user_id] = signals.engagement_level
+            self.performance_metrics['performance_scores'][user_id] = signals.performance_score
             
         except Exception as e:
             logger.error(f"Error updating performance metrics: {str(e)}")
@@ -873,13 +830,19 @@ def get_tiered_feature_progress(user_id: int) -> Dict[str, Any]:
     return tiered_feature_manager.get_tiered_feature_progress(user_id)
 
 
+def get_tier_report(user_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+    """Tiers and unlockable features for many users (default: all) for admin reports"""
+    return tiered_feature_manager.get_tier_report(user_ids)
+
+
 def get_available_tiered_features(user_id: int) -> List[Dict[str, Any]]:
     """Get list of available tiered features for a user"""
     try:
         available_features = []
+        evaluations = tiered_feature_manager.evaluate_all_features(user_id)
         
         for feature_name, feature_def in tiered_feature_manager.feature_definitions.items():
-            can_unlock, analysis = check_tiered_feature_unlock(user_id, feature_name)
+            can_unlock, analysis = evaluations[feature_name]
             
             feature_info = {
                 'name': feature_name,
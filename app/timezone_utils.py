@@ -66,18 +66,10 @@ def get_user_timezone(user_id):
         return _timezone_cache[cache_key]
     
     try:
-        from db_utils import execute_query
-        
-        result = execute_query("""
-            SELECT timezone 
-            FROM user_settings 
-            WHERE id = %s
-        """, (user_id,), fetch=True)
-        
-        if result and len(result) > 0:
-            tz_string = result[0].get('timezone', 'US/Pacific')
-        else:
-            tz_string = 'US/Pacific'
+        from user_profile_cache import get_user_profile
+
+        profile = get_user_profile(user_id)
+        tz_string = (profile or {}).get('timezone') or 'US/Pacific'
         
         # Validate and convert to pytz timezone
         try:
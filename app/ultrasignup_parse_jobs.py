@@ -0,0 +1,445 @@
+# ultrasignup_parse_jobs.py
+
+"""
+Background parsing of UltraSignup screenshots, deduplicated by content hash.
+
+POST /api/coach/race-history/screenshot used to run the vision call inside the
+request, and every upload of the same screenshot paid for a full parse.
+
+- submit() hashes the upload. A result for the same bytes within RESULT_TTL_SECONDS
+  is returned at once; an identical upload that is still being parsed joins that
+  job; anything else becomes a new job on a pool of PARSE_WORKERS threads. The pool
+  bounds how many uploads are decoded and encoded at once, and prepare_image()
+  bounds each one.
+- Each job records progress events (queued, preparing, parsing, validating, then
+  done or failed). get_job() serves polling; stream_events() yields them as
+  Server-Sent Events for GET /api/coach/race-history/screenshot/<job_id>/events.
+- Only successful parses are cached. Results are copied in and out, so callers may
+  edit the races they get back.
+
+Cloud Run spreads requests over several instances with no affinity, so jobs are also
+written to screenshot_parse_jobs (JOBS_DDL): every stage updates the row, and the
+row keeps the result. An instance that did not accept the upload answers polls and
+streams from the row (StoredParseJob), serves a result parsed elsewhere as cached,
+and joins a parse still running elsewhere. A row that stops moving for
+STALE_JOB_SECONDS belongs to an instance that went away, and reads as failed. If the
+row cannot be written, the upload is parsed within the request instead.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Union
+
+import db_utils
+
+logger = logging.getLogger(__name__)
+
+PARSE_WORKERS = int(os.environ.get('SCREENSHOT_PARSE_WORKERS', '4'))
+RESULT_TTL_SECONDS = 24 * 3600  # Extracted races are validated against today's date
+RESULT_CACHE_ENTRIES = 256
+JOB_TTL_SECONDS = 900
+STALE_JOB_SECONDS = 300  # Each stage takes at most the vision call's 30s timeout
+POLL_SECONDS = 1.0
+HEARTBEAT_SECONDS = 15
+INTERRUPTED_ERROR = 'Screenshot parsing was interrupted. Please upload the screenshot again.'
+
+QUEUED = 'queued'
+DONE = 'done'
+FAILED = 'failed'
+TERMINAL = (DONE, FAILED)
+
+# Progress shown to the client when each stage starts
+STAGE_PROGRESS = {QUEUED: 5, 'preparing': 15, 'parsing': 35, 'validating': 90, DONE: 100, FAILED: 100}
+
+JOBS_DDL = """
+    CREATE TABLE IF NOT EXISTS screenshot_parse_jobs (
+        job_id VARCHAR(32) PRIMARY KEY,
+        content_hash VARCHAR(64) NOT NULL,
+        user_ids INTEGER[] NOT NULL,
+        filename TEXT,
+        status VARCHAR(16) NOT NULL,
+        events JSONB NOT NULL DEFAULT '[]'::jsonb,
+        result JSONB,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+    CREATE INDEX IF NOT EXISTS idx_screenshot_parse_jobs_hash_updated
+        ON screenshot_parse_jobs (content_hash, updated_at DESC);
+"""
+
+_INSERT_JOB_SQL = """
+    INSERT INTO screenshot_parse_jobs (job_id, content_hash, user_ids, filename, status, events)
+    VALUES (%(job_id)s, %(content_hash)s, %(user_ids)s, %(filename)s, %(status)s, %(events)s::jsonb)
+"""
+
+_RECORD_SQL = """
+    UPDATE screenshot_parse_jobs
+    SET status = %(status)s,
+        events = events || jsonb_build_array(%(event)s::jsonb),
+        result = COALESCE(%(result)s::jsonb, result),
+        updated_at = NOW()
+    WHERE job_id = %(job_id)s
+"""
+
+_STORED_RESULT_SQL = """
+    SELECT result FROM screenshot_parse_jobs
+    WHERE content_hash = %(content_hash)s AND status = 'done'
+      AND updated_at > NOW() - make_interval(secs => %(ttl)s)
+    ORDER BY updated_at DESC
+    LIMIT 1
+"""
+
+_ADD_USER_SQL = """
+    UPDATE screenshot_parse_jobs
+    SET user_ids = array_append(user_ids, %(user_id)s)
+    WHERE job_id = %(job_id)s AND NOT %(user_id)s = ANY(user_ids)
+"""
+
+# Adds the user to the newest parse of the same bytes still moving on any instance
+_JOIN_SQL = """
+    UPDATE screenshot_parse_jobs
+    SET user_ids = CASE WHEN %(user_id)s = ANY(user_ids) THEN user_ids
+                        ELSE array_append(user_ids, %(user_id)s) END
+    WHERE job_id = (
+        SELECT job_id FROM screenshot_parse_jobs
+        WHERE content_hash = %(content_hash)s AND status NOT IN ('done', 'failed')
+          AND updated_at > NOW() - make_interval(secs => %(stale)s)
+        ORDER BY created_at DESC
+        LIMIT 1
+    )
+    RETURNING job_id
+"""
+
+_LOAD_SQL = """
+    SELECT job_id, content_hash, user_ids, filename, status, events, result,
+           updated_at < NOW() - make_interval(secs => %(stale)s) AS stale
+    FROM screenshot_parse_jobs
+    WHERE job_id = %(job_id)s
+"""
+
+_PURGE_SQL = """
+    DELETE FROM screenshot_parse_jobs
+    WHERE updated_at < NOW() - make_interval(secs => %(ttl)s)
+"""
+
+
+class ParseJob:
+    """One screenshot parse and its progress events"""
+
+    def __init__(self, user_id: int, content_hash: str, filename: str):
+        self.id = uuid.uuid4().hex
+        self.user_ids = {int(user_id)}
+        self.content_hash = content_hash
+        self.filename = filename
+        self.created_at = time.monotonic()
+        self.status = QUEUED
+        self.result: Optional[Dict] = None
+        self.events = [{'stage': QUEUED, 'progress': STAGE_PROGRESS[QUEUED]}]
+        self._condition = threading.Condition()
+
+    def record(self, stage: str, **extra) -> None:
+        event = {'stage': stage, 'progress': STAGE_PROGRESS.get(stage, 0), **extra}
+        with self._condition:
+            if stage in TERMINAL or self.status not in TERMINAL:
+                self.status = stage
+            self.events.append(event)
+            status, result = self.status, (self.result if stage in TERMINAL else None)
+            self._condition.notify_all()
+        try:
+            db_utils.execute_query(_RECORD_SQL, {
+                'job_id': self.id,
+                'status': status,
+                'event': json.dumps(event),
+                'result': json.dumps(result) if result is not None else None,
+            })
+        except Exception as e:
+            logger.warning(f"Could not store stage {stage} of screenshot parse job {self.id}: {e}")
+
+    def wait_for_event(self, seen: int, timeout: float) -> None:
+        with self._condition:
+            if len(self.events) <= seen and self.status not in TERMINAL:
+                self._condition.wait(timeout)
+
+    def snapshot(self) -> Dict:
+        with self._condition:
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'progress': self.events[-1]['progress'],
+                'result': copy.deepcopy(self.result),
+            }
+
+
+class StoredParseJob:
+    """A job accepted by another instance, read back from screenshot_parse_jobs"""
+
+    def __init__(self, row: Dict):
+        self._load(row)
+
+    def _load(self, row: Dict) -> None:
+        self.id = row['job_id']
+        self.user_ids = set(row['user_ids'])
+        self.content_hash = row['content_hash']
+        self.filename = row['filename']
+        self.status = row['status']
+        self.events = list(row['events'])
+        self.result = row['result']
+        if row['stale'] and self.status not in TERMINAL:
+            self.status = FAILED
+            self.result = {'success': False, 'error': INTERRUPTED_ERROR, 'races': []}
+            self.events.append({'stage': FAILED, 'progress': STAGE_PROGRESS[FAILED]})
+
+    def wait_for_event(self, seen: int, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while len(self.events) <= seen and self.status not in TERMINAL:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(min(POLL_SECONDS, remaining))
+            row = _load_row(self.id)
+            if row is not None:
+                self._load(row)
+
+    def snapshot(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': self.events[-1]['progress'],
+            'result': copy.deepcopy(self.result),
+        }
+
+
+_results: 'OrderedDict[str, tuple]' = OrderedDict()  # content hash -> (result, stored_at)
+_jobs: Dict[str, ParseJob] = {}
+_running: Dict[str, ParseJob] = {}  # content hash -> unfinished job
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_purged_at: Optional[float] = None
+
+
+def content_hash(file_data: bytes) -> str:
+    from ultrasignup_parser import CLAUDE_MODEL
+    digest = hashlib.sha256(file_data)
+    digest.update(CLAUDE_MODEL.encode('utf-8'))  # A model change invalidates cached parses
+    return digest.hexdigest()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix='screenshot-parse')
+        return _executor
+
+
+def _cached_result(key: str) -> Optional[Dict]:
+    with _lock:
+        entry = _results.get(key)
+        if entry is None:
+            return None
+        result, stored_at = entry
+        if time.monotonic() - stored_at >= RESULT_TTL_SECONDS:
+            del _results[key]
+            return None
+        _results.move_to_end(key)
+        return copy.deepcopy(result)
+
+
+def _store_result(key: str, result: Dict) -> None:
+    with _lock:
+        _results[key] = (copy.deepcopy(result), time.monotonic())
+        _results.move_to_end(key)
+        while len(_results) > RESULT_CACHE_ENTRIES:
+            _results.popitem(last=False)
+
+
+def _stored_result(key: str) -> Optional[Dict]:
+    """A successful parse of the same bytes stored by any instance"""
+    try:
+        rows = db_utils.execute_query(_STORED_RESULT_SQL, {'content_hash': key, 'ttl': RESULT_TTL_SECONDS},
+                                      fetch=True)
+    except Exception as e:
+        logger.warning(f"Could not read stored screenshot parses: {e}")
+        return None
+    return rows[0]['result'] if rows else None
+
+
+def _join_stored_job(key: str, user_id: int) -> Optional[str]:
+    """The id of a parse of the same bytes running on any instance, now shared with user_id"""
+    try:
+        rows = db_utils.execute_query(_JOIN_SQL, {'content_hash': key, 'user_id': int(user_id),
+                                                  'stale': STALE_JOB_SECONDS}, fetch=True)
+    except Exception as e:
+        logger.warning(f"Could not look up running screenshot parses: {e}")
+        return None
+    return rows[0]['job_id'] if rows else None
+
+
+def _add_user(job_id: str, user_id: int) -> None:
+    try:
+        db_utils.execute_query(_ADD_USER_SQL, {'job_id': job_id, 'user_id': int(user_id)})
+    except Exception as e:
+        logger.warning(f"Could not share screenshot parse job {job_id} with user {user_id}: {e}")
+
+
+def _insert_job(job: ParseJob) -> bool:
+    try:
+        db_utils.execute_query(_INSERT_JOB_SQL, {
+            'job_id': job.id,
+            'content_hash': job.content_hash,
+            'user_ids': sorted(job.user_ids),
+            'filename': job.filename,
+            'status': job.status,
+            'events': json.dumps(job.events),
+        })
+        return True
+    except Exception as e:
+        logger.warning(f"Could not store screenshot parse job {job.id}: {e}")
+        return False
+
+
+def _load_row(job_id: str) -> Optional[Dict]:
+    try:
+        rows = db_utils.execute_query(_LOAD_SQL, {'job_id': job_id, 'stale': STALE_JOB_SECONDS}, fetch=True)
+    except Exception as e:
+        logger.warning(f"Could not load screenshot parse job {job_id}: {e}")
+        return None
+    return rows[0] if rows else None
+
+
+def _expire_jobs() -> None:
+    global _purged_at
+    now = time.monotonic()
+    with _lock:
+        for job_id in [job_id for job_id, job in _jobs.items()
+                       if job.status in TERMINAL and now - job.created_at > JOB_TTL_SECONDS]:
+            del _jobs[job_id]
+        if _purged_at is not None and now - _purged_at < JOB_TTL_SECONDS:
+            return
+        _purged_at = now
+    try:
+        db_utils.execute_query(_PURGE_SQL, {'ttl': RESULT_TTL_SECONDS})
+    except Exception as e:
+        logger.warning(f"Could not purge old screenshot parse jobs: {e}")
+
+
+def _parse(file_data: bytes, filename: str, progress=None) -> Dict:
+    from ultrasignup_parser import parse_ultrasignup_screenshot
+
+    try:
+        return parse_ultrasignup_screenshot(file_data, filename, progress=progress)
+    except Exception as e:
+        logger.error(f"Parse of screenshot {filename} crashed: {e}", exc_info=True)
+        return {'success': False, 'error': f'Unexpected error during parsing: {str(e)}', 'races': []}
+
+
+def _run(job: ParseJob, file_data: bytes) -> None:
+    started = time.monotonic()
+    result = _parse(file_data, job.filename, progress=job.record)
+    del file_data
+
+    if result.get('success'):
+        _store_result(job.content_hash, result)
+    with _lock:
+        job.result = copy.deepcopy(result)
+        if _running.get(job.content_hash) is job:
+            del _running[job.content_hash]
+    job.record(DONE if result.get('success') else FAILED)
+    logger.info(f"Screenshot parse job {job.id} ({job.filename}) finished in "
+                f"{time.monotonic() - started:.1f}s: {'ok' if result.get('success') else result.get('error')}")
+
+
+def submit(user_id: int, file_data: bytes, filename: str) -> Dict:
+    """
+    Start (or reuse) the parse of an already validated upload.
+
+    Returns {'cached': True, 'result': ...} for a cached result, otherwise
+    {'cached': False, 'job_id': ...} for a new job or an identical one in flight, or
+    {'cached': False, 'result': ...} when the job could not be stored and the upload
+    was parsed within the request.
+    """
+    _expire_jobs()
+    key = content_hash(file_data)
+    cached = _cached_result(key)
+    if cached is None:
+        cached = _stored_result(key)
+        if cached is not None:
+            _store_result(key, cached)
+    if cached is not None:
+        logger.info(f"Screenshot {filename} for user {user_id} served from the parse cache")
+        return {'cached': True, 'result': cached}
+
+    with _lock:
+        job = _running.get(key)
+        if job is not None:
+            job.user_ids.add(int(user_id))
+    if job is not None:
+        _add_user(job.id, user_id)
+        logger.info(f"Screenshot {filename} for user {user_id} joined parse job {job.id}")
+        return {'cached': False, 'job_id': job.id}
+
+    job_id = _join_stored_job(key, user_id)
+    if job_id is not None:
+        logger.info(f"Screenshot {filename} for user {user_id} joined parse job {job_id} on another instance")
+        return {'cached': False, 'job_id': job_id}
+
+    job = ParseJob(user_id, key, filename)
+    if not _insert_job(job):
+        logger.warning(f"Parsing screenshot {filename} for user {user_id} within the request")
+        result = _parse(file_data, filename)
+        if result.get('success'):
+            _store_result(key, result)
+        return {'cached': False, 'result': result}
+
+    with _lock:
+        _jobs[job.id] = job
+        _running[key] = job
+    _get_executor().submit(_run, job, file_data)
+    return {'cached': False, 'job_id': job.id}
+
+
+def get_job(job_id: str, user_id: int) -> Optional[Union[ParseJob, StoredParseJob]]:
+    """
+    The job if it exists and belongs to user_id: this instance's own job, or the
+    stored row of one accepted elsewhere
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+    if job is not None and int(user_id) in job.user_ids:
+        return job
+
+    row = _load_row(job_id)
+    if row is None or int(user_id) not in row['user_ids']:
+        return None
+    if job is not None:  # Joined through another instance
+        with _lock:
+            job.user_ids.add(int(user_id))
+        return job
+    return StoredParseJob(row)
+
+
+def stream_events(job: Union[ParseJob, StoredParseJob], heartbeat: float = HEARTBEAT_SECONDS) -> Iterator[str]:
+    """Server-Sent Events for a job's progress, ending with its done/failed event"""
+    seen = 0
+    deadline = time.monotonic() + JOB_TTL_SECONDS
+    while time.monotonic() < deadline:
+        job.wait_for_event(seen, heartbeat)
+        events = job.events[seen:]
+        if not events:
+            yield ": keep-alive\n\n"
+            continue
+        for event in events:
+            seen += 1
+            if event['stage'] in TERMINAL:
+                event = {**event, 'result': job.snapshot()['result']}
+            yield f"data: {json.dumps(event)}\n\n"
+            if event['stage'] in TERMINAL:
+                return
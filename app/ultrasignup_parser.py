@@ -3,15 +3,28 @@ Ultrasignup Screenshot Parser Module
 Uses Claude Vision API to extract race history from ultrasignup.com screenshots
 
 Cost Estimate: ~$0.01-0.02 per screenshot
+
+Uploads are downscaled to MAX_IMAGE_EDGE_PX on the long edge and recompressed
+before they are base64-encoded (prepare_image), so a full-resolution phone
+screenshot neither sits in memory several times over nor goes to the API at
+full size. Background jobs and the result cache live in ultrasignup_parse_jobs.py.
 """
 
+import io
 import os
 import base64
 import logging
 import json
 import requests
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
+
+from http_clients import get_session
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow missing: images are sent as uploaded
+    Image = None
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +33,17 @@ MAX_FILE_SIZE_MB = 5
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
 ALLOWED_IMAGE_FORMATS = ['image/png', 'image/jpeg', 'image/jpg', 'image/webp']
 ALLOWED_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.webp']
+MEDIA_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp'
+}
+
+# Image preparation
+MAX_IMAGE_EDGE_PX = 1568  # Larger images are downscaled by the vision API anyway
+MAX_DECODE_PIXELS = 16_000_000  # Refuse to decode anything bigger (about 64 MB as RGBA)
+JPEG_QUALITY = 85
 
 # Claude API configuration
 ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY', '').strip()  # Strip whitespace/newlines
@@ -67,13 +91,70 @@ def encode_image_base64(file_data: bytes) -> str:
     return base64.standard_b64encode(file_data).decode('utf-8')
 
 
-def parse_ultrasignup_screenshot(file_data: bytes, filename: str) -> Dict:
+def prepare_image(file_data: bytes, filename: str) -> Tuple[bytes, str]:
+    """
+    Downscale and recompress an uploaded screenshot for the vision API
+
+    JPEGs are decoded at a reduced scale (draft mode) where possible, so the decoded
+    image stays close to the target size. Other formats are also tried as PNG and the
+    smaller encoding is sent. The original bytes are kept when they are already small
+    enough and recompressing would not shrink them.
+
+    Args:
+        file_data: Binary image data (already validated)
+        filename: Original filename
+
+    Returns:
+        (image_bytes, media_type)
+
+    Raises:
+        ValueError: if the image cannot be decoded or is too large to decode
+    """
+    media_type = MEDIA_TYPES.get(os.path.splitext(filename.lower())[1], 'image/jpeg')
+    if Image is None:
+        return file_data, media_type
+
+    try:
+        with Image.open(io.BytesIO(file_data)) as image:
+            width, height = image.size
+            if width * height > MAX_DECODE_PIXELS:
+                raise ValueError(f'Image is too large ({width}x{height} pixels)')
+            if max(width, height) <= MAX_IMAGE_EDGE_PX and len(file_data) <= 512 * 1024:
+                return file_data, media_type
+
+            image.draft('RGB', (MAX_IMAGE_EDGE_PX, MAX_IMAGE_EDGE_PX))
+            image.thumbnail((MAX_IMAGE_EDGE_PX, MAX_IMAGE_EDGE_PX))
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            candidates = [(_encode(image, 'JPEG', quality=JPEG_QUALITY, optimize=True), 'image/jpeg')]
+            if media_type != 'image/jpeg':
+                # Flat UI screenshots are often smaller as PNG than as JPEG
+                candidates.append((_encode(image, 'PNG', optimize=True), 'image/png'))
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f'Could not read image: {e}')
+
+    prepared, prepared_type = min(candidates, key=lambda candidate: len(candidate[0]))
+    if len(prepared) >= len(file_data) and max(width, height) <= MAX_IMAGE_EDGE_PX:
+        return file_data, media_type
+    logger.info(f"Prepared {filename}: {width}x{height}, {len(file_data)} -> {len(prepared)} bytes")
+    return prepared, prepared_type
+
+
+def _encode(image, image_format: str, **options) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format=image_format, **options)
+    return output.getvalue()
+
+
+def parse_ultrasignup_screenshot(file_data: bytes, filename: str,
+                                 progress: Optional[Callable[[str], None]] = None) -> Dict:
     """
     Parse ultrasignup.com screenshot using Claude Vision API
     
     Args:
         file_data: Binary image data
         filename: Original filename
+        progress: Called with 'preparing', 'parsing' and 'validating' as each stage starts
         
     Returns:
         Dictionary with:
@@ -101,20 +182,23 @@ def parse_ultrasignup_screenshot(file_data: bytes, filename: str) -> Dict:
             'races': []
         }
     
+    progress = progress or (lambda stage: None)
     try:
-        # Encode image
+        # Downscale, then encode only the prepared image
+        progress('preparing')
+        try:
+            image_data, media_type = prepare_image(file_data, filename)
+        except ValueError as e:
+            logger.warning(f"Image preparation failed for {filename}: {e}")
+            return {
+                'success': False,
+                'error': 'Could not read the image. Please upload a PNG, JPEG or WebP screenshot.',
+                'races': []
+            }
         logger.info(f"Encoding image for Claude Vision API: {filename}")
-        image_base64 = encode_image_base64(file_data)
-        
-        # Determine media type from filename
-        extension = os.path.splitext(filename.lower())[1]
-        media_type_map = {
-            '.png': 'image/png',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.webp': 'image/webp'
-        }
-        media_type = media_type_map.get(extension, 'image/jpeg')
+        image_base64 = encode_image_base64(image_data)
+        image_size_kb = len(image_data) / 1024
+        del image_data
         
         # Build Claude Vision API request
         prompt = """Extract race history data from this ultrasignup.com screenshot.
@@ -145,6 +229,7 @@ Return the data as a JSON array with this exact structure:
 If no valid races are found, return an empty array: []"""
 
         # Make API request
+        progress('parsing')
         logger.info("Calling Claude Vision API to parse screenshot")
         
         headers = {
@@ -177,12 +262,13 @@ If no valid races are found, return an empty array: []"""
             ]
         }
         
-        response = requests.post(
+        response = get_session('anthropic').post(
             ANTHROPIC_API_URL,
             headers=headers,
             json=payload,
             timeout=30
         )
+        del payload, image_base64
         
         if response.status_code != 200:
             logger.error(f"Claude API error: {response.status_code} - {response.text}")
@@ -250,6 +336,7 @@ If no valid races are found, return an empty array: []"""
             }
         
         # Validate and clean each race
+        progress('validating')
         validated_races = []
         errors = []
         
@@ -263,7 +350,6 @@ If no valid races are found, return an empty array: []"""
         
         # Calculate estimated cost
         # Rough estimate: ~$0.01-0.02 per image depending on size
-        image_size_kb = len(file_data) / 1024
         estimated_cost = 0.01 if image_size_kb < 500 else 0.02
         
         logger.info(f"Successfully parsed {len(validated_races)} races from screenshot (cost: ${estimated_cost:.2f})")
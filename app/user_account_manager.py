@@ -21,6 +21,7 @@ from registration_validation import registration_validator
 from legal_compliance import get_legal_compliance_tracker
 from legal_document_versioning import get_current_legal_versions
 from db_utils import execute_query, get_db_connection
+from user_profile_cache import invalidate_user_profile
 
 logger = logging.getLogger(__name__)
 
@@ -175,6 +176,7 @@ class UserAccountManager:
             
             current_time = datetime.now()
             execute_query(query, ('registration_complete', current_time, user_id))
+            invalidate_user_profile(user_id)
             
             logger.info(f"Initialized onboarding progress for user {user_id}")
             
@@ -200,6 +202,7 @@ class UserAccountManager:
             
             current_time = datetime.now()
             execute_query(query, ('active', current_time, user_id))
+            invalidate_user_profile(user_id)
             
             logger.info(f"Activated user account: {user_id}")
             return True
@@ -228,6 +231,7 @@ class UserAccountManager:
             
             current_time = datetime.now()
             execute_query(query, ('inactive', reason, current_time, user_id))
+            invalidate_user_profile(user_id)
             
             logger.info(f"Deactivated user account: {user_id} (reason: {reason})")
             return True
@@ -311,6 +315,7 @@ class UserAccountManager:
             
             current_time = datetime.now()
             execute_query(query, (valid_step.value, current_time, user_id))
+            invalidate_user_profile(user_id)
             
             logger.info(f"Updated onboarding progress for user {user_id}: {valid_step.value}")
             return True
@@ -342,6 +347,7 @@ class UserAccountManager:
             
             current_time = datetime.now()
             execute_query(query, ('completed', 'active', current_time, user_id))
+            invalidate_user_profile(user_id)
             
             logger.info(f"Completed onboarding for user {user_id}")
             return True
@@ -0,0 +1,121 @@
+# user_profile_cache.py
+
+"""
+User profile cache: the user_settings row, loaded once and shared.
+
+Every authenticated request loads the user (Flask-Login), then handlers look up
+timezone, HR settings, recommendation style, coaching spectrum and last_sync_date
+from the same row - often 4-6 queries per request. get_user_profile() reads the
+whole row once and serves it from two layers:
+
+- request scope (flask.g): every lookup in the same request/app context shares one row
+- process scope: a short TTL cache shared across requests on this instance
+
+Every code path that UPDATEs user_settings calls invalidate_user_profile() right
+after its write commits - the settings, coach and onboarding routes, the Strava
+sync when it moves last_sync_date, and the onboarding, account, legal and email
+verification modules. PROFILE_TTL_SECONDS only bounds a writer that misses it.
+
+Strava OAuth tokens are deliberately not cached: they are refreshed outside the
+settings routes and must always be read fresh.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from flask import g, has_app_context
+
+from db_utils import execute_query
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TTL_SECONDS = 30
+
+# Columns that change outside the settings routes and must never be served stale
+UNCACHED_COLUMNS = ('strava_access_token', 'strava_refresh_token', 'strava_token_expires_at')
+
+_profiles: Dict[int, tuple] = {}  # user_id -> (profile, loaded_at)
+_generations: Dict[int, int] = {}  # user_id -> bumped on every invalidation
+_lock = threading.Lock()
+
+
+def _request_cache() -> Optional[dict]:
+    if not has_app_context():
+        return None
+    if not hasattr(g, '_user_profiles'):
+        g._user_profiles = {}
+    return g._user_profiles
+
+
+def _load_profile(user_id: int) -> Optional[dict]:
+    rows = execute_query("SELECT * FROM user_settings WHERE id = %s", (user_id,), fetch=True)
+    if not rows:
+        return None
+    row = rows[0]
+    profile = dict(row) if hasattr(row, 'keys') else row
+    for column in UNCACHED_COLUMNS:
+        profile.pop(column, None)
+    return profile
+
+
+def get_user_profile(user_id, fresh: bool = False) -> Optional[dict]:
+    """
+    Get the user_settings row for a user, or None if the user does not exist.
+
+    The returned dict is a copy and may be modified by the caller. Strava token
+    columns are not included. fresh=True reads the row from the database even
+    when a cached copy exists (e.g. for a weekly program build, which must see a
+    schedule saved moments ago on any instance) and refreshes both cache layers.
+    """
+    if user_id is None:
+        return None
+    user_id = int(user_id)
+
+    request_cache = _request_cache()
+    if not fresh and request_cache is not None and user_id in request_cache:
+        profile = request_cache[user_id]
+        return dict(profile) if profile is not None else None
+
+    with _lock:
+        cached = _profiles.get(user_id)
+        generation = _generations.get(user_id, 0)
+
+    if not fresh and cached and time.monotonic() - cached[1] < PROFILE_TTL_SECONDS:
+        profile = cached[0]
+    else:
+        profile = _load_profile(user_id)
+        if profile is not None:
+            with _lock:
+                # An invalidation during the query means this row may already be stale
+                if _generations.get(user_id, 0) == generation:
+                    _profiles[user_id] = (profile, time.monotonic())
+
+    if request_cache is not None:
+        request_cache[user_id] = profile
+    return dict(profile) if profile is not None else None
+
+
+def invalidate_user_profile(user_id=None) -> None:
+    """Drop the cached profile for a user (or all users) after user_settings changes"""
+    with _lock:
+        if user_id is None:
+            for uid in list(_profiles) + list(_generations):
+                _generations[uid] = _generations.get(uid, 0) + 1
+            _profiles.clear()
+        else:
+            user_id = int(user_id)
+            _profiles.pop(user_id, None)
+            _generations[user_id] = _generations.get(user_id, 0) + 1
+
+    request_cache = _request_cache()
+    if request_cache is not None:
+        if user_id is None:
+            request_cache.clear()
+        else:
+            request_cache.pop(user_id, None)
+
+    from timezone_utils import clear_timezone_cache
+    clear_timezone_cache(user_id)
+    logger.debug(f"Invalidated user profile cache for user {user_id if user_id is not None else 'all'}")
@@ -2,9 +2,32 @@
 """
 Feature flags utility for Training Monkey™
 Handles gradual feature rollout and beta user access
+
+Flag definitions and per-user overrides live in the feature_flags and
+feature_flag_overrides tables (scripts/migrations/add_feature_flags_tables_2026-10-18.py).
+Each process compiles them into an immutable FlagSnapshot, so is_feature_enabled()
+is a couple of dict lookups with no logging and no database access. The store
+polls feature_flag_version every FLAG_POLL_SECONDS and reloads only when an admin
+toggle has bumped it.
+
+BUILTIN_FLAGS / BUILTIN_OVERRIDES are the seed data and the fallback when the
+tables are missing or the database is unreachable; a flag that is defined here
+but not yet in the table also comes from here. BUILTIN_OVERRIDES always apply,
+under the table's overrides: a table row for the same flag and user wins.
+
+PHASE 1 ROLLOUT PLAN:
+- Rob (user_id=1): Admin access (gets early access to every flag unless the flag opts out)
+- tballaine (user_id=2): Beta user #1
+- iz.houghton (user_id=3): Beta user #2
 """
 
 import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -18,115 +41,245 @@ except ImportError:
     def log_acwr_feature_error(feature_name, user_id, error_message, details=None):
         pass
 
+ADMIN_USER_ID = 1  # Rob's admin account gets early access to new features
+BETA_USER_IDS = (2, 3)  # tballaine, iz.houghton
+FLAG_POLL_SECONDS = int(os.environ.get('FEATURE_FLAG_POLL_SECONDS', '30'))
 
-def is_feature_enabled(feature_name, user_id=None):
-    """
-    Check if feature is enabled - allows gradual rollout to beta users
-
-    PHASE 1 ROLLOUT PLAN:
-    - Rob (user_id=1): Admin access (already enabled)
-    - tballaine (user_id=2): Beta user #1
-    - iz.houghton (user_id=3): Beta user #2
+# Access to these flags is reported to acwr_feature_flag_monitor (sampled there)
+MONITORED_FLAGS = frozenset({'enhanced_acwr_calculation'})
 
-    Args:
-        feature_name (str): Name of the feature to check
-        user_id (int): User ID to check feature access for
 
-    Returns:
-        bool: True if feature is enabled for the user, False otherwise
-    """
+@dataclass(frozen=True)
+class FlagDefinition:
+    """One flag: its default for everyone, and whether the admin gets it early"""
+    name: str
+    enabled: bool = False
+    admin_early_access: bool = True
+    description: str = ''
 
-    # Feature flag configuration
-    feature_flags = {
-        'settings_page_enabled': False,  # Default OFF for general users
-        'hr_zone_recalculation': False,  # Default OFF
-        'enhanced_ai_context': False,  # Default OFF
-        'settings_validation_strict': True,  # Default ON for safety
-        'enhanced_trimp_calculation': False,  # Default OFF - uses heart rate stream data
-        'enhanced_acwr_calculation': False,  # Default OFF - uses exponential decay weighting
-        'agentic_context': False,  # Phase 4: Agentic Context Assembly — OFF by default
-        'dynamic_aet_divergence_cutover': False,  # Effect B cutover — see special-case below
-    }
 
+BUILTIN_FLAGS = (
+    FlagDefinition('settings_page_enabled', description='Access to user settings and configuration'),
+    FlagDefinition('hr_zone_recalculation', description='Recalculate HR zones when settings change'),
+    FlagDefinition('enhanced_ai_context', description='Extended context for AI recommendations'),
+    FlagDefinition('settings_validation_strict', enabled=True,  # Default ON for safety
+                   description='Strict validation of user settings'),
+    FlagDefinition('enhanced_trimp_calculation',
+                   description='Uses heart rate stream data for improved TRIMP accuracy'),
+    FlagDefinition('enhanced_acwr_calculation',
+                   description='Uses exponential decay weighting for chronic load calculation'),
+    FlagDefinition('agentic_context', description='Phase 4: Agentic Context Assembly'),
+    FlagDefinition('agentic_tool_prefetch',
+                   description='Prefetch likely tool calls during agentic turn 1'),
     # Dynamic AeT divergence cutover: switches the internal-load track feeding divergence
     # from Banister to the AeT-anchored Edwards dynamic load. This is a DELIBERATE,
-    # post-recalibration flip — it must NOT be auto-enabled by admin status (the catch-all
-    # below would otherwise turn it on for Rob the moment it deploys). It also only takes
-    # effect when dynamic_acwr_cutover_ready() confirms 28d of consistent coverage.
+    # post-recalibration flip — it must NOT be auto-enabled by admin status. It also only
+    # takes effect when dynamic_acwr_cutover_ready() confirms 28d of consistent coverage.
     # To cut over: (1) recalibrate divergence thresholds for the dynamic distribution,
-    # then (2) add the user id to cutover_user_ids.
-    if feature_name == 'dynamic_aet_divergence_cutover':
-        cutover_user_ids = []  # e.g. [1] once thresholds are recalibrated
-        return user_id in cutover_user_ids
-
-    # Phase 4: Agentic context — enabled for user_id=1 (Rob) only
-    if feature_name == 'agentic_context':
-        agentic_beta_ids = [1]  # Rob only; expand to [1, 2, 3] once stable
-        if user_id in agentic_beta_ids:
-            logger.info(f"Agentic context access granted to user {user_id} (Phase 4 beta)")
-            return True
-        logger.info(f"Agentic context access denied to user {user_id} (not in Phase 4 beta)")
-        return False
+    # then (2) add a per-user override.
+    FlagDefinition('dynamic_aet_divergence_cutover', admin_early_access=False,
+                   description='Effect B cutover to the AeT-anchored dynamic load'),
+)
 
-    # Get base enabled state
-    base_enabled = feature_flags.get(feature_name, False)
+# (feature_name, user_id) -> enabled: beta rollouts
+BUILTIN_OVERRIDES = {
+    **{(name, user_id): True
+       for name in ('settings_page_enabled', 'enhanced_trimp_calculation', 'enhanced_acwr_calculation')
+       for user_id in (ADMIN_USER_ID,) + BETA_USER_IDS},
+    ('agentic_context', ADMIN_USER_ID): True,  # Rob only; expand to beta users once stable
+}
 
-    # Special handling for Settings page rollout
-    if feature_name == 'settings_page_enabled':
 
-        # PHASE 1: Admin + Beta Users (Rob, tballaine, iz.houghton)
-        beta_user_ids = [1, 2, 3]  # Rob (admin), tballaine, iz.houghton
+class FlagSnapshot:
+    """
+    Immutable, compiled view of every flag and override at one version.
+
+    Usage:
+        snapshot.evaluate('enhanced_acwr_calculation', user_id)
+    """
+
+    __slots__ = ('version', 'definitions', '_overrides', '_defaults', '_no_early_access')
 
-        if user_id in beta_user_ids:
-            logger.info(f"🎉 Settings page access granted to user {user_id} (beta rollout)")
+    def __init__(self, version: int, definitions: Iterable[FlagDefinition],
+                 overrides: Mapping[Tuple[str, int], bool]):
+        definitions = {flag.name: flag for flag in definitions}
+        self.version = version
+        self.definitions = MappingProxyType(definitions)
+        self._overrides = MappingProxyType(dict(overrides))
+        self._defaults = MappingProxyType({name: flag.enabled for name, flag in definitions.items()})
+        self._no_early_access = frozenset(name for name, flag in definitions.items()
+                                          if not flag.admin_early_access)
+
+    def evaluate(self, feature_name: str, user_id: Optional[int] = None) -> bool:
+        enabled = self._overrides.get((feature_name, user_id))
+        if enabled is not None:
+            return enabled
+        if user_id == ADMIN_USER_ID and feature_name not in self._no_early_access:
             return True
+        return self._defaults.get(feature_name, False)
 
-        # All other users: Settings page disabled
-        logger.info(f"⏳ Settings page access denied to user {user_id} (not in beta rollout)")
-        return False
+    def overrides_for(self, feature_name: str) -> Dict[int, bool]:
+        return {user_id: enabled for (name, user_id), enabled in self._overrides.items()
+                if name == feature_name}
 
-    # Special handling for Enhanced TRIMP Calculation rollout
-    if feature_name == 'enhanced_trimp_calculation':
 
-        # PHASE 1: Admin + Beta Users (Rob, tballaine, iz.houghton)
-        beta_user_ids = [1, 2, 3]  # Rob (admin), tballaine, iz.houghton
+def builtin_snapshot(version: int = 0) -> FlagSnapshot:
+    return FlagSnapshot(version, BUILTIN_FLAGS, BUILTIN_OVERRIDES)
 
-        if user_id in beta_user_ids:
-            logger.info(f"🎉 Enhanced TRIMP calculation access granted to user {user_id} (beta rollout)")
-            return True
 
-        # All other users: Enhanced TRIMP calculation disabled (uses average HR method)
-        logger.info(f"⏳ Enhanced TRIMP calculation access denied to user {user_id} (not in beta rollout)")
-        return False
+def _compile(version: int, flag_rows, override_rows) -> FlagSnapshot:
+    """Merge table rows over the built-ins, per flag and per (flag, user) override"""
+    stored = {row['name']: FlagDefinition(row['name'], bool(row['enabled']), bool(row['admin_early_access']),
+                                          row.get('description') or '')
+              for row in flag_rows}
+    definitions = {flag.name: flag for flag in BUILTIN_FLAGS}
+    definitions.update(stored)
+    overrides = dict(BUILTIN_OVERRIDES)
+    for row in override_rows:
+        overrides[(row['feature_name'], row['user_id'])] = bool(row['enabled'])
+    return FlagSnapshot(version, definitions.values(), overrides)
 
-    # Special handling for Enhanced ACWR Calculation rollout
-    if feature_name == 'enhanced_acwr_calculation':
 
-        # PHASE 1: Admin + Beta Users (Rob, tballaine, iz.houghton)
-        beta_user_ids = [1, 2, 3]  # Rob (admin), tballaine, iz.houghton
+class FeatureFlagStore:
+    """
+    Holds the current FlagSnapshot and refreshes it by version polling.
 
-        if user_id in beta_user_ids:
-            logger.info(f"🎉 Enhanced ACWR calculation access granted to user {user_id} (beta rollout)")
-            # Log access for monitoring
-            log_acwr_feature_access('enhanced_acwr_calculation', user_id, True, {
-                'rollout_phase': 'beta',
-                'user_type': 'beta_user' if user_id != 1 else 'admin'
-            })
-            return True
+    One thread polls at a time; everyone else keeps evaluating against the
+    snapshot they already have.
+    """
+
+    def __init__(self, poll_seconds: int = FLAG_POLL_SECONDS, clock=time.monotonic):
+        self.poll_seconds = poll_seconds
+        self.clock = clock
+        self._snapshot: Optional[FlagSnapshot] = None
+        self._next_poll = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> FlagSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and self.clock() < self._next_poll:
+            return snapshot
+        return self._poll(snapshot)
+
+    def refresh(self) -> FlagSnapshot:
+        """Poll now (e.g. right after this process wrote a toggle)"""
+        with self._lock:
+            self._next_poll = 0.0
+        return self._poll(self._snapshot, blocking=True)
+
+    def _poll(self, current: Optional[FlagSnapshot], blocking: bool = False) -> FlagSnapshot:
+        if not self._lock.acquire(blocking=blocking or current is None):
+            return current
+        try:
+            if self._snapshot is not None and self.clock() < self._next_poll:
+                return self._snapshot
+            current = self._snapshot
+            try:
+                version = self._read_version()
+                if current is None or version != current.version:
+                    current = self._load(version)
+            except Exception as e:
+                logger.warning(f"Feature flags unavailable from database, using {'previous' if current else 'built-in'} flags: {str(e)}")
+                if current is None:
+                    current = builtin_snapshot()
+            self._snapshot = current
+            self._next_poll = self.clock() + self.poll_seconds
+            return current
+        finally:
+            self._lock.release()
 
-        # All other users: Enhanced ACWR calculation disabled (uses standard 28-day calculation)
-        logger.info(f"⏳ Enhanced ACWR calculation access denied to user {user_id} (not in beta rollout)")
-        # Log access denial for monitoring
-        log_acwr_feature_access('enhanced_acwr_calculation', user_id, False, {
-            'rollout_phase': 'beta',
-            'user_type': 'regular_user'
-        })
-        return False
-
-    # For other features, check admin access first
-    if user_id == 1:  # Rob's admin account gets early access to all new features
-        logger.info(f"🔧 Admin early access granted for {feature_name} to user {user_id}")
-        return True
-
-    # Return base flag state for non-admin users
-    return base_enabled
+    def _read_version(self) -> int:
+        import db_utils
+        rows = db_utils.execute_query("SELECT version FROM feature_flag_version WHERE id = 1",
+                                      fetch=True, use_pool=True)
+        return int(rows[0]['version']) if rows else 0
+
+    def _load(self, version: int) -> FlagSnapshot:
+        import db_utils
+        flag_rows = db_utils.execute_query(
+            "SELECT name, enabled, admin_early_access, description FROM feature_flags",
+            fetch=True, use_pool=True)
+        override_rows = db_utils.execute_query(
+            "SELECT feature_name, user_id, enabled FROM feature_flag_overrides",
+            fetch=True, use_pool=True)
+        snapshot = _compile(version, flag_rows or [], override_rows or [])
+        logger.info(f"Loaded feature flags version {version}: {len(snapshot.definitions)} flags")
+        return snapshot
+
+
+flag_store = FeatureFlagStore()
+
+
+def is_feature_enabled(feature_name, user_id=None):
+    """
+    Check if feature is enabled - allows gradual rollout to beta users
+
+    Args:
+        feature_name (str): Name of the feature to check
+        user_id (int): User ID to check feature access for
+
+    Returns:
+        bool: True if feature is enabled for the user, False otherwise
+    """
+    enabled = flag_store.snapshot().evaluate(feature_name, user_id)
+    if feature_name in MONITORED_FLAGS:
+        log_acwr_feature_access(feature_name, user_id, enabled)
+    return enabled
+
+
+def set_feature_flag(feature_name, enabled, user_ids=None, admin_user_id=None):
+    """
+    Durably toggle a flag: its default (user_ids=None) or per-user overrides.
+
+    Writes the change and bumps feature_flag_version in one transaction, then
+    refreshes this process's snapshot; other instances pick it up on their
+    next poll.
+
+    Returns:
+        FlagSnapshot: the refreshed snapshot
+    """
+    from db_utils import get_db_connection
+
+    builtin = next((flag for flag in BUILTIN_FLAGS if flag.name == feature_name), None)
+    seed = builtin or FlagDefinition(feature_name)
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO feature_flags (name, enabled, admin_early_access, description, updated_by)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (name) DO NOTHING
+                """,
+                (feature_name, seed.enabled, seed.admin_early_access, seed.description, admin_user_id)
+            )
+            if user_ids is None:
+                cursor.execute(
+                    "UPDATE feature_flags SET enabled = %s, updated_at = NOW(), updated_by = %s WHERE name = %s",
+                    (bool(enabled), admin_user_id, feature_name)
+                )
+            else:
+                for user_id in user_ids:
+                    cursor.execute(
+                        """
+                        INSERT INTO feature_flag_overrides (feature_name, user_id, enabled, updated_by)
+                        VALUES (%s, %s, %s, %s)
+                        ON CONFLICT (feature_name, user_id)
+                        DO UPDATE SET enabled = EXCLUDED.enabled, updated_at = NOW(), updated_by = EXCLUDED.updated_by
+                        """,
+                        (feature_name, user_id, bool(enabled), admin_user_id)
+                    )
+            cursor.execute(
+                """
+                INSERT INTO feature_flag_version (id, version) VALUES (1, 1)
+                ON CONFLICT (id) DO UPDATE SET version = feature_flag_version.version + 1, updated_at = NOW()
+                """
+            )
+        conn.commit()
+
+    try:
+        from acwr_feature_flag_monitor import log_acwr_feature_toggle
+        log_acwr_feature_toggle(feature_name, admin_user_id, bool(enabled),
+                                {'user_ids': list(user_ids) if user_ids is not None else 'default'})
+    except ImportError:
+        pass
+    return flag_store.refresh()
@@ -6,7 +6,6 @@ Handles Google Secret Manager integration
 
 import os
 import logging
-from google.cloud import secretmanager
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +13,10 @@ logger = logging.getLogger(__name__)
 def get_secret(secret_name, project_id=None):
     """Get secret from Google Secret Manager"""
     try:
+        # Imported on use: the Secret Manager client library is slow to import and
+        # utils is imported by nearly every module at startup
+        from google.cloud import secretmanager
+
         if not project_id:
             project_id = os.environ.get('GOOGLE_CLOUD_PROJECT', 'dev-ruler-460822-e8')
 
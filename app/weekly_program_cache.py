@@ -0,0 +1,229 @@
+# weekly_program_cache.py
+
+"""
+Parsed weekly programs, cached per user and week, with an input fingerprint.
+
+Every Coach page view used to query weekly_programs, json.loads program_json and
+re-run _apply_structured_totals, and the Sunday weekly_program_cron regenerated
+every active user one after another with a 2 s pause between them.
+
+- compute_input_fingerprint() hashes the planning inputs a program is built from:
+  race goals, training schedule and cross-training disciplines, the week's schedule
+  constraints and the ACWR configuration. save_weekly_program() stores it in
+  weekly_programs.input_fingerprint.
+- get_program() / get_active_program() serve the parsed, totals-applied program
+  from a process cache keyed by (user_id, week). On load the stored fingerprint
+  is compared with the current inputs, and the program carries inputs_changed
+  when they differ so the Coach page can offer a regeneration; page views never
+  regenerate on their own.
+- invalidate_weekly_programs() drops a user's entries. save_weekly_program() calls
+  it, and an after_request hook in strava_app.py calls it after the race goal,
+  training schedule, cross-training and schedule constraint routes and the ACWR
+  configuration admin routes. Writes on other instances are bounded by
+  PROGRAM_TTL_SECONDS.
+- prewarm() generates one week's programs for many users on a thread pool and
+  skips users whose stored program for that week matches their current inputs.
+  Each worker assembles its prompt context one block at a time, and the workers
+  are capped at POOL_CONNECTIONS, so prewarm holds at most one pooled connection
+  per worker instead of PREWARM_WORKERS x CONTEXT_WORKERS.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+
+from db_utils import execute_query
+
+logger = logging.getLogger(__name__)
+
+PROGRAM_TTL_SECONDS = 300
+PREWARM_WORKERS = int(os.environ.get('WEEKLY_PROGRAM_PREWARM_WORKERS', '4'))
+POOL_CONNECTIONS = 10  # maxconn of the shared pool (db_connection_manager)
+ACTIVE = 'active'  # Cache key for "the latest plan starting on or before today"
+
+_INPUTS_SQL = """
+    SELECT
+        (SELECT COALESCE(json_agg(json_build_array(
+                    race_name, race_date, race_type, priority, target_time,
+                    elevation_gain_feet, distance_miles) ORDER BY race_date, id), '[]'::json)
+         FROM race_goals WHERE user_id = %(user_id)s) AS race_goals,
+        (SELECT json_build_array(
+                    training_schedule_json, include_strength_training, strength_hours_per_week,
+                    include_mobility, mobility_hours_per_week, include_cross_training,
+                    cross_training_type, cross_training_hours_per_week)
+         FROM user_settings WHERE id = %(user_id)s) AS training_schedule,
+        (SELECT COALESCE(json_agg(json_build_array(
+                    discipline, allocation_type, allocation_value) ORDER BY discipline), '[]'::json)
+         FROM user_cross_training_disciplines
+         WHERE user_id = %(user_id)s AND enabled = TRUE) AS cross_training,
+        (SELECT schedule_constraints FROM weekly_programs
+         WHERE user_id = %(user_id)s AND week_start_date = %(week_start)s) AS schedule_constraints
+"""
+
+_entries: Dict[Tuple[int, object], dict] = {}  # (user_id, week_start | ACTIVE) -> entry
+_generations: Dict[int, int] = {}  # user_id -> bumped on every invalidation
+_epoch = 0  # Bumped when every user is invalidated
+_lock = threading.Lock()
+
+
+def compute_input_fingerprint(user_id: int, week_start) -> str:
+    """sha256 of the inputs that should change a user's program for week_start"""
+    from acwr_configuration_service import ACWRConfigurationService
+
+    rows = execute_query(_INPUTS_SQL, {'user_id': user_id, 'week_start': str(week_start)}, fetch=True)
+    inputs = dict(rows[0]) if rows else {}
+    config = ACWRConfigurationService().get_user_configuration(user_id)
+    inputs['acwr'] = [config.get('id'), config.get('chronic_period_days'), config.get('decay_rate')] if config else None
+    payload = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _load(user_id: int, week_start) -> Optional[dict]:
+    if week_start == ACTIVE:
+        # Same row get_current_week_context() treats as this week's plan
+        where, params = "week_start_date <= CURRENT_DATE", (user_id,)
+    else:
+        from coach_recommendations import CACHE_EXPIRY_DAYS
+        where = "week_start_date = %s AND generated_at >= NOW() - INTERVAL '%s days'"
+        params = (user_id, week_start, CACHE_EXPIRY_DAYS)
+    rows = execute_query(
+        f"""
+        SELECT week_start_date, program_json, input_fingerprint, generated_at
+        FROM weekly_programs
+        WHERE user_id = %s AND {where}
+        ORDER BY week_start_date DESC
+        LIMIT 1
+        """,
+        params,
+        fetch=True
+    )
+    if not rows or not rows[0]['program_json']:
+        return None
+    row = rows[0]
+
+    from coach_recommendations import _apply_structured_totals
+    raw = row['program_json']
+    try:
+        program = json.loads(raw) if isinstance(raw, str) else raw
+        _apply_structured_totals(program)
+    except (json.JSONDecodeError, TypeError, AttributeError) as e:
+        logger.warning(f"Could not parse cached program_json for user {user_id}: {e}")
+        return None
+
+    plan_start = row['week_start_date']
+    if not hasattr(plan_start, 'year'):
+        plan_start = date.fromisoformat(str(plan_start))
+    stored = row.get('input_fingerprint')
+    current = None
+    if stored:
+        try:
+            current = compute_input_fingerprint(user_id, plan_start)
+        except Exception as e:
+            logger.warning(f"Input fingerprint failed for user {user_id}, week {plan_start}: {e}")
+    program['inputs_changed'] = bool(stored and current and stored != current)
+    logger.info(f"Loaded program for user {user_id}, week {plan_start}, generated {row['generated_at']}")
+    return {'week_start': plan_start, 'program': program, 'fingerprint': stored}
+
+
+def _get(user_id: int, week_start) -> Optional[dict]:
+    key = (int(user_id), week_start)
+    with _lock:
+        entry = _entries.get(key)
+        generation = (_epoch, _generations.get(key[0], 0))
+    if entry and time.monotonic() - entry['loaded_at'] < PROGRAM_TTL_SECONDS:
+        return entry
+
+    entry = _load(key[0], week_start)
+    if entry is None:
+        return None
+    entry['loaded_at'] = time.monotonic()
+    with _lock:
+        # An invalidation during the load means this row may already be stale
+        if (_epoch, _generations.get(key[0], 0)) == generation:
+            _entries[key] = entry
+    return entry
+
+
+def get_program(user_id: int, week_start: date) -> Optional[Dict]:
+    """week_start's program (generated within CACHE_EXPIRY_DAYS) as a copy, or None"""
+    entry = _get(user_id, week_start)
+    return copy.deepcopy(entry['program']) if entry else None
+
+
+def get_active_program(user_id: int) -> Optional[Tuple[date, Dict]]:
+    """(week_start, program copy) for the latest plan starting on or before today, or None"""
+    entry = _get(user_id, ACTIVE)
+    return (entry['week_start'], copy.deepcopy(entry['program'])) if entry else None
+
+
+def invalidate_weekly_programs(user_id=None) -> None:
+    """Drop a user's (or every user's) cached programs after a program or its inputs change"""
+    global _epoch
+    with _lock:
+        if user_id is None:
+            _epoch += 1
+            _entries.clear()
+        else:
+            user_id = int(user_id)
+            for key in [key for key in _entries if key[0] == user_id]:
+                del _entries[key]
+            _generations[user_id] = _generations.get(user_id, 0) + 1
+    logger.debug(f"Invalidated weekly program cache for user {user_id if user_id is not None else 'all'}")
+
+
+def prewarm(week_start: date, user_ids: Iterable[int], force: bool = False,
+            workers: int = PREWARM_WORKERS) -> Dict:
+    """
+    Generate and save week_start's program for each user on a thread pool.
+
+    Users whose stored program for week_start was generated from their current
+    inputs are skipped unless force is set. Returns generated/skipped/error counts.
+    """
+    from coach_recommendations import generate_weekly_program, save_weekly_program
+    from weekly_program_context import serial_blocks
+
+    user_ids = list(user_ids)
+    stored = {}
+    if user_ids and not force:
+        rows = execute_query(
+            """
+            SELECT user_id, input_fingerprint FROM weekly_programs
+            WHERE week_start_date = %s AND user_id = ANY(%s) AND program_json IS NOT NULL
+            """,
+            (str(week_start), user_ids),
+            fetch=True
+        )
+        stored = {row['user_id']: row['input_fingerprint'] for row in rows or []}
+
+    def run(user_id):
+        try:
+            if stored.get(user_id) and stored[user_id] == compute_input_fingerprint(user_id, week_start):
+                logger.info(f"Prewarm: user {user_id} week {week_start} inputs unchanged, skipped")
+                return 'skipped'
+            started = time.time()
+            with serial_blocks():
+                program = generate_weekly_program(user_id=user_id, target_week_start=week_start,
+                                                  force_regenerate=force)
+            save_weekly_program(user_id=user_id, week_start=week_start, program_data=program,
+                                generation_type='scheduled')
+            logger.info(f"Prewarm: generated week {week_start} for user {user_id} in {time.time() - started:.1f}s")
+            return 'generated'
+        except Exception as e:
+            logger.error(f"Prewarm: error generating week {week_start} for user {user_id}: {e}", exc_info=True)
+            return 'errors'
+
+    summary = {'generated': 0, 'skipped': 0, 'errors': 0}
+    if not user_ids:
+        return summary
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, POOL_CONNECTIONS, len(user_ids))),
+                            thread_name_prefix='weekly-prewarm') as pool:
+        for outcome in pool.map(run, user_ids):
+            summary[outcome] += 1
+    return summary
@@ -0,0 +1,481 @@
+# weekly_program_context.py
+
+"""
+Data assembly for coach_recommendations.build_weekly_program_prompt().
+
+The prompt builder used to run about twenty fetches one after another, and several
+re-read the same rows: user_settings for the recommendation style, coaching
+spectrum, training schedule, experience/age and AeT method; race_goals for the
+goals, the upcoming goals and the training stage; athlete_models for the threshold
+calibration and the model context; weekly_programs for the prior week and the
+training arc; activities for the 28-day analysis window and the 30-day long run.
+
+Each block below declares the blocks it reads. Shared reads are blocks of their
+own, so one user_settings row, one race_goals read, one athlete_models read, one
+weekly_programs read and one 30-day activities scan feed every block that needs
+them. WeeklyProgramContext.assemble() starts each block as soon as its
+dependencies have finished, on a small thread pool whose queries go through the
+connection pool (db_utils.pooled_queries), and records how long each block took in
+context.timings. Callers that build several contexts at once wrap each build in
+serial_blocks(), so their workers times CONTEXT_WORKERS cannot exhaust the pool. Build times are logged and kept in WEEKLY_CONTEXT_METRICS
+(GET /api/admin/weekly-context-metrics).
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from acwr_configuration_service import ACWRConfigurationService
+from coach_recommendations import (
+    _derive_assessment_category,
+    _divergence_trend_label,
+    get_current_training_stage,
+    get_race_goals,
+    get_race_history,
+    get_recent_journal_observations,
+    get_training_schedule,
+    get_upcoming_race_goals,
+)
+from db_utils import (
+    execute_query,
+    get_answered_alignment_queries,
+    get_athlete_model,
+    get_current_week_context,
+    get_latest_aerobic_assessment,
+    get_latest_lactate_step_test,
+    pooled_queries,
+)
+from llm_recommendations_module import (
+    _select_guide_sections,
+    analyze_pattern_flags,
+    apply_athlete_model_to_thresholds,
+    get_adjusted_thresholds,
+    get_athlete_model_context,
+    get_coaching_tone_instructions,
+    get_recent_autopsy_insights,
+    get_user_coaching_spectrum,
+    get_user_recommendation_style,
+    load_training_guide,
+)
+from readiness_engine import get_weekly_ans_summary
+from timezone_utils import get_user_current_date
+from unified_metrics_service import UnifiedMetricsService
+from user_profile_cache import get_user_profile
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_WORKERS = 6  # Leaves room in the 10-connection pool for concurrent requests
+ANALYSIS_DAYS = 28  # Pattern flags and divergence trend
+LONG_RUN_DAYS = 30  # Long run ceiling; the activities scan covers both windows
+PRIOR_WEEKS = 3  # Training arc; the newest row is also the prior week
+
+_serial_scope = threading.local()
+
+
+@dataclass(frozen=True)
+class ContextBlock:
+    name: str
+    deps: Tuple[str, ...]
+    fn: Callable[['WeeklyProgramContext'], Any]
+
+
+BLOCKS: Dict[str, ContextBlock] = {}
+
+
+def block(name: str, *deps: str):
+    """Register fn(context) as the block `name`, run once `deps` are in the context"""
+    def register(fn):
+        BLOCKS[name] = ContextBlock(name, deps, fn)
+        return fn
+    return register
+
+
+class WeeklyContextMetrics:
+    """Process-wide weekly prompt context build times, overall and per block (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._builds = 0
+        self._total_seconds = 0.0
+        self._blocks = {}
+
+    def record(self, seconds, timings):
+        with self._lock:
+            self._builds += 1
+            self._total_seconds += seconds
+            for name, block_seconds in timings.items():
+                stats = self._blocks.setdefault(name, {'calls': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+                stats['calls'] += 1
+                stats['total_seconds'] += block_seconds
+                stats['max_seconds'] = max(stats['max_seconds'], block_seconds)
+
+    def snapshot(self):
+        """Build count and mean build time, with mean/max milliseconds per block"""
+        with self._lock:
+            builds = self._builds
+            total_seconds = self._total_seconds
+            blocks = {name: dict(stats) for name, stats in self._blocks.items()}
+        for stats in blocks.values():
+            stats['mean_ms'] = round(stats['total_seconds'] / stats['calls'] * 1000, 1)
+            stats['max_ms'] = round(stats.pop('max_seconds') * 1000, 1)
+            stats['total_seconds'] = round(stats['total_seconds'], 3)
+        return {
+            'builds': builds,
+            'mean_ms': round(total_seconds / builds * 1000, 1) if builds else None,
+            'blocks': blocks,
+        }
+
+
+WEEKLY_CONTEXT_METRICS = WeeklyContextMetrics()
+
+
+@contextmanager
+def serial_blocks():
+    """
+    Run the blocks of every context this thread assembles one at a time.
+
+    For callers that already build contexts on several threads
+    (weekly_program_cache.prewarm): each build then holds one pooled connection
+    rather than up to CONTEXT_WORKERS.
+    """
+    previous = getattr(_serial_scope, 'active', False)
+    _serial_scope.active = True
+    try:
+        yield
+    finally:
+        _serial_scope.active = previous
+
+
+class WeeklyProgramContext:
+    """Everything build_weekly_program_prompt() formats for one user and week"""
+
+    def __init__(self, user_id: int, target_week_start: date,
+                 blocks: Optional[Dict[str, ContextBlock]] = None):
+        self.user_id = user_id
+        self.target_week_start = target_week_start
+        self.blocks = BLOCKS if blocks is None else blocks
+        self.values: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}
+        self.build_seconds: Optional[float] = None
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def assemble(self) -> 'WeeklyProgramContext':
+        """Run every block, each as soon as its dependencies are available"""
+        started = time.perf_counter()
+        waiting = dict(self.blocks)
+        running = {}
+        workers = 1 if getattr(_serial_scope, 'active', False) else CONTEXT_WORKERS
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='weekly-context') as pool:
+            while waiting or running:
+                for name, spec in list(waiting.items()):
+                    if all(dep in self.values for dep in spec.deps):
+                        running[pool.submit(self._run, spec)] = name
+                        del waiting[name]
+                if not running:
+                    raise ValueError(f"Weekly context blocks with unresolvable dependencies: {sorted(waiting)}")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.values[running.pop(future)] = future.result()
+
+        self.build_seconds = time.perf_counter() - started
+        WEEKLY_CONTEXT_METRICS.record(self.build_seconds, self.timings)
+        slowest = sorted(self.timings.items(), key=lambda item: item[1], reverse=True)[:3]
+        logger.info(f"Weekly program context for user {self.user_id} built in {self.build_seconds:.2f}s "
+                    f"(slowest: {', '.join(f'{name} {seconds:.2f}s' for name, seconds in slowest)})")
+        return self
+
+    def _run(self, spec: ContextBlock):
+        started = time.perf_counter()
+        try:
+            with pooled_queries():
+                return spec.fn(self)
+        finally:
+            self.timings[spec.name] = time.perf_counter() - started
+
+
+# --- Shared reads ---
+
+@block('profile')
+def _profile(ctx):
+    # Read through to the database: the schedule, AeT method and athlete fields
+    # must reflect a save made just before "regenerate", possibly on another
+    # instance. This also refreshes the cached row the personalization blocks use.
+    return get_user_profile(ctx.user_id, fresh=True)
+
+
+@block('race_goals')
+def _race_goals(ctx):
+    return get_race_goals(ctx.user_id)
+
+
+@block('recent_activities')
+def _recent_activities(ctx):
+    return UnifiedMetricsService.get_recent_activities_for_analysis(days=LONG_RUN_DAYS, user_id=ctx.user_id)
+
+
+@block('athlete_model')
+def _athlete_model(ctx):
+    # {} rather than None so the consumers below don't fetch it again
+    try:
+        return get_athlete_model(ctx.user_id) or {}
+    except Exception as e:
+        logger.warning(f"Could not load athlete model for user {ctx.user_id}: {e}")
+        return {}
+
+
+@block('recent_weeks')
+def _recent_weeks(ctx):
+    rows = execute_query(
+        """
+        SELECT strategic_summary, weekly_synthesis, deviation_log, week_start_date,
+               week_reflection
+        FROM weekly_programs
+        WHERE user_id = %s
+          AND week_start_date < %s
+          AND strategic_summary IS NOT NULL
+        ORDER BY week_start_date DESC
+        LIMIT %s
+        """,
+        (ctx.user_id, str(ctx.target_week_start), PRIOR_WEEKS),
+        fetch=True
+    )
+    return rows or []
+
+
+# --- Activities ---
+
+@block('analysis_activities', 'recent_activities')
+def _analysis_activities(ctx):
+    start = str(get_user_current_date(ctx.user_id) - timedelta(days=ANALYSIS_DAYS))
+    return [a for a in ctx['recent_activities'] if str(a.get('date')) >= start]
+
+
+@block('long_run', 'recent_activities')
+def _long_run(ctx):
+    distances = [
+        float(a['distance_miles']) for a in ctx['recent_activities']
+        if a.get('sport_type') in ('running', None) and a.get('distance_miles') and float(a['distance_miles']) > 0
+    ]
+    longest = max(distances) if distances else None
+    return {
+        'max_30d_long_run': longest,
+        'long_run_ceiling': round(longest * 1.1, 1) if longest else None,
+    }
+
+
+@block('div_trend', 'analysis_activities')
+def _div_trend(ctx):
+    return _divergence_trend_label(ctx['analysis_activities'] or [], days=7)
+
+
+@block('current_metrics')
+def _current_metrics(ctx):
+    return UnifiedMetricsService.get_latest_complete_metrics(ctx.user_id)
+
+
+# --- Races and schedule ---
+
+@block('upcoming_race_goals', 'race_goals')
+def _upcoming_race_goals(ctx):
+    return get_upcoming_race_goals(ctx.user_id, race_goals=ctx['race_goals'])
+
+
+@block('training_stage', 'race_goals')
+def _training_stage(ctx):
+    return get_current_training_stage(ctx.user_id, race_goals=ctx['race_goals'])
+
+
+@block('race_history')
+def _race_history(ctx):
+    return get_race_history(ctx.user_id)
+
+
+@block('training_schedule', 'profile')
+def _training_schedule(ctx):
+    return get_training_schedule(ctx.user_id, settings=ctx['profile'])
+
+
+@block('schedule_constraints')
+def _schedule_constraints(ctx):
+    # Athlete-declared scheduling exceptions for this week
+    try:
+        week_ctx = get_current_week_context(ctx.user_id)
+        return (week_ctx.get('schedule_constraints') or []) if week_ctx else []
+    except Exception:
+        return []
+
+
+@block('journal_obs')
+def _journal_obs(ctx):
+    return get_recent_journal_observations(ctx.user_id)
+
+
+# --- Personalization (Dashboard LLM system) ---
+
+@block('risk_tolerance', 'profile')
+def _risk_tolerance(ctx):
+    return get_user_recommendation_style(ctx.user_id)  # Served from the profile cache
+
+
+@block('thresholds', 'risk_tolerance', 'athlete_model')
+def _thresholds(ctx):
+    thresholds = get_adjusted_thresholds(ctx['risk_tolerance'])
+    return apply_athlete_model_to_thresholds(thresholds, ctx.user_id, athlete_model=ctx['athlete_model'])
+
+
+@block('athlete_model_context', 'athlete_model')
+def _athlete_model_context(ctx):
+    return get_athlete_model_context(ctx.user_id, athlete_model=ctx['athlete_model'])
+
+
+@block('autopsy_insights')
+def _autopsy_insights(ctx):
+    return get_recent_autopsy_insights(ctx.user_id, days=ANALYSIS_DAYS)
+
+
+@block('pattern_flags', 'analysis_activities', 'current_metrics', 'thresholds')
+def _pattern_flags(ctx):
+    return analyze_pattern_flags(ctx['analysis_activities'], ctx['current_metrics'], ctx.user_id, ctx['thresholds'])
+
+
+@block('training_guide', 'pattern_flags', 'current_metrics', 'thresholds')
+def _training_guide(ctx):
+    # Training guide filtered to state-relevant sections
+    category = _derive_assessment_category(ctx['pattern_flags'], ctx['current_metrics'], ctx['thresholds'])
+    logger.info(f"Training guide filtered for category: {category}")
+    return {
+        'assessment_category': category,
+        'training_guide': _select_guide_sections(load_training_guide(), category),
+    }
+
+
+@block('tone_instructions', 'profile')
+def _tone_instructions(ctx):
+    return get_coaching_tone_instructions(get_user_coaching_spectrum(ctx.user_id))
+
+
+@block('acwr_window')
+def _acwr_window(ctx):
+    # User's ACWR configuration for accurate load window labels
+    try:
+        config = ACWRConfigurationService().get_user_configuration(ctx.user_id)
+        return {
+            'chronic_days': config['chronic_period_days'] if config else 28,
+            'decay_rate': config['decay_rate'] if config else None,
+        }
+    except Exception:
+        return {'chronic_days': 28, 'decay_rate': None}
+
+
+@block('athlete', 'profile')
+def _athlete(ctx):
+    profile = ctx['profile'] or {}
+    return {
+        'experience': profile['training_experience'].capitalize() if profile.get('training_experience') else "Intermediate",
+        'age': profile.get('age') or None,
+        'aet_method': profile.get('aet_assessment_method') or 'hr_drift',
+    }
+
+
+# --- Assessments and phase rules ---
+
+@block('aerobic_assessment', 'athlete')
+def _aerobic_assessment(ctx):
+    # The athlete picks one of two interchangeable AeT methods (HR drift OR LT1
+    # lactate step); fetch the chosen one.
+    latest_aet = None
+    latest_lactate = None
+    try:
+        if ctx['athlete']['aet_method'] == 'lactate_step':
+            latest_lactate = get_latest_lactate_step_test(ctx.user_id)
+        else:
+            latest_aet = get_latest_aerobic_assessment(ctx.user_id)
+    except Exception as e:
+        logger.debug(f"Aerobic assessment fetch skipped: {e}")
+    return {'latest_aet': latest_aet, 'latest_lactate': latest_lactate}
+
+
+@block('polarized', 'training_stage', 'athlete')
+def _polarized(ctx):
+    # Polarized training compliance for the prior week
+    polarized_ratio = None
+    polarized_block = ""
+    try:
+        from llm_recommendations_module import compute_weekly_polarized_ratio, get_user_hr_thresholds
+        polarized_ratio = compute_weekly_polarized_ratio(
+            user_id=ctx.user_id,
+            training_stage=ctx['training_stage'],
+            athlete_age=ctx['athlete']['age'],
+            week_start_date=ctx.target_week_start - timedelta(days=7)
+        )
+        hr_thresholds = get_user_hr_thresholds(ctx.user_id)
+        if polarized_ratio:
+            pr = polarized_ratio
+            bh_str = f"Black hole days: {', '.join(pr['moderate_dates'])}" if pr['moderate_dates'] else "No black hole sessions."
+            vt_str = f"VT1 = {hr_thresholds['vt1_bpm']} bpm | VT2 = {hr_thresholds['vt2_bpm']} bpm" if hr_thresholds else ""
+            polarized_block = f"""
+**POLARIZED TRAINING COMPLIANCE — PRIOR WEEK (SEILER MODEL):**
+Sessions: {pr['easy_sessions']} Easy | {pr['hard_sessions']} Hard | {pr['moderate_sessions']} Moderate (black hole)
+{bh_str}
+Easy%: {pr['easy_pct']:.0f}% | Target: {pr['target_easy_pct']:.0f}% | Status: {pr['compliance'].replace('_', ' ').title()}
+{vt_str}
+"""
+    except Exception as e:
+        logger.debug(f"Polarized ratio computation skipped: {e}")
+    return {'ratio': polarized_ratio, 'block': polarized_block}
+
+
+@block('interval_protocol', 'training_stage')
+def _interval_protocol(ctx):
+    # Interval protocol + stride placement rules — phase-aware, injected so the LLM
+    # prescribes correct structures
+    try:
+        from workout_library import get_phase_interval_rules
+        phase_rules = get_phase_interval_rules(
+            stage=ctx['training_stage'].get('stage', 'base'),
+            weeks_to_race=ctx['training_stage'].get('weeks_until_race'),
+            target_date=ctx.target_week_start,
+        )
+        logger.info(f"Weekly plan interval rules: {phase_rules['log_summary']}")
+        return "\n" + phase_rules['prompt_block'] + "\n"
+    except Exception as e:
+        logger.debug(f"Interval protocol injection skipped: {e}")
+        return ""
+
+
+@block('ans_summary')
+def _ans_summary(ctx):
+    # ANS readiness summary for the prior 7 days
+    return get_weekly_ans_summary(ctx.user_id)
+
+
+@block('alignment_calibration')
+def _alignment_calibration(ctx):
+    # Alignment-failure calibration context — feed answered pattern queries into the plan
+    try:
+        answered = get_answered_alignment_queries(ctx.user_id, days=30)
+        pattern_answers = [q for q in answered if q.get('response')]
+        if not pattern_answers:
+            return ""
+        reason_lines = [f"  - {q['activity_date']}: \"{q['response']}\"" for q in pattern_answers[-5:]]
+        return (
+            "\n**PLAN CALIBRATION REQUIRED**\n\n"
+            "The previous weekly plan had low alignment — the athlete reported the following "
+            "reasons for missing sessions:\n"
+            + "\n".join(reason_lines)
+            + "\n\nAdjust the new plan to directly address these failure modes. "
+            "If the athlete reports fatigue/physical reasons, reduce load or add recovery. "
+            "If schedule/external constraints, work within them. "
+            "If the sessions felt wrong (too hard, wrong terrain, wrong type), recalibrate "
+            "the prescription to match the athlete's demonstrated capacity and environment.\n"
+        )
+    except Exception as e:
+        logger.debug(f"Alignment calibration context skipped: {e}")
+        return ""
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import styles from './TrainingLoadDashboard.module.css'; // Reuse existing styles
 import { usePagePerformanceMonitoring, useComponentPerformanceMonitoring } from './usePerformanceMonitoring';
+import { waitForJournalLearning } from './journalLearning';
 
 // Phase 6C: structured_output shape from the LLM
 interface StructuredOutput {
@@ -1259,8 +1260,10 @@ const JournalPage: React.FC = () => {
         // Mark this entry as saved
         setSavedEntries(prev => new Set(prev).add(date));
 
-        // Refresh data to get any new autopsy analysis and auto-open modal
-        setTimeout(async () => {
+        // The autopsy and tomorrow's recommendation are generated in the background;
+        // once that finishes, refresh data to get the new analysis and auto-open modal
+        waitForJournalLearning(date).then(async (learning) => {
+          if (!learning) return;
           try {
             const url = centerDate ? `/api/journal?date=${centerDate}` : '/api/journal';
             const response = await fetch(url);
@@ -1271,23 +1274,18 @@ const JournalPage: React.FC = () => {
                 setJournalData(result.data);
                 // Phase D: re-check for alignment queries after autopsy may have been generated
                 fetchPendingAlignmentQuery();
-                
+
                 // Find the saved entry and open modal if autopsy is available
                 const savedEntry = result.data.find(e => e.date === date);
                 if (savedEntry?.ai_autopsy?.autopsy_analysis) {
                   openAutopsyModal(savedEntry);
-                  // Auto-regen recommendation for next day (silently, in background)
-                  const nextDay = new Date(date + 'T12:00:00');
-                  nextDay.setDate(nextDay.getDate() + 1);
-                  const nextDateStr = nextDay.toISOString().split('T')[0];
-                  regenRecommendationSilent(nextDateStr);
                 }
               }
             }
           } catch (err) {
             console.error('Failed to refresh data:', err);
           }
-        }, 1500);
+        });
 
       } else {
         throw new Error(result.error || 'Failed to save journal entry');
@@ -1441,12 +1439,12 @@ const JournalPage: React.FC = () => {
       // Mark as saved
       setSavedEntries(prev => new Set(prev).add(date));
 
-      // Refresh journal data then auto-regen tomorrow's recommendation
+      // Refresh journal data now and again once tomorrow's recommendation is generated
       try {
         await fetchJournalData(centerDate);
-        const nextDay = new Date(date + 'T12:00:00');
-        nextDay.setDate(nextDay.getDate() + 1);
-        regenRecommendationSilent(nextDay.toISOString().split('T')[0]);
+        waitForJournalLearning(date).then(learning => {
+          if (learning) fetchJournalData(centerDate);
+        });
       } catch (refreshErr) {
         console.error('Failed to refresh data after rest day:', refreshErr);
       }
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import YTMSpinner from './YTMSpinner';
+import { waitForJournalLearning } from './journalLearning';
 import styles from './TrainingLoadDashboard.module.css';
 
 // ─── Design tokens (match tactical dark system) ────────────────────────────
@@ -97,8 +98,9 @@ const QuickJournalModal: React.FC<QuickJournalModalProps> = ({ date, onDone, isI
         body: JSON.stringify({ date, energy_level: energy, rpe_score: rpe, pain_percentage: pain }),
       });
       const data = await res.json();
-      if (data.autopsy_analysis) {
-        setAutopsyData({ analysis: data.autopsy_analysis, score: data.alignment_score ?? null });
+      const learning = res.ok && data.success ? await waitForJournalLearning(date) : null;
+      if (learning?.autopsy_analysis) {
+        setAutopsyData({ analysis: learning.autopsy_analysis, score: learning.alignment_score ?? null });
         setPhase('autopsy');
       } else {
         navigate('/journal');
@@ -5,6 +5,7 @@
  * Flow: form → saving → autopsy (inline)
  */
 import React, { useState, useEffect } from 'react';
+import { waitForJournalLearning } from './journalLearning';
 
 interface Props {
   activityName: string | null;
@@ -199,7 +200,8 @@ const PostWorkoutEntryPage: React.FC<Props> = ({ activityName, activityDate, onD
       });
       const data = await resp.json();
       if (!resp.ok) throw new Error(data.error || 'Failed to save');
-      setAutopsy({ analysis: data.autopsy_analysis || '', alignment_score: data.alignment_score ?? null });
+      const learning = await waitForJournalLearning(activityDate);
+      setAutopsy({ analysis: learning?.autopsy_analysis || '', alignment_score: learning?.alignment_score ?? null });
       setPhase('autopsy');
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Something went wrong');
@@ -192,6 +192,45 @@ const RaceHistoryManager: React.FC<RaceHistoryManagerProps> = ({ history, onHist
     }
   };
 
+  // Follow a background screenshot parse: progress over Server-Sent Events, with
+  // polling as the fallback when the stream drops. Resolves with the review payload.
+  const waitForParseJob = (job: { status_url: string; events_url: string }): Promise<any> =>
+    new Promise((resolve, reject) => {
+      const finish = async () => {
+        try {
+          for (;;) {
+            const statusResponse = await fetch(job.status_url);
+            const status = await statusResponse.json();
+            if (!statusResponse.ok) {
+              throw new Error(status.error || 'Failed to parse screenshot');
+            }
+            if (status.status === 'done') {
+              resolve(status);
+              return;
+            }
+            setUploadProgress(status.progress || 0);
+            await new Promise(r => setTimeout(r, 1000));
+          }
+        } catch (err) {
+          reject(err);
+        }
+      };
+
+      const events = new EventSource(job.events_url);
+      events.onmessage = (message) => {
+        const event = JSON.parse(message.data);
+        setUploadProgress(event.progress || 0);
+        if (event.stage === 'done' || event.stage === 'failed') {
+          events.close();
+          finish();
+        }
+      };
+      events.onerror = () => {
+        events.close();
+        finish();
+      };
+    });
+
   const handleScreenshotUpload = async () => {
     if (!selectedFile) {
       setError('Please select a screenshot file');
@@ -206,25 +245,21 @@ const RaceHistoryManager: React.FC<RaceHistoryManagerProps> = ({ history, onHist
       const formData = new FormData();
       formData.append('screenshot', selectedFile);
 
-      // Simulate progress (since fetch doesn't provide upload progress easily)
-      const progressInterval = setInterval(() => {
-        setUploadProgress(prev => Math.min(prev + 10, 90));
-      }, 200);
-
+      setUploadProgress(5);
       const response = await fetch('/api/coach/race-history/screenshot', {
         method: 'POST',
         body: formData
       });
 
-      clearInterval(progressInterval);
-      setUploadProgress(100);
-
       if (!response.ok) {
         const errorData = await response.json();
         throw new Error(errorData.error || 'Failed to parse screenshot');
       }
 
-      const data = await response.json();
+      // 200 is an already-parsed screenshot; 202 is a background job to follow
+      const submitted = await response.json();
+      const data = response.status === 202 ? await waitForParseJob(submitted) : submitted;
+      setUploadProgress(100);
       setExtractedRaces(data.races || []);
 
       // Show success message if races extracted
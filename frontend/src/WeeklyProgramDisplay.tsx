@@ -53,6 +53,7 @@ interface WeeklyProgram {
   nutrition_reminder?: string;
   injury_prevention_note?: string;
   from_cache?: boolean;
+  inputs_changed?: boolean;
 }
 
 interface TrainingSchedule {
@@ -366,6 +367,21 @@ const WeeklyProgramDisplay: React.FC<WeeklyProgramDisplayProps> = ({ program, on
               Cached
             </span>
           )}
+          {program.inputs_changed && (
+            <span
+              title="Race goals, schedule or constraints changed since this plan was generated"
+              style={{
+                marginLeft: '6px',
+                padding: '2px 8px',
+                backgroundColor: '#fff4e5',
+                borderRadius: '10px',
+                fontSize: '11px',
+                color: '#a15c00'
+              }}
+            >
+              Inputs changed — regenerate to update
+            </span>
+          )}
         </div>
         <button
           onClick={handleRegenerate}
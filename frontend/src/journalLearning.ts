@@ -0,0 +1,36 @@
+// journalLearning.ts
+// POST /api/journal returns as soon as the entry is saved; the autopsy and
+// tomorrow's recommendation are generated by a background job for that day.
+export interface JournalLearningResult {
+  is_rest_day?: boolean;
+  target_date?: string;
+  autopsy_generated?: boolean;
+  recommendation_generated?: boolean;
+  autopsy_analysis?: string | null;
+  alignment_score?: number | null;
+  user_message?: string;
+}
+
+// Poll the learning job for `date` until it finishes. Resolves null if no job
+// was queued, the job failed, or it is still running at the timeout.
+export const waitForJournalLearning = async (
+  date: string,
+  timeoutMs: number = 120000
+): Promise<JournalLearningResult | null> => {
+  const POLL_INTERVAL_MS = 2000;
+  const deadline = Date.now() + timeoutMs;
+  while (Date.now() < deadline) {
+    await new Promise(resolve => setTimeout(resolve, POLL_INTERVAL_MS));
+    try {
+      const response = await fetch(`/api/journal/learning-status?date=${date}`, { credentials: 'include' });
+      if (response.status === 404) return null;
+      if (!response.ok) continue;
+      const { status, result } = await response.json();
+      if (status === 'done') return result || {};
+      if (status === 'failed') return null;
+    } catch {
+      // Transient network error — keep polling
+    }
+  }
+  return null;
+};
@@ -23,6 +23,7 @@ from acwr_migration_integrity import (
 from acwr_migration_rollback import (
     ACWRMigrationRollbackManager, RollbackImpact, RollbackPlan, RollbackOperation
 )
+from acwr_migration_executor import ACWRMigrationExecutor
 import db_utils
 
 logger = logging.getLogger(__name__)
@@ -540,13 +541,21 @@ class ACWRMigrationRollbackExecutor:
     def _rollback_enhanced_calculations_batch(self, user_id: int, migration_id: str) -> int:
         """Rollback single batch of enhanced calculations"""
         try:
+            # Checkpointed migrations know exactly which rows they wrote
+            executor = ACWRMigrationExecutor()
+            if executor.get_progress(migration_id)['total_users'] > 0:
+                return executor.rollback(migration_id, user_id)
+            
             with db_utils.get_db_connection() as conn:
                 with conn.cursor() as cursor:
                     # Delete enhanced calculations for user (simplified batch approach)
                     cursor.execute("""
                         DELETE FROM acwr_enhanced_calculations 
-                        WHERE user_id = %s
-                        LIMIT 1000
+                        WHERE id IN (
+                            SELECT id FROM acwr_enhanced_calculations
+                            WHERE user_id = %s
+                            LIMIT 1000
+                        )
                     """, (user_id,))
                     
                     affected_records = cursor.rowcount
@@ -561,6 +570,11 @@ class ACWRMigrationRollbackExecutor:
     def _rollback_enhanced_calculations_user(self, user_id: int, migration_id: str) -> int:
         """Rollback all enhanced calculations for user"""
         try:
+            # Checkpointed migrations know exactly which rows they wrote
+            executor = ACWRMigrationExecutor()
+            if executor.get_progress(migration_id)['total_users'] > 0:
+                return executor.rollback(migration_id, user_id)
+            
             with db_utils.get_db_connection() as conn:
                 with conn.cursor() as cursor:
                     # Delete all enhanced calculations for user
@@ -0,0 +1,105 @@
+"""
+Migration: durable per-user checkpoints for the ACWR migration executor.
+
+1. acwr_migration_checkpoints — one row per (migration_id, user_id). The executor commits
+   each chunk of upserted calculations together with last_completed_date, so pause,
+   resume and rollback work from what is actually in the database rather than from the
+   in-memory MigrationProgress of whichever process started the run.
+2. acwr_enhanced_calculations.migration_id — which migration last wrote a row.
+   acwr_migration_prior_values — what each row held before a migration first wrote it
+   (or that it did not exist), committed with the write, so a rollback deletes only the
+   rows the migration created and restores the ones it overwrote.
+3. A unique index on (user_id, activity_id, configuration_id) so results are written with
+   INSERT ... ON CONFLICT instead of one INSERT per activity. Existing duplicates (the old
+   path inserted again on every run) are collapsed to the newest row first.
+
+Run autonomously via the Cloud SQL proxy. Idempotent.
+"""
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(APP_DIR, '.env'))
+from db_credentials_loader import set_database_url
+set_database_url()
+import db_utils
+
+db_utils.execute_query("""
+    CREATE TABLE IF NOT EXISTS acwr_migration_checkpoints (
+        migration_id VARCHAR(100) NOT NULL,
+        user_id INTEGER NOT NULL,
+        configuration_id INTEGER NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'pending',
+        total_activities INTEGER DEFAULT 0,
+        processed_activities INTEGER DEFAULT 0,
+        rows_written INTEGER DEFAULT 0,
+        last_completed_date DATE,
+        error_message TEXT,
+        started_at TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (migration_id, user_id)
+    )
+""")
+db_utils.execute_query("""
+    CREATE INDEX IF NOT EXISTS idx_acwr_migration_checkpoints_status
+    ON acwr_migration_checkpoints (migration_id, status)
+""")
+print("ensured table acwr_migration_checkpoints")
+
+db_utils.execute_query("""
+    ALTER TABLE acwr_enhanced_calculations
+    ADD COLUMN IF NOT EXISTS migration_id VARCHAR(100)
+""")
+print("ensured column acwr_enhanced_calculations.migration_id")
+
+# Value columns copy acwr_enhanced_calculations' own types so a restore is exact
+db_utils.execute_query("""
+    CREATE TABLE IF NOT EXISTS acwr_migration_prior_values AS
+    SELECT migration_id, user_id, activity_id, configuration_id, TRUE AS existed,
+           acwr_ratio, acute_load, chronic_load, calculation_method,
+           migration_id AS prior_migration_id, updated_at AS prior_updated_at
+    FROM acwr_enhanced_calculations
+    WITH NO DATA
+""")
+db_utils.execute_query("""
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_acwr_migration_prior_values_row
+    ON acwr_migration_prior_values (migration_id, user_id, activity_id, configuration_id)
+""")
+print("ensured table acwr_migration_prior_values")
+
+db_utils.execute_query("""
+    DELETE FROM acwr_enhanced_calculations a
+    USING acwr_enhanced_calculations b
+    WHERE a.user_id = b.user_id
+      AND a.activity_id = b.activity_id
+      AND a.configuration_id = b.configuration_id
+      AND a.id < b.id
+""")
+db_utils.execute_query("""
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_acwr_enhanced_calculations_activity_config
+    ON acwr_enhanced_calculations (user_id, activity_id, configuration_id)
+""")
+db_utils.execute_query("""
+    CREATE INDEX IF NOT EXISTS idx_acwr_enhanced_calculations_migration
+    ON acwr_enhanced_calculations (migration_id, user_id)
+""")
+print("ensured unique index on acwr_enhanced_calculations")
+
+cols = db_utils.execute_query(
+    """SELECT column_name, data_type FROM information_schema.columns
+       WHERE table_name = 'acwr_migration_checkpoints' ORDER BY ordinal_position""",
+    fetch=True,
+)
+print("Verification — columns:")
+for c in cols:
+    print("  ", dict(c))
+snapshot_cols = db_utils.execute_query(
+    """SELECT column_name FROM information_schema.columns
+       WHERE table_name = 'acwr_migration_prior_values'""",
+    fetch=True,
+)
+print(f"Verification — acwr_migration_prior_values columns: {len(snapshot_cols or [])}")
+print("Done." if cols and snapshot_cols else "FAILED — table not present.")
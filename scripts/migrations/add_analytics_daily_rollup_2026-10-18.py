@@ -0,0 +1,54 @@
+"""
+Migration: daily analytics rollup (analytics_tracker.py).
+
+analytics_daily_rollup — one row per (day, event_type, integration_point, tutorial_id)
+with the event count, exact distinct user/session arrays, inter-event gap sums and
+step positions. The CTR, funnel and tutorial reports read it in one query whatever
+the window, and /cron/analytics-rollup (plus the reports themselves, when stale)
+re-aggregates the latest days from analytics_events.
+
+Also indexes analytics_events by timestamp for the incremental refresh, then
+backfills the rollup from the first recorded event.
+
+Run autonomously via the Cloud SQL proxy. Idempotent.
+"""
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(APP_DIR, '.env'))
+from db_credentials_loader import set_database_url
+set_database_url()
+import db_utils
+from analytics_tracker import DAILY_ROLLUP_DDL, AnalyticsTracker
+
+db_utils.execute_query(DAILY_ROLLUP_DDL)
+print("ensured table analytics_daily_rollup and index idx_analytics_daily_rollup_event_type_day")
+
+db_utils.execute_query("""
+    CREATE INDEX IF NOT EXISTS idx_analytics_events_timestamp
+    ON analytics_events (timestamp)
+""")
+print("ensured index idx_analytics_events_timestamp")
+
+refreshed = AnalyticsTracker().refresh_daily_rollup()
+print(f"backfilled analytics_daily_rollup from {refreshed['start_day']}: {refreshed['rows']} rows")
+
+cols = db_utils.execute_query(
+    """SELECT column_name, data_type FROM information_schema.columns
+       WHERE table_name = 'analytics_daily_rollup' ORDER BY ordinal_position""",
+    fetch=True,
+)
+print("Verification — columns:")
+for c in cols:
+    print("  ", dict(c))
+totals = db_utils.execute_query(
+    """SELECT (SELECT COUNT(*) FROM analytics_events WHERE timestamp IS NOT NULL) AS events,
+              (SELECT COALESCE(SUM(event_count), 0) FROM analytics_daily_rollup) AS rolled_up""",
+    fetch=True,
+)[0]
+print(f"Verification — {totals['rolled_up']} of {totals['events']} events rolled up")
+print("Done." if cols and totals['rolled_up'] == totals['events'] else "FAILED — table missing or rollup incomplete.")
@@ -0,0 +1,48 @@
+"""
+Migration: incremental athlete model statistics (athlete_model_stats.py).
+
+athlete_models.model_stats — the sufficient statistics the learned model fields are
+computed from: the last 5 autopsies' alignment scores and deviation reasons, the
+last 60 healthy training days' divergence and the physical-distress divergences (the
+last 10 exactly, older ones as a streaming histogram). update_athlete_model() folds
+each autopsy into it instead of re-querying the athlete's history.
+
+After adding the column this rebuilds every user's model from ai_autopsies in one
+streamed pass (rebuild_athlete_models). Re-run it to rebuild again, e.g. after
+activity divergences have been recomputed.
+
+Run autonomously via the Cloud SQL proxy. Idempotent.
+"""
+import os
+import sys
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(APP_DIR, '.env'))
+from db_credentials_loader import set_database_url
+set_database_url()
+import db_utils
+from athlete_model_stats import rebuild_athlete_models
+
+db_utils.execute_query("""
+    ALTER TABLE athlete_models
+    ADD COLUMN IF NOT EXISTS model_stats JSONB
+""")
+print("ensured column athlete_models.model_stats")
+
+started = time.perf_counter()
+result = rebuild_athlete_models()
+print(f"rebuilt {result['users']} athlete models from {result['autopsies']} autopsies "
+      f"in {time.perf_counter() - started:.1f}s")
+
+missing = db_utils.execute_query(
+    """SELECT COUNT(*) AS n FROM athlete_models m
+       WHERE m.model_stats IS NULL
+         AND EXISTS (SELECT 1 FROM ai_autopsies a WHERE a.user_id = m.user_id AND a.alignment_score IS NOT NULL)""",
+    fetch=True,
+)
+print(f"Verification — models with autopsies but no statistics: {missing[0]['n']}")
+print("Done." if missing[0]['n'] == 0 else "FAILED — some models were not rebuilt.")
@@ -0,0 +1,49 @@
+"""
+Migration: durable checkpoints for the set-based elevation migration
+(elevation_migration_module.py).
+
+elevation_migration_checkpoints — one row per migration_id (one per conversion factor).
+Each chunk of users commits its load and rolling-window updates together with
+last_user_id and the running counts, so an interrupted live migration resumes after
+the last committed chunk and a completed one is not re-run.
+
+Run autonomously via the Cloud SQL proxy. Idempotent.
+"""
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(APP_DIR, '.env'))
+from db_credentials_loader import set_database_url
+set_database_url()
+import db_utils
+
+db_utils.execute_query("""
+    CREATE TABLE IF NOT EXISTS elevation_migration_checkpoints (
+        migration_id VARCHAR(100) PRIMARY KEY,
+        conversion_factor REAL NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'pending',
+        last_user_id INTEGER,
+        chunks_completed INTEGER NOT NULL DEFAULT 0,
+        activities_updated INTEGER NOT NULL DEFAULT 0,
+        acwr_rows_updated INTEGER NOT NULL DEFAULT 0,
+        error_message TEXT,
+        started_at TIMESTAMP,
+        completed_at TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT NOW()
+    )
+""")
+print("ensured table elevation_migration_checkpoints")
+
+cols = db_utils.execute_query(
+    """SELECT column_name, data_type FROM information_schema.columns
+       WHERE table_name = 'elevation_migration_checkpoints' ORDER BY ordinal_position""",
+    fetch=True,
+)
+print("Verification — columns:")
+for c in cols:
+    print("  ", dict(c))
+print("Done." if cols else "FAILED — table not present.")
@@ -0,0 +1,81 @@
+"""
+Migration: durable feature flags.
+
+1. feature_flags — one row per flag: the default for everyone and whether the admin
+   account gets early access.
+2. feature_flag_overrides — per-user overrides (beta rollouts, cutovers).
+3. feature_flag_version — single-row counter bumped by every toggle; each process polls
+   it and reloads its compiled flag snapshot only when it changes.
+
+Seeds the tables from utils.feature_flags.BUILTIN_FLAGS / BUILTIN_OVERRIDES without
+touching rows that already exist, so re-running never undoes an admin toggle.
+
+Run autonomously via the Cloud SQL proxy. Idempotent.
+"""
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(APP_DIR, '.env'))
+from db_credentials_loader import set_database_url
+set_database_url()
+import db_utils
+from utils.feature_flags import BUILTIN_FLAGS, BUILTIN_OVERRIDES
+
+db_utils.execute_query("""
+    CREATE TABLE IF NOT EXISTS feature_flags (
+        name VARCHAR(100) PRIMARY KEY,
+        enabled BOOLEAN NOT NULL DEFAULT FALSE,
+        admin_early_access BOOLEAN NOT NULL DEFAULT TRUE,
+        description TEXT,
+        updated_at TIMESTAMP DEFAULT NOW(),
+        updated_by INTEGER
+    )
+""")
+db_utils.execute_query("""
+    CREATE TABLE IF NOT EXISTS feature_flag_overrides (
+        feature_name VARCHAR(100) NOT NULL REFERENCES feature_flags(name) ON DELETE CASCADE,
+        user_id INTEGER NOT NULL,
+        enabled BOOLEAN NOT NULL,
+        updated_at TIMESTAMP DEFAULT NOW(),
+        updated_by INTEGER,
+        PRIMARY KEY (feature_name, user_id)
+    )
+""")
+db_utils.execute_query("""
+    CREATE TABLE IF NOT EXISTS feature_flag_version (
+        id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+        version BIGINT NOT NULL DEFAULT 1,
+        updated_at TIMESTAMP DEFAULT NOW()
+    )
+""")
+print("ensured tables feature_flags, feature_flag_overrides, feature_flag_version")
+
+for flag in BUILTIN_FLAGS:
+    db_utils.execute_query(
+        """INSERT INTO feature_flags (name, enabled, admin_early_access, description)
+           VALUES (%s, %s, %s, %s) ON CONFLICT (name) DO NOTHING""",
+        (flag.name, flag.enabled, flag.admin_early_access, flag.description),
+    )
+for (feature_name, user_id), enabled in BUILTIN_OVERRIDES.items():
+    db_utils.execute_query(
+        """INSERT INTO feature_flag_overrides (feature_name, user_id, enabled)
+           VALUES (%s, %s, %s) ON CONFLICT (feature_name, user_id) DO NOTHING""",
+        (feature_name, user_id, enabled),
+    )
+db_utils.execute_query("""
+    INSERT INTO feature_flag_version (id, version) VALUES (1, 1)
+    ON CONFLICT (id) DO UPDATE SET version = feature_flag_version.version + 1, updated_at = NOW()
+""")
+print(f"seeded {len(BUILTIN_FLAGS)} flags and {len(BUILTIN_OVERRIDES)} overrides")
+
+rows = db_utils.execute_query(
+    "SELECT name, enabled, admin_early_access FROM feature_flags ORDER BY name", fetch=True
+)
+print("Verification — flags:")
+for r in rows:
+    print("  ", dict(r))
+print("Done." if rows else "FAILED — table not present.")
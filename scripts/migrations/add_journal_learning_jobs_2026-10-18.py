@@ -0,0 +1,63 @@
+"""
+Migration: durable queue for post-journal learning (journal_learning.py).
+
+journal_learning_jobs — one row per (user_id, date). POST /api/journal upserts the row
+and returns; worker threads claim it with FOR UPDATE SKIP LOCKED, run the autopsy,
+deviation classification, athlete model update and tomorrow's decision, and store the
+outcome in result. generation counts saves of the same day, so a save that lands while
+the job is running requeues it instead of being lost. lease_expires_at lets another
+process reclaim a job whose worker died. steps records what the current generation
+has already done (the autopsy, the athlete model update) so a retry doesn't repeat it.
+
+Run autonomously via the Cloud SQL proxy. Idempotent.
+"""
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(APP_DIR, '.env'))
+from db_credentials_loader import set_database_url
+set_database_url()
+import db_utils
+
+db_utils.execute_query("""
+    CREATE TABLE IF NOT EXISTS journal_learning_jobs (
+        user_id INTEGER NOT NULL,
+        date DATE NOT NULL,
+        is_rest_day BOOLEAN NOT NULL DEFAULT FALSE,
+        status VARCHAR(20) NOT NULL DEFAULT 'pending',
+        generation INTEGER NOT NULL DEFAULT 1,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        requested_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        available_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP,
+        lease_expires_at TIMESTAMP,
+        result JSONB,
+        error TEXT,
+        steps JSONB NOT NULL DEFAULT '{}'::jsonb,
+        PRIMARY KEY (user_id, date)
+    )
+""")
+db_utils.execute_query(
+    "ALTER TABLE journal_learning_jobs ADD COLUMN IF NOT EXISTS steps JSONB NOT NULL DEFAULT '{}'::jsonb"
+)
+db_utils.execute_query("""
+    CREATE INDEX IF NOT EXISTS idx_journal_learning_jobs_runnable
+    ON journal_learning_jobs (requested_at)
+    WHERE status IN ('pending', 'running')
+""")
+print("ensured table journal_learning_jobs")
+
+cols = db_utils.execute_query(
+    """SELECT column_name, data_type FROM information_schema.columns
+       WHERE table_name = 'journal_learning_jobs' ORDER BY ordinal_position""",
+    fetch=True,
+)
+print("Verification — columns:")
+for c in cols:
+    print("  ", dict(c))
+print("Done." if cols else "FAILED — table not present.")
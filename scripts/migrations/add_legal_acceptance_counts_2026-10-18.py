@@ -0,0 +1,50 @@
+"""
+Migration: incrementally maintained legal acceptance counts (legal_compliance.py).
+
+legal_acceptance_counts — users per acceptance bitmap (terms=1, privacy=2,
+disclaimer=4; a bit is set when the user_settings acceptance timestamp is). A row
+trigger on user_settings moves a user between bitmaps on every insert, delete and
+acceptance update, whichever code path writes it, so the admin compliance
+statistics read eight rows instead of aggregating user_settings.
+
+Also indexes legal_compliance by (user_id, document_type, accepted_at DESC) for the
+per-user latest-version lookup behind the cached compliance status.
+
+After installing the trigger this recounts the table from user_settings under a
+SHARE lock, so it is safe to re-run on a live table.
+
+Run autonomously via the Cloud SQL proxy. Idempotent.
+"""
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(APP_DIR, '.env'))
+from db_credentials_loader import set_database_url
+set_database_url()
+import db_utils
+from legal_compliance import ACCEPTANCE_COUNTS_DDL, recount_legal_acceptances
+
+db_utils.execute_query(ACCEPTANCE_COUNTS_DDL)
+print("ensured table legal_acceptance_counts and trigger user_settings_legal_acceptance_counts")
+
+db_utils.execute_query("""
+    CREATE INDEX IF NOT EXISTS idx_legal_compliance_user_document
+    ON legal_compliance (user_id, document_type, accepted_at DESC)
+""")
+print("ensured index idx_legal_compliance_user_document")
+
+counts = recount_legal_acceptances()
+print("recounted legal_acceptance_counts")
+
+total = db_utils.execute_query("SELECT COUNT(*) AS n FROM user_settings", fetch=True)[0]['n']
+triggers = db_utils.execute_query(
+    "SELECT tgname FROM pg_trigger WHERE tgname = 'user_settings_legal_acceptance_counts'", fetch=True)
+print("Verification — users per acceptance bitmap:")
+for bits, users in sorted(counts.items()):
+    print(f"   {bits:03b}: {users}")
+print(f"Verification — counted {sum(counts.values())} of {total} users, trigger present: {bool(triggers)}")
+print("Done." if triggers and sum(counts.values()) == total else "FAILED — counts or trigger missing.")
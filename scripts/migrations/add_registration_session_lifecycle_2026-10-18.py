@@ -0,0 +1,79 @@
+"""
+Migration: registration session lifecycle tables (registration_session_manager.py).
+
+registration_sessions — one row per onboarding session. Two partial indexes cover
+the hot paths: (user_id, created_at) for a user's active sessions and (expires_at)
+for the scheduled set-based expiry, both only over status = 'active'.
+
+registration_session_counts — sessions per (session_type, status). Every create and
+status change moves these in the same statement, so session analytics read a few
+counter rows. This script recounts them from registration_sessions; run it while
+no sessions are being created or transitioned if it is ever re-run on a live table.
+
+Run autonomously via the Cloud SQL proxy. Idempotent.
+"""
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(APP_DIR, '.env'))
+from db_credentials_loader import set_database_url
+set_database_url()
+import db_utils
+
+db_utils.execute_query("""
+    CREATE TABLE IF NOT EXISTS registration_sessions (
+        session_id VARCHAR(64) PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        session_type VARCHAR(30) NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'active',
+        created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        expires_at TIMESTAMP NOT NULL,
+        last_activity TIMESTAMP,
+        ip_address VARCHAR(45),
+        user_agent TEXT,
+        metadata TEXT,
+        updated_at TIMESTAMP DEFAULT NOW()
+    )
+""")
+print("ensured table registration_sessions")
+
+db_utils.execute_query("""
+    CREATE INDEX IF NOT EXISTS idx_registration_sessions_user_active
+    ON registration_sessions (user_id, created_at) WHERE status = 'active'
+""")
+db_utils.execute_query("""
+    CREATE INDEX IF NOT EXISTS idx_registration_sessions_expiry
+    ON registration_sessions (expires_at) WHERE status = 'active'
+""")
+print("ensured partial indexes on registration_sessions")
+
+db_utils.execute_query("""
+    CREATE TABLE IF NOT EXISTS registration_session_counts (
+        session_type VARCHAR(30) NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        sessions BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (session_type, status)
+    )
+""")
+db_utils.execute_query("""
+    INSERT INTO registration_session_counts (session_type, status, sessions)
+    SELECT session_type, status, COUNT(*) FROM registration_sessions GROUP BY session_type, status
+    ON CONFLICT (session_type, status) DO UPDATE SET sessions = EXCLUDED.sessions
+""")
+print("ensured and recounted registration_session_counts")
+
+counts = db_utils.execute_query(
+    "SELECT session_type, status, sessions FROM registration_session_counts ORDER BY 1, 2", fetch=True)
+indexes = db_utils.execute_query(
+    "SELECT indexname FROM pg_indexes WHERE tablename = 'registration_sessions' ORDER BY indexname", fetch=True)
+print("Verification — indexes:")
+for i in indexes or []:
+    print("  ", i['indexname'])
+print("Verification — counts:")
+for c in counts or []:
+    print("  ", dict(c))
+print("Done." if indexes else "FAILED — table not present.")
@@ -0,0 +1,42 @@
+"""
+Migration: shared screenshot parse jobs (ultrasignup_parse_jobs.py).
+
+screenshot_parse_jobs — one row per background parse of an UltraSignup screenshot:
+the content hash, the users who uploaded those bytes, the stage reached, the progress
+events and, once finished, the result. Cloud Run runs several instances with no
+affinity, so the instance that answers a poll or an event stream is often not the one
+parsing; it reads the job from here. Successful results double as the parse cache
+keyed by content hash, and rows older than a day are purged as new uploads arrive.
+
+Run autonomously via the Cloud SQL proxy. Idempotent.
+"""
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(APP_DIR, '.env'))
+from db_credentials_loader import set_database_url
+set_database_url()
+import db_utils
+from ultrasignup_parse_jobs import JOBS_DDL
+
+db_utils.execute_query(JOBS_DDL)
+print("ensured table screenshot_parse_jobs and index idx_screenshot_parse_jobs_hash_updated")
+
+cols = db_utils.execute_query(
+    """SELECT column_name, data_type FROM information_schema.columns
+       WHERE table_name = 'screenshot_parse_jobs' ORDER BY ordinal_position""",
+    fetch=True,
+)
+print("Verification — columns:")
+for c in cols:
+    print("  ", dict(c))
+indexes = db_utils.execute_query(
+    """SELECT indexname FROM pg_indexes
+       WHERE tablename = 'screenshot_parse_jobs' AND indexname = 'idx_screenshot_parse_jobs_hash_updated'""",
+    fetch=True,
+)
+print("Done." if cols and indexes else "FAILED — table or index missing.")
@@ -0,0 +1,39 @@
+"""
+Migration: input fingerprint on weekly_programs (weekly_program_cache.py).
+
+weekly_programs.input_fingerprint — sha256 of the planning inputs a program was generated
+from: race goals, training schedule and cross-training disciplines, the week's schedule
+constraints and the ACWR configuration. save_weekly_program() writes it; the Coach page
+reports a plan whose inputs have since changed, and the weekly program prewarm skips
+users whose stored program already matches their current inputs. Existing rows stay
+NULL, which is treated as "unknown" (never skipped, never flagged).
+
+Run autonomously via the Cloud SQL proxy. Idempotent.
+"""
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(APP_DIR, '.env'))
+from db_credentials_loader import set_database_url
+set_database_url()
+import db_utils
+
+db_utils.execute_query("""
+    ALTER TABLE weekly_programs
+    ADD COLUMN IF NOT EXISTS input_fingerprint VARCHAR(64)
+""")
+print("ensured column weekly_programs.input_fingerprint")
+
+cols = db_utils.execute_query(
+    """SELECT column_name, data_type FROM information_schema.columns
+       WHERE table_name = 'weekly_programs' AND column_name = 'input_fingerprint'""",
+    fetch=True,
+)
+print("Verification — columns:")
+for c in cols:
+    print("  ", dict(c))
+print("Done." if cols else "FAILED — column not present.")
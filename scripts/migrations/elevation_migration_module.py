@@ -4,12 +4,25 @@ Your Training Monkey - Integrated with existing app infrastructure
 
 Migrates from 1000ft = 1 mile to 750ft = 1 mile conversion factor
 Uses existing db_utils connection for reliability.
+
+The migration is set-based. Users are grouped into chunks of about CHUNK_ACTIVITIES
+activities; each chunk is one transaction that
+1. recomputes elevation_load_miles / total_load_miles server-side in a single UPDATE,
+   returning the (user, date) span of the rows whose load actually changed,
+2. recomputes the 7/28-day rolling windows, ACWR ratios and normalized divergence in a
+   single UPDATE ... FROM, for those users and only the dates whose windows include a
+   changed day,
+3. advances the run's row in elevation_migration_checkpoints,
+so an interrupted migration resumes after the last committed chunk. A dry run writes
+nothing: it builds the load diff in a temp table and reports the ACWR values it would
+change.
 """
 
 import db_utils
-from datetime import datetime, timedelta
+from datetime import datetime
 from decimal import Decimal
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -17,16 +30,171 @@ logger = logging.getLogger(__name__)
 OLD_CONVERSION_FACTOR = 850.0  # Current factor
 NEW_CONVERSION_FACTOR = 750.0  # Research-optimized factor
 
+CHUNK_ACTIVITIES = 20000  # Target activities per transaction; one user is never split
+ACUTE_DAYS = 7
+CHRONIC_WINDOW_DAYS = 28  # Chronic window is days -27..-7, averaged over 21 days
+ACWR_DIFF_THRESHOLD = 0.01  # Dry run: ACWR changes at least this large are reported
+
+# New loads as the activities table stores them (REAL), so unchanged rows compare equal
+_NEW_ELEVATION_LOAD = "(COALESCE(elevation_gain_feet, 0) / %(factor)s)::real"
+_NEW_TOTAL_LOAD = "(COALESCE(distance_miles, 0) + COALESCE(elevation_gain_feet, 0) / %(factor)s)::real"
+
+UPDATE_LOADS_SQL = f"""
+    WITH changed AS (
+        UPDATE activities
+        SET elevation_load_miles = {_NEW_ELEVATION_LOAD},
+            total_load_miles = {_NEW_TOTAL_LOAD}
+        WHERE user_id = ANY(%(user_ids)s)
+          AND elevation_gain_feet IS NOT NULL
+          AND (elevation_load_miles IS DISTINCT FROM {_NEW_ELEVATION_LOAD}
+               OR total_load_miles IS DISTINCT FROM {_NEW_TOTAL_LOAD})
+        RETURNING user_id, date::date AS day
+    )
+    SELECT user_id, MIN(day) AS first_day, MAX(day) AS last_day, COUNT(*) AS activities
+    FROM changed
+    GROUP BY user_id
+"""
+
+DIFF_TABLE_SQL = f"""
+    CREATE TEMP TABLE elevation_migration_diff ON COMMIT DROP AS
+    SELECT user_id, activity_id, date::date AS day, elevation_gain_feet, distance_miles,
+           elevation_load_miles AS old_elevation_load,
+           {_NEW_ELEVATION_LOAD} AS new_elevation_load,
+           total_load_miles AS old_total_load,
+           {_NEW_TOTAL_LOAD} AS new_total_load
+    FROM activities
+    WHERE elevation_gain_feet IS NOT NULL
+      AND (elevation_load_miles IS DISTINCT FROM {_NEW_ELEVATION_LOAD}
+           OR total_load_miles IS DISTINCT FROM {_NEW_TOTAL_LOAD})
+"""
+
+# {scope}: (user_id, first_day, last_day) - the days whose windows are recomputed
+# {loads}: (user_id, activity_id, day, total_load, trimp) - the loads they are computed from
+ROLLING_WINDOWS_SQL = """
+    WITH scope AS ({scope}),
+    loads AS ({loads}),
+    daily AS (
+        SELECT l.user_id, l.day,
+               SUM(COALESCE(l.total_load, 0)) AS load,
+               SUM(COALESCE(l.trimp, 0)) AS trimp,
+               COUNT(*) AS activities
+        FROM loads l
+        JOIN scope s ON s.user_id = l.user_id
+        WHERE l.day BETWEEN s.first_day - {lookback} AND s.last_day
+        GROUP BY l.user_id, l.day
+    ),
+    windows AS (
+        SELECT user_id, day,
+               SUM(load) OVER acute / {acute}.0 AS acute_load,
+               SUM(trimp) OVER acute / {acute}.0 AS acute_trimp,
+               SUM(load) OVER chronic AS chronic_load,
+               SUM(trimp) OVER chronic AS chronic_trimp,
+               COALESCE(SUM(activities) OVER chronic, 0) AS chronic_activities
+        FROM daily
+        WINDOW acute AS (PARTITION BY user_id ORDER BY day
+                         RANGE BETWEEN INTERVAL '{acute_preceding} days' PRECEDING AND CURRENT ROW),
+               chronic AS (PARTITION BY user_id ORDER BY day
+                           RANGE BETWEEN INTERVAL '{lookback} days' PRECEDING
+                                     AND INTERVAL '{acute} days' PRECEDING)
+    ),
+    averages AS (
+        SELECT user_id, day, acute_load, acute_trimp,
+               CASE WHEN chronic_activities > 0 THEN chronic_load / {chronic_days}.0
+                    ELSE acute_load END AS chronic_load,
+               CASE WHEN chronic_activities > 0 THEN chronic_trimp / {chronic_days}.0
+                    ELSE acute_trimp END AS chronic_trimp
+        FROM windows
+    ),
+    ratios AS (
+        SELECT user_id, day, acute_load, acute_trimp, chronic_load, chronic_trimp,
+               CASE WHEN chronic_load > 0 THEN acute_load / chronic_load ELSE 0 END AS external_acwr,
+               CASE WHEN chronic_trimp > 0 THEN acute_trimp / chronic_trimp ELSE 0 END AS internal_acwr
+        FROM averages
+    ),
+    computed AS (
+        SELECT r.*,
+               CASE WHEN r.external_acwr + r.internal_acwr = 0 THEN 0
+                    ELSE ROUND(((r.external_acwr - r.internal_acwr)
+                                / ((r.external_acwr + r.internal_acwr) / 2))::numeric, 3)
+               END AS normalized_divergence
+        FROM ratios r
+        JOIN scope s ON s.user_id = r.user_id
+        WHERE r.day BETWEEN s.first_day AND s.last_day
+    )
+""".format(
+    scope='{scope}', loads='{loads}',
+    acute=ACUTE_DAYS, acute_preceding=ACUTE_DAYS - 1,
+    lookback=CHRONIC_WINDOW_DAYS - 1, chronic_days=CHRONIC_WINDOW_DAYS - ACUTE_DAYS,
+)
+
+UPDATE_WINDOWS_SQL = ROLLING_WINDOWS_SQL + """
+    UPDATE activities a
+    SET seven_day_avg_load = c.acute_load,
+        twentyeight_day_avg_load = c.chronic_load,
+        seven_day_avg_trimp = c.acute_trimp,
+        twentyeight_day_avg_trimp = c.chronic_trimp,
+        acute_chronic_ratio = c.external_acwr,
+        trimp_acute_chronic_ratio = c.internal_acwr,
+        normalized_divergence = c.normalized_divergence
+    FROM computed c
+    WHERE a.user_id = c.user_id AND a.date::date = c.day
+"""
+
+# A changed day moves the windows of that day and the CHRONIC_WINDOW_DAYS - 1 days after it
+CHUNK_SCOPE_SQL = f"""
+    SELECT user_id, first_day, last_day + {CHRONIC_WINDOW_DAYS - 1} AS last_day
+    FROM unnest(%(user_ids)s::int[], %(first_days)s::date[], %(last_days)s::date[])
+        AS s(user_id, first_day, last_day)
+"""
+DIFF_SCOPE_SQL = f"""
+    SELECT user_id, MIN(day) AS first_day, MAX(day) + {CHRONIC_WINDOW_DAYS - 1} AS last_day
+    FROM elevation_migration_diff
+    GROUP BY user_id
+"""
+STORED_LOADS_SQL = """
+    SELECT user_id, activity_id, date::date AS day, total_load_miles AS total_load, trimp
+    FROM activities
+    WHERE user_id IN (SELECT user_id FROM scope)
+"""
+DIFF_LOADS_SQL = """
+    SELECT a.user_id, a.activity_id, a.date::date AS day,
+           COALESCE(d.new_total_load, a.total_load_miles) AS total_load, a.trimp
+    FROM activities a
+    LEFT JOIN elevation_migration_diff d
+           ON d.user_id = a.user_id AND d.activity_id = a.activity_id
+    WHERE a.user_id IN (SELECT user_id FROM scope)
+"""
+
+ACWR_DIFF_SQL = ROLLING_WINDOWS_SQL + """
+    SELECT COUNT(*) AS activities,
+           COUNT(*) FILTER (WHERE ABS(c.external_acwr - COALESCE(a.acute_chronic_ratio, 0)) >= %(threshold)s)
+               AS acwr_changed,
+           MAX(ABS(c.external_acwr - COALESCE(a.acute_chronic_ratio, 0))) AS max_acwr_change
+    FROM computed c
+    JOIN activities a ON a.user_id = c.user_id AND a.date::date = c.day
+"""
+
+
+def default_migration_id():
+    """Checkpoint key for migrating to the current NEW_CONVERSION_FACTOR"""
+    return f"elevation_{NEW_CONVERSION_FACTOR:g}ft"
+
 
 class ElevationMigrationService:
     """Service for elevation factor migration"""
 
-    def __init__(self):
+    def __init__(self, migration_id=None, chunk_activities=CHUNK_ACTIVITIES):
+        self.migration_id = migration_id or default_migration_id()
+        self.chunk_activities = chunk_activities
         self.results = {
             'total_activities': 0,
             'elevation_activities': 0,
             'updated_activities': 0,
             'updated_users': 0,
+            'acwr_rows_updated': 0,
+            'chunks': 0,
+            'resumed_after_user': None,
+            'dry_run_diff': None,
             'validation_passed': False,
             'errors': [],
             'warnings': [],
@@ -48,13 +216,13 @@ class ElevationMigrationService:
 
             # Check activities with elevation data by user
             result = db_utils.execute_query("""
-                SELECT 
+                SELECT
                     user_id,
                     COUNT(*) as total_activities,
                     COUNT(CASE WHEN elevation_gain_feet > 0 THEN 1 END) as elevation_activities,
                     AVG(elevation_gain_feet) as avg_elevation,
                     MAX(elevation_gain_feet) as max_elevation
-                FROM activities 
+                FROM activities
                 WHERE user_id IS NOT NULL
                 GROUP BY user_id
                 ORDER BY user_id
@@ -84,39 +252,6 @@ class ElevationMigrationService:
             self.results['total_activities'] = total_activities
             self.results['elevation_activities'] = total_elevation_activities
 
-            # Get sample calculations
-            sample_result = db_utils.execute_query("""
-                SELECT 
-                    user_id,
-                    activity_id,
-                    elevation_gain_feet,
-                    elevation_load_miles,
-                    total_load_miles,
-                    distance_miles
-                FROM activities 
-                WHERE elevation_gain_feet > 0 
-                AND elevation_load_miles IS NOT NULL
-                ORDER BY elevation_gain_feet DESC
-                LIMIT 5
-            """, fetch=True)
-
-            # Calculate before/after examples
-            for row in sample_result:
-                current_elevation_load = row['elevation_load_miles']
-                new_elevation_load = self.calculate_new_elevation_load(row['elevation_gain_feet'])
-
-                sample = {
-                    'user_id': row['user_id'],
-                    'activity_id': row['activity_id'],
-                    'elevation_feet': row['elevation_gain_feet'],
-                    'current_load': current_elevation_load,
-                    'new_load': new_elevation_load,
-                    'percent_increase': ((
-                                                     new_elevation_load / current_elevation_load - 1) * 100) if current_elevation_load > 0 else 0,
-                    'distance_miles': row['distance_miles']
-                }
-                self.results['sample_calculations'].append(sample)
-
             logger.info(f"Validation complete: {total_activities} total, {total_elevation_activities} with elevation")
             return True
 
@@ -126,168 +261,218 @@ class ElevationMigrationService:
             self.results['errors'].append(error_msg)
             return False
 
-    def update_activities_elevation_loads(self, dry_run=True):
-        """Update all activities with new elevation load calculations"""
-        try:
-            logger.info(f"Starting elevation load update (dry_run={dry_run})")
-
-            # Get all activities with elevation data
-            activities = db_utils.execute_query("""
-                SELECT activity_id, user_id, elevation_gain_feet, distance_miles
-                FROM activities 
-                WHERE elevation_gain_feet IS NOT NULL
-                ORDER BY user_id, activity_id
-            """, fetch=True)
-
-            total_updates = len(activities)
-            logger.info(f"Found {total_updates} activities to update")
-
-            if total_updates == 0:
-                self.results['warnings'].append("No activities found to update")
-                return True
-
-            updated_count = 0
-
-            for activity in activities:
-                try:
-                    # Calculate new elevation load and total load
-                    new_elevation_load = self.calculate_new_elevation_load(activity['elevation_gain_feet'])
-                    new_total_load = (activity['distance_miles'] or 0.0) + new_elevation_load
-
-                    if not dry_run:
-                        # Update the activity record
-                        db_utils.execute_query("""
-                            UPDATE activities 
-                            SET 
-                                elevation_load_miles = %s,
-                                total_load_miles = %s
-                            WHERE activity_id = %s AND user_id = %s
-                        """, (new_elevation_load, new_total_load, activity['activity_id'], activity['user_id']))
-
-                    updated_count += 1
-
-                except Exception as e:
-                    error_msg = f"Failed to update activity {activity['activity_id']}: {str(e)}"
-                    logger.error(error_msg)
-                    self.results['errors'].append(error_msg)
-                    continue
+    def preview_migration(self):
+        """
+        Dry run: build the load diff in a temp table and measure its ACWR impact.
 
-            self.results['updated_activities'] = updated_count
-            logger.info(f"Elevation load update complete: {updated_count}/{total_updates} activities")
-            return updated_count == total_updates
+        Nothing is written; the temp table is dropped with the transaction. Fills
+        results['dry_run_diff'], updated_activities/updated_users (what a live run
+        would change) and the before/after sample calculations.
+        """
+        try:
+            logger.info("Building elevation migration dry-run diff")
+            params = {'factor': NEW_CONVERSION_FACTOR, 'threshold': ACWR_DIFF_THRESHOLD}
+
+            with db_utils.get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(DIFF_TABLE_SQL, params)
+                    cursor.execute("""
+                        SELECT COUNT(*) AS activities,
+                               COUNT(DISTINCT user_id) AS users,
+                               COALESCE(SUM(new_total_load - COALESCE(old_total_load, 0)), 0) AS load_delta,
+                               MAX(ABS(new_total_load - COALESCE(old_total_load, 0))) AS max_load_change
+                        FROM elevation_migration_diff
+                    """)
+                    loads = cursor.fetchone()
+
+                    cursor.execute(ACWR_DIFF_SQL.format(scope=DIFF_SCOPE_SQL, loads=DIFF_LOADS_SQL), params)
+                    acwr = cursor.fetchone()
+
+                    cursor.execute("""
+                        SELECT user_id, activity_id, elevation_gain_feet, distance_miles,
+                               old_elevation_load, new_elevation_load
+                        FROM elevation_migration_diff
+                        WHERE elevation_gain_feet > 0
+                        ORDER BY elevation_gain_feet DESC
+                        LIMIT 5
+                    """)
+                    samples = cursor.fetchall()
+                conn.rollback()
+
+            for row in samples:
+                current_load = row['old_elevation_load'] or 0
+                new_load = row['new_elevation_load']
+                self.results['sample_calculations'].append({
+                    'user_id': row['user_id'],
+                    'activity_id': row['activity_id'],
+                    'elevation_feet': row['elevation_gain_feet'],
+                    'current_load': current_load,
+                    'new_load': new_load,
+                    'percent_increase': ((new_load / current_load - 1) * 100) if current_load > 0 else 0,
+                    'distance_miles': row['distance_miles']
+                })
+
+            self.results['updated_activities'] = loads['activities']
+            self.results['updated_users'] = loads['users']
+            self.results['dry_run_diff'] = {
+                'activities_changed': loads['activities'],
+                'users_changed': loads['users'],
+                'total_load_delta_miles': float(loads['load_delta']),
+                'max_load_change_miles': float(loads['max_load_change'] or 0),
+                'acwr_values_recomputed': acwr['activities'],
+                'acwr_values_changed': acwr['acwr_changed'],
+                'max_acwr_change': float(acwr['max_acwr_change'] or 0),
+            }
+            logger.info(f"Dry-run diff: {self.results['dry_run_diff']}")
+            return True
 
         except Exception as e:
-            error_msg = f"Failed to update elevation loads: {str(e)}"
+            error_msg = f"Dry-run diff failed: {str(e)}"
             logger.error(error_msg)
             self.results['errors'].append(error_msg)
             return False
 
-    def recalculate_acwr_values(self, dry_run=True):
-        """Recalculate ACWR values for all users with updated elevation loads"""
-        try:
-            logger.info(f"Starting ACWR recalculation (dry_run={dry_run})")
-
-            # Get all users with activities
-            users = db_utils.execute_query("""
-                SELECT DISTINCT user_id 
-                FROM activities 
-                WHERE user_id IS NOT NULL
-                ORDER BY user_id
-            """, fetch=True)
+    def _checkpoint(self):
+        rows = db_utils.execute_query("""
+            SELECT status, last_user_id, chunks_completed
+            FROM elevation_migration_checkpoints
+            WHERE migration_id = %s
+        """, (self.migration_id,), fetch=True)
+        return dict(rows[0]) if rows else None
+
+    def _set_checkpoint_status(self, status, error_message=None):
+        db_utils.execute_query("""
+            INSERT INTO elevation_migration_checkpoints
+                (migration_id, conversion_factor, status, error_message, started_at, updated_at)
+            VALUES (%s, %s, %s, %s, NOW(), NOW())
+            ON CONFLICT (migration_id) DO UPDATE SET
+                status = EXCLUDED.status,
+                error_message = EXCLUDED.error_message,
+                completed_at = CASE WHEN EXCLUDED.status = 'completed' THEN NOW() END,
+                updated_at = NOW()
+        """, (self.migration_id, NEW_CONVERSION_FACTOR, status, error_message))
+
+    def plan_chunks(self, after_user_id=None):
+        """Consecutive user_id groups of about chunk_activities elevation activities each"""
+        rows = db_utils.execute_query("""
+            SELECT user_id, COUNT(*) AS activities
+            FROM activities
+            WHERE elevation_gain_feet IS NOT NULL
+              AND user_id IS NOT NULL
+              AND user_id > %s
+            GROUP BY user_id
+            ORDER BY user_id
+        """, (after_user_id if after_user_id is not None else -1,), fetch=True) or []
+
+        chunks, current, size = [], [], 0
+        for row in rows:
+            if current and size + row['activities'] > self.chunk_activities:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(row['user_id'])
+            size += row['activities']
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def migrate_chunk(self, cursor, user_ids):
+        """
+        Update one chunk's loads and the rolling windows that depend on them.
+
+        Runs on the caller's cursor so the chunk commits together with its checkpoint.
+        Returns (activities updated, users changed, activity rows with recomputed ACWR).
+        """
+        cursor.execute(UPDATE_LOADS_SQL, {'user_ids': user_ids, 'factor': NEW_CONVERSION_FACTOR})
+        spans = cursor.fetchall()
+        if not spans:
+            return 0, 0, 0
+
+        cursor.execute(
+            UPDATE_WINDOWS_SQL.format(scope=CHUNK_SCOPE_SQL, loads=STORED_LOADS_SQL),
+            {
+                'user_ids': [row['user_id'] for row in spans],
+                'first_days': [row['first_day'] for row in spans],
+                'last_days': [row['last_day'] for row in spans],
+            }
+        )
+        return sum(row['activities'] for row in spans), len(spans), cursor.rowcount
 
-            user_ids = [row['user_id'] for row in users]
-            logger.info(f"Recalculating ACWR for {len(user_ids)} users")
+    def update_activities_elevation_loads(self, dry_run=True):
+        """Update elevation loads and dependent ACWR values chunk by chunk, resuming from the checkpoint"""
+        if dry_run:
+            return self.preview_migration()
 
-            updated_users = 0
-            for user_id in user_ids:
-                success = self.recalculate_user_acwr(user_id, dry_run)
-                if success:
-                    updated_users += 1
-                else:
-                    self.results['warnings'].append(f"ACWR recalculation failed for user {user_id}")
+        try:
+            checkpoint = self._checkpoint()
+            if checkpoint and checkpoint['status'] == 'completed':
+                self.results['warnings'].append(
+                    f"Migration {self.migration_id} already completed; nothing to do")
+                return True
 
-            self.results['updated_users'] = updated_users
-            logger.info(f"ACWR recalculation complete: {updated_users}/{len(user_ids)} users")
-            return updated_users == len(user_ids)
+            after_user_id = checkpoint['last_user_id'] if checkpoint else None
+            self.results['resumed_after_user'] = after_user_id
+            self._set_checkpoint_status('running')
+
+            chunks = self.plan_chunks(after_user_id)
+            logger.info(f"Elevation migration {self.migration_id}: {len(chunks)} chunks"
+                        + (f", resuming after user {after_user_id}" if after_user_id is not None else ""))
+
+            for number, user_ids in enumerate(chunks, 1):
+                started = time.time()
+                with db_utils.get_db_connection() as conn:
+                    with conn.cursor() as cursor:
+                        activities, users, acwr_rows = self.migrate_chunk(cursor, user_ids)
+                        cursor.execute("""
+                            UPDATE elevation_migration_checkpoints
+                            SET last_user_id = %s,
+                                chunks_completed = chunks_completed + 1,
+                                activities_updated = activities_updated + %s,
+                                acwr_rows_updated = acwr_rows_updated + %s,
+                                updated_at = NOW()
+                            WHERE migration_id = %s
+                        """, (user_ids[-1], activities, acwr_rows, self.migration_id))
+                    conn.commit()
+
+                self.results['updated_activities'] += activities
+                self.results['updated_users'] += users
+                self.results['acwr_rows_updated'] += acwr_rows
+                self.results['chunks'] += 1
+                logger.info(f"Chunk {number}/{len(chunks)}: users {user_ids[0]}-{user_ids[-1]}, "
+                            f"{activities} loads and {acwr_rows} ACWR rows in {time.time() - started:.2f}s")
+
+            self._set_checkpoint_status('completed')
+            logger.info(f"Elevation load update complete: {self.results['updated_activities']} activities, "
+                        f"{self.results['acwr_rows_updated']} ACWR rows")
+            return True
 
         except Exception as e:
-            error_msg = f"ACWR recalculation failed: {str(e)}"
+            error_msg = f"Failed to update elevation loads: {str(e)}"
             logger.error(error_msg)
             self.results['errors'].append(error_msg)
+            try:
+                self._set_checkpoint_status('failed', str(e))
+            except Exception as checkpoint_error:
+                logger.error(f"Could not record failure checkpoint: {str(checkpoint_error)}")
             return False
 
     def recalculate_user_acwr(self, user_id, dry_run=True):
-        """Recalculate ACWR values for a specific user"""
+        """Recalculate ACWR values for a specific user's whole history"""
         try:
-            # Get all activities for user in chronological order
-            activities = db_utils.execute_query("""
-                SELECT activity_id, date, total_load_miles, trimp
-                FROM activities 
-                WHERE user_id = %s
-                ORDER BY date ASC
-            """, (user_id,), fetch=True)
-
-            if len(activities) == 0:
+            if dry_run:
                 return True
-
-            # Process each activity to calculate rolling windows
-            for i, activity in enumerate(activities):
-                activity_date = datetime.strptime(activity['date'], '%Y-%m-%d').date() if isinstance(activity['date'],
-                                                                                                     str) else activity[
-                    'date']
-
-                # Calculate 7-day acute window (current day + 6 previous days)
-                acute_start = activity_date - timedelta(days=6)
-                acute_activities = [a for a in activities[:i + 1]
-                                    if (datetime.strptime(a['date'], '%Y-%m-%d').date() if isinstance(a['date'],
-                                                                                                      str) else a[
-                        'date']) >= acute_start]
-
-                # Calculate 28-day chronic window (days -27 to -7 before current)
-                chronic_start = activity_date - timedelta(days=27)
-                chronic_end = activity_date - timedelta(days=7)
-                chronic_activities = [a for a in activities[:i + 1]
-                                      if chronic_start <= (
-                                          datetime.strptime(a['date'], '%Y-%m-%d').date() if isinstance(a['date'],
-                                                                                                        str) else a[
-                                              'date']) <= chronic_end]
-
-                # Calculate averages
-                acute_external_load = sum(a['total_load_miles'] or 0 for a in acute_activities) / 7.0
-                acute_internal_load = sum(a['trimp'] or 0 for a in acute_activities) / 7.0
-
-                chronic_external_load = (sum(a['total_load_miles'] or 0 for a in chronic_activities) / 21.0
-                                         if len(chronic_activities) > 0 else acute_external_load)
-                chronic_internal_load = (sum(a['trimp'] or 0 for a in chronic_activities) / 21.0
-                                         if len(chronic_activities) > 0 else acute_internal_load)
-
-                # Calculate ACWR ratios
-                external_acwr = acute_external_load / chronic_external_load if chronic_external_load > 0 else 0
-                internal_acwr = acute_internal_load / chronic_internal_load if chronic_internal_load > 0 else 0
-
-                # Calculate normalized divergence
-                normalized_divergence = self.calculate_normalized_divergence(external_acwr, internal_acwr)
-
-                if not dry_run:
-                    # Update activity with new calculations
-                    db_utils.execute_query("""
-                        UPDATE activities 
-                        SET 
-                            seven_day_avg_load = %s,
-                            twentyeight_day_avg_load = %s,
-                            seven_day_avg_trimp = %s,
-                            twentyeight_day_avg_trimp = %s,
-                            acute_chronic_ratio = %s,
-                            trimp_acute_chronic_ratio = %s,
-                            normalized_divergence = %s
-                        WHERE activity_id = %s AND user_id = %s
-                    """, (
-                        acute_external_load, chronic_external_load,
-                        acute_internal_load, chronic_internal_load,
-                        external_acwr, internal_acwr, normalized_divergence,
-                        activity['activity_id'], user_id
-                    ))
-
+            with db_utils.get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        UPDATE_WINDOWS_SQL.format(
+                            scope="""
+                                SELECT user_id, MIN(date::date) AS first_day, MAX(date::date) AS last_day
+                                FROM activities WHERE user_id = %(user_id)s GROUP BY user_id
+                            """,
+                            loads=STORED_LOADS_SQL
+                        ),
+                        {'user_id': user_id}
+                    )
+                conn.commit()
             return True
 
         except Exception as e:
@@ -318,34 +503,18 @@ class ElevationMigrationService:
         try:
             logger.info("Validating migration results")
 
-            # Check sample calculations with new factor
-            result = db_utils.execute_query("""
-                SELECT 
-                    user_id,
-                    activity_id,
-                    elevation_gain_feet,
-                    elevation_load_miles,
-                    total_load_miles,
-                    distance_miles
-                FROM activities 
-                WHERE elevation_gain_feet > 0 
-                AND elevation_load_miles IS NOT NULL
-                ORDER BY elevation_gain_feet DESC
-                LIMIT 5
-            """, fetch=True)
-
-            validation_passed = True
-
-            for row in result:
-                expected_elevation_load = row['elevation_gain_feet'] / NEW_CONVERSION_FACTOR
-                expected_total_load = (row['distance_miles'] or 0) + expected_elevation_load
-
-                elevation_match = abs(row['elevation_load_miles'] - expected_elevation_load) < 0.001
-                total_match = abs(row['total_load_miles'] - expected_total_load) < 0.001
+            result = db_utils.execute_query(f"""
+                SELECT COUNT(*) AS mismatched
+                FROM activities
+                WHERE elevation_gain_feet IS NOT NULL
+                  AND (elevation_load_miles IS DISTINCT FROM {_NEW_ELEVATION_LOAD}
+                       OR total_load_miles IS DISTINCT FROM {_NEW_TOTAL_LOAD})
+            """, {'factor': NEW_CONVERSION_FACTOR}, fetch=True)
 
-                if not (elevation_match and total_match):
-                    validation_passed = False
-                    self.results['errors'].append(f"Validation failed for activity {row['activity_id']}")
+            mismatched = result[0]['mismatched'] if result else 0
+            validation_passed = mismatched == 0
+            if not validation_passed:
+                self.results['errors'].append(f"Validation failed: {mismatched} activities not on the new factor")
 
             self.results['validation_passed'] = validation_passed
             return validation_passed
@@ -358,7 +527,8 @@ class ElevationMigrationService:
 
     def run_migration(self, dry_run=True):
         """Execute complete migration process"""
-        logger.info(f"Starting elevation factor migration (dry_run={dry_run})")
+        logger.info(f"Starting elevation factor migration {self.migration_id} (dry_run={dry_run}) "
+                    f"at {datetime.now().isoformat()}")
 
         try:
             # Step 1: Validate current data
@@ -366,17 +536,12 @@ class ElevationMigrationService:
                 self.results['errors'].append("Data validation failed")
                 return False
 
-            # Step 2: Update elevation loads
+            # Step 2: Update elevation loads and the ACWR values that depend on them
             if not self.update_activities_elevation_loads(dry_run):
                 self.results['errors'].append("Elevation load update failed")
                 return False
 
-            # Step 3: Recalculate ACWR values
-            if not self.recalculate_acwr_values(dry_run):
-                self.results['errors'].append("ACWR recalculation failed")
-                return False
-
-            # Step 4: Validate results (only for live migration)
+            # Step 3: Validate results (only for live migration)
             if not dry_run:
                 if not self.validate_migration_results():
                     self.results['errors'].append("Migration validation failed")
@@ -396,8 +561,8 @@ class ElevationMigrationService:
         return self.results
 
 
-def run_elevation_migration(dry_run=True):
+def run_elevation_migration(dry_run=True, migration_id=None):
     """Main function to run elevation migration"""
-    migration_service = ElevationMigrationService()
+    migration_service = ElevationMigrationService(migration_id)
     success = migration_service.run_migration(dry_run)
-    return success, migration_service.get_results()
\ No newline at end of file
+    return success, migration_service.get_results()